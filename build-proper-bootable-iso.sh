@@ -11,6 +11,10 @@ OUTPUT_DIR="$SCRIPT_DIR/output"
 WORK_DIR="/tmp/archfusion-build-$$"
 ARCHFUSION_ISO="$OUTPUT_DIR/ArchFusion-OS-Bootable-$(date +%Y%m%d).iso"
 
+# Profil de compression du squashfs (scripts/compression/*.conf)
+COMPRESSION_PROFILE="${COMPRESSION_PROFILE:-size-optimized}"
+source "$SCRIPT_DIR/scripts/compression/${COMPRESSION_PROFILE}.conf"
+
 # Couleurs pour les logs
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -64,7 +68,7 @@ EOF
     
     # Créer le système de fichiers squashfs
     log "🗜️ Création du système de fichiers squashfs..."
-    mksquashfs "$WORK_DIR/squashfs-root" "$WORK_DIR/iso/arch/x86_64/airootfs.sfs" -comp xz
+    mksquashfs "$WORK_DIR/squashfs-root" "$WORK_DIR/iso/arch/x86_64/airootfs.sfs" "${SQUASHFS_OPTIONS[@]}"
     
     success "✅ Structure ISO créée"
 }
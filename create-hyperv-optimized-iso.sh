@@ -12,6 +12,10 @@ ISO_NAME="ArchFusion-OS-HyperV-$(date +%Y%m%d).iso"
 WORK_DIR="/tmp/archfusion-hyperv"
 OUTPUT_DIR="output"
 
+# Profil de compression du squashfs (scripts/compression/*.conf)
+COMPRESSION_PROFILE="${COMPRESSION_PROFILE:-boot-optimized}"
+source "$(dirname "$0")/scripts/compression/${COMPRESSION_PROFILE}.conf"
+
 # Nettoyage
 rm -rf "$WORK_DIR"
 mkdir -p "$WORK_DIR"/{arch/boot/x86_64,boot/{grub,syslinux},EFI/BOOT}
@@ -58,7 +62,7 @@ chmod +x "$WORK_DIR/arch/x86_64/airootfs/init"
 
 # Créer le SquashFS
 if command -v mksquashfs >/dev/null 2>&1; then
-    mksquashfs "$WORK_DIR/arch/x86_64/airootfs" "$WORK_DIR/arch/x86_64/airootfs.sfs" -comp xz
+    mksquashfs "$WORK_DIR/arch/x86_64/airootfs" "$WORK_DIR/arch/x86_64/airootfs.sfs" "${SQUASHFS_OPTIONS[@]}"
 else
     echo "⚠️  mksquashfs non disponible, création d'un fichier stub"
     echo "ArchFusion SquashFS stub" > "$WORK_DIR/arch/x86_64/airootfs.sfs"
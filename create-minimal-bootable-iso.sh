@@ -12,6 +12,10 @@ BUILD_DIR="$SCRIPT_DIR/build"
 ISO_NAME="ArchFusion-OS-Minimal-$(date +%Y%m%d).iso"
 ISO_PATH="$OUTPUT_DIR/$ISO_NAME"
 
+# Profil de compression du squashfs (scripts/compression/*.conf)
+COMPRESSION_PROFILE="${COMPRESSION_PROFILE:-size-optimized}"
+source "$SCRIPT_DIR/scripts/compression/${COMPRESSION_PROFILE}.conf"
+
 # Couleurs pour les logs
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -133,7 +137,7 @@ EOF
     chmod +x "$rootfs_dir/usr/bin/archfusion-welcome"
     
     # Créer le squashfs
-    mksquashfs "$rootfs_dir" "$BUILD_DIR/arch/x86_64/airootfs.sfs" -comp xz -b 1M
+    mksquashfs "$rootfs_dir" "$BUILD_DIR/arch/x86_64/airootfs.sfs" "${SQUASHFS_OPTIONS[@]}"
     rm -rf "$rootfs_dir"
     
     success "✅ Système de fichiers créé"
@@ -13,21 +13,43 @@ set -euo pipefail
 
 readonly SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 readonly PROJECT_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
-readonly BUILD_DIR="${PROJECT_ROOT}/build"
+readonly BUILD_ROOT="${PROJECT_ROOT}/build"
 readonly ISO_DIR="${PROJECT_ROOT}/iso"
-readonly WORK_DIR="${BUILD_DIR}/work"
-readonly OUT_DIR="${BUILD_DIR}/out"
+
+# Variantes de l'ISO (paquets, services et démarrage ajoutés au système de base);
+# chacune a son répertoire de build, fixé par select_variant
+readonly VARIANTS_DIR="${SCRIPT_DIR}/variants"
+readonly DEFAULT_VARIANT="full"
+# Profils de compression du squashfs et de l'initramfs (compression_bench.py)
+readonly COMPRESSION_DIR="${SCRIPT_DIR}/compression"
 
 # Informations de la distribution
 readonly DISTRO_NAME="ArchFusion"
 readonly DISTRO_VERSION="1.0.0"
 readonly DISTRO_CODENAME="Fusion"
 readonly ISO_LABEL="ARCHFUSION_${DISTRO_VERSION//./_}"
-readonly ISO_FILENAME="archfusion-${DISTRO_VERSION}-x86_64.iso"
 
-# Configuration archiso
-readonly ARCHISO_PROFILE="${BUILD_DIR}/archiso-profile"
-readonly ARCHISO_CONFIG="${ARCHISO_PROFILE}/profiledef.sh"
+# Dépôt hors ligne des paquets de l'installateur (voir package_plan.py)
+readonly OFFLINE_REPO_DIR="/opt/archfusion/repo"
+readonly OFFLINE_REPO_NAME="archfusion-offline"
+readonly HOST_PACKAGE_CACHE="/var/cache/pacman/pkg"
+
+# Construction incrémentale: cache des étapes adressé par le contenu (build_cache.py)
+readonly BUILD_CACHE_SCRIPT="${SCRIPT_DIR}/build_cache.py"
+# Empreintes de l'ISO et manifeste des blocs, en une seule lecture
+readonly ISO_MANIFEST_SCRIPT="${SCRIPT_DIR}/iso_manifest.py"
+# Hook pacman masqué pendant l'étape des paquets (initramfs fait après l'overlay)
+readonly MKINITCPIO_HOOK_MASK="etc/pacman.d/hooks/90-mkinitcpio-install.hook"
+# Repère des options de budget ajoutées à profiledef.sh (exclues des clés du cache)
+readonly BUDGET_MARK="  # budget"
+# Fichiers de l'overlay lus par mkinitcpio (clé de l'étape des images de démarrage)
+readonly INITRAMFS_INPUTS=(
+    etc/mkinitcpio.conf
+    etc/mkinitcpio.conf.d
+    etc/mkinitcpio.d
+    etc/modprobe.d
+    usr/lib/initcpio
+)
 
 # Couleurs pour l'affichage
 readonly RED='\033[0;31m'
@@ -75,7 +97,9 @@ fatal() {
 
 # Affichage du banner ArchFusion
 show_banner() {
-    clear
+    if [[ -t 1 ]]; then
+        clear
+    fi
     echo -e "${CYAN}"
     cat << 'EOF'
     ╔═══════════════════════════════════════════════════════════╗
@@ -105,6 +129,46 @@ EOF
     echo ""
 }
 
+# Chargement de la variante et des chemins qui en dépendent
+select_variant() {
+    local variant_file="${VARIANTS_DIR}/${VARIANT}.conf"
+    [[ -f $variant_file ]] || fatal "Variante inconnue: ${VARIANT} (voir ${VARIANTS_DIR})"
+    
+    VARIANT_PACKAGES=()
+    VARIANT_SERVICES=()
+    VARIANT_KERNEL_PARAMS=""
+    VARIANT_OFFLINE_REPO=true
+    VARIANT_COMPRESSION="size-optimized"
+    # shellcheck disable=SC1090
+    source "$variant_file"
+    [[ $VARIANT_OFFLINE_REPO == true ]] || OFFLINE_REPO=false
+    
+    # Profil de compression: --compression, sinon celui de la variante
+    COMPRESSION_PROFILE="${COMPRESSION_PROFILE:-$VARIANT_COMPRESSION}"
+    local compression_file="${COMPRESSION_DIR}/${COMPRESSION_PROFILE}.conf"
+    [[ -f $compression_file ]] || fatal "Profil de compression inconnu: ${COMPRESSION_PROFILE} (voir ${COMPRESSION_DIR})"
+    # shellcheck disable=SC1090
+    source "$compression_file"
+    
+    readonly BUILD_DIR="${BUILD_ROOT}/${VARIANT}"
+    readonly WORK_DIR="${BUILD_DIR}/work"
+    readonly OUT_DIR="${BUILD_DIR}/out"
+    readonly ARCHISO_PROFILE="${BUILD_DIR}/archiso-profile"
+    readonly ARCHISO_CONFIG="${ARCHISO_PROFILE}/profiledef.sh"
+    # Paquets communs à toutes les variantes (couche de base du mode incrémental)
+    readonly BASE_PACKAGES_FILE="${BUILD_DIR}/base-packages.x86_64"
+    # Bases des dépôts synchronisées et versions retenues (clés du cache)
+    readonly REPO_DB_DIR="${BUILD_DIR}/repo-db"
+    readonly REPO_STATE_DIR="${BUILD_DIR}/repo-state"
+    
+    # La variante complète garde le nom historique de l'ISO
+    if [[ $VARIANT == "$DEFAULT_VARIANT" ]]; then
+        readonly ISO_FILENAME="archfusion-${DISTRO_VERSION}-x86_64.iso"
+    else
+        readonly ISO_FILENAME="archfusion-${DISTRO_VERSION}-${VARIANT}-x86_64.iso"
+    fi
+}
+
 # Vérification des prérequis
 check_prerequisites() {
     info "Vérification des prérequis pour la génération d'ISO..."
@@ -115,7 +179,9 @@ check_prerequisites() {
     fi
     
     # Vérifier les outils requis
-    local required_tools=("archiso" "mkarchiso" "pacman" "mksquashfs" "xorriso")
+    local required_tools=("archiso" "mkarchiso" "pacman" "mksquashfs" "xorriso" "python3")
+    [[ $OFFLINE_REPO == true ]] && required_tools+=("repo-add")
+    [[ $INCREMENTAL == true ]] && required_tools+=("arch-chroot")
     for tool in "${required_tools[@]}"; do
         if ! command -v "$tool" &> /dev/null; then
             error "Outil requis manquant: $tool"
@@ -129,12 +195,20 @@ check_prerequisites() {
     done
     
     # Vérifier l'espace disque (au moins 4GB)
-    local available_space=$(df "${BUILD_DIR%/*}" | awk 'NR==2 {print $4}')
+    mkdir -p "$BUILD_ROOT"
+    local available_space=$(df "$BUILD_ROOT" | awk 'NR==2 {print $4}')
     if [[ $available_space -lt 4194304 ]]; then # 4GB en KB
         fatal "Au moins 4GB d'espace libre requis pour la génération d'ISO"
     fi
     success "Espace disque suffisant: $(( available_space / 1024 / 1024 ))GB disponibles"
     
+    # Le mode incrémental reprend une construction grâce aux fichiers témoins
+    # des étapes de mkarchiso (_run_once, archiso v49 et suivantes)
+    if [[ $INCREMENTAL == true ]] && ! grep -qs 'run_once_mode' "$(command -v mkarchiso || echo mkarchiso)"; then
+        warning "Version de mkarchiso sans reprise d'étapes: construction complète"
+        INCREMENTAL=false
+    fi
+    
     # Vérifier la connexion internet
     if ! ping -c 1 archlinux.org &> /dev/null; then
         warning "Pas de connexion internet - utilisation du cache local uniquement"
@@ -167,6 +241,10 @@ create_archiso_profile() {
     # Copier le profil de base
     cp -r /usr/share/archiso/configs/releng/* "$ARCHISO_PROFILE/"
     
+    # Options de mksquashfs du profil de compression
+    local squashfs_options
+    squashfs_options=$(printf "'%s' " "${SQUASHFS_OPTIONS[@]}")
+    
     # Configuration du profil
     cat > "$ARCHISO_CONFIG" << EOF
 #!/usr/bin/env bash
@@ -185,7 +263,7 @@ bootmodes=('bios.syslinux.mbr' 'bios.syslinux.eltorito'
 arch="x86_64"
 pacman_conf="pacman.conf"
 airootfs_image_type="squashfs"
-airootfs_image_tool_options=('-comp' 'xz' '-Xbcj' 'x86' '-b' '1M' '-Xdict-size' '1M')
+airootfs_image_tool_options=(${squashfs_options% })
 file_permissions=(
   ["/etc/shadow"]="0:0:400"
   ["/root"]="0:0:750"
@@ -197,15 +275,24 @@ file_permissions=(
 )
 EOF
     
-    success "Profil archiso créé"
+    # Part des processeurs et de la mémoire accordée à mksquashfs (constructions
+    # parallèles); sans effet sur le contenu de l'image
+    local budget=()
+    [[ -n $SQUASHFS_PROCESSORS ]] && budget+=("'-processors' '${SQUASHFS_PROCESSORS}'")
+    [[ -n $SQUASHFS_MEM ]] && budget+=("'-mem' '${SQUASHFS_MEM}'")
+    if [[ ${#budget[@]} -gt 0 ]]; then
+        echo "airootfs_image_tool_options+=(${budget[*]})${BUDGET_MARK}" >> "$ARCHISO_CONFIG"
+    fi
+    
+    success "Profil archiso créé (compression: ${COMPRESSION_PROFILE})"
 }
 
 # Configuration des paquets
 configure_packages() {
     info "Configuration de la liste des paquets..."
     
-    # Liste des paquets ArchFusion
-    cat > "${ARCHISO_PROFILE}/packages.x86_64" << 'EOF'
+    # Paquets communs à toutes les variantes
+    cat > "$BASE_PACKAGES_FILE" << 'EOF'
 # Système de base
 base
 base-devel
@@ -249,82 +336,6 @@ neofetch
 tree
 lsof
 
-# Interface graphique - KDE Plasma
-plasma-meta
-kde-applications-meta
-sddm
-sddm-kcm
-xorg-server
-xorg-apps
-xorg-xinit
-plasma-wayland-session
-
-# Applications essentielles
-firefox
-kitty
-dolphin
-kate
-konsole
-spectacle
-gwenview
-okular
-ark
-kdeconnect
-kcalc
-
-# Multimédia
-pipewire
-pipewire-alsa
-pipewire-pulse
-pipewire-jack
-wireplumber
-pavucontrol
-alsa-utils
-vlc
-mpv
-
-# Polices
-ttf-dejavu
-ttf-liberation
-ttf-roboto
-noto-fonts
-noto-fonts-emoji
-ttf-fira-code
-ttf-jetbrains-mono
-
-# Thèmes et icônes
-papirus-icon-theme
-arc-gtk-theme
-kvantum-qt5
-
-# Outils de développement
-code
-python
-python-pip
-nodejs
-npm
-
-# Utilitaires système
-gparted
-timeshift
-bleachbit
-synaptic
-software-properties-common
-apt-transport-https
-ca-certificates
-gnupg
-lsb-release
-
-# Support matériel
-mesa
-xf86-video-intel
-xf86-video-amdgpu
-nvidia
-bluez
-bluez-utils
-cups
-ghostscript
-
 # Archiso spécifique
 archiso
 arch-install-scripts
@@ -335,7 +346,15 @@ qemu-guest-agent
 virtualbox-guest-utils
 EOF
     
-    success "Liste des paquets configurée"
+    # Liste de mkarchiso: base puis paquets de la variante
+    {
+        cat "$BASE_PACKAGES_FILE"
+        echo ""
+        echo "# Variante ${VARIANT}"
+        printf '%s\n' "${VARIANT_PACKAGES[@]}"
+    } > "${ARCHISO_PROFILE}/packages.x86_64"
+    
+    success "Liste des paquets configurée (variante ${VARIANT}: ${#VARIANT_PACKAGES[@]} paquets ajoutés)"
 }
 
 # Configuration du système live
@@ -362,6 +381,10 @@ configure_live_system() {
         cp -r "${PROJECT_ROOT}/scripts"/* "${airootfs}/usr/share/archfusion/scripts/"
         chmod +x "${airootfs}/usr/share/archfusion/scripts/install"/*.sh
         chmod +x "${airootfs}/usr/share/archfusion/scripts/install"/*.py
+        # Sans installations de référence, le live estime le temps restant sans historique
+        if [[ ! -f "${PROJECT_ROOT}/scripts/install/install-history.seed.json" ]]; then
+            warning "Pas d'installations de référence (install_trace.py seed): temps restant estimé sans historique"
+        fi
     fi
     
     # Configuration utilisateur live
@@ -393,6 +416,21 @@ EOF
     
     ln -sf ../archfusion-live.service "${airootfs}/etc/systemd/system/multi-user.target.wants/"
     
+    # Compression de l'initramfs live: lu après archiso.conf de releng
+    mkdir -p "${airootfs}/etc/mkinitcpio.conf.d"
+    cat > "${airootfs}/etc/mkinitcpio.conf.d/compression.conf" << EOF
+# Profil de compression ${COMPRESSION_PROFILE} (build-iso.sh --compression)
+COMPRESSION="${INITRAMFS_COMPRESSION}"
+COMPRESSION_OPTIONS=(${INITRAMFS_COMPRESSION_OPTIONS[*]})
+EOF
+    
+    # Services propres à la variante
+    local service
+    for service in "${VARIANT_SERVICES[@]}"; do
+        ln -sf "/usr/lib/systemd/system/${service}.service" \
+            "${airootfs}/etc/systemd/system/multi-user.target.wants/${service}.service"
+    done
+    
     success "Système live configuré"
 }
 
@@ -416,10 +454,12 @@ echo "archfusion:archfusion" | chpasswd
 # Configuration sudo sans mot de passe pour l'utilisateur live
 echo "archfusion ALL=(ALL) NOPASSWD: ALL" > /etc/sudoers.d/archfusion
 
-# Activer les services
-systemctl enable NetworkManager
-systemctl enable sddm
-systemctl enable bluetooth
+# Activer les services (présents selon la variante de l'ISO)
+for service in NetworkManager sddm bluetooth; do
+    if [[ -f /usr/lib/systemd/system/${service}.service ]]; then
+        systemctl enable "$service"
+    fi
+done
 
 # Configuration du thème
 if [[ -d /usr/share/archfusion/themes ]]; then
@@ -479,6 +519,56 @@ EOF
     success "Script de setup live créé"
 }
 
+# Mise à jour des miroirs (avant tout téléchargement)
+update_mirrors() {
+    info "Mise à jour des miroirs Pacman..."
+    # Sondes parallèles avec résultat en cache (voir mirror_rank.py), reflector en secours
+    if ! python3 "${SCRIPT_DIR}/install/mirror_rank.py" --config "${PROJECT_ROOT}/configs/install.conf" \
+            --save /etc/pacman.d/mirrorlist; then
+        warning "Classement des miroirs impossible, utilisation de reflector"
+        reflector --country France,Germany,Netherlands --age 12 --protocol https --sort rate --save /etc/pacman.d/mirrorlist
+    fi
+}
+
+# Dépôt local des paquets de l'installateur (installation hors ligne)
+build_offline_repo() {
+    info "Construction du dépôt hors ligne..."
+    
+    local repo_dir="${ARCHISO_PROFILE}/airootfs${OFFLINE_REPO_DIR}"
+    local db_dir="${BUILD_DIR}/offline-db"
+    local pacman_conf="${ARCHISO_PROFILE}/pacman.conf"
+    local packages files
+    
+    # Plan KDE par défaut, avec tous les pilotes GPU et le serveur SSH: le matériel
+    # et les options de la machine cible ne sont pas connus à la construction
+    mapfile -t packages < <(python3 "${SCRIPT_DIR}/install/package_plan.py" \
+        --config "${PROJECT_ROOT}/configs/install.conf" --desktop kde --ssh --gpu all --packages)
+    mkdir -p "$repo_dir" "$db_dir"
+    
+    # Base de synchronisation vide: pacman résout toute la fermeture des dépendances.
+    # Le téléchargement passe par le cache de l'hôte, réutilisé ensuite par mkarchiso
+    # et par les constructions suivantes.
+    pacman -Syw --noconfirm --config "$pacman_conf" --dbpath "$db_dir" \
+        --cachedir "$HOST_PACKAGE_CACHE" "${packages[@]}"
+    mapfile -t files < <(pacman -Sp --print-format '%f' --config "$pacman_conf" \
+        --dbpath "$db_dir" "${packages[@]}")
+    [[ ${#files[@]} -eq 0 ]] && fatal "Impossible de résoudre les paquets du dépôt hors ligne"
+    
+    local file
+    for file in "${files[@]}"; do
+        cp "${HOST_PACKAGE_CACHE}/${file}" "${repo_dir}/"
+        # Signature détachée: repo-add l'intègre à l'index
+        if [[ -f "${HOST_PACKAGE_CACHE}/${file}.sig" ]]; then
+            cp "${HOST_PACKAGE_CACHE}/${file}.sig" "${repo_dir}/"
+        fi
+    done
+    
+    repo-add -q "${repo_dir}/${OFFLINE_REPO_NAME}.db.tar.gz" "${files[@]/#/${repo_dir}/}"
+    rm -rf "$db_dir"
+    
+    success "Dépôt hors ligne: ${#files[@]} paquets ($(du -sh "$repo_dir" | cut -f1))"
+}
+
 # Configuration du bootloader
 configure_bootloader() {
     info "Configuration du bootloader..."
@@ -498,22 +588,213 @@ configure_bootloader() {
         sed -i "s/archiso/${ISO_LABEL}/g" "${grub_dir}/grub.cfg"
     fi
     
+    # Paramètres du noyau propres à la variante, sur chaque entrée de démarrage
+    if [[ -n $VARIANT_KERNEL_PARAMS ]]; then
+        sed -i -E "/^[[:space:]]*APPEND /s|\$| ${VARIANT_KERNEL_PARAMS}|" "${syslinux_dir}"/*.cfg
+        sed -i -E "/^[[:space:]]*linux /s|\$| ${VARIANT_KERNEL_PARAMS}|" "${grub_dir}"/*.cfg
+    fi
+    
     success "Bootloader configuré"
 }
 
+build_cache() {
+    python3 "$BUILD_CACHE_SCRIPT" --cache-dir "$BUILD_CACHE_DIR" "$@"
+}
+
+# Reprise d'une entrée du cache, sauf si elle a plus de BUILD_CACHE_MAX_AGE
+# jours (supprimée; --refresh: aucune entrée reprise)
+cache_restore() {
+    build_cache restore --max-age "$(( BUILD_CACHE_MAX_AGE * 86400 ))" "$@"
+}
+
+# Versions que pacman installerait pour une liste de paquets (dépendances
+# comprises), d'après la base synchronisée par record_repo_state
+repo_versions() {
+    local packages
+    mapfile -t packages < <(grep -v -e '^#' -e '^[[:space:]]*$' "$1")
+    pacman -Sp --print-format '%n %v' --config "${ARCHISO_PROFILE}/pacman.conf" \
+        --dbpath "$REPO_DB_DIR" "${packages[@]}" | sort
+}
+
+# État des dépôts, entrée des clés des paquets: une mise à jour d'un paquet
+# (ou d'une dépendance) des listes de la couche de base ou de la variante
+# invalide les couches correspondantes
+record_repo_state() {
+    info "Synchronisation des dépôts (clés du cache)..."
+    mkdir -p "$REPO_DB_DIR" "$REPO_STATE_DIR"
+    if ! pacman -Sy --config "${ARCHISO_PROFILE}/pacman.conf" --dbpath "$REPO_DB_DIR" > /dev/null; then
+        compgen -G "${REPO_DB_DIR}/sync/*.db" > /dev/null || fatal "Synchronisation des dépôts impossible"
+        warning "Synchronisation des dépôts impossible: état de la synchronisation précédente"
+    fi
+    repo_versions "$BASE_PACKAGES_FILE" > "${REPO_STATE_DIR}/base" \
+        || fatal "Paquets de la couche de base introuvables dans les dépôts"
+    repo_versions "${ARCHISO_PROFILE}/packages.x86_64" > "${REPO_STATE_DIR}/packages" \
+        || fatal "Paquets de la variante introuvables dans les dépôts"
+}
+
+# Valeur d'une variable de profiledef.sh (tableaux: éléments séparés par des espaces)
+profile_value() {
+    (
+        # Déclaré comme mkarchiso avant de lire le profil
+        declare -A file_permissions=()
+        # shellcheck disable=SC1090
+        source "$ARCHISO_CONFIG"
+        declare -n value="$1"
+        echo "${value[*]}"
+    )
+}
+
+# mkarchiso limité aux premières étapes: les étapes indiquées sont marquées
+# comme faites (fichiers témoins de _run_once) le temps de l'exécution
+run_mkarchiso_without() {
+    local profile="$1"
+    shift
+    local step
+    for step in "$@"; do
+        touch "${WORK_DIR}/iso.${step}"
+    done
+    mkarchiso -v -w "$WORK_DIR" -o "$OUT_DIR" "$profile"
+    for step in "$@"; do
+        rm -f "${WORK_DIR}/iso.${step}"
+    done
+}
+
+# Étapes de mkarchiso postérieures à l'installation des paquets et à l'overlay
+mkarchiso_late_steps() {
+    local steps=() bootmode
+    for bootmode in $(profile_value bootmodes); do
+        steps+=("_make_bootmode_${bootmode}")
+    done
+    echo "${steps[*]} _cleanup_pacstrap_dir _prepare_airootfs_image _build_iso_image"
+}
+
+# profiledef.sh sans la part de budget (processeurs, mémoire), qui ne change
+# pas le contenu de l'image
+profile_definition() {
+    grep -vF -- "$BUDGET_MARK" "$ARCHISO_CONFIG"
+}
+
+base_layer_key() {
+    build_cache key "$BASE_PACKAGES_FILE" "${ARCHISO_PROFILE}/pacman.conf" "${REPO_STATE_DIR}/base" \
+        --text "$(profile_value arch)"
+}
+
+# Couche de base commune à toutes les variantes: paquets de BASE_PACKAGES_FILE,
+# installés par mkarchiso avec un profil sans overlay (hook mkinitcpio masqué,
+# l'initramfs est fait après l'overlay de la variante)
+build_base_layer() {
+    local pacstrap_dir="${WORK_DIR}/x86_64/airootfs"
+    local base_key late_steps
+    base_key=$(base_layer_key)
+    read -ra late_steps <<< "$(mkarchiso_late_steps)"
+    
+    mkdir -p "${WORK_DIR}/x86_64"
+    if cache_restore base "$base_key" "${WORK_DIR}/x86_64"; then
+        success "Couche de base reprise du cache (${base_key:0:12})"
+        return 0
+    fi
+    
+    info "Installation des paquets de la couche de base..."
+    local base_profile="${BUILD_DIR}/base-profile"
+    rm -rf "$base_profile"
+    cp -a "$ARCHISO_PROFILE" "$base_profile"
+    cp "$BASE_PACKAGES_FILE" "${base_profile}/packages.x86_64"
+    rm -rf "${base_profile}/airootfs"
+    mkdir -p "${base_profile}/airootfs/$(dirname "$MKINITCPIO_HOOK_MASK")"
+    ln -s /dev/null "${base_profile}/airootfs/${MKINITCPIO_HOOK_MASK}"
+    printf '\nfile_permissions=()\n' >> "${base_profile}/profiledef.sh"
+    
+    run_mkarchiso_without "$base_profile" _make_version _make_customize_airootfs \
+        _make_pkglist _check_if_initramfs_has_ucode "${late_steps[@]}"
+    rm -rf "$base_profile"
+    build_cache store base "$base_key" "$pacstrap_dir"
+}
+
+# Génération incrémentale: chaque étape (paquets, overlay airootfs, images de
+# démarrage, squashfs, ISO) est identifiée par l'empreinte de ses entrées et
+# reprise du cache si elle n'a pas changé
+generate_iso_incremental() {
+    local pacstrap_dir="${WORK_DIR}/x86_64/airootfs"
+    local image_dir="${WORK_DIR}/iso/$(profile_value install_dir)/x86_64"
+    local late_steps
+    read -ra late_steps <<< "$(mkarchiso_late_steps)"
+    
+    local packages_key overlay_key boot_key squashfs_key iso_key
+    packages_key=$(build_cache key --parent "$(base_layer_key)" "${ARCHISO_PROFILE}/packages.x86_64" \
+        "${REPO_STATE_DIR}/packages")
+    overlay_key=$(build_cache key --parent "$packages_key" --text "$(profile_definition)" \
+        "${ARCHISO_PROFILE}/airootfs")
+    boot_key=$(build_cache key --parent "$packages_key" "${INITRAMFS_INPUTS[@]/#/${ARCHISO_PROFILE}/airootfs/}")
+    squashfs_key=$(build_cache key --parent "$overlay_key" --parent "$boot_key")
+    iso_key=$(build_cache key --parent "$squashfs_key" "${ARCHISO_PROFILE}/syslinux" \
+        "${ARCHISO_PROFILE}/grub" "${ARCHISO_PROFILE}/efiboot")
+    
+    if cache_restore iso "$iso_key" "$OUT_DIR"; then
+        success "ISO inchangée, reprise du cache (${iso_key:0:12})"
+        return 0
+    fi
+    
+    # Paquets: couche de base commune, puis paquets de la variante. Les clés
+    # couvrent les listes de paquets, pacman.conf et les versions des dépôts
+    mkdir -p "${WORK_DIR}/x86_64"
+    if cache_restore packages "$packages_key" "${WORK_DIR}/x86_64"; then
+        success "Paquets repris du cache (${packages_key:0:12})"
+    else
+        build_base_layer
+        if [[ ${#VARIANT_PACKAGES[@]} -gt 0 ]]; then
+            info "Installation des paquets de la variante ${VARIANT}..."
+            local packages
+            mapfile -t packages < <(grep -v -e '^#' -e '^[[:space:]]*$' "${ARCHISO_PROFILE}/packages.x86_64")
+            pacstrap -C "${ARCHISO_PROFILE}/pacman.conf" -c -G -M "$pacstrap_dir" --needed "${packages[@]}"
+        fi
+        rm -f "${pacstrap_dir}/${MKINITCPIO_HOOK_MASK}"
+        build_cache store packages "$packages_key" "$pacstrap_dir"
+    fi
+    touch "${WORK_DIR}/iso._make_packages"
+    
+    # Overlay airootfs du vrai profil, appliqué sur les paquets
+    info "Application de l'overlay airootfs..."
+    rm -f "${WORK_DIR}/iso._make_custom_airootfs"
+    run_mkarchiso_without "$ARCHISO_PROFILE" _check_if_initramfs_has_ucode "${late_steps[@]}"
+    
+    # Images de démarrage (noyaux, initramfs, microcodes)
+    if cache_restore boot "$boot_key" "$pacstrap_dir"; then
+        success "Images de démarrage reprises du cache (${boot_key:0:12})"
+    else
+        info "Génération des images de démarrage..."
+        arch-chroot "$pacstrap_dir" mkinitcpio -P
+        build_cache store boot "$boot_key" "${pacstrap_dir}/boot"
+    fi
+    
+    # Squashfs: le plus long après les paquets
+    local squashfs_steps=()
+    if cache_restore squashfs "$squashfs_key" "$image_dir"; then
+        success "Image squashfs reprise du cache (${squashfs_key:0:12})"
+        squashfs_steps=(_cleanup_pacstrap_dir _prepare_airootfs_image)
+    fi
+    
+    info "Lancement de mkarchiso (démarrage et ISO)..."
+    run_mkarchiso_without "$ARCHISO_PROFILE" "${squashfs_steps[@]}"
+    
+    if [[ ${#squashfs_steps[@]} -eq 0 ]]; then
+        build_cache store squashfs "$squashfs_key" "$image_dir"/airootfs.*
+    fi
+    build_cache store iso "$iso_key" "$OUT_DIR"/*.iso
+    build_cache evict --max-size "$BUILD_CACHE_SIZE"
+}
+
 # Génération de l'ISO
 generate_iso() {
     info "Génération de l'ISO ArchFusion..."
     
-    # Mise à jour des miroirs
-    info "Mise à jour des miroirs Pacman..."
-    reflector --country France,Germany,Netherlands --age 12 --protocol https --sort rate --save /etc/pacman.d/mirrorlist
-    
-    # Génération avec mkarchiso
-    info "Lancement de mkarchiso..."
     cd "$BUILD_DIR"
-    
-    mkarchiso -v -w "$WORK_DIR" -o "$OUT_DIR" "$ARCHISO_PROFILE"
+    if [[ $INCREMENTAL == true ]]; then
+        generate_iso_incremental
+    else
+        # Génération avec mkarchiso
+        info "Lancement de mkarchiso..."
+        mkarchiso -v -w "$WORK_DIR" -o "$OUT_DIR" "$ARCHISO_PROFILE"
+    fi
     
     # Déplacer l'ISO vers le répertoire final
     if [[ -f "${OUT_DIR}/${ISO_FILENAME}" ]]; then
@@ -537,13 +818,11 @@ generate_checksums() {
     
     cd "$ISO_DIR"
     
-    # SHA256
-    sha256sum "${ISO_FILENAME}" > "${ISO_FILENAME}.sha256"
+    # SHA256, MD5 et manifeste des blocs (vérification des copies bloc par bloc)
+    python3 "$ISO_MANIFEST_SCRIPT" create "${ISO_FILENAME}" --quiet > /dev/null
     success "SHA256: $(cat "${ISO_FILENAME}.sha256")"
-    
-    # MD5
-    md5sum "${ISO_FILENAME}" > "${ISO_FILENAME}.md5"
     success "MD5: $(cat "${ISO_FILENAME}.md5")"
+    success "Manifeste des blocs: ${ISO_FILENAME}.chunks.json"
     
     # Informations sur l'ISO
     local iso_size=$(du -h "${ISO_FILENAME}" | cut -f1)
@@ -593,11 +872,28 @@ main() {
     check_prerequisites
     
     # Étapes de génération
+    [[ $UPDATE_MIRRORS == true ]] && update_mirrors
     prepare_directories
     create_archiso_profile
     configure_packages
+    [[ $INCREMENTAL == true ]] && record_repo_state
+    
+    # Couche de base seule, mise en cache pour les constructions des variantes
+    if [[ $BASE_ONLY == true ]]; then
+        cd "$BUILD_DIR"
+        if build_cache lookup --max-age "$(( BUILD_CACHE_MAX_AGE * 86400 ))" base "$(base_layer_key)" \
+                > /dev/null; then
+            success "Couche de base déjà en cache"
+        else
+            build_base_layer
+        fi
+        cleanup
+        return 0
+    fi
+    
     configure_live_system
     create_live_setup_script
+    [[ $OFFLINE_REPO == true ]] && build_offline_repo
     configure_bootloader
     generate_iso
     generate_checksums
@@ -613,19 +909,38 @@ main() {
     echo -e "  SHA256: $(cat "${ISO_DIR}/${ISO_FILENAME}.sha256" | cut -d' ' -f1)"
     echo ""
     echo -e "${YELLOW}Pour utiliser l'ISO:${NC}"
-    echo -e "  1. Gravez sur USB: dd if=${ISO_DIR}/${ISO_FILENAME} of=/dev/sdX bs=4M status=progress"
+    echo -e "  1. Gravez sur USB (écriture vérifiée): python3 ${SCRIPT_DIR}/image_writer.py ${ISO_DIR}/${ISO_FILENAME} /dev/sdX"
     echo -e "  2. Ou utilisez un outil comme Rufus, Etcher, Ventoy"
     echo -e "  3. Bootez depuis l'USB et suivez les instructions"
     echo ""
     
-    # Test optionnel
-    test_iso
+    # Test optionnel (demandé avec --test ou en session interactive)
+    if [[ $TEST_AFTER == true || -t 0 ]]; then
+        test_iso
+    fi
 }
 
 # ==========================================
 # GESTION DES ARGUMENTS
 # ==========================================
 
+conf_names() {
+    local file names=()
+    for file in "$1"/*.conf; do
+        names+=("$(basename "$file" .conf)")
+    done
+    local IFS=,
+    echo "${names[*]}"
+}
+
+variant_names() {
+    conf_names "$VARIANTS_DIR"
+}
+
+profile_names() {
+    conf_names "$COMPRESSION_DIR"
+}
+
 show_help() {
     cat << EOF
 ArchFusion OS - Générateur d'ISO
@@ -639,11 +954,30 @@ OPTIONS:
     -t, --test              Tester l'ISO avec QEMU après génération
     -v, --verbose           Mode verbeux
     --no-cleanup            Ne pas nettoyer les fichiers temporaires
+    --no-offline-repo       Ne pas intégrer le dépôt hors ligne de l'installateur
+    -i, --incremental       Reprendre du cache les étapes dont les entrées n'ont pas changé
+    --cache-dir DIR         Cache des étapes (défaut: /var/cache/archfusion/build)
+    --cache-size SIZE       Taille maximale du cache (défaut: 40G)
+    --max-age DAYS          Ne pas reprendre les entrées du cache plus anciennes (défaut: 30)
+    --refresh               Tout reconstruire et renouveler le cache (équivaut à --max-age 0)
+    --variant NAME          Variante de l'ISO: $(variant_names) (défaut: ${DEFAULT_VARIANT})
+    --base-only             Construire seulement la couche de base commune (cache)
+    --skip-mirrors          Garder la liste des miroirs de l'hôte
+    --squashfs-processors N Processeurs accordés à mksquashfs
+    --squashfs-mem SIZE     Mémoire accordée à mksquashfs (ex: 2G)
+    --compression PROFILE   Compression du squashfs et de l'initramfs: $(profile_names)
+                            (défaut: celui de la variante)
 
 EXEMPLES:
     $0                      # Génération standard
     $0 -c -t                # Nettoyage + génération + test
     $0 --verbose            # Mode verbeux
+    $0 -i                   # Reconstruction incrémentale
+    $0 -i --variant hyperv  # Variante Hyper-V
+    $0 -i --refresh         # Reconstruction complète, cache renouvelé
+    $0 --compression boot-optimized   # Démarrage plus rapide, ISO plus grande
+    python3 ${SCRIPT_DIR}/compression_bench.py   # Comparer les compressions
+    python3 ${SCRIPT_DIR}/build_variants.py   # Toutes les variantes en parallèle
 
 EOF
 }
@@ -653,6 +987,17 @@ CLEAN_BEFORE=false
 TEST_AFTER=false
 VERBOSE=false
 NO_CLEANUP=false
+OFFLINE_REPO=true
+INCREMENTAL=false
+BUILD_CACHE_DIR="/var/cache/archfusion/build"
+BUILD_CACHE_SIZE="40G"
+BUILD_CACHE_MAX_AGE=30
+VARIANT="$DEFAULT_VARIANT"
+BASE_ONLY=false
+UPDATE_MIRRORS=true
+SQUASHFS_PROCESSORS=""
+SQUASHFS_MEM=""
+COMPRESSION_PROFILE=""
 
 # Parsing des arguments
 while [[ $# -gt 0 ]]; do
@@ -678,6 +1023,55 @@ while [[ $# -gt 0 ]]; do
             NO_CLEANUP=true
             shift
             ;;
+        --no-offline-repo)
+            OFFLINE_REPO=false
+            shift
+            ;;
+        -i|--incremental)
+            INCREMENTAL=true
+            shift
+            ;;
+        --cache-dir)
+            BUILD_CACHE_DIR="$2"
+            shift 2
+            ;;
+        --cache-size)
+            BUILD_CACHE_SIZE="$2"
+            shift 2
+            ;;
+        --max-age)
+            BUILD_CACHE_MAX_AGE="$2"
+            shift 2
+            ;;
+        --refresh)
+            BUILD_CACHE_MAX_AGE=0
+            shift
+            ;;
+        --variant)
+            VARIANT="$2"
+            shift 2
+            ;;
+        --base-only)
+            BASE_ONLY=true
+            INCREMENTAL=true
+            shift
+            ;;
+        --skip-mirrors)
+            UPDATE_MIRRORS=false
+            shift
+            ;;
+        --squashfs-processors)
+            SQUASHFS_PROCESSORS="$2"
+            shift 2
+            ;;
+        --squashfs-mem)
+            SQUASHFS_MEM="$2"
+            shift 2
+            ;;
+        --compression)
+            COMPRESSION_PROFILE="$2"
+            shift 2
+            ;;
         *)
             error "Option inconnue: $1"
             show_help
@@ -686,6 +1080,10 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
+[[ $BUILD_CACHE_MAX_AGE =~ ^[0-9]+$ ]] || fatal "--max-age: nombre de jours attendu (${BUILD_CACHE_MAX_AGE})"
+
+select_variant
+
 # Nettoyage préalable si demandé
 if [[ $CLEAN_BEFORE == true ]]; then
     info "Nettoyage préalable..."
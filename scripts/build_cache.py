@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Cache de construction de l'ISO
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Cache adressé par le contenu des étapes de build-iso.sh
+             (paquets, images de démarrage, squashfs, ISO), borné en taille
+             avec éviction des entrées les moins récemment utilisées
+
+La clé d'une étape est l'empreinte SHA-256 de ses entrées: fichiers,
+arborescences (chemins, types, modes, cibles des liens, contenus) et clés des
+étapes dont elle dépend. Une entrée est le répertoire <cache>/<étape>/<clé>/;
+la date de modification de son témoin .last-used sert à l'éviction. Avec
+--max-age, une entrée créée depuis plus longtemps est supprimée au lieu d'être
+reprise (ce que la clé ne couvre pas: outils de l'hôte, paquets republiés).
+
+Usage:
+    python3 build_cache.py key profil/packages.x86_64 profil/pacman.conf
+    python3 build_cache.py key --parent CLE profil/airootfs
+    python3 build_cache.py lookup base CLE                    # code 1 si absente
+    python3 build_cache.py restore packages CLE work/x86_64   # code 1 si absente
+    python3 build_cache.py restore --max-age 604800 base CLE work/x86_64
+    python3 build_cache.py store packages CLE work/x86_64/airootfs
+    python3 build_cache.py evict --max-size 40G
+    python3 build_cache.py list
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+BUILD_CACHE_DIR = "/var/cache/archfusion/build"
+DEFAULT_MAX_SIZE = "40G"
+
+LAST_USED_FILE = ".last-used"
+META_FILE = ".meta.json"
+LOCK_FILE = ".lock"
+
+HASH_CHUNK = 1024 * 1024
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """Taille lisible (40G, 512M, 1024) en octets"""
+    text = text.strip().upper().removesuffix("B").removesuffix("I")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    try:
+        value = float(text[:len(text) - len(unit)])
+    except ValueError:
+        raise ValueError(f"taille invalide: {text}") from None
+    return int(value * SIZE_UNITS[unit])
+
+
+def format_size(size: float) -> str:
+    for unit in ("", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit else f"{size:.0f}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+# ----------------------------------------------------------------------
+# Empreintes
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tree_entries(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """Chemins relatifs de l'arborescence, dans un ordre stable, sans suivre les liens"""
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        relative = os.path.relpath(directory, root)
+        for name in dirs + sorted(files):
+            path = os.path.join(directory, name)
+            yield os.path.normpath(os.path.join(relative, name)), os.lstat(path)
+
+
+def path_digest(path: str) -> str:
+    """Empreinte d'un fichier ou d'une arborescence (absente: empreinte propre)"""
+    if not os.path.lexists(path):
+        return hashlib.sha256(b"absent").hexdigest()
+    if not os.path.isdir(path) or os.path.islink(path):
+        return tree_digest_entries(os.path.dirname(path) or ".", [
+            (os.path.basename(path), os.lstat(path))
+        ])
+    return tree_digest_entries(path, list(_tree_entries(path)))
+
+
+def tree_digest_entries(root: str, entries: List[Tuple[str, os.stat_result]]) -> str:
+    # Contenus des fichiers lus en parallèle (hashlib libère le GIL)
+    regular = [relative for relative, st in entries if stat.S_ISREG(st.st_mode)]
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        contents = dict(zip(regular, pool.map(
+            lambda relative: file_digest(os.path.join(root, relative)), regular)))
+
+    digest = hashlib.sha256()
+    for relative, st in entries:
+        if stat.S_ISREG(st.st_mode):
+            detail = contents[relative]
+        elif stat.S_ISLNK(st.st_mode):
+            detail = os.readlink(os.path.join(root, relative))
+        else:
+            detail = ""
+        digest.update(f"{relative}\0{stat.S_IFMT(st.st_mode):o}\0"
+                      f"{stat.S_IMODE(st.st_mode):o}\0{detail}\n".encode())
+    return digest.hexdigest()
+
+
+def stage_key(paths: Sequence[str], parents: Sequence[str] = (), text: Sequence[str] = ()) -> str:
+    """Clé d'une étape: empreintes des chemins, clés parentes et valeurs libres, dans l'ordre"""
+    digest = hashlib.sha256()
+    for parent in parents:
+        digest.update(f"parent\0{parent}\n".encode())
+    for value in text:
+        digest.update(f"text\0{value}\n".encode())
+    for path in paths:
+        digest.update(f"path\0{path_digest(path)}\n".encode())
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Cache
+
+def disk_usage(path: str) -> int:
+    """Blocs occupés par une arborescence (liens non suivis)"""
+    total = 0
+    for directory, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                total += os.lstat(os.path.join(directory, name)).st_blocks * 512
+            except OSError:
+                continue
+    return total
+
+
+def copy_tree(source: str, destination: str):
+    """Copie en conservant propriétaires, modes, liens et attributs étendus
+    (capacités des binaires); partage des blocs si le système de fichiers le permet"""
+    subprocess.run(["cp", "-a", "--reflink=auto", source, destination], check=True)
+
+
+class BuildCache:
+    """Entrées <cache>/<étape>/<clé>/ avec éviction LRU bornée en taille"""
+
+    def __init__(self, cache_dir: str = BUILD_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def entry_path(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, stage, key)
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def lookup(self, stage: str, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Chemin de l'entrée (marquée comme utilisée) ou None
+
+        max_age: âge maximal en secondes; une entrée plus ancienne est supprimée.
+        """
+        entry = self.entry_path(stage, key)
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                created = json.load(f).get("created", 0)
+        except (OSError, ValueError):
+            return None
+        if max_age is not None and time.time() - created >= max_age:
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        with open(os.path.join(entry, LAST_USED_FILE), "w"):
+            pass
+        return entry
+
+    def restore(self, stage: str, key: str, destination: str,
+                max_age: Optional[float] = None) -> bool:
+        """Copie le contenu de l'entrée dans destination; False si absente ou trop ancienne"""
+        with self.locked():
+            entry = self.lookup(stage, key, max_age)
+            if entry is None:
+                return False
+            os.makedirs(destination, exist_ok=True)
+            for name in sorted(os.listdir(entry)):
+                if name in (LAST_USED_FILE, META_FILE):
+                    continue
+                target = os.path.join(destination, name)
+                if os.path.isdir(target) and not os.path.islink(target):
+                    shutil.rmtree(target)
+                elif os.path.lexists(target):
+                    os.unlink(target)
+                copy_tree(os.path.join(entry, name), destination)
+        return True
+
+    def store(self, stage: str, key: str, sources: List[str]) -> str:
+        """Enregistre les chemins sources sous la clé (copie puis renommage atomique)"""
+        entry = self.entry_path(stage, key)
+        tmp_entry = os.path.join(self.cache_dir, stage, f".tmp-{key}-{os.getpid()}")
+        with self.locked():
+            if os.path.isdir(entry):
+                self.lookup(stage, key)
+                return entry
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            os.makedirs(tmp_entry)
+            try:
+                for source in sources:
+                    copy_tree(source, tmp_entry)
+                meta = {
+                    "stage": stage,
+                    "key": key,
+                    "created": time.time(),
+                    "size": disk_usage(tmp_entry),
+                    "contents": [os.path.basename(os.path.normpath(s)) for s in sources],
+                }
+                with open(os.path.join(tmp_entry, META_FILE), "w") as f:
+                    json.dump(meta, f, indent=2)
+                with open(os.path.join(tmp_entry, LAST_USED_FILE), "w"):
+                    pass
+                os.rename(tmp_entry, entry)
+            except BaseException:
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+                raise
+        return entry
+
+    def entries(self) -> List[dict]:
+        """Entrées du cache, de la moins récemment utilisée à la plus récente"""
+        found = []
+        if not os.path.isdir(self.cache_dir):
+            return found
+        for stage in sorted(os.listdir(self.cache_dir)):
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                entry = os.path.join(stage_dir, key)
+                try:
+                    with open(os.path.join(entry, META_FILE)) as f:
+                        meta = json.load(f)
+                    meta["last_used"] = os.path.getmtime(os.path.join(entry, LAST_USED_FILE))
+                except (OSError, ValueError):
+                    # Copie interrompue (.tmp-*) ou entrée abîmée: première candidate
+                    meta = {"stage": stage, "key": key, "size": disk_usage(entry), "last_used": 0}
+                meta["path"] = entry
+                found.append(meta)
+        return sorted(found, key=lambda meta: meta["last_used"])
+
+    def evict(self, max_size: int) -> List[dict]:
+        """Supprime les entrées les moins récemment utilisées au-delà de max_size"""
+        removed = []
+        with self.locked():
+            entries = self.entries()
+            total = sum(meta["size"] for meta in entries)
+            for meta in entries:
+                if total <= max_size:
+                    break
+                shutil.rmtree(meta["path"], ignore_errors=True)
+                total -= meta["size"]
+                removed.append(meta)
+        return removed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cache de construction de l'ISO")
+    parser.add_argument("--cache-dir", default=BUILD_CACHE_DIR,
+                        help=f"répertoire du cache (défaut: {BUILD_CACHE_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    key = commands.add_parser("key", help="clé d'une étape")
+    key.add_argument("--parent", action="append", default=[], help="clé d'une étape amont")
+    key.add_argument("--text", action="append", default=[], help="valeur libre (options...)")
+    key.add_argument("paths", nargs="*", help="fichiers et répertoires d'entrée")
+
+    lookup = commands.add_parser("lookup", help="chemin d'une entrée (code 1 si absente)")
+    restore = commands.add_parser("restore", help="copie une entrée (code 1 si absente)")
+    for command in (lookup, restore):
+        command.add_argument("--max-age", type=float,
+                             help="âge maximal en secondes (entrée plus ancienne supprimée)")
+    lookup.add_argument("stage")
+    lookup.add_argument("key")
+    restore.add_argument("stage")
+    restore.add_argument("key")
+    restore.add_argument("destination")
+
+    store = commands.add_parser("store", help="enregistre des chemins sous une clé")
+    store.add_argument("stage")
+    store.add_argument("key")
+    store.add_argument("sources", nargs="+")
+
+    evict = commands.add_parser("evict", help="limite la taille du cache")
+    evict.add_argument("--max-size", default=DEFAULT_MAX_SIZE,
+                       help=f"taille maximale (défaut: {DEFAULT_MAX_SIZE})")
+
+    commands.add_parser("list", help="liste les entrées")
+    args = parser.parse_args(argv)
+
+    cache = BuildCache(args.cache_dir)
+    if args.command == "key":
+        print(stage_key(args.paths, args.parent, args.text))
+    elif args.command == "lookup":
+        with cache.locked():
+            entry = cache.lookup(args.stage, args.key, args.max_age)
+        if entry is None:
+            return 1
+        print(entry)
+    elif args.command == "restore":
+        return 0 if cache.restore(args.stage, args.key, args.destination, args.max_age) else 1
+    elif args.command == "store":
+        cache.store(args.stage, args.key, args.sources)
+    elif args.command == "evict":
+        try:
+            max_size = parse_size(args.max_size)
+        except ValueError as e:
+            parser.error(str(e))
+        for meta in cache.evict(max_size):
+            print(f"Évincé: {meta['stage']}/{meta['key'][:12]} ({format_size(meta['size'])})")
+    else:
+        entries = cache.entries()
+        for meta in reversed(entries):
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["last_used"]))
+            print(f"{meta['stage']:<10} {meta['key'][:12]}  {format_size(meta['size']):>8}  {used}")
+        print(f"{len(entries)} entrées, {format_size(sum(m['size'] for m in entries))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
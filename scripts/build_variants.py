@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Construction des variantes de l'ISO
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Construit une seule fois la couche de base commune, puis les ISO
+             des variantes (scripts/variants/*.conf) en parallèle, dans un
+             budget de processeurs et de mémoire
+
+Chaque variante est une construction incrémentale de build-iso.sh
+(--incremental --variant NOM) qui reprend la couche de base du cache de
+build_cache.py et n'y ajoute que ses paquets, son overlay et ses paramètres de
+démarrage. Le nombre de constructions simultanées et la part de mksquashfs
+(processeurs, mémoire) de chacune découlent du budget.
+
+La durée totale est comparée à celle des anciens constructeurs que les
+variantes remplacent (LEGACY_BUILDERS: build-iso.sh, build-archfusion-simple.sh,
+create-minimal-bootable-iso.sh...), lancés l'un après l'autre comme avant
+l'orchestrateur, mesurée une fois avec --sequential et gardée dans
+build/variants-times.json.
+
+Usage:
+    sudo python3 build_variants.py                        # toutes les variantes
+    sudo python3 build_variants.py full hyperv --cpus 8 --memory 16G
+    sudo python3 build_variants.py --sequential           # mesure de référence (anciens scripts)
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from build_cache import BUILD_CACHE_DIR, format_size, parse_size
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+BUILD_SCRIPT = os.path.join(SCRIPT_DIR, "build-iso.sh")
+VARIANTS_DIR = os.path.join(SCRIPT_DIR, "variants")
+LOG_DIR = os.path.join(PROJECT_ROOT, "build", "logs")
+TIMES_FILE = os.path.join(PROJECT_ROOT, "build", "variants-times.json")
+
+# Anciens constructeurs remplacés par chaque variante (commandes relatives à la
+# racine du projet), lancés l'un après l'autre par --sequential
+LEGACY_BUILDERS: Dict[str, Tuple[str, ...]] = {
+    "full": ("scripts/build-iso.sh", "build-archfusion-simple.sh"),
+    "minimal": ("create-minimal-bootable-iso.sh",),
+    "hyperv": ("create-hyperv-optimized-iso.sh", "build-proper-bootable-iso.sh"),
+}
+
+# Part minimale d'une construction: mkarchiso, pacstrap et mksquashfs
+MIN_CPUS_PER_BUILD = 2
+MIN_MEMORY_PER_BUILD = parse_size("3G")
+# Mémoire d'une construction laissée à mksquashfs (le reste: pacman, xorriso...)
+SQUASHFS_MEMORY_SHARE = 0.75
+
+
+@dataclass
+class VariantBuild:
+    """Résultat de la construction d'une variante"""
+
+    variant: str
+    ok: bool = False
+    duration: float = 0.0
+    log_path: str = ""
+    # Ancien constructeur lancé (--sequential)
+    builder: str = ""
+
+
+def available_variants() -> List[str]:
+    return sorted(name[:-len(".conf")] for name in os.listdir(VARIANTS_DIR)
+                  if name.endswith(".conf"))
+
+
+def available_memory() -> int:
+    """Mémoire disponible (MemAvailable) en octets"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return MIN_MEMORY_PER_BUILD
+
+
+def plan_budget(variants: int, cpus: int, memory: int) -> Tuple[int, int, int]:
+    """Constructions simultanées, processeurs et mémoire de mksquashfs pour chacune"""
+    jobs = max(1, min(variants, cpus // MIN_CPUS_PER_BUILD, memory // MIN_MEMORY_PER_BUILD))
+    return jobs, max(1, cpus // jobs), int(memory // jobs * SQUASHFS_MEMORY_SHARE)
+
+
+class VariantBuilder:
+    """Couche de base puis variantes en parallèle, journal par variante"""
+
+    def __init__(self, variants: List[str], cpus: int, memory: int,
+                 cache_dir: str = BUILD_CACHE_DIR, extra_arguments: Tuple[str, ...] = ()):
+        self.variants = variants
+        self.jobs, self.processors, self.squashfs_memory = plan_budget(len(variants), cpus, memory)
+        self.cache_dir = cache_dir
+        self.extra_arguments = extra_arguments
+        self._print_lock = threading.Lock()
+
+    def _report(self, message: str):
+        with self._print_lock:
+            print(message, flush=True)
+
+    def _run(self, name: str, arguments: List[str]) -> VariantBuild:
+        result = VariantBuild(name, log_path=os.path.join(LOG_DIR, f"{name}.log"))
+        self._report(f"▶ {name}: journal {result.log_path}")
+        start = time.monotonic()
+        with open(result.log_path, "w") as log:
+            process = subprocess.run(
+                [BUILD_SCRIPT, *arguments, *self.extra_arguments],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            )
+        result.duration = time.monotonic() - start
+        result.ok = process.returncode == 0
+        self._report(f"{'✅' if result.ok else '❌'} {name}: {result.duration:.0f} s")
+        return result
+
+    def build_base(self) -> VariantBuild:
+        """Couche de base commune (et classement des miroirs, fait une seule fois)"""
+        return self._run("base", ["--base-only", "--cache-dir", self.cache_dir])
+
+    def build_variant(self, variant: str) -> VariantBuild:
+        return self._run(variant, [
+            "--variant", variant, "--incremental", "--skip-mirrors",
+            "--cache-dir", self.cache_dir,
+            "--squashfs-processors", str(self.processors),
+            "--squashfs-mem", f"{self.squashfs_memory // 1024 ** 2}M",
+        ])
+
+    def run(self) -> List[VariantBuild]:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        self._report(f"Budget: {self.jobs} construction(s) simultanée(s), "
+                     f"{self.processors} processeurs et {format_size(self.squashfs_memory)} "
+                     f"pour mksquashfs chacune")
+        base = self.build_base()
+        if not base.ok:
+            return [base]
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            return [base, *pool.map(self.build_variant, self.variants)]
+
+
+def run_sequential(variants: List[str], extra_arguments: Tuple[str, ...] = (),
+                   compression: Optional[str] = None) -> List[VariantBuild]:
+    """Référence: les anciens constructeurs des variantes, l'un après l'autre.
+    Les options de build-iso.sh ne s'appliquent qu'à lui; le profil de
+    compression passe aux autres par COMPRESSION_PROFILE"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    env = dict(os.environ)
+    if compression:
+        env["COMPRESSION_PROFILE"] = compression
+    results = []
+    for variant in variants:
+        for builder in LEGACY_BUILDERS.get(variant, ()):
+            command = shlex.split(builder)
+            name = os.path.basename(command[0])[:-len(".sh")]
+            if command[0] == "scripts/build-iso.sh":
+                command += extra_arguments
+            result = VariantBuild(variant, builder=builder,
+                                  log_path=os.path.join(LOG_DIR, f"{variant}-{name}-sequential.log"))
+            print(f"▶ {variant} ({builder}): journal {result.log_path}", flush=True)
+            start = time.monotonic()
+            with open(result.log_path, "w") as log:
+                process = subprocess.run([os.path.join(PROJECT_ROOT, command[0]), *command[1:]],
+                                         cwd=PROJECT_ROOT, env=env, stdin=subprocess.DEVNULL,
+                                         stdout=log, stderr=subprocess.STDOUT)
+            result.duration = time.monotonic() - start
+            result.ok = process.returncode == 0
+            print(f"{'✅' if result.ok else '❌'} {builder}: {result.duration:.0f} s", flush=True)
+            results.append(result)
+    return results
+
+
+def load_times() -> Dict:
+    try:
+        with open(TIMES_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_times(mode: str, results: List[VariantBuild], total: float):
+    times = load_times()
+    times[mode] = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "total": total,
+        "builds": [asdict(result) for result in results],
+    }
+    os.makedirs(os.path.dirname(TIMES_FILE), exist_ok=True)
+    with open(TIMES_FILE, "w") as f:
+        json.dump(times, f, indent=2)
+
+
+def print_summary(results: List[VariantBuild], total: float, reference: Optional[Dict]):
+    labels = [f"{result.variant}: {result.builder}" if result.builder else result.variant
+              for result in results]
+    width = max(14, *(len(label) + 2 for label in labels))
+    print(f"\n{'Construction':<{width}}{'Durée':>10}  Résultat")
+    for label, result in zip(labels, results):
+        print(f"{label:<{width}}{result.duration:9.0f}s  {'ok' if result.ok else 'échec'}")
+    print(f"{'Total':<{width}}{total:9.0f}s")
+    if reference:
+        variants = {result.variant for result in results} - {"base"}
+        reference_variants = {build["variant"] for build in reference["builds"]}
+        if variants == reference_variants:
+            gain = (1 - total / reference["total"]) * 100
+            print(f"{'Séquentiel':<{width}}{reference['total']:9.0f}s  (mesuré le {reference['date']})")
+            print(f"Gain: {gain:.1f} %")
+        else:
+            print("Référence séquentielle mesurée sur d'autres variantes: relancer --sequential")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    variants = available_variants()
+    parser = argparse.ArgumentParser(description="Construction parallèle des variantes de l'ISO")
+    parser.add_argument("variants", nargs="*", metavar="VARIANTE",
+                        help=f"variantes à construire: {', '.join(variants)} (défaut: toutes)")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1,
+                        help="processeurs accordés à l'ensemble (défaut: tous)")
+    parser.add_argument("--memory", help="mémoire accordée à l'ensemble (défaut: mémoire disponible)")
+    parser.add_argument("--cache-dir", default=BUILD_CACHE_DIR,
+                        help=f"cache des étapes (défaut: {BUILD_CACHE_DIR})")
+    parser.add_argument("--sequential", action="store_true",
+                        help="anciens scripts de construction l'un après l'autre (mesure de référence)")
+    parser.add_argument("--no-offline-repo", action="store_true",
+                        help="sans dépôt hors ligne, pour toutes les variantes")
+    parser.add_argument("--compression", metavar="PROFIL",
+                        help="profil de compression de toutes les variantes (défaut: celui de chacune)")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.variants) - set(variants))
+    if unknown:
+        parser.error(f"variante inconnue: {', '.join(unknown)}")
+    if os.geteuid() != 0:
+        parser.error("à lancer en root (mkarchiso)")
+    try:
+        memory = parse_size(args.memory) if args.memory else available_memory()
+    except ValueError as e:
+        parser.error(str(e))
+
+    selected = args.variants or variants
+    extra = ("--no-offline-repo",) if args.no_offline_repo else ()
+    if args.compression:
+        extra += ("--compression", args.compression)
+
+    start = time.monotonic()
+    if args.sequential:
+        results = run_sequential(selected, extra, args.compression)
+    else:
+        results = VariantBuilder(selected, args.cpus, memory, args.cache_dir, extra).run()
+    total = time.monotonic() - start
+
+    ok = all(result.ok for result in results)
+    reference = load_times().get("sequential")
+    if ok:
+        save_times("sequential" if args.sequential else "parallel", results, total)
+    if args.sequential:
+        print_summary(results, total, None)
+        if ok:
+            print(f"Référence séquentielle enregistrée dans {TIMES_FILE}")
+    else:
+        print_summary(results, total, reference)
+        if reference is None:
+            print("Pas de référence séquentielle: lancer une fois avec --sequential")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Banc d'essai de la compression
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Compare les compresseurs, niveaux et tailles de blocs (xz, zstd,
+             lz4) sur le vrai airootfs et le vrai initramfs d'une ISO, pour
+             choisir les profils de build-iso.sh --compression
+
+Pour le squashfs: durée de construction, taille, débit de lecture séquentielle
+et latence de lectures aléatoires, mesurés à froid (caches du noyau vidés) sur
+l'image montée comme au démarrage du système live. Pour l'initramfs, décompressé
+en entier au démarrage: durée de compression, taille et débit de
+décompression. Les profils de scripts/compression/ font toujours partie des
+candidats; les résultats sont gardés dans build/compression-bench.json.
+
+Usage:
+    sudo python3 compression_bench.py                          # ISO de la variante complète
+    sudo python3 compression_bench.py --iso iso/archfusion-1.0.0-hyperv-x86_64.iso
+    sudo python3 compression_bench.py --rootfs DIR --initramfs FILE --compressors zstd lz4
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import stat
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from build_cache import format_size
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PROFILES_DIR = os.path.join(SCRIPT_DIR, "compression")
+DEFAULT_ISO = os.path.join(PROJECT_ROOT, "iso", "archfusion-1.0.0-x86_64.iso")
+DEFAULT_WORK_DIR = os.path.join(PROJECT_ROOT, "build", "compression-bench")
+RESULTS_FILE = os.path.join(PROJECT_ROOT, "build", "compression-bench.json")
+
+COMPRESSORS = ("xz", "zstd", "lz4")
+BLOCK_SIZES = ("128K", "256K", "1M")
+ZSTD_LEVELS = (3, 9, 19)
+
+# Options de compresseur par algorithme (mksquashfs), hors taille de bloc
+SQUASHFS_VARIANTS = {
+    "xz": lambda block, levels: [("-Xbcj", "x86", "-b", block, "-Xdict-size", block)],
+    "zstd": lambda block, levels: [("-Xcompression-level", str(level), "-b", block) for level in levels],
+    "lz4": lambda block, levels: [("-b", block), ("-Xhc", "-b", block)],
+}
+
+# Commandes de mkinitcpio pour chaque algorithme (options ajoutées par le profil)
+INITRAMFS_TOOLS = {
+    "xz": ("xz", "--check=crc32"),
+    "zstd": ("zstd", "-q", "-T0"),
+    "lz4": ("lz4", "-l"),
+}
+INITRAMFS_VARIANTS = {
+    "xz": lambda levels: [("-9", "-T0")],
+    "zstd": lambda levels: [(f"-{level}",) for level in levels],
+    "lz4": lambda levels: [(), ("-9",)],
+}
+
+# Signatures des formats d'initramfs (la partie compressée suit l'éventuel
+# cpio non compressé des microcodes)
+CPIO_MAGIC = b"070701"
+DECOMPRESSORS = (
+    (b"\xfd7zXZ", ("xz", "-dc")),
+    (b"\x28\xb5\x2f\xfd", ("zstd", "-dcq")),
+    (b"\x02\x21\x4c\x18", ("lz4", "-dc")),
+    (b"\x04\x22\x4d\x18", ("lz4", "-dc")),
+    (b"\x1f\x8b", ("gzip", "-dc")),
+)
+
+RANDOM_READ_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """Compresseur et options (mksquashfs ou outil de mkinitcpio)"""
+
+    compressor: str
+    options: Tuple[str, ...]
+
+    @property
+    def label(self) -> str:
+        return " ".join((self.compressor,) + self.options)
+
+
+@dataclass
+class Result:
+    """Mesures d'un candidat"""
+
+    target: str
+    label: str
+    profiles: List[str] = field(default_factory=list)
+    build_time: float = 0.0
+    size: int = 0
+    throughput: float = 0.0
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+
+
+@dataclass
+class Profile:
+    """Profil de scripts/compression/*.conf"""
+
+    name: str
+    description: str
+    squashfs: Candidate
+    initramfs: Candidate
+
+
+def load_profiles() -> List[Profile]:
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(PROFILES_DIR, "*.conf"))):
+        # Fichiers lus par build-iso.sh: évalués par bash
+        output = subprocess.run(
+            ["bash", "-c", 'source "$1"; echo "$PROFILE_DESCRIPTION"; echo "${SQUASHFS_OPTIONS[*]}"; '
+             'echo "$INITRAMFS_COMPRESSION"; echo "${INITRAMFS_COMPRESSION_OPTIONS[*]}"', "bash", path],
+            check=True, capture_output=True, text=True,
+        ).stdout.split("\n")
+        description, squashfs, compression, initramfs = output[:4]
+        options = squashfs.split()
+        comp = options.index("-comp")
+        profiles.append(Profile(
+            name=os.path.basename(path)[:-len(".conf")],
+            description=description,
+            squashfs=Candidate(options[comp + 1], tuple(options[:comp] + options[comp + 2:])),
+            initramfs=Candidate(compression, tuple(initramfs.split())),
+        ))
+    return profiles
+
+
+def squashfs_candidates(compressors, blocks, levels, profiles: List[Profile]) -> List[Candidate]:
+    candidates = [Candidate(compressor, options)
+                  for compressor in compressors for block in blocks
+                  for options in SQUASHFS_VARIANTS[compressor](block, levels)]
+    candidates += [profile.squashfs for profile in profiles if profile.squashfs.compressor in compressors]
+    return list(dict.fromkeys(candidates))
+
+
+def initramfs_candidates(compressors, levels, profiles: List[Profile]) -> List[Candidate]:
+    candidates = [Candidate(compressor, options)
+                  for compressor in compressors for options in INITRAMFS_VARIANTS[compressor](levels)]
+    candidates += [profile.initramfs for profile in profiles if profile.initramfs.compressor in compressors]
+    return list(dict.fromkeys(candidates))
+
+
+def drop_caches():
+    """Vide le cache de pages: les lectures suivantes viennent du disque"""
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def regular_files(root: str) -> List[Tuple[str, int]]:
+    """Fichiers réguliers non vides (chemin relatif, taille)"""
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            info = os.lstat(path)
+            if stat.S_ISREG(info.st_mode) and info.st_size > 0:
+                files.append((os.path.relpath(path, root), info.st_size))
+    return files
+
+
+class CompressionBench:
+    """Mesures des candidats sur un airootfs et un initramfs extraits"""
+
+    def __init__(self, work_dir: str, processors: Optional[int], samples: int, seed: int):
+        self.work_dir = work_dir
+        self.processors = processors
+        self.samples = samples
+        self.seed = seed
+
+    # Squashfs -----------------------------------------------------------
+
+    def _sequential_read(self, mount_point: str, files: List[Tuple[str, int]]) -> float:
+        """Débit de lecture de toute l'image (octets décompressés par seconde)"""
+        drop_caches()
+        total = 0
+        start = time.monotonic()
+        for path, _ in files:
+            with open(os.path.join(mount_point, path), "rb", buffering=0) as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+        return total / (time.monotonic() - start)
+
+    def _random_reads(self, mount_point: str, sample: List[Tuple[str, int]]) -> List[float]:
+        """Latences (ouverture et lecture d'un bloc) de lectures aléatoires à froid"""
+        drop_caches()
+        latencies = []
+        rng = random.Random(self.seed)
+        for path, size in sample:
+            offset = rng.randrange(0, size) // RANDOM_READ_SIZE * RANDOM_READ_SIZE
+            start = time.perf_counter()
+            fd = os.open(os.path.join(mount_point, path), os.O_RDONLY)
+            try:
+                os.pread(fd, RANDOM_READ_SIZE, offset)
+            finally:
+                os.close(fd)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def measure_squashfs(self, rootfs: str, candidate: Candidate,
+                         files: List[Tuple[str, int]], sample: List[Tuple[str, int]]) -> Result:
+        result = Result("squashfs", candidate.label)
+        image = os.path.join(self.work_dir, "candidate.sfs")
+        mount_point = os.path.join(self.work_dir, "mnt")
+        os.makedirs(mount_point, exist_ok=True)
+
+        command = ["mksquashfs", rootfs, image, "-noappend", "-quiet", "-no-progress",
+                   "-comp", candidate.compressor, *candidate.options]
+        if self.processors:
+            command += ["-processors", str(self.processors)]
+        start = time.monotonic()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        result.build_time = time.monotonic() - start
+        result.size = os.path.getsize(image)
+
+        subprocess.run(["mount", "-t", "squashfs", "-o", "loop,ro", image, mount_point], check=True)
+        try:
+            latencies = self._random_reads(mount_point, sample)
+            result.latency_p50 = percentile(latencies, 0.50) * 1000
+            result.latency_p95 = percentile(latencies, 0.95) * 1000
+            result.throughput = self._sequential_read(mount_point, files)
+        finally:
+            subprocess.run(["umount", mount_point], check=False)
+            os.unlink(image)
+        return result
+
+    # Initramfs ----------------------------------------------------------
+
+    def measure_initramfs(self, archive: str, candidate: Candidate) -> Result:
+        result = Result("initramfs", candidate.label)
+        compressed = os.path.join(self.work_dir, "candidate.img")
+        command = [*INITRAMFS_TOOLS[candidate.compressor], *candidate.options, "-c"]
+        with open(archive, "rb") as source, open(compressed, "wb") as target:
+            start = time.monotonic()
+            subprocess.run(command, stdin=source, stdout=target, check=True)
+            result.build_time = time.monotonic() - start
+        result.size = os.path.getsize(compressed)
+
+        # Décompression en mémoire, comme au démarrage (fichier déjà lu)
+        with open(compressed, "rb") as source:
+            start = time.monotonic()
+            subprocess.run([INITRAMFS_TOOLS[candidate.compressor][0], "-dc"],
+                           stdin=source, stdout=subprocess.DEVNULL, check=True)
+            result.throughput = os.path.getsize(archive) / (time.monotonic() - start)
+        os.unlink(compressed)
+        return result
+
+    def run(self, rootfs: Optional[str], archive: Optional[str],
+            squashfs: List[Candidate], initramfs: List[Candidate]) -> List[Result]:
+        results = []
+        if rootfs:
+            files = regular_files(rootfs)
+            rng = random.Random(self.seed)
+            sample = [rng.choice(files) for _ in range(self.samples)]
+            for index, candidate in enumerate(squashfs, 1):
+                print(f"▶ squashfs [{index}/{len(squashfs)}] {candidate.label}", flush=True)
+                results.append(self.measure_squashfs(rootfs, candidate, files, sample))
+        if archive:
+            for index, candidate in enumerate(initramfs, 1):
+                print(f"▶ initramfs [{index}/{len(initramfs)}] {candidate.label}", flush=True)
+                results.append(self.measure_initramfs(archive, candidate))
+        return results
+
+
+def early_cpio_length(data: bytes) -> int:
+    """Longueur des archives cpio non compressées en tête (microcodes)"""
+    offset = 0
+    while data.startswith(CPIO_MAGIC, offset):
+        # En-têtes newc: 110 octets, nom et données alignés sur 4 octets
+        while True:
+            header = data[offset:offset + 110]
+            file_size = int(header[54:62], 16)
+            name_size = int(header[94:102], 16)
+            name = data[offset + 110:offset + 110 + name_size - 1]
+            offset = (offset + 110 + name_size + 3) // 4 * 4
+            offset = (offset + file_size + 3) // 4 * 4
+            if name == b"TRAILER!!!":
+                break
+        while offset < len(data) and data[offset] == 0:
+            offset += 1
+    return offset
+
+
+def extract_initramfs(image: str, archive: str):
+    """Archive cpio décompressée de l'initramfs (sans les microcodes)"""
+    with open(image, "rb") as f:
+        data = f.read()
+    data = data[early_cpio_length(data):]
+    if data.startswith(CPIO_MAGIC):
+        with open(archive, "wb") as f:
+            f.write(data)
+        return
+    for magic, command in DECOMPRESSORS:
+        if data.startswith(magic):
+            with open(archive, "wb") as f:
+                subprocess.run(command, input=data, stdout=f, check=True)
+            return
+    raise ValueError(f"format d'initramfs inconnu: {image}")
+
+
+def extract_iso(iso: str, work_dir: str) -> Tuple[str, str]:
+    """airootfs et initramfs de l'ISO, extraits dans le répertoire de travail"""
+    rootfs = os.path.join(work_dir, "airootfs")
+    initramfs = os.path.join(work_dir, "initramfs.img")
+    mount_point = os.path.join(work_dir, "iso")
+    os.makedirs(mount_point, exist_ok=True)
+    subprocess.run(["mount", "-o", "loop,ro", iso, mount_point], check=True)
+    try:
+        images = glob.glob(os.path.join(mount_point, "*", "x86_64", "airootfs.sfs"))
+        kernels = glob.glob(os.path.join(mount_point, "*", "boot", "x86_64", "initramfs-*.img"))
+        if not images or not kernels:
+            raise ValueError(f"{iso}: airootfs.sfs ou initramfs introuvable")
+        print(f"Extraction de {os.path.relpath(images[0], mount_point)}...", flush=True)
+        shutil.rmtree(rootfs, ignore_errors=True)
+        subprocess.run(["unsquashfs", "-no-progress", "-d", rootfs, images[0]],
+                       check=True, stdout=subprocess.DEVNULL)
+        shutil.copyfile(sorted(kernels)[0], initramfs)
+    finally:
+        subprocess.run(["umount", mount_point], check=False)
+    return rootfs, initramfs
+
+
+def tag_profiles(results: List[Result], profiles: List[Profile]):
+    for result in results:
+        for profile in profiles:
+            candidate = profile.squashfs if result.target == "squashfs" else profile.initramfs
+            if candidate.label == result.label:
+                result.profiles.append(profile.name)
+
+
+def print_results(results: List[Result]):
+    for target in ("squashfs", "initramfs"):
+        rows = sorted((r for r in results if r.target == target), key=lambda r: r.size)
+        if not rows:
+            continue
+        print(f"\n{target}")
+        header = f"{'Candidat':<44}{'Taille':>10}{'Création':>10}{'Débit':>12}"
+        if target == "squashfs":
+            header += f"{'p50':>9}{'p95':>9}"
+        print(header + "  Profils")
+        for r in rows:
+            line = (f"{r.label:<44}{format_size(r.size):>10}{r.build_time:9.1f}s"
+                    f"{r.throughput / 1e6:8.0f} MB/s")
+            if target == "squashfs":
+                line += f"{r.latency_p50:7.2f}ms{r.latency_p95:7.2f}ms"
+            print(f"{line}  {', '.join(r.profiles)}")
+
+        smallest = rows[0]
+        fastest = max(rows, key=lambda r: r.throughput)
+        print(f"Plus petit: {smallest.label} | décompression la plus rapide: {fastest.label}")
+        if target == "squashfs":
+            quickest = min(rows, key=lambda r: r.latency_p95)
+            print(f"Lectures aléatoires les plus rapides (p95): {quickest.label}")
+
+
+def save_results(source: str, results: List[Result]):
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, "w") as f:
+        json.dump({
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": source,
+            "results": [asdict(result) for result in results],
+        }, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai de la compression du squashfs et de l'initramfs")
+    parser.add_argument("--iso", default=DEFAULT_ISO,
+                        help="ISO dont l'airootfs et l'initramfs sont extraits (défaut: variante complète)")
+    parser.add_argument("--rootfs", help="airootfs déjà extrait (au lieu de l'ISO)")
+    parser.add_argument("--initramfs", help="image initramfs (au lieu de celle de l'ISO)")
+    parser.add_argument("--compressors", nargs="+", default=list(COMPRESSORS), choices=COMPRESSORS,
+                        help="algorithmes comparés (défaut: tous)")
+    parser.add_argument("--blocks", nargs="+", default=list(BLOCK_SIZES),
+                        help=f"tailles de blocs du squashfs (défaut: {' '.join(BLOCK_SIZES)})")
+    parser.add_argument("--levels", nargs="+", type=int, default=list(ZSTD_LEVELS),
+                        choices=range(1, 20), metavar="N",
+                        help=f"niveaux de zstd, de 1 à 19 (défaut: {' '.join(map(str, ZSTD_LEVELS))})")
+    parser.add_argument("--only", choices=("squashfs", "initramfs"), help="une seule des deux images")
+    parser.add_argument("--processors", type=int, help="processeurs de mksquashfs (défaut: tous)")
+    parser.add_argument("--samples", type=int, default=500,
+                        help="lectures aléatoires par image (défaut: 500)")
+    parser.add_argument("--seed", type=int, default=0, help="graine des lectures aléatoires")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR,
+                        help=f"répertoire de travail (défaut: {DEFAULT_WORK_DIR})")
+    args = parser.parse_args(argv)
+
+    if os.geteuid() != 0:
+        parser.error("à lancer en root (montage des images, vidage des caches)")
+    for tool in ("mksquashfs", "unsquashfs", *(INITRAMFS_TOOLS[c][0] for c in args.compressors)):
+        if not shutil.which(tool):
+            parser.error(f"outil manquant: {tool}")
+
+    profiles = load_profiles()
+    os.makedirs(args.work_dir, exist_ok=True)
+    rootfs, initramfs = args.rootfs, args.initramfs
+    source = rootfs or args.iso
+    try:
+        if not rootfs or (not initramfs and args.only != "squashfs"):
+            if not os.path.isfile(args.iso):
+                parser.error(f"ISO introuvable: {args.iso} (--iso, ou --rootfs et --initramfs)")
+            extracted_rootfs, extracted_initramfs = extract_iso(args.iso, args.work_dir)
+            rootfs = rootfs or extracted_rootfs
+            initramfs = initramfs or extracted_initramfs
+
+        archive = None
+        if args.only != "squashfs":
+            archive = os.path.join(args.work_dir, "initramfs.cpio")
+            extract_initramfs(initramfs, archive)
+
+        bench = CompressionBench(args.work_dir, args.processors, args.samples, args.seed)
+        results = bench.run(
+            rootfs if args.only != "initramfs" else None, archive,
+            squashfs_candidates(args.compressors, args.blocks, args.levels, profiles),
+            initramfs_candidates(args.compressors, args.levels, profiles),
+        )
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        if not args.rootfs:
+            shutil.rmtree(os.path.join(args.work_dir, "airootfs"), ignore_errors=True)
+
+    tag_profiles(results, profiles)
+    print_results(results)
+    print("\nProfils (build-iso.sh --compression):")
+    for profile in profiles:
+        print(f"  {profile.name:<16} {profile.description}")
+    save_results(source, results)
+    print(f"\nRésultats enregistrés dans {RESULTS_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
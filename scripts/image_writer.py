@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Écriture vérifiée d'une image sur clé USB ou disque
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Écrit une ISO sur un périphérique (ou un fichier) avec lecture et
+             écriture en parallèle, puis relit la cible et la vérifie bloc par
+             bloc avec le manifeste de l'image (iso_manifest.py)
+
+La lecture de l'image et l'écriture de la cible se recouvrent: un thread
+remplit des tampons alignés pendant que le précédent est écrit en E/S directes
+(O_DIRECT, sans passer par le cache de pages). Les blocs de l'image sont hachés
+au passage: comparés au manifeste s'il existe (image abîmée détectée avant la
+fin), ils servent sinon de manifeste pour la relecture. Sur une cible déjà
+remplie de zéros (fichier neuf, --assume-zero), les zones nulles de l'image ne
+sont pas écrites.
+
+Usage:
+    sudo python3 image_writer.py iso/archfusion-1.0.0-x86_64.iso /dev/sdX
+    python3 image_writer.py ISO /tmp/copie.img                # fichier: zéros connus
+    sudo python3 image_writer.py ISO /dev/loop0 --assume-zero --yes
+"""
+
+import argparse
+import fcntl
+import mmap
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+from build_cache import format_size
+from iso_manifest import (CHUNK_ALGORITHM, DEFAULT_CHUNK_SIZE, HASH_WORKERS, ChunkManifest,
+                          ManifestError, Progress, bad_ranges, chunk_digest, load_manifest,
+                          manifest_path, progress_printer, verify_image)
+
+# E/S directes: adresses, tailles et positions multiples de la taille de bloc
+# logique (4096 couvre les disques 512 et 4K)
+DIRECT_ALIGNMENT = 4096
+# Tampons de 2 blocs du manifeste, en rotation entre lecture et écriture
+# (double tampon, plus un dont les blocs sont encore hachés)
+BUFFER_CHUNKS = 2
+BUFFER_COUNT = 3
+# Granularité de la détection des zones nulles
+ZERO_SEGMENT = 64 * 1024
+ZEROS = bytes(ZERO_SEGMENT)
+
+
+class WriterError(RuntimeError):
+    """Cible inutilisable ou image source différente de son manifeste"""
+
+
+@dataclass
+class WriteStats:
+    """Bilan d'une écriture"""
+
+    size: int = 0
+    written: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    direct: bool = False
+    verify_time: float = 0.0
+
+
+def is_block_device(path: str) -> bool:
+    return os.path.exists(path) and stat.S_ISBLK(os.stat(path).st_mode)
+
+
+def _parent_disk(device: str) -> str:
+    """Disque d'une partition (sdb1 -> sdb), d'après /sys/class/block"""
+    name = os.path.basename(os.path.realpath(device))
+    sys_path = os.path.realpath(os.path.join("/sys/class/block", name))
+    if os.path.exists(os.path.join(sys_path, "partition")):
+        return os.path.basename(os.path.dirname(sys_path))
+    return name
+
+
+def busy_devices() -> Set[str]:
+    """Disques dont un système de fichiers est monté ou une partition sert de swap"""
+    sources = []
+    for table in ("/proc/mounts", "/proc/swaps"):
+        try:
+            with open(table) as f:
+                sources += [line.split()[0] for line in f if line.startswith("/dev/")]
+        except OSError:
+            continue
+    return {_parent_disk(source) for source in sources if os.path.exists(source)}
+
+
+def device_description(device: str) -> str:
+    name = os.path.basename(os.path.realpath(device))
+    try:
+        with open(f"/sys/block/{name}/device/model") as f:
+            model = f.read().strip()
+    except OSError:
+        model = ""
+    with open(device, "rb") as f:
+        size = os.lseek(f.fileno(), 0, os.SEEK_END)
+    return f"{device} ({' '.join(filter(None, (model, format_size(size))))})"
+
+
+class ImageWriter:
+    """Écriture d'une image sur une cible puis relecture vérifiée"""
+
+    def __init__(self, source: str, target: str, manifest: Optional[ChunkManifest] = None,
+                 assume_zero: bool = False, direct: bool = True,
+                 progress: Optional[Progress] = None):
+        self.source = source
+        self.target = target
+        self.manifest = manifest
+        self.assume_zero = assume_zero
+        self.direct = direct
+        self.progress = progress
+        self.stats = WriteStats()
+        self._stop = threading.Event()
+        self._reader_error: Optional[BaseException] = None
+
+    # Cible --------------------------------------------------------------
+
+    def _open_target(self, size: int) -> int:
+        if is_block_device(self.target):
+            if _parent_disk(self.target) in busy_devices():
+                raise WriterError(f"{self.target}: périphérique monté ou utilisé comme swap")
+            # O_EXCL sur un périphérique bloc: refus s'il est utilisé (EBUSY)
+            flags = os.O_WRONLY | os.O_EXCL
+        else:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+            # Fichier neuf: ftruncate le remplit de zéros (creux)
+            self.assume_zero = True
+
+        fd = -1
+        if self.direct:
+            try:
+                fd = os.open(self.target, flags | os.O_DIRECT, 0o644)
+            except OSError:
+                # tmpfs et certains systèmes de fichiers refusent O_DIRECT
+                self.direct = False
+        if fd < 0:
+            fd = os.open(self.target, flags, 0o644)
+
+        try:
+            if is_block_device(self.target):
+                if os.lseek(fd, 0, os.SEEK_END) < size:
+                    raise WriterError(f"{self.target}: plus petit que l'image ({format_size(size)})")
+            else:
+                os.ftruncate(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.stats.direct = self.direct
+        return fd
+
+    def _pwrite(self, fd: int, data: memoryview, offset: int):
+        if self.direct and len(data) % DIRECT_ALIGNMENT:
+            # Fin de l'image non alignée: dernière écriture par le cache de pages
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+            self.direct = False
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+
+    def _write_buffer(self, fd: int, buffer: mmap.mmap, length: int, offset: int):
+        """Écrit le tampon, sans les zones nulles si la cible est déjà à zéro"""
+        view = memoryview(buffer)
+        if not self.assume_zero:
+            self._pwrite(fd, view[:length], offset)
+            self.stats.written += length
+            return
+
+        run_start = None
+        for start in range(0, length, ZERO_SEGMENT):
+            end = min(length, start + ZERO_SEGMENT)
+            if buffer[start:end] == ZEROS[:end - start]:
+                self.stats.skipped += end - start
+                if run_start is not None:
+                    self._pwrite(fd, view[run_start:start], offset + run_start)
+                    self.stats.written += start - run_start
+                    run_start = None
+            elif run_start is None:
+                run_start = start
+        if run_start is not None:
+            self._pwrite(fd, view[run_start:length], offset + run_start)
+            self.stats.written += length - run_start
+
+    # Lecture ------------------------------------------------------------
+
+    def _read(self, size: int, buffer_size: int, chunk_size: int, pool: ThreadPoolExecutor,
+              free: "queue.Queue", filled: "queue.Queue"):
+        """Thread de lecture: remplit les tampons libres et lance le hachage des blocs"""
+        try:
+            with open(self.source, "rb", buffering=0) as f:
+                offset = 0
+                while offset < size:
+                    buffer = free.get()
+                    if buffer is None or self._stop.is_set():
+                        return
+                    view = memoryview(buffer)
+                    wanted = min(buffer_size, size - offset)
+                    length = 0
+                    while length < wanted:
+                        count = f.readinto(view[length:wanted])
+                        if not count:
+                            raise WriterError(f"{self.source}: image tronquée")
+                        length += count
+                    futures = [pool.submit(chunk_digest, self.manifest_algorithm,
+                                           view[start:min(start + chunk_size, length)])
+                               for start in range(0, length, chunk_size)]
+                    filled.put((offset, buffer, length, futures))
+                    offset += length
+        except BaseException as e:
+            self._reader_error = e
+        finally:
+            filled.put(None)
+
+    # Écriture -----------------------------------------------------------
+
+    @property
+    def manifest_algorithm(self) -> str:
+        return self.manifest.chunk_algorithm if self.manifest else CHUNK_ALGORITHM
+
+    def write(self) -> ChunkManifest:
+        """Écrit l'image; manifeste des blocs (celui fourni ou calculé en lisant)"""
+        size = os.path.getsize(self.source)
+        chunk_size = self.manifest.chunk_size if self.manifest else DEFAULT_CHUNK_SIZE
+        if self.manifest and self.manifest.size != size:
+            raise WriterError(f"le manifeste décrit une image de {self.manifest.size} octets, "
+                              f"{self.source} en fait {size}")
+        buffer_size = chunk_size * BUFFER_CHUNKS
+        if buffer_size % DIRECT_ALIGNMENT:
+            self.direct = False
+        self.stats.size = size
+
+        fd = self._open_target(size)
+        buffers = [mmap.mmap(-1, buffer_size) for _ in range(BUFFER_COUNT)]
+        free: "queue.Queue" = queue.Queue()
+        filled: "queue.Queue" = queue.Queue()
+        for buffer in buffers:
+            free.put(buffer)
+
+        chunks: List[str] = []
+        start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+        reader = threading.Thread(target=self._read, daemon=True,
+                                  args=(size, buffer_size, chunk_size, pool, free, filled))
+        reader.start()
+        try:
+            while True:
+                item = filled.get()
+                if item is None:
+                    break
+                offset, buffer, length, futures = item
+                self._write_buffer(fd, buffer, length, offset)
+                for future in futures:
+                    index = len(chunks)
+                    chunks.append(future.result())
+                    if self.manifest and chunks[-1] != self.manifest.chunks[index]:
+                        raise WriterError(f"{self.source}: bloc {index} différent du manifeste "
+                                          f"(image abîmée, à télécharger de nouveau)")
+                free.put(buffer)
+                if self.progress:
+                    self.progress(offset + length, size)
+            if self._reader_error:
+                raise self._reader_error
+            os.fsync(fd)
+            # Relecture depuis le périphérique, pas depuis le cache
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            self._stop.set()
+            free.put(None)
+            reader.join()
+            pool.shutdown()
+            os.close(fd)
+            for buffer in buffers:
+                try:
+                    buffer.close()
+                except BufferError:
+                    # Vue encore référencée (exception en cours): libéré par le ramasse-miettes
+                    pass
+        self.stats.elapsed = time.monotonic() - start
+
+        if self.manifest:
+            return self.manifest
+        return ChunkManifest(os.path.basename(self.source), size, chunk_size, CHUNK_ALGORITHM, {}, chunks)
+
+    def verify(self, manifest: ChunkManifest, progress: Optional[Progress] = None) -> List[int]:
+        """Relit la cible: indices des blocs différents de l'image"""
+        start = time.monotonic()
+        bad = verify_image(self.target, manifest, progress)
+        self.stats.verify_time = time.monotonic() - start
+        return bad
+
+
+def confirm(target: str) -> bool:
+    answer = input(f"⚠️  Toutes les données de {device_description(target)} seront effacées. "
+                   f"Continuer ? [oui/N] ")
+    return answer.strip().lower() in ("o", "oui", "y", "yes")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Écriture vérifiée d'une image sur clé USB ou disque")
+    parser.add_argument("image", help="ISO à écrire")
+    parser.add_argument("target", help="périphérique (/dev/sdX) ou fichier")
+    parser.add_argument("--manifest", help="manifeste des blocs (défaut: IMAGE.chunks.json s'il existe)")
+    parser.add_argument("--assume-zero", action="store_true",
+                        help="la cible ne contient que des zéros: zones nulles non écrites")
+    parser.add_argument("--no-direct", action="store_true", help="écriture par le cache de pages")
+    parser.add_argument("--no-verify", action="store_true", help="sans relecture de la cible")
+    parser.add_argument("-y", "--yes", action="store_true", help="sans confirmation")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.image):
+        parser.error(f"image introuvable: {args.image}")
+    if os.path.exists(args.target) and os.path.samefile(args.image, args.target):
+        parser.error("la cible est l'image elle-même")
+    manifest = None
+    manifest_file = args.manifest or manifest_path(args.image)
+    try:
+        if args.manifest or os.path.isfile(manifest_file):
+            manifest = load_manifest(manifest_file)
+    except ManifestError as e:
+        parser.error(f"{manifest_file}: {e}")
+
+    if is_block_device(args.target) and not args.yes:
+        if not sys.stdin.isatty():
+            parser.error("confirmation requise (--yes) pour écrire sur un périphérique")
+        if not confirm(args.target):
+            print("Abandon.")
+            return 1
+
+    interactive = sys.stderr.isatty()
+    writer = ImageWriter(args.image, args.target, manifest, args.assume_zero, not args.no_direct,
+                         progress_printer("Écriture") if interactive else None)
+    try:
+        manifest = writer.write()
+        bad = [] if args.no_verify else writer.verify(
+            manifest, progress_printer("Vérification") if interactive else None)
+    except (OSError, WriterError, ManifestError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    stats = writer.stats
+    print(f"Écrit: {format_size(stats.written)} en {stats.elapsed:.1f} s "
+          f"({format_size(stats.size / max(stats.elapsed, 1e-6))}/s"
+          f"{', E/S directes' if stats.direct else ''})")
+    if stats.skipped:
+        print(f"Zones nulles non écrites: {format_size(stats.skipped)}")
+    if args.no_verify:
+        return 0
+    if bad:
+        print(f"❌ Vérification: {len(bad)} bloc(s) différent(s) de l'image")
+        for start, end in bad_ranges(manifest, bad):
+            print(f"   octets {start}-{end - 1} ({format_size(end - start)})")
+        return 1
+    print(f"✅ Vérifié: {len(manifest.chunks)} blocs conformes en {stats.verify_time:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Initramfs réduit au matériel
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Génère une configuration mkinitcpio limitée aux modules et hooks
+             nécessaires pour atteindre la racine de la machine détectée (ou
+             d'une classe de matériel), avec un compresseur à décompression
+             rapide, et garde une image de secours complète
+
+La pile de la racine (système de fichiers, LUKS, LVM, RAID) est toujours lue
+sur la machine (findmnt, lsblk). Les pilotes du contrôleur viennent soit des
+liens driver/module de sysfs entre le disque et son bus (--class auto), soit
+de la liste d'une classe de matériel (virtio, hyperv...).
+
+"configure" écrit /etc/mkinitcpio-slim.conf et les presets des noyaux:
+l'image par défaut utilise la configuration réduite, l'image de secours
+(initramfs-*-fallback.img, proposée par GRUB) la configuration complète
+/etc/mkinitcpio.conf. "compare" construit les deux images pour le noyau en
+cours et compare leur taille et leur durée de décompression.
+
+Usage:
+    python3 initramfs_slim.py show                          # configuration réduite
+    sudo python3 initramfs_slim.py configure --root /mnt    # depuis install.sh
+    sudo python3 initramfs_slim.py compare --class virtio
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from build_cache import format_size
+from compression_bench import DECOMPRESSORS, early_cpio_length, load_profiles
+
+SLIM_CONFIG = "/etc/mkinitcpio-slim.conf"
+FULL_CONFIG = "/etc/mkinitcpio.conf"
+PRESETS_DIR = "/etc/mkinitcpio.d"
+DEFAULT_PROFILE = "boot-optimized"
+
+# Pilotes de contrôleur par classe de matériel ("?": module facultatif)
+HARDWARE_CLASSES: Dict[str, Tuple[str, ...]] = {
+    "virtio": ("virtio_pci", "virtio_blk", "virtio_scsi", "sd_mod"),
+    "hyperv": ("hv_vmbus", "hv_storvsc", "sd_mod", "hyperv_keyboard"),
+    "vmware": ("vmw_pvscsi", "mptspi", "ahci", "sd_mod"),
+    "virtualbox": ("ahci", "sd_mod"),
+    "physical": ("ahci", "nvme", "sd_mod", "xhci_pci", "usb_storage", "uas"),
+}
+
+# Système de fichiers (findmnt) -> module
+FILESYSTEM_MODULES = {"ext2": "ext4", "ext3": "ext4", "fuseblk": "fuse"}
+
+
+@dataclass
+class RootStack:
+    """Périphériques et pilotes entre la racine et le matériel"""
+
+    source: str
+    fstype: str
+    disks: List[str] = field(default_factory=list)
+    encrypted: bool = False
+    lvm: bool = False
+    raid: bool = False
+
+
+@dataclass
+class SlimConfig:
+    """Contenu de la configuration mkinitcpio réduite"""
+
+    modules: List[str]
+    hooks: List[str]
+    compression: str
+    compression_options: Tuple[str, ...]
+
+    def render(self, description: str) -> str:
+        options = " ".join(self.compression_options)
+        return (
+            "# ArchFusion OS - Configuration mkinitcpio réduite\n"
+            f"# Générée par initramfs_slim.py ({description}); image de secours:\n"
+            f"# {FULL_CONFIG}\n\n"
+            f"MODULES=({' '.join(self.modules)})\n"
+            "BINARIES=()\n"
+            "FILES=()\n"
+            f"HOOKS=({' '.join(self.hooks)})\n\n"
+            f'COMPRESSION="{self.compression}"\n'
+            f"COMPRESSION_OPTIONS=({options})\n"
+            'MODULES_DECOMPRESS="yes"\n'
+        )
+
+
+def read_root_stack(root: str) -> RootStack:
+    """Source et type de la racine, puis ses ancêtres (lsblk --inverse)"""
+    source, fstype = subprocess.run(
+        ["findmnt", "-n", "-o", "SOURCE,FSTYPE", "--nofsroot", "--mountpoint", root],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    stack = RootStack(source, fstype)
+    lines = subprocess.run(["lsblk", "-s", "-n", "-r", "-o", "KNAME,TYPE", source],
+                           check=True, capture_output=True, text=True).stdout.splitlines()
+    for line in lines:
+        name, kind = line.split()
+        if kind == "disk":
+            stack.disks.append(name)
+        stack.encrypted |= kind == "crypt"
+        stack.lvm |= kind == "lvm"
+        stack.raid |= kind.startswith("raid")
+    return stack
+
+
+def driver_modules(disk: str, sysfs: str = "/sys") -> List[str]:
+    """Modules des pilotes du disque jusqu'au bus (liens driver/module de sysfs)"""
+    modules = []
+    devices_root = os.path.realpath(os.path.join(sysfs, "devices"))
+    path = os.path.realpath(os.path.join(sysfs, "class", "block", disk, "device"))
+    while path.startswith(devices_root + os.sep):
+        link = os.path.join(path, "driver", "module")
+        if os.path.islink(link):
+            module = os.path.basename(os.readlink(link))
+            if module not in modules:
+                modules.append(module)
+        path = os.path.dirname(path)
+    return modules
+
+
+def build_config(stack: RootStack, hardware_class: str, profile: str) -> SlimConfig:
+    if hardware_class == "auto":
+        modules = []
+        for disk in stack.disks:
+            modules += [module for module in driver_modules(disk) if module not in modules]
+    else:
+        modules = [f"{module}?" for module in HARDWARE_CLASSES[hardware_class]]
+    modules.append(FILESYSTEM_MODULES.get(stack.fstype, stack.fstype))
+
+    # Sans autodetect, block et filesystems: seuls MODULES et les hooks de la pile
+    hooks = ["base", "udev", "modconf"]
+    if stack.encrypted:
+        hooks += ["keyboard", "keymap", "encrypt"]
+    if stack.lvm:
+        hooks.append("lvm2")
+    if stack.raid:
+        hooks.append("mdadm_udev")
+    hooks.append("fsck")
+
+    profiles = {p.name: p for p in load_profiles()}
+    if profile not in profiles:
+        raise ValueError(f"profil de compression inconnu: {profile} ({', '.join(sorted(profiles))})")
+    initramfs = profiles[profile].initramfs
+    return SlimConfig(modules, hooks, initramfs.compressor, initramfs.options)
+
+
+def kernel_packages(root: str) -> List[str]:
+    """Noyaux installés (pkgbase de usr/lib/modules/*)"""
+    packages = []
+    modules_root = os.path.join(root, "usr", "lib", "modules")
+    for version in sorted(os.listdir(modules_root)):
+        try:
+            with open(os.path.join(modules_root, version, "pkgbase")) as f:
+                packages.append(f.read().strip())
+        except OSError:
+            continue
+    return packages
+
+
+def render_preset(package: str) -> str:
+    return (
+        f"# ArchFusion OS - preset mkinitcpio du paquet '{package}'\n"
+        "# Image par défaut réduite au matériel, image de secours complète\n\n"
+        f'ALL_kver="/boot/vmlinuz-{package}"\n\n'
+        "PRESETS=('default' 'fallback')\n\n"
+        f'default_config="{SLIM_CONFIG}"\n'
+        f'default_image="/boot/initramfs-{package}.img"\n\n'
+        f'fallback_config="{FULL_CONFIG}"\n'
+        f'fallback_image="/boot/initramfs-{package}-fallback.img"\n'
+        'fallback_options="-S autodetect"\n'
+    )
+
+
+def configure(root: str, config: SlimConfig, description: str) -> List[str]:
+    """Écrit la configuration réduite et les presets (repris tels quels par le hook mkinitcpio)"""
+    written = [os.path.join(root, SLIM_CONFIG.lstrip("/"))]
+    with open(written[0], "w") as f:
+        f.write(config.render(description))
+    presets_dir = os.path.join(root, PRESETS_DIR.lstrip("/"))
+    os.makedirs(presets_dir, exist_ok=True)
+    for package in kernel_packages(root):
+        path = os.path.join(presets_dir, f"{package}.preset")
+        with open(path, "w") as f:
+            f.write(render_preset(package))
+        written.append(path)
+    return written
+
+
+@dataclass
+class ImageReport:
+    """Taille et décompression d'une image initramfs"""
+
+    name: str
+    size: int = 0
+    unpacked: int = 0
+    decompression: float = 0.0
+
+
+def measure_image(name: str, image: str, runs: int) -> ImageReport:
+    """Décompression en mémoire (médiane de plusieurs passes), microcodes exclus"""
+    report = ImageReport(name, os.path.getsize(image))
+    with open(image, "rb") as f:
+        data = f.read()
+    data = data[early_cpio_length(data):]
+    command = next((command for magic, command in DECOMPRESSORS if data.startswith(magic)), None)
+    if command is None:
+        report.unpacked = len(data)
+        return report
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        unpacked = subprocess.run(command, input=data, stdout=subprocess.PIPE, check=True).stdout
+        durations.append(time.perf_counter() - start)
+    report.unpacked = len(unpacked)
+    report.decompression = statistics.median(durations)
+    return report
+
+
+def compare(config: SlimConfig, description: str, kernel: str, runs: int) -> List[ImageReport]:
+    """Construit les images complète et réduite pour le noyau et les mesure"""
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="archfusion-initramfs-") as work_dir:
+        slim_config = os.path.join(work_dir, "mkinitcpio-slim.conf")
+        with open(slim_config, "w") as f:
+            f.write(config.render(description))
+        for name, config_path in (("actuelle", FULL_CONFIG), ("réduite", slim_config)):
+            image = os.path.join(work_dir, f"{name}.img")
+            print(f"▶ mkinitcpio: configuration {name}", flush=True)
+            subprocess.run(["mkinitcpio", "-c", config_path, "-k", kernel, "-g", image],
+                           check=True, stdout=subprocess.DEVNULL)
+            reports.append(measure_image(name, image, runs))
+    return reports
+
+
+def print_reports(reports: List[ImageReport]):
+    print(f"\n{'Configuration':<16}{'Image':>10}{'Décompressée':>14}{'Décompression':>16}")
+    for report in reports:
+        print(f"{report.name:<16}{format_size(report.size):>10}{format_size(report.unpacked):>14}"
+              f"{report.decompression * 1000:13.1f} ms")
+    current, slim = reports
+    if current.size and current.decompression:
+        print(f"Gain: {(1 - slim.size / current.size) * 100:.1f} % de taille, "
+              f"{(1 - slim.decompression / current.decompression) * 100:.1f} % de décompression")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Initramfs réduit au matériel de la machine")
+    parser.add_argument("command", choices=("show", "configure", "compare"))
+    parser.add_argument("--root", default="/",
+                        help="racine du système visé, montée (défaut: /)")
+    parser.add_argument("--class", dest="hardware_class", default="auto",
+                        choices=("auto", *HARDWARE_CLASSES),
+                        help="pilotes du contrôleur: détectés (auto) ou ceux d'une classe")
+    parser.add_argument("--compression", default=DEFAULT_PROFILE, metavar="PROFIL",
+                        help=f"profil de scripts/compression (défaut: {DEFAULT_PROFILE})")
+    parser.add_argument("--kernel", default=os.uname().release,
+                        help="noyau des images comparées (défaut: noyau en cours)")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="décompressions mesurées par image (défaut: 5)")
+    args = parser.parse_args(argv)
+
+    if args.command != "show" and os.geteuid() != 0:
+        parser.error("à lancer en root (configuration ou construction des images)")
+    try:
+        stack = read_root_stack(args.root)
+        config = build_config(stack, args.hardware_class, args.compression)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(f"❌ Racine {args.root}: {e}", file=sys.stderr)
+        return 1
+    description = f"classe {args.hardware_class}, racine {stack.fstype} sur {' '.join(stack.disks) or stack.source}"
+
+    if args.command == "show":
+        print(config.render(description), end="")
+    elif args.command == "configure":
+        for path in configure(args.root, config, description):
+            print(f"✅ {path}")
+    else:
+        print_reports(compare(config, description, args.kernel, args.runs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Benchmark du moteur d'installation parallèle
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Compare l'exécution séquentielle de install.sh (main) et le
+             graphe d'étapes de engine.py (install.sh --step), avec les
+             vraies fonctions de install.sh et des commandes externes simulées
+
+Les commandes qui touchent le disque, le réseau ou l'hôte (pacstrap, mkfs,
+parted, arch-chroot, mount, reflector, mirror_rank.py...) sont remplacées par
+des scripts bouchons placés en tête du PATH, qui dorment pendant une durée
+représentative (secondes réelles multipliées par --scale). Tout le reste,
+enchaînement des étapes, fichiers écrits dans la cible, points de reprise,
+s'exécute réellement dans un dossier temporaire. Nécessite root (install.sh).
+
+Le coût de lancement des étapes (un install.sh --step par étape) ne dépend
+pas de --scale: il est mesuré à part, durées simulées nulles, et une petite
+échelle lui donne un poids exagéré dans le gain.
+
+Usage:
+    sudo python3 bench_engine.py                 # durées réelles, 4 workers
+    sudo python3 bench_engine.py --scale 0.1 --workers 2
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from engine import INSTALL_SCRIPT, INSTALL_STEPS, InstallEngine
+
+# Durées typiques observées sur une installation KDE (secondes), par commande
+COMMAND_DURATIONS: Dict[str, float] = {
+    "parted": 3,
+    "mkfs.fat": 1,
+    "mkfs.ext4": 8,
+    "mkfs.btrfs": 8,
+    "mkswap": 1,
+    "reflector": 25,
+    "pacman": 2,
+    "pacstrap": 840,
+    "genfstab": 1,
+}
+
+# Commandes lancées dans la cible (arch-chroot), reconnues dans leur script
+CHROOT_DURATIONS: Dict[str, float] = {
+    "locale-gen": 15,
+    "useradd": 2,
+    "systemctl": 1,
+    "grub-install": 12,
+    "mkinitcpio": 18,
+    "grub-mkconfig": 2,
+}
+
+# Outils Python de install.sh agissant hors de la cible (réseau, historique de l'hôte)
+PYTHON_DURATIONS: Dict[str, float] = {
+    "mirror_rank.py": 25,
+    "install_trace.py": 0,
+}
+
+# Commandes sans effet ni durée notable: disque, montages, réseau
+NOOP_COMMANDS = ("wipefs", "udevadm", "swapoff", "swapon", "cryptsetup", "mount", "umount",
+                 "blkid", "lsblk", "ping", "curl")
+
+
+def write_stubs(directory: Path, scale: float):
+    """Scripts bouchons des commandes externes de install.sh"""
+    def write(name: str, body: str):
+        path = directory / name
+        path.write_text(f"#!/bin/bash\n{body}\n")
+        path.chmod(0o755)
+
+    directory.mkdir()
+    for name, seconds in COMMAND_DURATIONS.items():
+        write(name, f"sleep {seconds * scale:.4f}")
+    for name in NOOP_COMMANDS:
+        write(name, "exit 0")
+    # Cible jamais montée; espace libre suffisant pour les prérequis
+    write("mountpoint", "exit 1")
+    write("df", 'echo "Filesystem 1K-blocks Used Available Use% Mounted on"\n'
+                'echo "bench 104857600 0 104857600 0% /"')
+
+    # Scripts passés par l'entrée standard (in_target /bin/bash << EOF)
+    checks = "\n".join(f"[[ $text == *{name}* ]] && sleep {seconds * scale:.4f}"
+                       for name, seconds in CHROOT_DURATIONS.items())
+    write("arch-chroot", f'text="$*"\n[[ $* == *bin/bash* ]] && text+=$(cat)\n{checks}\nexit 0')
+
+    cases = "\n".join(f"    {name}) sleep {seconds * scale:.4f}; exit 0 ;;"
+                      for name, seconds in PYTHON_DURATIONS.items())
+    write("python3", f'case ${{1##*/}} in\n{cases}\nesac\nexec "{sys.executable}" "$@"')
+
+
+def measure(tmp: str, scale: float, workers: int, config: Dict) -> Tuple[float, float, Dict[str, str]]:
+    """Durées du script séquentiel et du moteur, et état final des étapes du moteur"""
+    stubs = Path(tmp) / f"bin-{scale:g}"
+    write_stubs(stubs, scale)
+    path = os.environ["PATH"]
+    os.environ["PATH"] = f"{stubs}{os.pathsep}{path}"
+
+    def engine(name: str, **kwargs) -> InstallEngine:
+        return InstallEngine(
+            config,
+            max_workers=workers,
+            command_prefix=(),
+            console_log=None,
+            extra_arguments=("--target-root", os.path.join(tmp, f"{name}-{scale:g}"),
+                             "--log-file", os.path.join(tmp, f"{name}-{scale:g}.log")),
+            trace_file=None,
+            history_file=None,
+            resume=False,
+            **kwargs,
+        )
+
+    try:
+        # Même plan et mêmes options: install.sh complet, puis une étape par processus
+        serial_command = [str(INSTALL_SCRIPT), *engine("serial").script_arguments()]
+        start = time.perf_counter()
+        process = subprocess.run(serial_command, stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        serial = time.perf_counter() - start
+        if process.returncode != 0:
+            print(f"❌ install.sh séquentiel en échec (voir {tmp}/serial-{scale:g}.log)", file=sys.stderr)
+            raise SystemExit(1)
+
+        statuses: Dict[str, str] = {}
+        parallel_engine = engine("parallel", on_step=lambda step, status: statuses.__setitem__(step.name, status))
+        start = time.perf_counter()
+        parallel_engine.run()
+        parallel = time.perf_counter() - start
+    finally:
+        os.environ["PATH"] = path
+    return serial, parallel, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du moteur d'installation")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="facteur appliqué aux durées simulées (défaut: 1, durées réelles)")
+    parser.add_argument("--workers", type=int, default=4, help="taille du pool (défaut: 4)")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print("❌ install.sh doit être lancé en root: sudo python3 bench_engine.py", file=sys.stderr)
+        raise SystemExit(1)
+
+    config = {"disk": "bench", "username": "bench", "hostname": "bench", "timezone": "UTC"}
+
+    with tempfile.TemporaryDirectory(prefix="archfusion-bench-") as tmp:
+        serial_launch, parallel_launch, launch_statuses = measure(tmp, 0.0, args.workers, config)
+        serial, parallel, statuses = (measure(tmp, args.scale, args.workers, config) if args.scale
+                                      else (serial_launch, parallel_launch, launch_statuses))
+
+    print(f"Lancement (durées nulles):    {serial_launch:8.2f} s séquentiel, "
+          f"{parallel_launch:.2f} s moteur")
+    print(f"Script séquentiel (main):     {serial:8.2f} s")
+    print(f"Moteur ({args.workers} workers):          {parallel:8.2f} s")
+    print(f"Gain:                         {(1 - parallel / serial) * 100:7.1f} %")
+    failed = [step.name for step in INSTALL_STEPS if statuses.get(step.name) != "done"]
+    if failed:
+        print(f"⚠️  Étapes non terminées: {', '.join(failed)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Benchmark des modes d'installation
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Compare l'installation par paquets (pacstrap), l'installation
+             par image (copie de airootfs.sfs) et l'installation des paquets
+             sans fsync (--no-fsync) sur une vraie cible, pour chaque
+             disposition de la racine choisie (layouts/*.conf)
+
+Chaque mode installe le même plan sur un fichier image vierge attaché à un
+périphérique loop; la durée de chaque étape est relevée par le moteur
+(engine.py), l'espace occupé sur la racine juste avant finalize. À lancer en
+root depuis l'ISO ArchFusion démarrée. Pour mesurer le coût de fsync ou du
+formatage, placer les images sur un vrai disque (--work-dir), pas sur le
+tmpfs du système live.
+
+Usage:
+    sudo python3 bench_install.py                       # 40G dans /tmp
+    sudo python3 bench_install.py --desktop GNOME --size 60G --modes image
+    sudo python3 bench_install.py --modes pacstrap no-fsync --work-dir /run/media/disque
+    sudo python3 bench_install.py --modes image --layouts ext4 ext4-fast btrfs
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from disks import format_size
+from engine import DONE, INSTALL_STEPS, RUNNING, InstallEngine, Step
+from fs_layouts import DEFAULT_LAYOUT, layout_names
+from package_plan import DESKTOPS
+from prefetch import root_image_path
+from provision import release_disk
+
+MODES = {
+    "pacstrap": (),
+    "image": ("--image",),
+    "no-fsync": ("--no-fsync",),
+}
+
+
+def password_hash(password: str) -> str:
+    return subprocess.run(["openssl", "passwd", "-6", password],
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def root_usage(root: str) -> int:
+    """Octets occupés sur le système de fichiers de la racine (compression btrfs comprise)"""
+    stats = os.statvfs(root)
+    return (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+
+
+def run_mode(mode: str, layout: str, config: Dict, image_size: str,
+             work_dir: str) -> Tuple[bool, Dict[str, float], int]:
+    """Installe le plan avec un mode et une disposition sur un disque neuf;
+    succès, durées par étape et espace occupé sur la racine"""
+    name = f"{mode}-{layout}"
+    image = os.path.join(work_dir, f"{name}.img")
+    root = os.path.join(work_dir, f"{name}-root")
+    subprocess.run(["truncate", "-s", image_size, image], check=True)
+    device = subprocess.run(["losetup", "--find", "--show", "--partscan", image],
+                            check=True, capture_output=True, text=True).stdout.strip()
+    disk = os.path.basename(device)
+
+    started: Dict[str, float] = {}
+    durations: Dict[str, float] = {}
+    failed: List[str] = []
+    usage = 0
+
+    def measure_usage(step: Step) -> bool:
+        nonlocal usage
+        # Dernière étape: système complet, cible encore montée
+        if step.name == "finalize":
+            usage = root_usage(root)
+        return True
+
+    def step_status(step: Step, status: str):
+        if status == RUNNING:
+            started[step.name] = time.monotonic()
+        else:
+            durations[step.name] = time.monotonic() - started.get(step.name, time.monotonic())
+            if status != DONE:
+                failed.append(step.name)
+
+    engine = InstallEngine(
+        {**config, "disk": disk, "fs_layout": layout},
+        on_step=step_status,
+        command_prefix=(),
+        console_log=os.path.join(work_dir, f"{name}.log"),
+        extra_arguments=(
+            "--target-root", root,
+            "--log-file", os.path.join(work_dir, f"{name}-install.log"),
+            "--removable-boot",
+        ) + MODES[mode],
+        before_step=measure_usage,
+        trace_file=os.path.join(work_dir, f"{name}-trace.json"),
+        history_file=None,
+        resume=False,
+    )
+    start = time.monotonic()
+    try:
+        ok = engine.run()
+    finally:
+        durations["total"] = time.monotonic() - start
+        release_disk(disk, root)
+        subprocess.run(["losetup", "-d", device], check=False)
+        os.unlink(image)
+
+    if not ok:
+        print(f"❌ {mode} ({layout}): échec ({', '.join(failed) or 'interrompu'}), "
+              f"journal: {os.path.join(work_dir, name + '.log')}")
+    return ok, durations, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pacstrap / image / sans fsync, par disposition")
+    parser.add_argument("--desktop", default="KDE Plasma", choices=list(DESKTOPS.values()),
+                        help="bureau installé (défaut: KDE Plasma)")
+    parser.add_argument("--size", default="40G", help="taille des disques de test (défaut: 40G)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES),
+                        help="modes comparés (défaut: tous)")
+    parser.add_argument("--layouts", nargs="+", default=[DEFAULT_LAYOUT], choices=layout_names(),
+                        help=f"dispositions de la racine comparées (défaut: {DEFAULT_LAYOUT})")
+    parser.add_argument("--offline", action="store_true",
+                        help="paquets depuis le dépôt de l'ISO (sans réseau)")
+    parser.add_argument("--work-dir", default="/tmp",
+                        help="emplacement des disques de test et journaux (défaut: /tmp)")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        parser.error("à lancer en root (losetup, montage, pacstrap)")
+    if "image" in args.modes and not root_image_path():
+        parser.error("image système de l'ISO absente: lancer depuis l'ISO démarrée")
+
+    hashed = password_hash("archfusion")
+    config = {
+        "username": "bench", "hostname": "bench", "timezone": "UTC",
+        "locale": "fr_FR.UTF-8", "keymap": "fr", "swap_size": "1G",
+        "encrypt": False, "offline": args.offline,
+        "desktop_environment": args.desktop, "ssh": False,
+        "firewall": True, "bluetooth": True,
+        "root_password_hash": hashed, "user_password_hash": hashed,
+    }
+
+    # Colonne par mode, ou par mode et disposition si plusieurs sont comparées
+    results: Dict[str, Dict[str, float]] = {}
+    usages: Dict[str, int] = {}
+    success = True
+    with tempfile.TemporaryDirectory(prefix="archfusion-bench-", dir=args.work_dir) as work_dir:
+        for mode in args.modes:
+            for layout in args.layouts:
+                case = mode if len(args.layouts) == 1 else f"{mode}/{layout}"
+                print(f"▶ {mode} ({layout})...", flush=True)
+                ok, results[case], usages[case] = run_mode(mode, layout, config, args.size, work_dir)
+                success = success and ok
+
+    width = max(12, *(len(case) + 2 for case in results))
+    names = [step.name for step in INSTALL_STEPS if any(step.name in r for r in results.values())]
+    print(f"\n{'Étape':<16}" + "".join(f"{case:>{width}}" for case in results))
+    for name in names + ["total"]:
+        cells = "".join(
+            f"{results[case][name]:{width - 1}.1f}s" if name in results[case] else f"{'-':>{width}}"
+            for case in results
+        )
+        print(f"{name:<16}{cells}")
+    print(f"{'occupé (racine)':<16}" + "".join(
+        f"{format_size(usages[case]) if usages[case] else '-':>{width}}" for case in results))
+    # Gain de chaque cas par rapport au premier (pacstrap et première disposition par défaut)
+    reference, *others = results
+    if others:
+        print()
+    for case in others:
+        gain = 1 - results[case]["total"] / results[reference]["total"]
+        line = f"Gain de {case} par rapport à {reference}: {gain * 100:.1f} % de durée"
+        if usages[case] and usages[reference]:
+            line += f", {(1 - usages[case] / usages[reference]) * 100:.1f} % d'espace"
+        print(line)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Benchmark de démarrage de l'installateur graphique
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Mesure le temps d'import, de construction de la fenêtre et
+             jusqu'à la première image, avec la plateforme Qt offscreen
+
+Usage:
+    python3 bench_startup.py                      # 5 mesures, tableau
+    python3 bench_startup.py --runs 10 --json     # sortie JSON
+    python3 bench_startup.py --save base.json     # enregistrer une référence
+    python3 bench_startup.py --baseline base.json # échoue si régression
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+INSTALLER_PATH = Path(__file__).parent / "gui-installer.py"
+METRICS = ("import_s", "construct_s", "first_frame_s")
+
+# Délai maximal d'attente de la première image (secondes)
+FIRST_FRAME_TIMEOUT = 10.0
+
+
+def measure_once() -> Dict[str, float]:
+    """Mesure un démarrage à froid (exécuté dans un processus dédié)"""
+    start = time.perf_counter()
+
+    sys.path.insert(0, str(INSTALLER_PATH.parent))
+    spec = importlib.util.spec_from_file_location("gui_installer", INSTALLER_PATH)
+    installer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(installer)
+    imported = time.perf_counter()
+
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+
+    class FirstPaint(QObject):
+        def __init__(self):
+            super().__init__()
+            self.at = None
+
+        def eventFilter(self, obj, event):
+            if self.at is None and event.type() == QEvent.Paint:
+                self.at = time.perf_counter()
+            return False
+
+    app = QApplication([sys.argv[0]])
+    probe = FirstPaint()
+    app.installEventFilter(probe)
+
+    constructing = time.perf_counter()
+    window = installer.ArchFusionInstaller()
+    constructed = time.perf_counter()
+
+    window.show()
+    deadline = constructed + FIRST_FRAME_TIMEOUT
+    while probe.at is None and time.perf_counter() < deadline:
+        app.processEvents()
+
+    window.close()
+    app.processEvents()
+
+    return {
+        "import_s": imported - start,
+        "construct_s": constructed - constructing,
+        "first_frame_s": (probe.at or deadline) - start,
+    }
+
+
+def run_child() -> Dict[str, float]:
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run(
+        [sys.executable, __file__, "--child"],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        metric: {
+            "median": statistics.median(sample[metric] for sample in samples),
+            "min": min(sample[metric] for sample in samples),
+            "max": max(sample[metric] for sample in samples),
+        }
+        for metric in METRICS
+    }
+
+
+def compare(summary: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Retourne les métriques dont la médiane dépasse la référence"""
+    regressions = []
+    for metric in METRICS:
+        reference = baseline.get(metric, {}).get("median")
+        current = summary[metric]["median"]
+        if reference and current > reference * (1 + tolerance):
+            regressions.append(
+                f"{metric}: {current * 1000:.1f} ms > {reference * 1000:.1f} ms "
+                f"(+{(current / reference - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de démarrage de l'installateur")
+    parser.add_argument("--runs", type=int, default=5, help="nombre de démarrages mesurés")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    parser.add_argument("--save", metavar="FICHIER", help="enregistrer le résumé comme référence")
+    parser.add_argument("--baseline", metavar="FICHIER", help="comparer à une référence")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="régression tolérée par rapport à la référence (défaut: 0.2)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    # Une mesure par processus pour que l'import soit toujours à froid
+    samples = [run_child() for _ in range(args.runs)]
+    summary = summarize(samples)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{'Métrique':<16}{'médiane':>12}{'min':>12}{'max':>12}")
+        for metric in METRICS:
+            values = summary[metric]
+            print(f"{metric:<16}"
+                  f"{values['median'] * 1000:>10.1f}ms"
+                  f"{values['min'] * 1000:>10.1f}ms"
+                  f"{values['max'] * 1000:>10.1f}ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Régression du temps de démarrage:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print("✓ Pas de régression du temps de démarrage")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Points de reprise de l'installation
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Enregistre sur la cible chaque étape terminée avec l'empreinte
+             de ses entrées, pour reprendre une installation échouée ou
+             annulée à la première étape incomplète
+
+L'empreinte d'une étape couvre les options du plan qui la concernent et
+celles des étapes dont elle dépend: changer le nom d'hôte ne refait que
+l'étape hostname et celles qui en dépendent, changer de disque ou de taille
+de swap refait tout.
+
+engine.py enregistre le point de reprise après la réussite de l'étape
+(record_checkpoint), ou install.sh --step s'il n'est pas root (install.sh
+--checkpoint FICHIER, écrit par engine.py). Les points de reprise vont dans
+TARGET_ROOT/var/lib/archfusion/install-checkpoints une fois la cible montée,
+dans /run/archfusion/install-checkpoints/DISQUE avant; ils portent
+l'identifiant de la table de partitions (PTUUID) du disque, et ceux d'une
+autre table sont ignorés. finalize les efface avant de démonter la cible:
+une installation terminée ne se reprend pas.
+
+Les étapes dont l'effet est sur le système live (prérequis, miroirs,
+montages) n'ont pas de point de reprise: elles sont refaites dès qu'une
+étape qui en dépend doit l'être.
+
+Usage (root, depuis install.sh):
+    python3 checkpoints.py record --disk sda --target-root /mnt /tmp/.../base.json
+    python3 checkpoints.py list --disk sda --target-root /mnt
+    python3 checkpoints.py clear --disk sda --target-root /mnt
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+CHECKPOINT_VERSION = 1
+TARGET_CHECKPOINT_DIR = "var/lib/archfusion/install-checkpoints"
+PENDING_CHECKPOINT_DIR = "/run/archfusion/install-checkpoints"
+
+# Étapes sans effet durable sur la cible (refaites si une étape dépendante l'est)
+LIVE_STEPS = ("prerequisites", "rank_mirrors", "mount")
+
+# Clés de configuration (self.config de gui-installer.py) lues par chaque étape
+STEP_INPUTS: Dict[str, tuple] = {
+    "partition": ("disk", "swap_size"),
+    "format_root": ("encrypt", "fs_layout"),
+    "base": ("desktop_environment", "offline", "image", "ssh", "firewall", "bluetooth", "snapshots"),
+    "timezone": ("timezone",),
+    "locale": ("locale", "keymap"),
+    "hostname": ("hostname",),
+    "user": ("username",),
+    "services": ("desktop_environment", "ssh", "firewall", "bluetooth", "snapshots"),
+    "bootloader": ("disk", "encrypt"),
+    "boot_images": ("encrypt",),
+    "finalize": ("username",),
+}
+
+# Options de install.sh sans effet sur le système installé
+IGNORED_ARGUMENTS = ("--log-file", "--trace-file", "--progress-file", "--package-cache")
+
+
+# ==========================================
+# EMPREINTES (engine.py)
+# ==========================================
+
+def relevant_arguments(arguments: Iterable[str]) -> List[str]:
+    """Options supplémentaires de install.sh, sans les chemins propres à une exécution"""
+    kept, skip = [], False
+    for argument in arguments:
+        if skip:
+            skip = False
+        elif argument in IGNORED_ARGUMENTS:
+            skip = True
+        else:
+            kept.append(argument)
+    return kept
+
+
+def step_inputs(name: str, config: Dict, arguments: Iterable[str] = ()) -> Dict:
+    """Entrées d'une étape, enregistrées avec son point de reprise (sans mot de passe)"""
+    inputs = {key: config.get(key) for key in STEP_INPUTS.get(name, ())}
+    if name == "partition":
+        # Table GPT+ESP ou MBR selon le mode de démarrage de la machine
+        inputs["firmware"] = "uefi" if os.path.isdir("/sys/firmware/efi") else "bios"
+    inputs["arguments"] = relevant_arguments(arguments)
+    return inputs
+
+
+def step_digests(steps, config: Dict, arguments: Iterable[str] = ()) -> Dict[str, str]:
+    """Empreinte de chaque étape (ordre topologique): ses entrées et celles de ses dépendances"""
+    arguments = list(arguments)
+    digests: Dict[str, str] = {}
+    for step in steps:
+        payload = {
+            "version": CHECKPOINT_VERSION,
+            "step": step.name,
+            "inputs": step_inputs(step.name, config, arguments),
+            "deps": {dep: digests[dep] for dep in step.deps},
+        }
+        digests[step.name] = hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return digests
+
+
+def completed_steps(steps, digests: Dict[str, str], records: Dict[str, Dict]) -> Set[str]:
+    """Étapes à ne pas refaire (ordre topologique): point de reprise valide, dépendances faites"""
+    done: Set[str] = set()
+    for step in steps:
+        record = records.get(step.name)
+        if (step.name not in LIVE_STEPS and record and record.get("digest") == digests[step.name]
+                and all(dep in done or dep in LIVE_STEPS for dep in step.deps)):
+            done.add(step.name)
+    # Étapes live: inutiles si tout ce qui en dépend est déjà fait
+    for step in reversed(steps):
+        dependents = [other.name for other in steps if step.name in other.deps]
+        if step.name in LIVE_STEPS and dependents and all(name in done for name in dependents):
+            done.add(step.name)
+    return done
+
+
+def parse_records(output: str) -> Dict[str, Dict]:
+    """Points de reprise affichés par "list" (une ligne JSON par étape)"""
+    records = {}
+    for line in output.splitlines():
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "step" in record:
+            records[record["step"]] = record
+    return records
+
+
+# ==========================================
+# STOCKAGE (install.sh, root)
+# ==========================================
+
+def disk_ptuuid(disk: str) -> str:
+    """Identifiant de la table de partitions actuelle du disque"""
+    process = subprocess.run(["lsblk", "-d", "-n", "-o", "PTUUID", f"/dev/{disk}"],
+                             capture_output=True, text=True)
+    return process.stdout.strip()
+
+
+def checkpoint_dirs(disk: str, target_root: str) -> List[str]:
+    """Dossiers lus, par priorité croissante: en attente (live), puis cible montée"""
+    dirs = [os.path.join(PENDING_CHECKPOINT_DIR, disk)]
+    if os.path.ismount(target_root):
+        dirs.append(os.path.join(target_root, TARGET_CHECKPOINT_DIR))
+    return dirs
+
+
+def read_records(directory: str) -> Dict[str, Dict]:
+    records = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(record, dict) and "step" in record:
+            records[record["step"]] = record
+    return records
+
+
+def write_record(directory: str, record: Dict):
+    """Écriture atomique et durable (fichier puis dossier synchronisés)"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(directory, f"{record['step']}.json"))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def record_checkpoint(disk: str, target_root: str, spec: Dict) -> str:
+    """Enregistre l'étape terminée; la cible montée reprend aussi les points en attente"""
+    record = {**spec, "ptuuid": disk_ptuuid(disk), "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    pending_dir, *target_dirs = checkpoint_dirs(disk, target_root)
+    if not target_dirs:
+        write_record(pending_dir, record)
+        return pending_dir
+    for pending in read_records(pending_dir).values():
+        write_record(target_dirs[0], pending)
+    write_record(target_dirs[0], record)
+    clear_dir(pending_dir)
+    return target_dirs[0]
+
+
+def list_checkpoints(disk: str, target_root: str) -> Dict[str, Dict]:
+    """Points de reprise de la table de partitions actuelle du disque"""
+    ptuuid = disk_ptuuid(disk)
+    records: Dict[str, Dict] = {}
+    for directory in checkpoint_dirs(disk, target_root):
+        records.update(read_records(directory))
+    return {name: record for name, record in records.items() if ptuuid and record.get("ptuuid") == ptuuid}
+
+
+def clear_dir(directory: str):
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.unlink(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Points de reprise de l'installation")
+    parser.add_argument("command", choices=("record", "list", "clear"))
+    parser.add_argument("spec", nargs="?", help="étape terminée (JSON écrit par engine.py), pour record")
+    parser.add_argument("--disk", required=True, help="disque cible (ex: sda)")
+    parser.add_argument("--target-root", default="/mnt", help="racine du système cible (défaut: /mnt)")
+    args = parser.parse_intermixed_args(argv)
+
+    try:
+        if args.command == "record":
+            if not args.spec:
+                parser.error("record nécessite le fichier de l'étape")
+            with open(args.spec, encoding="utf-8") as f:
+                spec = json.load(f)
+            record_checkpoint(args.disk, args.target_root, spec)
+        elif args.command == "list":
+            for record in list_checkpoints(args.disk, args.target_root).values():
+                print(json.dumps(record, ensure_ascii=False))
+        else:
+            for directory in checkpoint_dirs(args.disk, args.target_root):
+                clear_dir(directory)
+    except (OSError, ValueError) as e:
+        print(f"❌ Points de reprise: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Détection des disques
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Énumération des disques via /sys/block, cache et suivi des
+             branchements à chaud par les événements uevent du noyau
+"""
+
+import os
+import select
+import socket
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+# Périphériques blocs qui ne sont pas des cibles d'installation
+SKIPPED_PREFIXES = ("loop", "ram", "zram", "sr", "fd", "dm-", "md", "nbd")
+
+# Taille d'un secteur dans les fichiers "size" de sysfs (toujours 512 octets)
+SYSFS_SECTOR_SIZE = 512
+
+# Protocole netlink des uevents du noyau (linux/netlink.h)
+NETLINK_KOBJECT_UEVENT = 15
+
+
+@dataclass
+class PartitionInfo:
+    """Partition existante d'un disque"""
+
+    name: str
+    number: int
+    size_bytes: int
+
+
+@dataclass
+class DiskInfo:
+    """Disque candidat à l'installation"""
+
+    name: str
+    size_bytes: int
+    model: str = "Inconnu"
+    rotational: bool = False
+    removable: bool = False
+    transport: str = "inconnu"
+    partitions: List[PartitionInfo] = field(default_factory=list)
+
+    @property
+    def size(self) -> str:
+        return format_size(self.size_bytes)
+
+    @property
+    def kind(self) -> str:
+        return "HDD" if self.rotational else "SSD"
+
+
+def format_size(size_bytes: int) -> str:
+    """Formate une taille comme lsblk (puissances de 1024, ex: 238.5G)"""
+    value = float(size_bytes)
+    for unit in ("B", "K", "M", "G", "T"):
+        if value < 1024 or unit == "T":
+            break
+        value /= 1024
+    return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+
+
+def _read(path: str, default: str = "") -> str:
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def _read_int(path: str, default: int = 0) -> int:
+    try:
+        return int(_read(path))
+    except ValueError:
+        return default
+
+
+def detect_transport(device_path: str) -> str:
+    """Déduit le bus d'un disque depuis son chemin réel dans /sys/devices"""
+    parts = device_path.split("/")
+    for marker, transport in (
+        ("nvme", "nvme"),
+        ("virtio", "virtio"),
+        ("usb", "usb"),
+        ("mmc_host", "mmc"),
+        ("VMBUS", "vmbus"),
+        ("vmbus", "vmbus"),
+        ("ata", "sata"),
+    ):
+        if any(part.startswith(marker) for part in parts):
+            return transport
+    if any(part.startswith("host") for part in parts):
+        return "scsi"
+    return "inconnu"
+
+
+def is_candidate(name: str) -> bool:
+    return not name.startswith(SKIPPED_PREFIXES)
+
+
+def read_disk(name: str, sysfs_root: str = "/sys") -> Optional[DiskInfo]:
+    """Lit les informations d'un disque depuis sysfs, None s'il n'existe pas"""
+    block_path = os.path.join(sysfs_root, "block", name)
+    if not is_candidate(name) or not os.path.isdir(block_path):
+        return None
+
+    size_bytes = _read_int(os.path.join(block_path, "size")) * SYSFS_SECTOR_SIZE
+    if size_bytes == 0:
+        # Lecteur de cartes vide, périphérique en cours de retrait...
+        return None
+
+    partitions = []
+    try:
+        entries = sorted(os.listdir(block_path))
+    except OSError:
+        return None
+    for entry in entries:
+        part_path = os.path.join(block_path, entry)
+        if os.path.isfile(os.path.join(part_path, "partition")):
+            partitions.append(PartitionInfo(
+                name=entry,
+                number=_read_int(os.path.join(part_path, "partition")),
+                size_bytes=_read_int(os.path.join(part_path, "size")) * SYSFS_SECTOR_SIZE,
+            ))
+    partitions.sort(key=lambda part: part.number)
+
+    return DiskInfo(
+        name=name,
+        size_bytes=size_bytes,
+        model=_read(os.path.join(block_path, "device", "model")) or "Inconnu",
+        rotational=_read(os.path.join(block_path, "queue", "rotational")) == "1",
+        removable=_read(os.path.join(block_path, "removable")) == "1",
+        transport=detect_transport(os.path.realpath(block_path)),
+        partitions=partitions,
+    )
+
+
+def scan_disks(sysfs_root: str = "/sys") -> List[DiskInfo]:
+    """Énumère tous les disques candidats"""
+    try:
+        names = sorted(os.listdir(os.path.join(sysfs_root, "block")))
+    except OSError:
+        return []
+
+    disks = []
+    for name in names:
+        disk = read_disk(name, sysfs_root)
+        if disk is not None:
+            disks.append(disk)
+    return disks
+
+
+class DiskCache:
+    """Cache des disques détectés, mis à jour disque par disque"""
+
+    def __init__(self, sysfs_root: str = "/sys"):
+        self.sysfs_root = sysfs_root
+        self._disks: Dict[str, DiskInfo] = {}
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    @property
+    def scanned(self) -> bool:
+        return self._scanned
+
+    def disks(self) -> List[DiskInfo]:
+        with self._lock:
+            return [self._disks[name] for name in sorted(self._disks)]
+
+    def get(self, name: str) -> Optional[DiskInfo]:
+        with self._lock:
+            return self._disks.get(name)
+
+    def scan(self) -> List[DiskInfo]:
+        """Énumération complète (démarrage ou actualisation manuelle)"""
+        disks = scan_disks(self.sysfs_root)
+        with self._lock:
+            self._disks = {disk.name: disk for disk in disks}
+            self._scanned = True
+        return disks
+
+    def refresh(self, name: str) -> Optional[DiskInfo]:
+        """Relit un seul disque; le retire du cache s'il a disparu"""
+        disk = read_disk(name, self.sysfs_root)
+        with self._lock:
+            if disk is None:
+                self._disks.pop(name, None)
+            else:
+                self._disks[name] = disk
+        return disk
+
+
+def parse_uevent(data: bytes) -> Optional[Dict[str, str]]:
+    """Décode un message uevent du noyau ("add@/devices/...\\0CLÉ=valeur\\0...")"""
+    fields = data.split(b"\0")
+    if not fields or b"@" not in fields[0]:
+        return None
+
+    event: Dict[str, str] = {}
+    for item in fields[1:]:
+        key, sep, value = item.partition(b"=")
+        if sep:
+            event[key.decode(errors="replace")] = value.decode(errors="replace")
+    return event if "ACTION" in event else None
+
+
+def block_disk_event(event: Dict[str, str]) -> Optional[str]:
+    """Retourne le nom du disque concerné par un uevent bloc, sinon None"""
+    if event.get("SUBSYSTEM") != "block":
+        return None
+
+    devpath = event.get("DEVPATH", "")
+    parts = [part for part in devpath.split("/") if part]
+    if event.get("DEVTYPE") == "disk":
+        name = event.get("DEVNAME") or (parts[-1] if parts else "")
+    elif event.get("DEVTYPE") == "partition" and len(parts) >= 2:
+        # Une partition ajoutée ou supprimée modifie son disque parent
+        name = parts[-2]
+    else:
+        return None
+
+    name = os.path.basename(name)
+    return name if name and is_candidate(name) else None
+
+
+class UeventMonitor:
+    """Écoute les uevents du noyau sans scrutation (socket netlink bloquante)"""
+
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                   NETLINK_KOBJECT_UEVENT)
+        self._sock.bind((0, 1))
+        self._wake_r, self._wake_w = os.pipe()
+        # close() et release() viennent de threads différents
+        self._lock = threading.Lock()
+        self._released = False
+
+    def events(self) -> Iterator[Dict[str, str]]:
+        """Produit les événements jusqu'à l'appel de close()"""
+        while True:
+            readable, _, _ = select.select([self._sock, self._wake_r], [], [])
+            if self._wake_r in readable:
+                return
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                return
+            event = parse_uevent(data)
+            if event is not None:
+                yield event
+
+    def close(self):
+        """Interrompt events(), même appelé avant lui (l'octet reste dans le tube)"""
+        with self._lock:
+            if self._released:
+                return
+            try:
+                os.write(self._wake_w, b"x")
+            except OSError:
+                pass
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            self._sock.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
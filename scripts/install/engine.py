@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Moteur d'installation
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Modélise l'installation comme un graphe d'étapes (install.sh
+             --step) et exécute en parallèle les étapes indépendantes
+"""
+
+import json
+import os
+import selectors
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from checkpoints import completed_steps, parse_records, record_checkpoint, step_digests, step_inputs
+from fs_layouts import default_layout
+from install_config import load_install_config
+from install_trace import (INSTALL_HISTORY_FILE, INSTALL_TRACE_FILE, EtaEstimator, append_history,
+                           build_summary, finalize_trace, load_estimates)
+from log_store import LogWriter
+from package_plan import desktop_id, resolve_plan
+from progress import LineSplitter, ProgressTracker, parse_event
+
+INSTALL_SCRIPT = Path(__file__).parent / "install.sh"
+
+# Journal complet de la console d'installation (l'interface n'en garde qu'une fenêtre)
+INSTALL_CONSOLE_LOG = "/tmp/archfusion-gui-install.log"
+
+# Intervalle de regroupement des lignes de log envoyées à l'interface (secondes)
+LOG_BATCH_INTERVAL = 0.1
+
+# Intervalle de mise à jour du temps restant et du débit (secondes)
+ETA_INTERVAL = 1.0
+
+# Nombre d'étapes exécutées simultanément
+DEFAULT_MAX_WORKERS = 4
+
+# Délai de lecture des points de reprise (montage de la cible compris, secondes)
+CHECKPOINT_LIST_TIMEOUT = 60
+
+# Racine du système cible de install.sh (--target-root)
+DEFAULT_TARGET_ROOT = "/mnt"
+
+# États d'une étape
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass(frozen=True)
+class Step:
+    """Étape du graphe d'installation"""
+
+    name: str
+    label: str
+    deps: Tuple[str, ...] = ()
+    weight: int = 1
+
+
+# Graphe des étapes: chaque nom correspond à une entrée STEP_FUNCTIONS de install.sh
+INSTALL_STEPS: List[Step] = [
+    Step("prerequisites", "Vérification des prérequis", (), 1),
+    Step("rank_mirrors", "Classement des miroirs", ("prerequisites",), 2),
+    Step("partition", "Partitionnement du disque", ("prerequisites",), 2),
+    Step("format_efi", "Formatage de la partition EFI", ("partition",), 1),
+    Step("format_boot", "Formatage de la partition Boot", ("partition",), 1),
+    Step("format_swap", "Formatage du swap", ("partition",), 1),
+    Step("format_root", "Formatage de la partition Root", ("partition",), 2),
+    Step("mount", "Montage des partitions",
+         ("format_efi", "format_boot", "format_swap", "format_root"), 1),
+    # Plan de paquets complet (bureau compris) en une seule transaction
+    Step("base", "Installation des paquets", ("mount", "rank_mirrors"), 70),
+    Step("fstab", "Génération du fstab", ("base",), 1),
+    Step("timezone", "Configuration du fuseau horaire", ("base",), 1),
+    Step("locale", "Génération des locales", ("base",), 2),
+    Step("hostname", "Configuration du nom d'hôte", ("base",), 1),
+    Step("user", "Création de l'utilisateur", ("base",), 1),
+    Step("services", "Activation des services", ("base",), 1),
+    Step("bootloader", "Installation du chargeur de démarrage", ("base",), 3),
+    Step("configs", "Application des configurations ArchFusion", ("base",), 2),
+    # Initramfs (clavier de vconsole.conf) et grub.cfg générés une seule fois
+    Step("boot_images", "Génération de l'initramfs et de GRUB",
+         ("configs", "locale", "bootloader"), 3),
+    Step("finalize", "Finalisation",
+         ("boot_images", "fstab", "timezone", "hostname", "user", "services"), 4),
+]
+
+
+class StepScheduler:
+    """Exécute un graphe d'étapes sur un pool de threads en respectant les dépendances"""
+
+    def __init__(self, steps: List[Step], action: Callable[[Step], bool],
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 on_status: Optional[Callable[[Step, str], None]] = None,
+                 completed: Iterable[str] = ()):
+        self.steps = {step.name: step for step in steps}
+        self.order = topological_order(steps)
+        self.action = action
+        self.max_workers = max(1, max_workers)
+        self.on_status = on_status
+        self.status: Dict[str, str] = {name: PENDING for name in self.order}
+        # Étapes déjà faites lors d'une installation précédente (points de reprise)
+        self.completed = set(completed)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """N'entame plus de nouvelles étapes"""
+        self._cancelled.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _set_status(self, step: Step, status: str):
+        self.status[step.name] = status
+        if self.on_status:
+            self.on_status(step, status)
+
+    def _ready(self) -> List[Step]:
+        return [
+            self.steps[name] for name in self.order
+            if self.status[name] == PENDING
+            and all(self.status[dep] == DONE for dep in self.steps[name].deps)
+        ]
+
+    def _run_step(self, step: Step) -> bool:
+        try:
+            return bool(self.action(step))
+        except Exception:
+            return False
+
+    def run(self) -> bool:
+        """Retourne True si toutes les étapes ont réussi"""
+        running: Dict[Future, Step] = {}
+        failed = False
+        for name in self.order:
+            if name in self.completed:
+                self._set_status(self.steps[name], DONE)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if not failed and not self._cancelled.is_set():
+                    for step in self._ready():
+                        if len(running) >= self.max_workers:
+                            break
+                        self._set_status(step, RUNNING)
+                        running[pool.submit(self._run_step, step)] = step
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    if future.result():
+                        self._set_status(step, DONE)
+                    else:
+                        self._set_status(step, FAILED)
+                        failed = True
+
+        for name in self.order:
+            if self.status[name] == PENDING:
+                self._set_status(self.steps[name], SKIPPED)
+
+        return not failed and not self._cancelled.is_set()
+
+
+def topological_order(steps: List[Step]) -> List[str]:
+    """Ordre compatible avec les dépendances; lève ValueError si le graphe est invalide"""
+    names = {step.name for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.deps if dep not in names]
+        if unknown:
+            raise ValueError(f"Dépendance inconnue pour {step.name}: {', '.join(unknown)}")
+
+    order: List[str] = []
+    remaining = {step.name: set(step.deps) for step in steps}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if deps.issubset(order)]
+        if not ready:
+            raise ValueError(f"Cycle de dépendances: {', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+    return order
+
+
+def remove_steps(steps: List[Step], names: Tuple[str, ...]) -> List[Step]:
+    """Graphe sans les étapes indiquées (exécutées ailleurs), dépendances comprises"""
+    return [
+        Step(step.name, step.label, tuple(dep for dep in step.deps if dep not in names), step.weight)
+        for step in steps if step.name not in names
+    ]
+
+
+def critical_path(steps: List[Step], durations: Dict[str, float]) -> float:
+    """Durée minimale théorique du graphe avec un nombre illimité de workers"""
+    by_name = {step.name: step for step in steps}
+    finish: Dict[str, float] = {}
+    for name in topological_order(steps):
+        start = max((finish[dep] for dep in by_name[name].deps), default=0.0)
+        finish[name] = start + durations.get(name, 0.0)
+    return max(finish.values(), default=0.0)
+
+
+class InstallEngine:
+    """Pilote install.sh étape par étape et agrège logs et progression"""
+
+    def __init__(self, config: Dict,
+                 on_log: Optional[Callable[[List[str]], None]] = None,
+                 on_progress: Optional[Callable[[int, str], None]] = None,
+                 on_step: Optional[Callable[[Step, str], None]] = None,
+                 steps: Optional[List[Step]] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 script: Path = INSTALL_SCRIPT,
+                 command_prefix: Tuple[str, ...] = ("sudo",),
+                 console_log: Optional[str] = INSTALL_CONSOLE_LOG,
+                 extra_arguments: Tuple[str, ...] = (),
+                 before_step: Optional[Callable[[Step], bool]] = None,
+                 on_eta: Optional[Callable[[float], None]] = None,
+                 trace_file: Optional[str] = INSTALL_TRACE_FILE,
+                 history_file: Optional[str] = INSTALL_HISTORY_FILE,
+                 log_store: Optional[LogWriter] = None,
+                 resume: bool = True):
+        self.config = config
+        self.on_log = on_log
+        self.on_progress = on_progress
+        self.on_step = on_step
+        self.steps = steps or INSTALL_STEPS
+        self.max_workers = max_workers
+        self.script = script
+        self.command_prefix = command_prefix
+        self.console_log = console_log
+        self.extra_arguments = extra_arguments
+        # Appelé avant le lancement de chaque étape; False annule l'étape
+        self.before_step = before_step
+        # Temps restant estimé (secondes), mis à jour chaque ETA_INTERVAL
+        self.on_eta = on_eta
+        # Trace des étapes (install.sh --trace-file) et historique des installations
+        self.trace_file = trace_file
+        self.history_file = history_file
+        # Journal persistant (segments compressés et index, voir log_store.py)
+        self.log_store = log_store
+        # Reprise aux points enregistrés sur la cible par une installation interrompue
+        self.resume = resume
+        # Résolus une fois pour toutes les étapes: install.sh --step ne relance
+        # ni fs_layouts.py ni package_plan.py
+        self.install_config = load_install_config()
+        self.fs_layout = config.get("fs_layout") or default_layout(self.install_config)
+
+        self.tracker = ProgressTracker([(s.name, s.label, s.weight) for s in self.steps])
+        self.estimator = EtaEstimator(self.steps, load_estimates(history_file), critical_path)
+        self.percent = 0.0
+        self._started = 0.0
+        self.scheduler: Optional[StepScheduler] = None
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.password_file: Optional[str] = None
+        self.checkpoint_dir: Optional[str] = None
+        self.checkpoint_specs: Dict[str, Dict] = {}
+        self.package_plan_dir: Optional[str] = None
+        self.resumed: Set[str] = set()
+        self._pending_lines: List[str] = []
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._done = threading.Event()
+
+    def script_arguments(self) -> List[str]:
+        """Options de install.sh communes à toutes les étapes"""
+        args = [
+            "--auto",
+            "--disk", self.config["disk"],
+            "--username", self.config["username"],
+            "--hostname", self.config["hostname"],
+            "--timezone", self.config["timezone"],
+        ]
+        if self.config.get("locale"):
+            args.extend(["--locale", self.config["locale"]])
+        if self.config.get("keymap"):
+            args.extend(["--keymap", self.config["keymap"]])
+        if self.config.get("encrypt", False):
+            args.append("--encrypt")
+        if self.config.get("swap_size"):
+            args.extend(["--swap-size", self.config["swap_size"]])
+        if self.config.get("offline", False):
+            args.append("--offline")
+        if self.config.get("image", False):
+            args.append("--image")
+        if self.config.get("no_fsync", False):
+            args.append("--no-fsync")
+        # Choix explicites: install.sh ne relit pas install.conf à chaque étape
+        args.extend(["--fs-layout", self.fs_layout])
+        args.append("--snapshots" if self.config.get("snapshots", False) else "--no-snapshots")
+        args.extend(["--desktop", desktop_id(self.config.get("desktop_environment", "kde"))])
+        if self.config.get("ssh", False):
+            args.append("--ssh")
+        if not self.config.get("firewall", True):
+            args.append("--no-firewall")
+        if not self.config.get("bluetooth", True):
+            args.append("--no-bluetooth")
+        if self.config.get("package_cache"):
+            args.extend(["--package-cache", self.config["package_cache"]])
+        if self.password_file:
+            args.extend(["--password-file", self.password_file])
+        if self.package_plan_dir:
+            args.extend(["--package-plan", self.package_plan_dir])
+        if self.trace_file:
+            args.extend(["--trace-file", self.trace_file])
+        args.extend(self.extra_arguments)
+        return args
+
+    def write_password_file(self, directory: str) -> Optional[str]:
+        """Empreintes des mots de passe du plan au format de chpasswd -e"""
+        lines = []
+        if self.config.get("root_password_hash"):
+            lines.append(f"root:{self.config['root_password_hash']}")
+        if self.config.get("user_password_hash"):
+            lines.append(f"{self.config['username']}:{self.config['user_password_hash']}")
+        if not lines:
+            return None
+
+        path = os.path.join(directory, "passwords")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def write_package_plan(self, directory: str) -> str:
+        """Paquets et services du plan (install.sh --package-plan), un par ligne"""
+        plan = resolve_plan(self.install_config, self.config.get("desktop_environment", "kde"),
+                            bluetooth=self.config.get("bluetooth", True),
+                            firewall=self.config.get("firewall", True),
+                            ssh=self.config.get("ssh", False))
+        path = os.path.join(directory, "package-plan")
+        os.mkdir(path)
+        for name, lines in (("packages", plan.packages), ("services", plan.services)):
+            with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+                f.write("".join(f"{line}\n" for line in lines))
+        return path
+
+    @property
+    def records_checkpoints(self) -> bool:
+        """Points de reprise enregistrés par le moteur (root), sinon par install.sh --checkpoint"""
+        return os.geteuid() == 0
+
+    def target_root(self) -> str:
+        args = list(self.extra_arguments)
+        if "--target-root" in args[:-1]:
+            return args[args.index("--target-root") + 1]
+        return DEFAULT_TARGET_ROOT
+
+    def step_command(self, step: Step, progress_path: str) -> List[str]:
+        command = [*self.command_prefix, str(self.script), *self.script_arguments(),
+                   "--step", step.name, "--progress-file", progress_path]
+        if self.checkpoint_dir and not self.records_checkpoints:
+            command.extend(["--checkpoint", os.path.join(self.checkpoint_dir, f"{step.name}.json")])
+        return command
+
+    def _ordered_steps(self) -> List[Step]:
+        by_name = {step.name: step for step in self.steps}
+        return [by_name[name] for name in topological_order(self.steps)]
+
+    def write_checkpoint_specs(self, directory: str) -> Dict[str, str]:
+        """Empreinte et entrées de chaque étape, enregistrées après sa réussite
+
+        Par le moteur s'il est root, sinon par install.sh --checkpoint (fichiers écrits ici).
+        """
+        digests = step_digests(self._ordered_steps(), self.config, self.extra_arguments)
+        self.checkpoint_dir = os.path.join(directory, "checkpoints")
+        os.mkdir(self.checkpoint_dir)
+        for step in self._ordered_steps():
+            spec = {"step": step.name, "digest": digests[step.name],
+                    "inputs": step_inputs(step.name, self.config, self.extra_arguments)}
+            self.checkpoint_specs[step.name] = spec
+            with open(os.path.join(self.checkpoint_dir, f"{step.name}.json"), "w") as f:
+                json.dump(spec, f, ensure_ascii=False)
+        return digests
+
+    def resumable_steps(self, digests: Dict[str, str]) -> Set[str]:
+        """Étapes dont la cible garde un point de reprise correspondant au plan"""
+        command = [*self.command_prefix, str(self.script), *self.script_arguments(),
+                   "--list-checkpoints"]
+        try:
+            process = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True,
+                                     text=True, timeout=CHECKPOINT_LIST_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            return set()
+        if process.returncode != 0:
+            return set()
+        return completed_steps(self._ordered_steps(), digests, parse_records(process.stdout))
+
+    def _log(self, line: str):
+        with self._lock:
+            self._pending_lines.append(line)
+
+    def _flush_logs(self):
+        with self._lock:
+            lines, self._pending_lines = self._pending_lines, []
+        if lines and self.on_log:
+            self.on_log(lines)
+
+    def _run_step(self, step: Step, progress_path: str, console) -> bool:
+        if self.before_step and not self.before_step(step):
+            return False
+        process = subprocess.Popen(
+            self.step_command(step, progress_path),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+        self.processes[step.name] = process
+
+        splitter = LineSplitter()
+        for chunk in iter(lambda: process.stdout.read1(65536), b""):
+            for line in splitter.feed(chunk):
+                self._record(step, line, console)
+        for line in splitter.flush():
+            self._record(step, line, console)
+
+        process.wait()
+        if process.returncode != 0:
+            return False
+        self._record_checkpoint(step)
+        return True
+
+    def _record_checkpoint(self, step: Step):
+        """Point de reprise de l'étape réussie, écrit sans lancer checkpoints.py
+
+        finalize vient d'effacer les points de reprise et de démonter la cible.
+        """
+        spec = self.checkpoint_specs.get(step.name)
+        if not spec or step.name == "finalize" or not self.records_checkpoints:
+            return
+        try:
+            with self._checkpoint_lock:
+                record_checkpoint(self.config["disk"], self.target_root(), spec)
+        except OSError:
+            self._log(f"[{step.name}] Point de reprise non enregistré")
+
+    def _record(self, step: Step, line: str, console):
+        if self.log_store:
+            self.log_store.write(step.name, line.strip())
+        line = f"[{step.name}] {line.strip()}"
+        if console:
+            with self._lock:
+                console.write(line + "\n")
+        self._log(line)
+
+    def _step_status(self, step: Step, status: str):
+        now = time.monotonic()
+        if step.name in self.resumed:
+            self.estimator.step_resumed(step.name)
+            self._log(f"[{step.name}] Déjà effectuée lors de l'installation précédente: reprise")
+        elif status == RUNNING:
+            self.estimator.step_started(step.name, now)
+        elif status in (DONE, FAILED):
+            self.estimator.step_finished(step.name, now)
+        if self.on_step:
+            self.on_step(step, status)
+
+    def _update_progress(self, remaining: float) -> int:
+        """Pourcentage selon le temps écoulé et le temps restant estimé (jamais en recul)"""
+        elapsed = time.monotonic() - self._started
+        if elapsed + remaining > 0:
+            self.percent = max(self.percent, min(99.0, elapsed * 100 / (elapsed + remaining)))
+        return int(self.percent)
+
+    def _follow_progress(self, progress_fd: int):
+        """Lit le canal de progression, regroupe les logs et estime le temps restant"""
+        splitter = LineSplitter()
+        last_emitted = (-1, None)
+        remaining = self.estimator.remaining()
+        next_eta = 0.0
+        selector = selectors.DefaultSelector()
+        selector.register(progress_fd, selectors.EVENT_READ)
+
+        def emit():
+            nonlocal last_emitted
+            percent = self._update_progress(remaining)
+            if (percent, self.tracker.label) != last_emitted and self.on_progress:
+                last_emitted = (percent, self.tracker.label)
+                self.on_progress(percent, self.tracker.label)
+
+        def drain() -> bool:
+            try:
+                chunk = os.read(progress_fd, 65536)
+            except BlockingIOError:
+                return False
+            for line in splitter.feed(chunk):
+                event = parse_event(line)
+                if event is None:
+                    continue
+                self.tracker.update(event)
+                emit()
+            return bool(chunk)
+
+        while not self._done.is_set():
+            if selector.select(LOG_BATCH_INTERVAL):
+                drain()
+            if time.monotonic() >= next_eta:
+                next_eta = time.monotonic() + ETA_INTERVAL
+                remaining = self.estimator.tick()
+                if self.on_eta:
+                    self.on_eta(remaining)
+                emit()
+            self._flush_logs()
+
+        while drain():
+            pass
+        self._flush_logs()
+        selector.close()
+
+    def run(self) -> bool:
+        """Exécute l'installation; retourne True en cas de succès"""
+        progress_dir = tempfile.mkdtemp(prefix="archfusion-progress-")
+        progress_path = os.path.join(progress_dir, "events")
+        self.password_file = self.write_password_file(progress_dir)
+        progress_fd = keepalive_fd = None
+        console = open(self.console_log, "a", encoding="utf-8") if self.console_log else None
+        follower = None
+        success = False
+        self._started = time.monotonic()
+
+        try:
+            self._open_trace()
+            digests = self.write_checkpoint_specs(progress_dir)
+            self.package_plan_dir = self.write_package_plan(progress_dir)
+            if self.resume:
+                self.resumed = self.resumable_steps(digests)
+
+            # FIFO lue sans blocage; une écriture factice évite de lire EOF entre deux étapes
+            os.mkfifo(progress_path, 0o600)
+            progress_fd = os.open(progress_path, os.O_RDONLY | os.O_NONBLOCK)
+            keepalive_fd = os.open(progress_path, os.O_WRONLY | os.O_NONBLOCK)
+
+            follower = threading.Thread(target=self._follow_progress, args=(progress_fd,),
+                                        daemon=True)
+            follower.start()
+
+            self.scheduler = StepScheduler(
+                self.steps,
+                lambda step: self._run_step(step, progress_path, console),
+                max_workers=self.max_workers,
+                on_status=self._step_status,
+                completed=self.resumed,
+            )
+            success = self.scheduler.run()
+            return success
+        finally:
+            self._done.set()
+            if follower:
+                follower.join()
+            self._record_run(success)
+            for fd in (progress_fd, keepalive_fd):
+                if fd is not None:
+                    os.close(fd)
+            if console:
+                console.close()
+            shutil.rmtree(progress_dir, ignore_errors=True)
+
+    def _open_trace(self):
+        """Nouvelle trace, tableau JSON complété par chaque étape de install.sh"""
+        if not self.trace_file:
+            return
+        try:
+            with open(self.trace_file, "w", encoding="utf-8") as f:
+                f.write("[\n")
+        except OSError:
+            self.trace_file = None
+
+    def _record_run(self, success: bool):
+        """Referme la trace et ajoute le résumé de l'installation à l'historique"""
+        events = []
+        try:
+            if self.trace_file:
+                events = finalize_trace(self.trace_file)
+            if self.history_file:
+                append_history(build_summary(events, success, self.estimator.records), self.history_file)
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self.scheduler and self.scheduler.cancelled)
+
+    def stop(self):
+        """Arrête l'installation: plus de nouvelles étapes, arrêt des étapes en cours
+
+        install.sh arrête les processus de l'étape (voir cancel_step): l'étape
+        interrompue n'a pas de point de reprise et sera refaite.
+        """
+        if self.scheduler:
+            self.scheduler.cancel()
+        for process in list(self.processes.values()):
+            if process.poll() is None:
+                process.terminate()
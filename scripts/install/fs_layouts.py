@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Dispositions du système de fichiers racine
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Lit les dispositions de scripts/install/layouts/ (système de
+             fichiers, options de mkfs et de montage, sous-volumes btrfs)
+             proposées par l'assistant et install.sh --fs-layout
+
+Les fichiers de layouts/ sont des fichiers bash, sourcés par install.sh: ils
+sont évalués par bash ici aussi. La disposition par défaut est ROOT_FS de
+configs/install.conf; SNAPSHOTS_ENABLED et SNAPSHOTS_RETENTION_* règlent les
+instantanés automatiques (snapper, dispositions btrfs seulement).
+
+Usage:
+    python3 fs_layouts.py list
+    python3 fs_layouts.py snapper-config      # depuis install.sh
+    python3 fs_layouts.py defaults --config configs/install.conf   # depuis install.sh
+"""
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from install_config import load_install_config
+
+LAYOUTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts")
+DEFAULT_LAYOUT = "ext4"
+
+# Rétention des instantanés par défaut (SNAPSHOTS_RETENTION_* de install.conf)
+SNAPSHOT_RETENTION = {"DAILY": 7, "WEEKLY": 4, "MONTHLY": 6}
+
+
+@dataclass(frozen=True)
+class FsLayout:
+    """Disposition de la racine décrite par layouts/NOM.conf"""
+
+    name: str
+    description: str
+    root_fs: str
+    mkfs_options: Tuple[str, ...]
+    mount_options: str
+    discard_option: str
+    subvolumes: Tuple[Tuple[str, str], ...]
+    packages: Tuple[str, ...]
+
+    @property
+    def snapshots_supported(self) -> bool:
+        return self.root_fs == "btrfs" and any(path == "/.snapshots" for _, path in self.subvolumes)
+
+
+def load_layouts() -> List[FsLayout]:
+    layouts = []
+    for path in sorted(glob.glob(os.path.join(LAYOUTS_DIR, "*.conf"))):
+        # Fichiers lus par install.sh: évalués par bash
+        output = subprocess.run(
+            ["bash", "-c", 'source "$1"; echo "$LAYOUT_DESCRIPTION"; echo "$LAYOUT_ROOT_FS"; '
+             'echo "${LAYOUT_MKFS_OPTIONS[*]}"; echo "$LAYOUT_MOUNT_OPTIONS"; '
+             'echo "$LAYOUT_DISCARD_OPTION"; echo "${LAYOUT_SUBVOLUMES[*]}"; echo "${LAYOUT_PACKAGES[*]}"',
+             "bash", path],
+            check=True, capture_output=True, text=True,
+        ).stdout.split("\n")
+        description, root_fs, mkfs, mount, discard, subvolumes, packages = output[:7]
+        layouts.append(FsLayout(
+            name=os.path.basename(path)[:-len(".conf")],
+            description=description,
+            root_fs=root_fs,
+            mkfs_options=tuple(mkfs.split()),
+            mount_options=mount,
+            discard_option=discard,
+            subvolumes=tuple(tuple(entry.split(":", 1)) for entry in subvolumes.split()),
+            packages=tuple(packages.split()),
+        ))
+    return layouts
+
+
+def layout_names() -> List[str]:
+    return [os.path.basename(path)[:-len(".conf")]
+            for path in sorted(glob.glob(os.path.join(LAYOUTS_DIR, "*.conf")))]
+
+
+def default_layout(config: Optional[Dict] = None) -> str:
+    """ROOT_FS de install.conf s'il désigne une disposition, sinon DEFAULT_LAYOUT"""
+    config = load_install_config() if config is None else config
+    name = config.get("ROOT_FS", DEFAULT_LAYOUT)
+    return name if name in layout_names() else DEFAULT_LAYOUT
+
+
+def snapshots_default(config: Optional[Dict] = None) -> bool:
+    config = load_install_config() if config is None else config
+    return config.get("SNAPSHOTS_ENABLED") == "true"
+
+
+def snapshot_retention(config: Optional[Dict] = None) -> Dict[str, int]:
+    config = load_install_config() if config is None else config
+    retention = dict(SNAPSHOT_RETENTION)
+    for period in retention:
+        value = config.get(f"SNAPSHOTS_RETENTION_{period}", "")
+        if isinstance(value, str) and value.isdigit():
+            retention[period] = int(value)
+    return retention
+
+
+def render_snapper_config(retention: Dict[str, int]) -> str:
+    """Configuration snapper "root": instantanés horaires, nettoyés selon la rétention"""
+    return (
+        "# ArchFusion OS - Configuration snapper de la racine\n"
+        "# Générée par fs_layouts.py (SNAPSHOTS_RETENTION_* de install.conf)\n\n"
+        'SUBVOLUME="/"\n'
+        'FSTYPE="btrfs"\n'
+        'QGROUP=""\n'
+        'SPACE_LIMIT="0.5"\n'
+        'FREE_LIMIT="0.2"\n'
+        'ALLOW_USERS=""\n'
+        'ALLOW_GROUPS="wheel"\n'
+        'SYNC_ACL="no"\n'
+        'BACKGROUND_COMPARISON="yes"\n'
+        'NUMBER_CLEANUP="yes"\n'
+        'NUMBER_MIN_AGE="1800"\n'
+        'NUMBER_LIMIT="20"\n'
+        'NUMBER_LIMIT_IMPORTANT="5"\n'
+        'TIMELINE_CREATE="yes"\n'
+        'TIMELINE_CLEANUP="yes"\n'
+        'TIMELINE_MIN_AGE="1800"\n'
+        'TIMELINE_LIMIT_HOURLY="5"\n'
+        f'TIMELINE_LIMIT_DAILY="{retention["DAILY"]}"\n'
+        f'TIMELINE_LIMIT_WEEKLY="{retention["WEEKLY"]}"\n'
+        f'TIMELINE_LIMIT_MONTHLY="{retention["MONTHLY"]}"\n'
+        'TIMELINE_LIMIT_YEARLY="0"\n'
+        'EMPTY_PRE_POST_CLEANUP="yes"\n'
+        'EMPTY_PRE_POST_MIN_AGE="1800"\n'
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dispositions du système de fichiers racine")
+    parser.add_argument("command", choices=("list", "snapper-config", "defaults"))
+    parser.add_argument("--config", help="install.conf (défaut: recherche habituelle)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "defaults":
+            # Disposition et instantanés par défaut, lus par install.sh
+            config = load_install_config(args.config)
+            print(default_layout(config), "true" if snapshots_default(config) else "false")
+        elif args.command == "list":
+            default = default_layout()
+            for layout in load_layouts():
+                marker = " (défaut)" if layout.name == default else ""
+                print(f"{layout.name:<12}{layout.description}{marker}")
+                print(f"{'':<12}mkfs.{layout.root_fs} {' '.join(layout.mkfs_options)}, "
+                      f"montage {layout.mount_options}")
+        else:
+            print(render_snapper_config(snapshot_retention()), end="")
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ Dispositions: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
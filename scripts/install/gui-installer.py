@@ -10,11 +10,14 @@ Description: Interface graphique moderne pour l'installation d'ArchFusion OS
 
 import sys
 import os
+import argparse
+import signal
 import subprocess
 import threading
 import json
 import time
 from pathlib import Path
+from collections import deque
 from typing import Dict, List, Optional, Tuple
 
 try:
@@ -23,9 +26,13 @@ try:
         QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox, QProgressBar,
         QTextEdit, QStackedWidget, QFrame, QScrollArea, QGridLayout,
         QButtonGroup, QRadioButton, QSpacerItem, QSizePolicy, QMessageBox,
-        QFileDialog, QTabWidget, QGroupBox, QSlider, QSpinBox
+        QFileDialog, QTabWidget, QGroupBox, QSlider, QSpinBox, QListView,
+        QAbstractItemView
+    )
+    from PyQt5.QtCore import (
+        Qt, QThread, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve,
+        QAbstractListModel, QModelIndex, QCoreApplication
     )
-    from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve
     from PyQt5.QtGui import QFont, QPixmap, QPalette, QColor, QIcon, QPainter, QLinearGradient
 except ImportError:
     print("PyQt5 non installé. Installation en cours...")
@@ -34,6 +41,31 @@ except ImportError:
     from PyQt5.QtCore import *
     from PyQt5.QtGui import *
 
+from disks import DiskCache, DiskInfo, UeventMonitor, block_disk_event
+from engine import FAILED, INSTALL_STEPS, RUNNING, InstallEngine
+from install_trace import format_duration
+from log_store import LogReader, LogWriter, load_log_settings
+from install_plan import PlanError, load_plan, save_plan
+from fs_layouts import DEFAULT_LAYOUT, default_layout, load_layouts, snapshots_default
+from prefetch import (PackagePrefetcher, base_packages, offline_repo_available, plan_packages,
+                      root_image_path)
+
+# Nombre maximal de lignes conservées dans la console
+LOG_VIEW_MAX_LINES = 5000
+
+# Lignes affichées avant la ligne visée lors d'un saut dans le journal
+LOG_JUMP_CONTEXT = 50
+
+# Filtre des boîtes de dialogue d'import/export de plan
+PLAN_FILE_FILTER = "Plans d'installation (*.json)"
+
+
+def select_combo_text(combo: QComboBox, text: str):
+    """Sélectionne une valeur, ajoutée à la liste si elle n'y figure pas (plan importé)"""
+    if combo.findText(text) < 0:
+        combo.addItem(text)
+    combo.setCurrentText(text)
+
 class ArchFusionStyle:
     """Thème et styles pour l'interface ArchFusion"""
     
@@ -194,6 +226,16 @@ class ArchFusionStyle:
             border-radius: 8px;
         }}
         
+        QListView#logConsole {{
+            background: {ArchFusionStyle.DARK};
+            color: #00FF00;
+            border: none;
+            border-radius: 10px;
+            padding: 16px;
+            font-family: 'SF Mono', 'Consolas', monospace;
+            font-size: 14px;
+        }}
+        
         QTextEdit {{
             background: {ArchFusionStyle.DARK};
             color: #00FF00;
@@ -223,74 +265,47 @@ class InstallationWorker(QThread):
     """Worker thread pour l'installation"""
     
     progress_updated = pyqtSignal(int, str)
-    log_updated = pyqtSignal(str)
+    eta_updated = pyqtSignal(float)
+    log_updated = pyqtSignal(list)
+    step_updated = pyqtSignal(str, str)
     installation_finished = pyqtSignal(bool, str)
     
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, resume: bool = True):
         super().__init__()
         self.config = config
-        self.process = None
+        self.resume = resume
+        self.engine = None
+        
+        # Journal persistant (configs/install.conf: LOG_FILE, LOG_MAX_SIZE, LOG_ROTATE_COUNT)
+        try:
+            self.log_store = LogWriter(load_log_settings())
+        except OSError:
+            self.log_store = None
         
     def run(self):
         """Exécute l'installation"""
         try:
-            # Préparer la commande d'installation
-            script_path = Path(__file__).parent / "install.sh"
-            cmd = [
-                "sudo", str(script_path),
-                "--auto",
-                "--disk", self.config["disk"],
-                "--username", self.config["username"],
-                "--hostname", self.config["hostname"],
-                "--timezone", self.config["timezone"]
-            ]
-            
-            if self.config.get("encrypt", False):
-                cmd.append("--encrypt")
-                
-            if self.config.get("swap_size"):
-                cmd.extend(["--swap-size", self.config["swap_size"]])
-            
-            # Lancer l'installation
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            # Suivre la progression
-            progress = 0
-            for line in iter(self.process.stdout.readline, ''):
-                if line:
-                    self.log_updated.emit(line.strip())
-                    
-                    # Analyser la progression
-                    if "Partitionnement" in line:
-                        progress = 10
-                    elif "Formatage" in line:
-                        progress = 20
-                    elif "Montage" in line:
-                        progress = 30
-                    elif "Installation du système de base" in line:
-                        progress = 50
-                    elif "Configuration du système" in line:
-                        progress = 70
-                    elif "Installation de l'environnement de bureau" in line:
-                        progress = 85
-                    elif "Finalisation" in line:
-                        progress = 95
-                    elif "Installation terminée" in line:
-                        progress = 100
-                    
-                    self.progress_updated.emit(progress, line.strip())
-            
-            # Attendre la fin du processus
-            self.process.wait()
-            
-            if self.process.returncode == 0:
+            # Journal refermé (dernier segment compressé) avant d'annoncer la fin, même sur erreur
+            try:
+                # Le moteur exécute les étapes indépendantes en parallèle; la
+                # progression suit le temps restant estimé (historique et débit)
+                self.engine = InstallEngine(
+                    self.config,
+                    on_log=self.log_updated.emit,
+                    on_progress=self.progress_updated.emit,
+                    on_step=lambda step, status: self.step_updated.emit(step.label, status),
+                    on_eta=self.eta_updated.emit,
+                    log_store=self.log_store,
+                    resume=self.resume
+                )
+                success = self.engine.run()
+            finally:
+                if self.log_store:
+                    self.log_store.close()
+            if success:
                 self.installation_finished.emit(True, "Installation réussie!")
+            elif self.engine.cancelled:
+                self.installation_finished.emit(False, "Installation annulée")
             else:
                 self.installation_finished.emit(False, "Erreur lors de l'installation")
                 
@@ -299,8 +314,8 @@ class InstallationWorker(QThread):
     
     def stop(self):
         """Arrête l'installation"""
-        if self.process:
-            self.process.terminate()
+        if self.engine:
+            self.engine.stop()
 
 class WelcomePage(QWidget):
     """Page d'accueil"""
@@ -367,14 +382,77 @@ class WelcomePage(QWidget):
         
         self.setLayout(layout)
 
+class DiskScanWorker(QThread):
+    """Énumération complète des disques hors du thread graphique"""
+    
+    disks_scanned = pyqtSignal(list)
+    
+    def __init__(self, cache: DiskCache):
+        super().__init__()
+        self.cache = cache
+    
+    def run(self):
+        self.disks_scanned.emit(self.cache.scan())
+
+class DiskHotplugWatcher(QThread):
+    """Suit les ajouts et retraits de disques signalés par le noyau"""
+    
+    # Nom du disque, DiskInfo à jour ou None s'il a été retiré
+    disk_changed = pyqtSignal(str, object)
+    
+    def __init__(self, cache: DiskCache):
+        super().__init__()
+        self.cache = cache
+        # Créé avant le démarrage du thread: stop() le réveille même si run()
+        # n'a pas encore commencé
+        try:
+            self.monitor = UeventMonitor()
+        except OSError:
+            # Pas d'accès netlink (conteneur...): seule l'actualisation manuelle reste
+            self.monitor = None
+    
+    def run(self):
+        if self.monitor is None:
+            return
+        try:
+            for event in self.monitor.events():
+                name = block_disk_event(event)
+                if name:
+                    self.disk_changed.emit(name, self.cache.refresh(name))
+        finally:
+            self.monitor.release()
+    
+    def stop(self):
+        if self.monitor:
+            self.monitor.close()
+
 class DiskSelectionPage(QWidget):
     """Page de sélection du disque"""
     
-    def __init__(self):
+    selection_changed = pyqtSignal()
+    
+    def __init__(self, cache: Optional[DiskCache] = None,
+                 scan_worker: Optional[DiskScanWorker] = None):
         super().__init__()
-        self.disks = []
+        self.cache = cache or DiskCache()
+        self.disk_cards: Dict[str, Tuple[QFrame, QRadioButton, QLabel]] = {}
+        self.disk_ids: Dict[int, str] = {}
+        self.next_disk_id = 0
         self.init_ui()
-        self.refresh_disks()
+        
+        self.scan_worker = scan_worker
+        self.hotplug_watcher = DiskHotplugWatcher(self.cache)
+        self.hotplug_watcher.disk_changed.connect(self.update_disk)
+        self.hotplug_watcher.start()
+        
+        if self.scan_worker and self.scan_worker.isRunning():
+            # Énumération déjà lancée au démarrage: attendre son résultat
+            self.refresh_btn.setEnabled(False)
+            self.scan_worker.disks_scanned.connect(self.sync_disks)
+        if self.cache.scanned:
+            self.sync_disks(self.cache.disks())
+        elif not (self.scan_worker and self.scan_worker.isRunning()):
+            self.refresh_disks()
     
     def init_ui(self):
         layout = QVBoxLayout()
@@ -387,84 +465,122 @@ class DiskSelectionPage(QWidget):
         
         # Liste des disques
         self.disk_group = QButtonGroup()
+        self.disk_group.buttonToggled.connect(lambda *_: self.selection_changed.emit())
         self.disk_layout = QVBoxLayout()
         
+        self.status_label = QLabel("Détection des disques...")
+        self.status_label.setStyleSheet("color: #666;")
+        
         # Bouton de rafraîchissement
-        refresh_btn = QPushButton("🔄 Actualiser")
-        refresh_btn.clicked.connect(self.refresh_disks)
+        self.refresh_btn = QPushButton("🔄 Actualiser")
+        self.refresh_btn.clicked.connect(self.refresh_disks)
         
         layout.addWidget(title)
         layout.addWidget(description)
+        layout.addWidget(self.status_label)
         layout.addLayout(self.disk_layout)
-        layout.addWidget(refresh_btn)
+        layout.addWidget(self.refresh_btn)
         layout.addStretch()
         
         self.setLayout(layout)
     
     def refresh_disks(self):
-        """Actualise la liste des disques"""
-        # Nettoyer l'ancienne liste
-        for i in reversed(range(self.disk_layout.count())):
-            self.disk_layout.itemAt(i).widget().setParent(None)
+        """Relance une énumération complète en arrière-plan"""
+        if self.scan_worker and self.scan_worker.isRunning():
+            return
         
-        # Obtenir la liste des disques
-        try:
-            result = subprocess.run(
-                ["lsblk", "-d", "-o", "NAME,SIZE,MODEL", "-n"],
-                capture_output=True, text=True
-            )
-            
-            self.disks = []
-            for line in result.stdout.strip().split('\n'):
-                if line and not line.startswith('loop'):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        name = parts[0]
-                        size = parts[1]
-                        model = ' '.join(parts[2:]) if len(parts) > 2 else "Inconnu"
-                        
-                        self.disks.append({
-                            'name': name,
-                            'size': size,
-                            'model': model
-                        })
-            
-            # Créer les boutons radio pour chaque disque
-            for i, disk in enumerate(self.disks):
-                disk_widget = QFrame()
-                disk_widget.setObjectName("card")
-                disk_layout = QHBoxLayout(disk_widget)
-                
-                radio = QRadioButton()
-                self.disk_group.addButton(radio, i)
-                
-                info_layout = QVBoxLayout()
-                name_label = QLabel(f"/dev/{disk['name']}")
-                name_label.setStyleSheet("font-weight: bold; font-size: 16px;")
-                
-                details_label = QLabel(f"{disk['size']} - {disk['model']}")
-                details_label.setStyleSheet("color: #666;")
-                
-                info_layout.addWidget(name_label)
-                info_layout.addWidget(details_label)
-                
-                disk_layout.addWidget(radio)
-                disk_layout.addLayout(info_layout)
-                disk_layout.addStretch()
-                
-                self.disk_layout.addWidget(disk_widget)
-                
-        except Exception as e:
-            error_label = QLabel(f"Erreur lors de la détection des disques: {str(e)}")
-            error_label.setStyleSheet(f"color: {ArchFusionStyle.DANGER};")
-            self.disk_layout.addWidget(error_label)
+        self.refresh_btn.setEnabled(False)
+        self.scan_worker = DiskScanWorker(self.cache)
+        self.scan_worker.disks_scanned.connect(self.sync_disks)
+        self.scan_worker.start()
+    
+    def sync_disks(self, disks: List[DiskInfo]):
+        """Met à jour la liste sans reconstruire les cartes inchangées"""
+        self.refresh_btn.setEnabled(True)
+        
+        names = {disk.name for disk in disks}
+        for name in list(self.disk_cards):
+            if name not in names:
+                self.update_disk(name, None)
+        for disk in disks:
+            self.update_disk(disk.name, disk)
+        
+        self.update_status()
+    
+    def update_disk(self, name: str, disk: Optional[DiskInfo]):
+        """Ajoute, met à jour ou retire la carte d'un disque"""
+        if disk is None:
+            card = self.disk_cards.pop(name, None)
+            if card:
+                frame, radio, _ = card
+                was_checked = radio.isChecked()
+                self.disk_group.removeButton(radio)
+                self.disk_ids = {i: n for i, n in self.disk_ids.items() if n != name}
+                frame.setParent(None)
+                frame.deleteLater()
+                if was_checked:
+                    self.selection_changed.emit()
+            self.update_status()
+            return
+        
+        details = self.describe_disk(disk)
+        if name in self.disk_cards:
+            self.disk_cards[name][2].setText(details)
+            return
+        
+        disk_widget = QFrame()
+        disk_widget.setObjectName("card")
+        disk_layout = QHBoxLayout(disk_widget)
+        
+        radio = QRadioButton()
+        self.disk_group.addButton(radio, self.next_disk_id)
+        self.disk_ids[self.next_disk_id] = name
+        self.next_disk_id += 1
+        
+        info_layout = QVBoxLayout()
+        name_label = QLabel(f"/dev/{name}")
+        name_label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        
+        details_label = QLabel(details)
+        details_label.setStyleSheet("color: #666;")
+        
+        info_layout.addWidget(name_label)
+        info_layout.addWidget(details_label)
+        
+        disk_layout.addWidget(radio)
+        disk_layout.addLayout(info_layout)
+        disk_layout.addStretch()
+        
+        # Conserver l'ordre alphabétique des disques
+        position = sorted(list(self.disk_cards) + [name]).index(name)
+        self.disk_layout.insertWidget(position, disk_widget)
+        self.disk_cards[name] = (disk_widget, radio, details_label)
+        self.update_status()
+    
+    @staticmethod
+    def describe_disk(disk: DiskInfo) -> str:
+        partitions = len(disk.partitions)
+        details = f"{disk.size} - {disk.model} · {disk.transport.upper()} · {disk.kind}"
+        if partitions:
+            details += f" · {partitions} partition{'s' if partitions > 1 else ''} existante{'s' if partitions > 1 else ''}"
+        return details
+    
+    def update_status(self):
+        if self.disk_cards:
+            self.status_label.hide()
+        else:
+            self.status_label.setText("Aucun disque détecté" if self.cache.scanned
+                                      else "Détection des disques...")
+            self.status_label.show()
     
     def get_selected_disk(self) -> Optional[str]:
         """Retourne le disque sélectionné"""
-        selected_id = self.disk_group.checkedId()
-        if selected_id >= 0 and selected_id < len(self.disks):
-            return self.disks[selected_id]['name']
-        return None
+        return self.disk_ids.get(self.disk_group.checkedId())
+    
+    def stop_watching(self):
+        """Arrête le suivi des branchements à chaud"""
+        self.hotplug_watcher.stop()
+        self.hotplug_watcher.wait()
 
 class UserConfigPage(QWidget):
     """Page de configuration utilisateur"""
@@ -536,6 +652,14 @@ class UserConfigPage(QWidget):
             'locale': self.locale_combo.currentText(),
             'keymap': self.keymap_combo.currentText()
         }
+    
+    def set_config(self, config: Dict):
+        """Reporte la configuration d'un plan importé dans le formulaire"""
+        self.username_edit.setText(config['username'])
+        self.hostname_edit.setText(config['hostname'])
+        select_combo_text(self.timezone_combo, config['timezone'])
+        select_combo_text(self.locale_combo, config['locale'])
+        select_combo_text(self.keymap_combo, config['keymap'])
 
 class AdvancedOptionsPage(QWidget):
     """Page des options avancées"""
@@ -554,6 +678,56 @@ class AdvancedOptionsPage(QWidget):
         self.encrypt_check = QCheckBox("Activer le chiffrement du disque (LUKS)")
         self.encrypt_check.setToolTip("Chiffre le disque pour une sécurité maximale")
         
+        # Installation hors ligne (dépôt intégré à l'ISO)
+        self.offline_check = QCheckBox("Installer depuis les paquets de l'ISO (hors ligne)")
+        self.offline_check.setToolTip(
+            "Utilise le dépôt intégré à l'ISO; le réseau ne sert que pour les paquets manquants"
+        )
+        self.offline_check.setEnabled(offline_repo_available())
+        self.offline_check.setChecked(offline_repo_available())
+        
+        # Installation par image (copie du système live au lieu de pacstrap)
+        self.image_check = QCheckBox("Copier le système de l'ISO (installation rapide)")
+        self.image_check.setToolTip(
+            "Décompresse l'image du système live sur le disque; seuls les paquets "
+            "manquants du bureau choisi sont installés ensuite"
+        )
+        self.image_check.setEnabled(root_image_path() is not None)
+        
+        # Paquets installés sans fsync par fichier, une synchronisation à la fin
+        self.no_fsync_check = QCheckBox("Écritures différées pendant l'installation des paquets")
+        self.no_fsync_check.setToolTip(
+            "Plus rapide sur disque dur ou disque virtuel: le disque est synchronisé "
+            "une seule fois, avant l'installation du chargeur de démarrage"
+        )
+        
+        # Disposition de la racine (layouts/*.conf): système de fichiers et montage
+        fs_row = QHBoxLayout()
+        fs_row.addWidget(QLabel("Système de fichiers:"))
+        self.fs_combo = QComboBox()
+        try:
+            self.layouts = {fs.name: fs for fs in load_layouts()}
+        except (OSError, subprocess.CalledProcessError):
+            self.layouts = {}
+        for fs in self.layouts.values():
+            self.fs_combo.addItem(fs.description, fs.name)
+            self.fs_combo.setItemData(
+                self.fs_combo.count() - 1,
+                f"mkfs.{fs.root_fs} {' '.join(fs.mkfs_options)}\n"
+                f"Montage: {fs.mount_options}", Qt.ToolTipRole,
+            )
+        fs_row.addWidget(self.fs_combo)
+        fs_row.addStretch()
+        
+        # Instantanés automatiques (snapper), dispositions btrfs seulement
+        self.snapshots_check = QCheckBox("Instantanés automatiques du système (snapper)")
+        self.snapshots_check.setToolTip(
+            "Instantanés horaires de la racine, conservés selon la rétention de install.conf"
+        )
+        self.fs_combo.currentIndexChanged.connect(self.fs_layout_changed)
+        self.select_fs_layout(default_layout())
+        self.snapshots_check.setChecked(snapshots_default() and self.snapshots_check.isEnabled())
+        
         # Swap
         swap_layout = QHBoxLayout()
         swap_layout.addWidget(QLabel("Taille du swap:"))
@@ -589,6 +763,11 @@ class AdvancedOptionsPage(QWidget):
         
         layout.addWidget(title)
         layout.addWidget(self.encrypt_check)
+        layout.addWidget(self.offline_check)
+        layout.addWidget(self.image_check)
+        layout.addWidget(self.no_fsync_check)
+        layout.addLayout(fs_row)
+        layout.addWidget(self.snapshots_check)
         layout.addLayout(swap_layout)
         layout.addLayout(de_layout)
         layout.addWidget(services_group)
@@ -596,16 +775,48 @@ class AdvancedOptionsPage(QWidget):
         
         self.setLayout(layout)
     
+    def select_fs_layout(self, name: str):
+        index = self.fs_combo.findData(name)
+        if index >= 0:
+            self.fs_combo.setCurrentIndex(index)
+        self.fs_layout_changed()
+    
+    def fs_layout_changed(self):
+        layout = self.layouts.get(self.fs_combo.currentData())
+        supported = layout is not None and layout.snapshots_supported
+        self.snapshots_check.setEnabled(supported)
+        if not supported:
+            self.snapshots_check.setChecked(False)
+    
     def get_config(self) -> Dict:
         """Retourne la configuration avancée"""
         return {
             'encrypt': self.encrypt_check.isChecked(),
+            'offline': self.offline_check.isChecked(),
+            'image': self.image_check.isChecked(),
+            'no_fsync': self.no_fsync_check.isChecked(),
+            'fs_layout': self.fs_combo.currentData() or DEFAULT_LAYOUT,
+            'snapshots': self.snapshots_check.isChecked(),
             'swap_size': f"{self.swap_spin.value()}G",
             'desktop_environment': self.de_combo.currentText(),
             'ssh': self.ssh_check.isChecked(),
             'firewall': self.firewall_check.isChecked(),
             'bluetooth': self.bluetooth_check.isChecked()
         }
+    
+    def set_config(self, config: Dict):
+        """Reporte les options d'un plan importé (hors ligne seulement si l'ISO le permet)"""
+        self.encrypt_check.setChecked(config['encrypt'])
+        self.offline_check.setChecked(config['offline'] and self.offline_check.isEnabled())
+        self.image_check.setChecked(config['image'] and self.image_check.isEnabled())
+        self.no_fsync_check.setChecked(config['no_fsync'])
+        self.select_fs_layout(config['fs_layout'])
+        self.snapshots_check.setChecked(config['snapshots'] and self.snapshots_check.isEnabled())
+        self.swap_spin.setValue(int(config['swap_size'].rstrip('G')))
+        select_combo_text(self.de_combo, config['desktop_environment'])
+        self.ssh_check.setChecked(config['ssh'])
+        self.firewall_check.setChecked(config['firewall'])
+        self.bluetooth_check.setChecked(config['bluetooth'])
 
 class SummaryPage(QWidget):
     """Page de résumé"""
@@ -658,6 +869,10 @@ class SummaryPage(QWidget):
 
 <h4>Options avancées:</h4>
 <b>Chiffrement:</b> {'Activé' if config.get('encrypt', False) else 'Désactivé'}<br>
+<b>Source des paquets:</b> {"Dépôt de l'ISO" if config.get('offline', False) else 'Miroirs en ligne'}<br>
+<b>Méthode:</b> {"Copie de l'image de l'ISO" if config.get('image', False) else 'Installation des paquets'}<br>
+<b>Écritures:</b> {'Différées, une synchronisation finale' if config.get('no_fsync', False) else 'Synchronisées (fsync)'}<br>
+<b>Système de fichiers:</b> {config.get('fs_layout', DEFAULT_LAYOUT)}{', instantanés automatiques' if config.get('snapshots', False) else ''}<br>
 <b>Taille du swap:</b> {config.get('swap_size', '4G')}<br>
 <b>Environnement de bureau:</b> {config.get('desktop_environment', 'KDE Plasma')}<br>
 <b>SSH:</b> {'Activé' if config.get('ssh', False) else 'Désactivé'}<br>
@@ -671,12 +886,63 @@ class SummaryPage(QWidget):
         
         self.summary_text.setHtml(summary)
 
+class LogModel(QAbstractListModel):
+    """Modèle de la console: tampon circulaire de lignes de taille fixe"""
+    
+    def __init__(self, max_lines: int = LOG_VIEW_MAX_LINES):
+        super().__init__()
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.lines)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+    
+    def set_lines(self, lines: List[str]):
+        """Remplace le contenu (page lue dans le journal persistant)"""
+        self.beginResetModel()
+        self.lines.clear()
+        self.lines.extend(lines[-self.max_lines:])
+        self.endResetModel()
+    
+    def append_lines(self, lines: List[str]):
+        """Ajoute un lot de lignes en supprimant les plus anciennes au besoin"""
+        if not lines:
+            return
+        
+        if len(lines) >= self.max_lines:
+            self.beginResetModel()
+            self.lines.clear()
+            self.lines.extend(lines[-self.max_lines:])
+            self.endResetModel()
+            return
+        
+        overflow = len(self.lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.lines.popleft()
+            self.endRemoveRows()
+        
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
 class InstallationPage(QWidget):
     """Page d'installation"""
     
     def __init__(self):
         super().__init__()
         self.worker = None
+        self.config: Dict = {}
+        self.log_reader: Optional[LogReader] = None
+        # Ligne visée dans le journal; None: la console suit l'installation
+        self.browse_line: Optional[int] = None
         self.init_ui()
     
     def init_ui(self):
@@ -694,23 +960,83 @@ class InstallationPage(QWidget):
         self.status_label = QLabel("Préparation de l'installation...")
         self.status_label.setAlignment(Qt.AlignCenter)
         
-        # Console de logs
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setMaximumHeight(300)
+        # Temps restant estimé (durées des installations précédentes, débit actuel)
+        self.eta_label = QLabel()
+        self.eta_label.setAlignment(Qt.AlignCenter)
+        
+        # Étapes en cours d'exécution (plusieurs peuvent tourner en parallèle)
+        self.running_steps: List[str] = []
+        self.steps_label = QLabel()
+        self.steps_label.setAlignment(Qt.AlignCenter)
+        self.steps_label.setStyleSheet("color: #666;")
+        
+        # Console de logs (vue virtualisée: seules les lignes visibles sont dessinées)
+        self.log_model = LogModel()
+        self.log_view = QListView()
+        self.log_view.setObjectName("logConsole")
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.log_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.log_view.setMaximumHeight(300)
+        
+        # Navigation dans le journal complet (lu par pages depuis le disque)
+        navigation = QHBoxLayout()
+        self.stage_combo = QComboBox()
+        self.stage_combo.addItem("Aller à l'étape...", None)
+        for step in INSTALL_STEPS:
+            self.stage_combo.addItem(step.label, step.name)
+        self.stage_combo.activated.connect(self.jump_to_stage)
+        self.error_button = QPushButton("Erreur suivante")
+        self.error_button.clicked.connect(self.next_error)
+        self.follow_button = QPushButton("Suivre l'installation")
+        self.follow_button.clicked.connect(self.follow_log)
+        self.follow_button.setEnabled(False)
+        for widget in (self.stage_combo, self.error_button):
+            widget.setEnabled(False)
+            navigation.addWidget(widget)
+        navigation.addWidget(self.follow_button)
+        
+        # Annulation propre et reprise aux points enregistrés sur la cible
+        actions = QHBoxLayout()
+        self.cancel_button = QPushButton("Annuler l'installation")
+        self.cancel_button.clicked.connect(self.cancel_installation)
+        self.resume_button = QPushButton("Reprendre l'installation")
+        self.resume_button.clicked.connect(lambda: self.start_installation(self.config))
+        self.resume_button.hide()
+        actions.addStretch()
+        actions.addWidget(self.cancel_button)
+        actions.addWidget(self.resume_button)
         
         layout.addWidget(title)
         layout.addWidget(self.progress_bar)
         layout.addWidget(self.status_label)
-        layout.addWidget(self.log_text)
+        layout.addWidget(self.eta_label)
+        layout.addWidget(self.steps_label)
+        layout.addWidget(self.log_view)
+        layout.addLayout(navigation)
+        layout.addLayout(actions)
         
         self.setLayout(layout)
     
     def start_installation(self, config: Dict):
-        """Démarre l'installation"""
+        """Démarre l'installation (reprise des étapes déjà faites sur la cible)"""
+        self.config = config
+        self.resume_button.hide()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.running_steps.clear()
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Préparation de l'installation...")
         self.worker = InstallationWorker(config)
+        if self.worker.log_store:
+            self.log_reader = LogReader(self.worker.log_store.run_dir)
+            self.stage_combo.setEnabled(True)
+            self.error_button.setEnabled(True)
         self.worker.progress_updated.connect(self.update_progress)
+        self.worker.eta_updated.connect(self.update_eta)
         self.worker.log_updated.connect(self.add_log)
+        self.worker.step_updated.connect(self.update_step)
         self.worker.installation_finished.connect(self.installation_finished)
         self.worker.start()
     
@@ -719,20 +1045,95 @@ class InstallationPage(QWidget):
         self.progress_bar.setValue(value)
         self.status_label.setText(status)
     
-    def add_log(self, message: str):
-        """Ajoute un message au log"""
-        self.log_text.append(message)
-        # Auto-scroll vers le bas
-        scrollbar = self.log_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+    def update_eta(self, remaining: float):
+        """Met à jour le temps restant estimé"""
+        self.eta_label.setText(f"Temps restant estimé: {format_duration(remaining)}")
+    
+    def update_step(self, label: str, status: str):
+        """Met à jour la liste des étapes en cours"""
+        if status == RUNNING:
+            self.running_steps.append(label)
+        elif label in self.running_steps:
+            self.running_steps.remove(label)
+        
+        self.steps_label.setText(
+            f"En cours: {', '.join(self.running_steps)}" if self.running_steps else ""
+        )
+    
+    def add_log(self, lines: List[str]):
+        """Ajoute un lot de messages au log"""
+        # Pendant la navigation, les nouvelles lignes restent dans le journal sur disque
+        if self.browse_line is not None:
+            return
+        
+        # Auto-scroll vers le bas seulement si l'utilisateur y était déjà
+        scrollbar = self.log_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        
+        self.log_model.append_lines(lines)
+        
+        if at_bottom:
+            self.log_view.scrollToBottom()
+    
+    def cancel_installation(self):
+        """Arrête les étapes en cours; l'installation pourra être reprise"""
+        reply = QMessageBox.question(
+            self, "Annuler l'installation",
+            "Arrêter l'installation? Les étapes terminées sont conservées et "
+            "l'installation pourra être reprise.",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply == QMessageBox.Yes and self.worker:
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("Annulation en cours...")
+            self.worker.stop()
+    
+    def jump_to_line(self, line: int):
+        """Affiche le journal autour d'une ligne, lu depuis les segments sur disque"""
+        start = max(0, line - LOG_JUMP_CONTEXT)
+        self.browse_line = line
+        self.log_model.set_lines(self.log_reader.read_lines(start, LOG_VIEW_MAX_LINES))
+        self.log_view.scrollTo(self.log_model.index(line - start), QAbstractItemView.PositionAtCenter)
+        self.follow_button.setEnabled(True)
+    
+    def jump_to_stage(self, index: int):
+        """Début de l'étape choisie"""
+        stage = self.stage_combo.itemData(index)
+        self.stage_combo.setCurrentIndex(0)
+        entries = self.log_reader.find(stage=stage) if stage else []
+        if entries:
+            self.jump_to_line(entries[0].line)
+    
+    def next_error(self):
+        """Erreur suivant la ligne affichée (la première en mode suivi)"""
+        after = -1 if self.browse_line is None else self.browse_line
+        errors = [entry for entry in self.log_reader.find(level="ERROR") if entry.line > after]
+        if errors:
+            self.jump_to_line(errors[0].line)
+        else:
+            self.error_button.setText("Aucune autre erreur")
+            QTimer.singleShot(2000, lambda: self.error_button.setText("Erreur suivante"))
+    
+    def follow_log(self):
+        """Retour aux dernières lignes de l'installation"""
+        self.browse_line = None
+        self.follow_button.setEnabled(False)
+        total = self.log_reader.line_count()
+        self.log_model.set_lines(self.log_reader.read_lines(max(0, total - LOG_VIEW_MAX_LINES),
+                                                            LOG_VIEW_MAX_LINES))
+        self.log_view.scrollToBottom()
     
     def installation_finished(self, success: bool, message: str):
         """Installation terminée"""
         if success:
             self.status_label.setText("✅ Installation terminée avec succès!")
             self.progress_bar.setValue(100)
+            self.eta_label.clear()
         else:
-            self.status_label.setText(f"❌ Erreur: {message}")
+            self.status_label.setText(f"❌ {message}: les étapes terminées seront reprises")
+            self.resume_button.show()
+        self.cancel_button.hide()
 
 class ArchFusionInstaller(QMainWindow):
     """Interface principale de l'installateur ArchFusion"""
@@ -740,8 +1141,12 @@ class ArchFusionInstaller(QMainWindow):
     def __init__(self):
         super().__init__()
         self.config = {}
+        self.disk_cache = DiskCache()
+        self.disk_scan_worker = None
+        self.prefetcher = PackagePrefetcher()
         self.init_ui()
         self.setStyleSheet(ArchFusionStyle.get_main_style())
+        QTimer.singleShot(0, self.warm_up)
     
     def init_ui(self):
         self.setWindowTitle("ArchFusion OS - Installateur")
@@ -759,24 +1164,20 @@ class ArchFusionInstaller(QMainWindow):
         header = self.create_header()
         main_layout.addWidget(header)
         
-        # Pages
+        # Pages, construites à la première visite (une page vide les remplace d'ici là)
         self.stacked_widget = QStackedWidget()
-        
-        # Créer les pages
-        self.welcome_page = WelcomePage()
-        self.disk_page = DiskSelectionPage()
-        self.user_page = UserConfigPage()
-        self.advanced_page = AdvancedOptionsPage()
-        self.summary_page = SummaryPage()
-        self.install_page = InstallationPage()
-        
-        # Ajouter les pages
-        self.stacked_widget.addWidget(self.welcome_page)
-        self.stacked_widget.addWidget(self.disk_page)
-        self.stacked_widget.addWidget(self.user_page)
-        self.stacked_widget.addWidget(self.advanced_page)
-        self.stacked_widget.addWidget(self.summary_page)
-        self.stacked_widget.addWidget(self.install_page)
+        self.page_factories = [
+            WelcomePage,
+            self.create_disk_page,
+            UserConfigPage,
+            self.create_advanced_page,
+            SummaryPage,
+            InstallationPage,
+        ]
+        self.pages: List[Optional[QWidget]] = [None] * len(self.page_factories)
+        for _ in self.page_factories:
+            self.stacked_widget.addWidget(QWidget())
+        self.show_page(0)
         
         main_layout.addWidget(self.stacked_widget)
         
@@ -788,6 +1189,95 @@ class ArchFusionInstaller(QMainWindow):
         self.current_page = 0
         self.update_navigation()
     
+    def get_page(self, index: int) -> QWidget:
+        """Retourne une page en la construisant lors du premier accès"""
+        page = self.pages[index]
+        if page is None:
+            page = self.page_factories[index]()
+            placeholder = self.stacked_widget.widget(index)
+            self.stacked_widget.insertWidget(index, page)
+            self.stacked_widget.removeWidget(placeholder)
+            placeholder.deleteLater()
+            self.pages[index] = page
+        return page
+    
+    def show_page(self, index: int):
+        self.stacked_widget.setCurrentWidget(self.get_page(index))
+    
+    @property
+    def disk_page(self) -> "DiskSelectionPage":
+        return self.get_page(1)
+    
+    @property
+    def user_page(self) -> "UserConfigPage":
+        return self.get_page(2)
+    
+    @property
+    def advanced_page(self) -> "AdvancedOptionsPage":
+        return self.get_page(3)
+    
+    @property
+    def summary_page(self) -> "SummaryPage":
+        return self.get_page(4)
+    
+    @property
+    def install_page(self) -> "InstallationPage":
+        return self.get_page(5)
+    
+    def create_disk_page(self) -> DiskSelectionPage:
+        page = DiskSelectionPage(self.disk_cache, self.disk_scan_worker)
+        page.selection_changed.connect(self.update_navigation)
+        return page
+    
+    def create_advanced_page(self) -> AdvancedOptionsPage:
+        page = AdvancedOptionsPage()
+        page.de_combo.currentTextChanged.connect(self.prefetch_desktop)
+        page.offline_check.toggled.connect(self.offline_toggled)
+        return page
+    
+    def offline_toggled(self, offline: bool):
+        """Sans le dépôt de l'ISO, les paquets sont préchargés depuis les miroirs"""
+        if not offline and self.start_prefetch():
+            self.prefetch_desktop(self.advanced_page.de_combo.currentText())
+    
+    def start_prefetch(self) -> bool:
+        """Démarre le préchargement des paquets de base (une seule fois)"""
+        if self.prefetcher.started:
+            return True
+        if not self.prefetcher.start():
+            return False
+        self.prefetcher.request("base", base_packages())
+        return True
+    
+    def prefetch_desktop(self, desktop: str):
+        """Précharge le plan de paquets de l'environnement de bureau choisi"""
+        if self.prefetcher.started:
+            options = self.advanced_page.get_config()
+            self.prefetcher.request("desktop", plan_packages(
+                desktop, bluetooth=options['bluetooth'],
+                firewall=options['firewall'], ssh=options['ssh']))
+    
+    def warm_up(self):
+        """Travail non visible lancé après le premier affichage"""
+        # Les disques sont prêts quand l'utilisateur atteint la page de sélection
+        if not self.disk_cache.scanned and self.pages[1] is None:
+            self.disk_scan_worker = DiskScanWorker(self.disk_cache)
+            self.disk_scan_worker.start()
+        
+        # Téléchargement des paquets de base pendant que l'assistant est rempli
+        # (inutile si l'ISO fournit déjà les paquets)
+        if not offline_repo_available():
+            self.start_prefetch()
+    
+    def closeEvent(self, event):
+        """Arrête les threads d'arrière-plan avant la fermeture"""
+        if self.pages[1] is not None:
+            self.pages[1].stop_watching()
+        if self.disk_scan_worker:
+            self.disk_scan_worker.wait()
+        self.prefetcher.stop()
+        super().closeEvent(event)
+    
     def create_header(self) -> QWidget:
         """Crée l'en-tête"""
         header = QFrame()
@@ -818,10 +1308,14 @@ class ArchFusionInstaller(QMainWindow):
         layout = QHBoxLayout(footer)
         
         # Boutons
+        self.import_btn = QPushButton("📂 Importer un plan")
+        self.export_btn = QPushButton("💾 Exporter le plan")
         self.prev_btn = QPushButton("← Précédent")
         self.next_btn = QPushButton("Suivant →")
         self.install_btn = QPushButton("🚀 Installer")
         
+        self.import_btn.clicked.connect(self.import_plan)
+        self.export_btn.clicked.connect(self.export_plan)
         self.prev_btn.clicked.connect(self.previous_page)
         self.next_btn.clicked.connect(self.next_page)
         self.install_btn.clicked.connect(self.start_installation)
@@ -830,9 +1324,11 @@ class ArchFusionInstaller(QMainWindow):
         self.install_btn.setObjectName("success-button")
         self.install_btn.hide()
         
+        layout.addWidget(self.import_btn)
         layout.addStretch()
         layout.addWidget(self.prev_btn)
         layout.addWidget(self.next_btn)
+        layout.addWidget(self.export_btn)
         layout.addWidget(self.install_btn)
         
         return footer
@@ -847,6 +1343,10 @@ class ArchFusionInstaller(QMainWindow):
         # Bouton précédent
         self.prev_btn.setEnabled(self.current_page > 0)
         
+        # Import depuis l'accueil, export depuis le résumé
+        self.import_btn.setVisible(self.current_page == 0)
+        self.export_btn.setVisible(self.current_page == total_pages - 1)
+        
         # Bouton suivant / installer
         if self.current_page == total_pages - 1:  # Page de résumé
             self.next_btn.hide()
@@ -871,7 +1371,7 @@ class ArchFusionInstaller(QMainWindow):
         """Page précédente"""
         if self.current_page > 0:
             self.current_page -= 1
-            self.stacked_widget.setCurrentIndex(self.current_page)
+            self.show_page(self.current_page)
             self.update_navigation()
     
     def next_page(self):
@@ -886,11 +1386,12 @@ class ArchFusionInstaller(QMainWindow):
             self.config.update(self.user_page.get_config())
         elif self.current_page == 3:  # Options avancées
             self.config.update(self.advanced_page.get_config())
+            self.prefetch_desktop(self.config['desktop_environment'])
         
         # Aller à la page suivante
         if self.current_page < self.stacked_widget.count() - 2:  # -2 car on exclut la page d'installation
             self.current_page += 1
-            self.stacked_widget.setCurrentIndex(self.current_page)
+            self.show_page(self.current_page)
             
             # Mettre à jour la page de résumé si on y arrive
             if self.current_page == 4:  # Page de résumé
@@ -898,6 +1399,55 @@ class ArchFusionInstaller(QMainWindow):
             
             self.update_navigation()
     
+    def import_plan(self):
+        """Charge un plan d'installation exporté depuis une autre machine"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Importer un plan d'installation", "", PLAN_FILE_FILTER
+        )
+        if path:
+            self.load_plan_file(path)
+    
+    def load_plan_file(self, path: str) -> bool:
+        """Reporte un plan dans l'assistant et affiche le résumé pour vérification"""
+        try:
+            plan = load_plan(path)
+        except PlanError as e:
+            QMessageBox.warning(self, "Plan invalide", f"{path}:\n{e}")
+            return False
+        
+        self.user_page.set_config(plan)
+        self.advanced_page.set_config(plan)
+        self.config.update(plan)
+        self.config.update(self.advanced_page.get_config())
+        self.prefetch_desktop(self.config['desktop_environment'])
+        
+        self.current_page = 4
+        self.show_page(self.current_page)
+        self.summary_page.update_summary(self.config)
+        self.update_navigation()
+        return True
+    
+    def export_plan(self):
+        """Enregistre la configuration courante comme plan réutilisable"""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exporter le plan d'installation", "archfusion-plan.json", PLAN_FILE_FILTER
+        )
+        if not path:
+            return
+        
+        try:
+            save_plan(self.config, path)
+        except (PlanError, OSError) as e:
+            QMessageBox.warning(self, "Export impossible", str(e))
+            return
+        
+        QMessageBox.information(
+            self, "Plan exporté",
+            f"Plan enregistré dans {path}.\n\n"
+            "Installation sans interface:\n"
+            f"sudo python3 gui-installer.py --headless --plan {path} --yes"
+        )
+    
     def start_installation(self):
         """Démarre l'installation"""
         # Vérifier que tous les champs requis sont remplis
@@ -917,7 +1467,7 @@ class ArchFusionInstaller(QMainWindow):
         
         if reply == QMessageBox.Yes:
             # Aller à la page d'installation
-            self.stacked_widget.setCurrentIndex(5)  # Page d'installation
+            self.show_page(5)  # Page d'installation
             self.page_indicator.setText("Installation en cours...")
             
             # Cacher les boutons de navigation
@@ -925,12 +1475,90 @@ class ArchFusionInstaller(QMainWindow):
             self.next_btn.hide()
             self.install_btn.hide()
             
+            # pacstrap reprend les paquets préchargés (et les téléchargements partiels)
+            if self.prefetcher.started:
+                self.prefetcher.stop()
+                self.config['package_cache'] = self.prefetcher.cache_dir
+            
             # Démarrer l'installation
             self.install_page.start_installation(self.config)
 
+def run_headless(plan_path: str, assume_yes: bool = False, resume: bool = True) -> int:
+    """Installation sans affichage depuis un plan, avec le même InstallationWorker"""
+    try:
+        config = load_plan(plan_path)
+    except PlanError as e:
+        print(f"❌ Plan invalide: {plan_path}: {e}", file=sys.stderr)
+        return 1
+    
+    if os.geteuid() != 0:
+        print("❌ L'installateur doit être exécuté en tant que root", file=sys.stderr)
+        return 1
+    
+    if config['offline'] and not offline_repo_available():
+        print("⚠️  Dépôt de l'ISO absent: installation depuis les miroirs")
+        config['offline'] = False
+    if config['image'] and not root_image_path():
+        print("⚠️  Image système de l'ISO absente: installation des paquets")
+        config['image'] = False
+    
+    if not assume_yes:
+        if not sys.stdin.isatty():
+            print("❌ Confirmation impossible sans terminal: utilisez --yes", file=sys.stderr)
+            return 1
+        answer = input(f"⚠️  Toutes les données sur /dev/{config['disk']} seront EFFACÉES. "
+                       "Continuer? (y/N): ")
+        if answer.strip().lower() not in ('y', 'o', 'yes', 'oui'):
+            return 1
+    
+    app = QCoreApplication(sys.argv[:1])
+    worker = InstallationWorker(config, resume)
+    result = {'success': False}
+    
+    def finished(success: bool, message: str):
+        result['success'] = success
+        print(("✅ " if success else "❌ ") + message, flush=True)
+    
+    def step_updated(label: str, status: str):
+        if status == FAILED:
+            print(f"❌ Échec: {label}", flush=True)
+    
+    worker.log_updated.connect(lambda lines: print("\n".join(lines), flush=True))
+    worker.progress_updated.connect(lambda value, status: print(f"[{value:3d}%] {status}", flush=True))
+    worker.step_updated.connect(step_updated)
+    worker.installation_finished.connect(finished)
+    worker.finished.connect(app.quit)
+    
+    # Ctrl+C arrête proprement les étapes; le minuteur rend la main à Python
+    # pour qu'il traite le signal pendant la boucle Qt
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    timer = QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(200)
+    
+    worker.start()
+    app.exec_()
+    worker.wait()
+    return 0 if result['success'] else 1
+
 def main():
     """Fonction principale"""
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Installateur ArchFusion OS")
+    parser.add_argument("--plan", help="plan d'installation à charger (JSON)")
+    parser.add_argument("--headless", action="store_true",
+                        help="installer sans interface graphique depuis --plan")
+    parser.add_argument("--yes", action="store_true",
+                        help="ne pas demander de confirmation (avec --headless)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignorer les points de reprise d'une installation interrompue (avec --headless)")
+    args, qt_args = parser.parse_known_args()
+    
+    if args.headless:
+        if not args.plan:
+            parser.error("--headless nécessite --plan")
+        sys.exit(run_headless(args.plan, args.yes, not args.restart))
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Configuration de l'application
     app.setApplicationName("ArchFusion OS Installer")
@@ -948,6 +1576,8 @@ def main():
     # Créer et afficher la fenêtre principale
     installer = ArchFusionInstaller()
     installer.show()
+    if args.plan:
+        installer.load_plan_file(args.plan)
     
     # Centrer la fenêtre
     screen = app.primaryScreen().geometry()
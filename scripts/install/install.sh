@@ -13,7 +13,7 @@ set -euo pipefail
 
 readonly SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 readonly PROJECT_ROOT="$(cd "${SCRIPT_DIR}/../.." && pwd)"
-readonly LOG_FILE="/tmp/archfusion-install.log"
+LOG_FILE="/tmp/archfusion-install.log"
 readonly CONFIG_FILE="${PROJECT_ROOT}/configs/install.conf"
 
 # Couleurs pour l'affichage
@@ -37,6 +37,96 @@ KEYMAP="fr"
 DESKTOP_ENVIRONMENT="kde"
 ENABLE_ENCRYPTION=false
 SWAP_SIZE="4G"
+ENABLE_SSH=false
+ENABLE_FIREWALL=true
+ENABLE_BLUETOOTH=true
+
+# Pilotes GPU du plan de paquets: auto (matériel courant), all, none ou liste
+GPU_DRIVERS="auto"
+
+# Racine du système cible (--target-root: une par disque en provisionnement, voir provision.py)
+TARGET_ROOT="/mnt"
+
+# GRUB au chemin de secours EFI, sans entrée NVRAM (disque destiné à une autre machine)
+BOOT_REMOVABLE=false
+
+# Installation par copie de l'image racine de l'ISO au lieu de pacstrap (--image)
+IMAGE_MODE=false
+ROOT_IMAGE=""
+readonly ROOT_IMAGE_GLOB="/run/archiso/bootmnt/*/x86_64/airootfs.sfs"
+readonly ISO_BOOT_GLOB="/run/archiso/bootmnt/*/boot"
+
+# Fichiers propres au système live, retirés de la cible après copie de l'image
+readonly LIVE_ONLY_FILES=(
+    /etc/mkinitcpio.conf.d/archiso.conf
+    /etc/mkinitcpio.d/linux.preset
+    /etc/mkinitcpio.d/linux-lts.preset
+    /etc/systemd/system/getty@tty1.service.d/autologin.conf
+    /etc/systemd/system/archfusion-setup.service
+    /root/.automated_script.sh
+    /root/.zlogin
+)
+readonly LIVE_ONLY_PACKAGES=(mkinitcpio-archiso)
+
+# Étape unique à exécuter (--step, utilisé par le moteur engine.py)
+RUN_STEP=""
+STEP_PID=""
+
+# Points de reprise: étape terminée à enregistrer (--checkpoint, écrit par
+# engine.py) et liste de ceux de la cible (--list-checkpoints), voir checkpoints.py
+CHECKPOINT_FILE=""
+LIST_CHECKPOINTS=false
+
+# Empreintes des mots de passe au format de chpasswd -e (--password-file, voir install_plan.py)
+PASSWORD_FILE=""
+
+# Plan de paquets et de services déjà résolu par engine.py (--package-plan:
+# fichiers packages et services), sinon calculé par package_plan.py
+PACKAGE_PLAN_DIR=""
+
+# Cache de paquets préchargés (--package-cache, voir prefetch.py)
+PACKAGE_CACHE=""
+
+# Installation depuis le dépôt intégré à l'ISO (--offline, voir build-iso.sh)
+OFFLINE_MODE=false
+readonly OFFLINE_REPO_DIR="/opt/archfusion/repo"
+readonly OFFLINE_REPO_NAME="archfusion-offline"
+readonly OFFLINE_PACMAN_CONF="/tmp/archfusion-offline-pacman.conf"
+
+# Installation des paquets sans fsync par fichier (--no-fsync, disque neuf):
+# libeatmydata, puis une seule synchronisation vérifiée de la cible
+NO_FSYNC=false
+readonly EATMYDATA_LIB="/usr/lib/libeatmydata.so"
+
+# Disposition de la racine (--fs-layout: système de fichiers, options de mkfs
+# et de montage, sous-volumes; voir layouts/*.conf et fs_layouts.py).
+# Vide: valeur de install.conf (voir load_layout_defaults)
+FS_LAYOUT=""
+readonly LAYOUTS_DIR="${SCRIPT_DIR}/layouts"
+LAYOUT_ROOT_FS=""
+LAYOUT_MKFS_OPTIONS=()
+LAYOUT_MOUNT_OPTIONS=""
+LAYOUT_DISCARD_OPTION=""
+LAYOUT_SUBVOLUMES=()
+LAYOUT_PACKAGES=()
+
+# Instantanés automatiques de la racine (--snapshots, snapper, btrfs seulement)
+SNAPSHOTS=""
+
+# Hook mkinitcpio masqué pendant la transaction unique (voir regenerate_boot_files)
+readonly MKINITCPIO_HOOK_MASK="/etc/pacman.d/hooks/90-mkinitcpio-install.hook"
+
+# Canal de progression (JSON lignes, voir progress.py)
+PROGRESS_FILE=""
+PROGRESS_FD=""
+CURRENT_STAGE=""
+
+# Trace des étapes et sous-étapes (Trace Event, voir install_trace.py)
+TRACE_FILE=""
+TRACE_SUMMARY=false
+SPAN_NAMES=()
+SPAN_CATEGORIES=()
+SPAN_STARTS=()
 
 # ==========================================
 # FONCTIONS UTILITAIRES
@@ -72,6 +162,129 @@ fatal() {
     exit 1
 }
 
+# ==========================================
+# CANAL DE PROGRESSION
+# ==========================================
+
+# Ouvre le canal de progression si --progress-file a été fourni
+progress_open() {
+    if [[ -n $PROGRESS_FILE ]]; then
+        exec {PROGRESS_FD}>"$PROGRESS_FILE"
+    fi
+}
+
+# Publie un événement: progress_event EVENT STAGE [champ=valeur_numérique...]
+progress_event() {
+    [[ -z $PROGRESS_FD ]] && return 0
+
+    local event="$1" stage="$2"
+    shift 2
+
+    local fields="" field
+    for field in "$@"; do
+        fields+=",\"${field%%=*}\":${field#*=}"
+    done
+
+    printf '{"v":1,"event":"%s","stage":"%s","ts":%s%s}\n' \
+        "$event" "$stage" "${EPOCHREALTIME/,/.}" "$fields" >&"${PROGRESS_FD}"
+}
+
+# ==========================================
+# TRACE DES ÉTAPES
+# ==========================================
+
+# Démarre une nouvelle trace (tableau JSON laissé ouvert: les étapes
+# parallèles y ajoutent leurs lignes, install_trace.py le referme)
+trace_open() {
+    [[ -z $TRACE_FILE ]] && return 0
+    mkdir -p "$(dirname "$TRACE_FILE")"
+    echo "[" > "$TRACE_FILE"
+}
+
+# Ajoute un span terminé: trace_event NOM CATÉGORIE DÉBUT_US FIN_US STATUT
+trace_event() {
+    [[ -z $TRACE_FILE ]] && return 0
+    printf '{"name":"%s","cat":"%s","ph":"X","ts":%s,"dur":%s,"pid":1,"tid":%s,"args":{"stage":"%s","status":"%s"}},\n' \
+        "$1" "$2" "$3" "$(($4 - $3))" "$$" "${CURRENT_STAGE:-}" "$5" >> "$TRACE_FILE"
+}
+
+# Ouvre un span (pile: les sous-étapes s'imbriquent dans l'étape)
+span_begin() {
+    SPAN_NAMES+=("$1")
+    SPAN_CATEGORIES+=("${2:-task}")
+    SPAN_STARTS+=("${EPOCHREALTIME/[.,]/}")
+}
+
+# Ferme le dernier span ouvert: span_end [STATUT]
+span_end() {
+    local last=$((${#SPAN_NAMES[@]} - 1))
+    [[ $last -lt 0 ]] && return 0
+    trace_event "${SPAN_NAMES[last]}" "${SPAN_CATEGORIES[last]}" "${SPAN_STARTS[last]}" \
+        "${EPOCHREALTIME/[.,]/}" "${1:-ok}"
+    unset 'SPAN_NAMES[last]' 'SPAN_CATEGORIES[last]' 'SPAN_STARTS[last]'
+}
+
+# Exécute une sous-étape chronométrée: span NOM COMMANDE... (code de retour conservé)
+span() {
+    local name="$1" status=0
+    shift
+    span_begin "$name"
+    "$@" || status=$?
+    if [[ $status -eq 0 ]]; then
+        span_end
+    else
+        span_end failed
+    fi
+    return "$status"
+}
+
+# Exécute une étape d'installation en publiant son début et sa fin
+run_stage() {
+    local stage="$1"
+    shift
+
+    CURRENT_STAGE="$stage"
+    progress_event begin "$stage"
+    span_begin "$stage" stage
+    "$@"
+    span_end
+    progress_event end "$stage"
+    CURRENT_STAGE=""
+}
+
+# Relaye la sortie de pacman/pacstrap et publie l'avancement par paquet
+run_with_package_progress() {
+    local stage="$1"
+    shift
+
+    local line
+    "$@" 2>&1 | while IFS= read -r line; do
+        echo "$line"
+        if [[ $line =~ ^\(\ *([0-9]+)/([0-9]+)\)\ (installing|upgrading|reinstalling|installation|réinstallation|mise) ]]; then
+            progress_event progress "$stage" \
+                "packages_done=${BASH_REMATCH[1]}" "packages_total=${BASH_REMATCH[2]}"
+        fi
+    done
+}
+
+# Signale l'étape en cours comme échouée si le script s'arrête sur une erreur
+on_exit() {
+    local status=$?
+    if [[ $status -ne 0 && -n $CURRENT_STAGE ]]; then
+        progress_event failed "$CURRENT_STAGE"
+    fi
+    
+    # Spans interrompus par l'erreur, puis résumé de l'installation complète
+    while [[ ${#SPAN_NAMES[@]} -gt 0 ]]; do
+        span_end failed
+    done
+    if [[ $TRACE_SUMMARY == true ]]; then
+        local summary_options=()
+        [[ $status -ne 0 ]] && summary_options+=(--failed)
+        python3 "${SCRIPT_DIR}/install_trace.py" summarize "$TRACE_FILE" "${summary_options[@]}" || true
+    fi
+}
+
 # Affichage du banner ArchFusion
 show_banner() {
     clear
@@ -115,11 +328,24 @@ check_prerequisites() {
         success "Mode UEFI détecté"
     fi
     
-    # Vérifier la connexion internet
-    if ! ping -c 1 archlinux.org &> /dev/null; then
+    # Vérifier la connexion internet (facultative avec le dépôt hors ligne)
+    if network_available; then
+        success "Connexion internet OK"
+    elif [[ $OFFLINE_MODE == true ]]; then
+        warning "Pas de connexion internet - installation depuis le dépôt hors ligne uniquement"
+    else
         fatal "Connexion internet requise pour l'installation"
     fi
-    success "Connexion internet OK"
+    
+    if [[ $OFFLINE_MODE == true ]] && [[ ! -f "${OFFLINE_REPO_DIR}/${OFFLINE_REPO_NAME}.db" ]]; then
+        fatal "Dépôt hors ligne introuvable: ${OFFLINE_REPO_DIR}"
+    fi
+    
+    if [[ $IMAGE_MODE == true ]]; then
+        find_root_image > /dev/null || fatal "Image racine de l'ISO introuvable: ${ROOT_IMAGE_GLOB}"
+        command -v unsquashfs &> /dev/null || fatal "unsquashfs requis pour l'installation par image"
+        success "Image système disponible"
+    fi
     
     # Vérifier l'espace disque disponible
     local available_space=$(df / | awk 'NR==2 {print $4}')
@@ -199,14 +425,165 @@ interactive_setup() {
     info "Configuration terminée!"
 }
 
+# Chemin d'une partition (nvme0n1 -> nvme0n1p1, sda -> sda1)
+partition_path() {
+    local disk="$1" number="$2"
+    if [[ $disk =~ [0-9]$ ]]; then
+        echo "/dev/${disk}p${number}"
+    else
+        echo "/dev/${disk}${number}"
+    fi
+}
+
+# Détermine les partitions cibles (déterministe, utilisable par chaque étape)
+resolve_partitions() {
+    if [[ -d /sys/firmware/efi ]]; then
+        EFI_PART="$(partition_path "$TARGET_DISK" 1)"
+        BOOT_PART="$(partition_path "$TARGET_DISK" 2)"
+        SWAP_PART="$(partition_path "$TARGET_DISK" 3)"
+        ROOT_PART="$(partition_path "$TARGET_DISK" 4)"
+    else
+        EFI_PART=""
+        BOOT_PART="$(partition_path "$TARGET_DISK" 1)"
+        SWAP_PART="$(partition_path "$TARGET_DISK" 2)"
+        ROOT_PART="$(partition_path "$TARGET_DISK" 3)"
+    fi
+    
+    if [[ $ENABLE_ENCRYPTION == true ]]; then
+        ROOT_MOUNT="/dev/mapper/cryptroot"
+    else
+        ROOT_MOUNT="$ROOT_PART"
+    fi
+}
+
+# Libère la cible d'une installation précédente (swap, montages, LUKS)
+release_target() {
+    swapoff "$SWAP_PART" 2> /dev/null || true
+    if mountpoint -q "${TARGET_ROOT}"; then
+        umount -R "${TARGET_ROOT}"
+    fi
+    if [[ -e /dev/mapper/cryptroot ]]; then
+        cryptsetup close cryptroot
+    fi
+}
+
+# Exécute une commande dans le système cible, dans un espace de montage
+# privé pour que plusieurs étapes puissent utiliser le chroot en parallèle
+in_target() {
+    unshare --mount --propagation private arch-chroot "$TARGET_ROOT" "$@"
+}
+
+# Vrai si les miroirs sont joignables
+network_available() {
+    ping -c 1 -W 3 archlinux.org &> /dev/null
+}
+
+# Écrit une configuration pacman qui consulte le dépôt hors ligne avant les
+# miroirs; sans réseau, seul le dépôt hors ligne est conservé
+# (usage: write_offline_pacman_conf SOURCE DESTINATION)
+write_offline_pacman_conf() {
+    local network=false
+    network_available && network=true
+    
+    awk -v repo="$OFFLINE_REPO_NAME" -v dir="$OFFLINE_REPO_DIR" -v network="$network" '
+        /^\[/ && $0 != "[options]" && !inserted {
+            print "[" repo "]"
+            print "SigLevel = Required DatabaseOptional"
+            print "Server = file://" dir
+            print ""
+            inserted = 1
+        }
+        /^\[/ { section = $0 }
+        network == "true" || section == "" || section == "[options]" { print }
+    ' "$1" > "$2.$$"
+    # Remplacement atomique: des installations parallèles peuvent lire ce fichier
+    mv -f "$2.$$" "$2"
+}
+
+# Configuration pacman de l'hôte utilisée pour l'installation
+pacman_config_path() {
+    if [[ $OFFLINE_MODE == true ]]; then
+        write_offline_pacman_conf /etc/pacman.conf "$OFFLINE_PACMAN_CONF"
+        echo "$OFFLINE_PACMAN_CONF"
+    else
+        echo /etc/pacman.conf
+    fi
+}
+
+# Options de pacstrap: configuration hors ligne éventuelle
+pacstrap_options() {
+    [[ $OFFLINE_MODE != true ]] && return 0
+    echo "-C $(pacman_config_path)"
+}
+
+# Option --cachedir de pacstrap: cache préchargé (les paquets ne sont
+# installés que depuis l'hôte, jamais depuis le chroot)
+pacman_cache_args() {
+    [[ -z $PACKAGE_CACHE ]] && return 0
+    echo "--cachedir ${PACKAGE_CACHE}"
+}
+
+# Plan de paquets (ou de services) correspondant aux choix de l'installation
+# (usage: package_plan --packages|--services, voir package_plan.py)
+package_plan() {
+    if [[ -n $PACKAGE_PLAN_DIR ]]; then
+        cat "${PACKAGE_PLAN_DIR}/${1#--}"
+        return
+    fi
+    
+    local args=(--desktop "$DESKTOP_ENVIRONMENT")
+    [[ $ENABLE_BLUETOOTH != true ]] && args+=(--no-bluetooth)
+    [[ $ENABLE_FIREWALL != true ]] && args+=(--no-firewall)
+    [[ $ENABLE_SSH == true ]] && args+=(--ssh)
+    [[ -f $CONFIG_FILE ]] && args+=(--config "$CONFIG_FILE")
+    args+=(--gpu "$GPU_DRIVERS")
+    
+    python3 "${SCRIPT_DIR}/package_plan.py" "${args[@]}" "$@"
+}
+
+# Paquets du système cible: plan de paquets, outils de la disposition de la
+# racine et snapper pour les instantanés
+target_packages() {
+    package_plan --packages
+    [[ ${#LAYOUT_PACKAGES[@]} -gt 0 ]] && printf '%s\n' "${LAYOUT_PACKAGES[@]}"
+    [[ $SNAPSHOTS == true ]] && echo snapper
+    return 0
+}
+
+# Retire du plan les paquets absents des dépôts configurés
+# (usage: available_packages CONFIG PAQUET...)
+available_packages() {
+    local config="$1"
+    shift
+    
+    local missing
+    missing=$(LC_ALL=C pacman --config "$config" --root "${TARGET_ROOT}" --dbpath "${TARGET_ROOT}/var/lib/pacman" \
+        -Sp --noconfirm "$@" 2>&1 >/dev/null | sed -n 's/^error: target not found: //p' || true)
+    
+    local package
+    for package in "$@"; do
+        if grep -qxF "$package" <<< "$missing"; then
+            warning "Paquet introuvable dans les dépôts, ignoré: ${package}" >&2
+        else
+            echo "$package"
+        fi
+    done
+}
+
 # Partitionnement du disque
 partition_disk() {
     info "Partitionnement du disque /dev/${TARGET_DISK}..."
     
-    # Avertissement
-    echo -e "${RED}⚠ ATTENTION: Toutes les données sur /dev/${TARGET_DISK} seront EFFACÉES!${NC}"
-    read -p "$(echo -e "${YELLOW}Continuer? (y/N): ${NC}")" confirm
-    [[ ! $confirm =~ ^[Yy]$ ]] && fatal "Installation annulée par l'utilisateur"
+    # Avertissement (l'interface graphique a déjà demandé confirmation)
+    if [[ $INSTALL_MODE != "auto" ]]; then
+        echo -e "${RED}⚠ ATTENTION: Toutes les données sur /dev/${TARGET_DISK} seront EFFACÉES!${NC}"
+        read -p "$(echo -e "${YELLOW}Continuer? (y/N): ${NC}")" confirm
+        [[ ! $confirm =~ ^[Yy]$ ]] && fatal "Installation annulée par l'utilisateur"
+    fi
+    
+    # Cible d'une tentative précédente encore montée (reprise avec un autre plan)
+    resolve_partitions
+    release_target
     
     # Effacer la table de partition
     wipefs -af "/dev/${TARGET_DISK}"
@@ -220,12 +597,6 @@ partition_disk() {
             mkpart "Boot" ext4 513MiB 1537MiB \
             mkpart "Swap" linux-swap 1537MiB $((1537 + ${SWAP_SIZE%G} * 1024))MiB \
             mkpart "Root" ext4 $((1537 + ${SWAP_SIZE%G} * 1024))MiB 100%
-        
-        # Variables des partitions
-        EFI_PART="/dev/${TARGET_DISK}1"
-        BOOT_PART="/dev/${TARGET_DISK}2"
-        SWAP_PART="/dev/${TARGET_DISK}3"
-        ROOT_PART="/dev/${TARGET_DISK}4"
     else
         # Partitionnement BIOS
         parted -s "/dev/${TARGET_DISK}" \
@@ -234,150 +605,450 @@ partition_disk() {
             set 1 boot on \
             mkpart primary linux-swap 513MiB $((513 + ${SWAP_SIZE%G} * 1024))MiB \
             mkpart primary ext4 $((513 + ${SWAP_SIZE%G} * 1024))MiB 100%
-        
-        # Variables des partitions
-        BOOT_PART="/dev/${TARGET_DISK}1"
-        SWAP_PART="/dev/${TARGET_DISK}2"
-        ROOT_PART="/dev/${TARGET_DISK}3"
     fi
     
+    # Attendre la création des nœuds de partition par udev
+    udevadm settle
+    resolve_partitions
+    
     success "Partitionnement terminé"
 }
 
+# Disposition de la racine (--fs-layout): layouts/NOM.conf définit les
+# variables LAYOUT_*. Les instantanés demandent des sous-volumes btrfs
+load_fs_layout() {
+    local layout_file="${LAYOUTS_DIR}/${FS_LAYOUT}.conf"
+    [[ -f $layout_file ]] || fatal "Disposition inconnue: ${FS_LAYOUT} (voir ${LAYOUTS_DIR})"
+    source "$layout_file"
+    if [[ $SNAPSHOTS == true && $LAYOUT_ROOT_FS != btrfs ]]; then
+        warning "Instantanés ignorés: disposition ${FS_LAYOUT} sans btrfs"
+        SNAPSHOTS=false
+    fi
+}
+
 # Formatage des partitions
-format_partitions() {
-    info "Formatage des partitions..."
-    
+format_efi() {
     if [[ -n ${EFI_PART:-} ]]; then
         mkfs.fat -F32 -n "EFI" "$EFI_PART"
         success "Partition EFI formatée"
     fi
-    
-    mkfs.ext4 -L "Boot" "$BOOT_PART"
+}
+
+format_boot() {
+    mkfs.ext4 -F -L "Boot" "$BOOT_PART"
     success "Partition Boot formatée"
-    
+}
+
+format_swap() {
     mkswap -L "Swap" "$SWAP_PART"
     success "Partition Swap formatée"
-    
+}
+
+format_root() {
     if [[ $ENABLE_ENCRYPTION == true ]]; then
         info "Configuration du chiffrement LUKS..."
+        # Conteneur ouvert par une tentative interrompue de cette étape
+        if [[ -e /dev/mapper/cryptroot ]]; then
+            cryptsetup close cryptroot
+        fi
         cryptsetup luksFormat --type luks2 "$ROOT_PART"
         cryptsetup open "$ROOT_PART" cryptroot
-        mkfs.ext4 -L "Root" /dev/mapper/cryptroot
-        ROOT_MOUNT="/dev/mapper/cryptroot"
-    else
-        mkfs.ext4 -L "Root" "$ROOT_PART"
-        ROOT_MOUNT="$ROOT_PART"
     fi
     
+    "mkfs.${LAYOUT_ROOT_FS}" "${LAYOUT_MKFS_OPTIONS[@]}" -L "Root" "$ROOT_MOUNT"
+    create_subvolumes
+    success "Partition Root formatée (${FS_LAYOUT})"
+}
+
+# Sous-volumes de la disposition, créés au sommet du système de fichiers
+create_subvolumes() {
+    [[ ${#LAYOUT_SUBVOLUMES[@]} -gt 0 ]] || return 0
+    local top entry
+    top="$(mktemp -d)"
+    mount "$ROOT_MOUNT" "$top"
+    for entry in "${LAYOUT_SUBVOLUMES[@]}"; do
+        btrfs subvolume create "${top}/${entry%%:*}"
+    done
+    umount "$top"
+    rmdir "$top"
+}
+
+format_partitions() {
+    info "Formatage des partitions..."
+    
+    format_efi
+    format_boot
+    format_swap
+    format_root
+    
     success "Toutes les partitions formatées"
 }
 
-# Montage des partitions
+# Options de montage de la racine: celles de la disposition, plus l'abandon
+# asynchrone des blocs libérés si le périphérique l'accepte (SSD, disque
+# virtuel; pas un conteneur LUKS ouvert sans --allow-discards)
+root_mount_options() {
+    local options="$LAYOUT_MOUNT_OPTIONS" discard_max
+    if [[ -n $LAYOUT_DISCARD_OPTION ]]; then
+        discard_max="$(lsblk -b -d -n -o DISC-MAX "$ROOT_MOUNT" 2> /dev/null | tr -d ' ')"
+        [[ ${discard_max:-0} -gt 0 ]] && options+=",${LAYOUT_DISCARD_OPTION}"
+    fi
+    echo "$options"
+}
+
+# Racine: le système de fichiers, ou chaque sous-volume à son point de montage
+mount_root() {
+    local options entry subvolume path
+    options="$(root_mount_options)"
+    
+    mkdir -p "${TARGET_ROOT}"
+    if [[ ${#LAYOUT_SUBVOLUMES[@]} -eq 0 ]]; then
+        mountpoint -q "${TARGET_ROOT}" || mount -o "$options" "$ROOT_MOUNT" "${TARGET_ROOT}"
+        return 0
+    fi
+    for entry in "${LAYOUT_SUBVOLUMES[@]}"; do
+        subvolume="${entry%%:*}"
+        path="${TARGET_ROOT}${entry#*:}"
+        mkdir -p "$path"
+        mountpoint -q "$path" || mount -o "${options},subvol=${subvolume}" "$ROOT_MOUNT" "$path"
+    done
+}
+
+# Montage des partitions (ce qui l'est déjà est conservé: reprise)
 mount_partitions() {
     info "Montage des partitions..."
     
-    mount "$ROOT_MOUNT" /mnt
+    mount_root
     
-    mkdir -p /mnt/boot
-    mount "$BOOT_PART" /mnt/boot
+    mkdir -p "${TARGET_ROOT}/boot"
+    mountpoint -q "${TARGET_ROOT}/boot" || mount "$BOOT_PART" "${TARGET_ROOT}/boot"
     
     if [[ -n ${EFI_PART:-} ]]; then
-        mkdir -p /mnt/boot/efi
-        mount "$EFI_PART" /mnt/boot/efi
+        mkdir -p "${TARGET_ROOT}/boot/efi"
+        mountpoint -q "${TARGET_ROOT}/boot/efi" || mount "$EFI_PART" "${TARGET_ROOT}/boot/efi"
     fi
     
-    swapon "$SWAP_PART"
+    if ! swapon --show=NAME --noheadings | grep -qx "$SWAP_PART"; then
+        swapon "$SWAP_PART"
+    fi
     
     success "Partitions montées"
 }
 
+# Mise à jour des miroirs
+rank_mirrors() {
+    if [[ $OFFLINE_MODE == true ]] && ! network_available; then
+        info "Hors ligne: classement des miroirs ignoré"
+        return 0
+    fi
+    
+    info "Mise à jour des miroirs..."
+    # Sondes parallèles avec résultat en cache (voir mirror_rank.py), reflector en secours
+    if ! span mirror_rank python3 "${SCRIPT_DIR}/mirror_rank.py" --save /etc/pacman.d/mirrorlist; then
+        warning "Classement des miroirs impossible, utilisation de reflector"
+        span reflector reflector --country France,Germany,Netherlands --age 12 --protocol https --sort rate --save /etc/pacman.d/mirrorlist
+    fi
+}
+
+# Installation du plan de paquets complet (système, bureau, pilotes) en une
+# seule transaction pacstrap
+install_base_packages() {
+    local plan packages config
+    mapfile -t plan < <(target_packages)
+    [[ ${#plan[@]} -eq 0 ]] && fatal "Plan de paquets vide"
+    
+    # Synchronisation préalable de la base de la cible pour écarter les
+    # paquets introuvables, qui feraient échouer toute la transaction
+    config="$(pacman_config_path)"
+    mkdir -p "${TARGET_ROOT}/var/lib/pacman"
+    span pacman-sync pacman --config "$config" --root "${TARGET_ROOT}" --dbpath "${TARGET_ROOT}/var/lib/pacman" -Sy --noconfirm > /dev/null
+    mapfile -t packages < <(available_packages "$config" "${plan[@]}")
+    info "Plan de paquets: ${#packages[@]} paquets (bureau: ${DESKTOP_ENVIRONMENT})"
+    
+    # L'initramfs est généré une seule fois à la fin (étape boot_images)
+    mkdir -p "${TARGET_ROOT}$(dirname "$MKINITCPIO_HOOK_MASK")"
+    ln -sf /dev/null "${TARGET_ROOT}${MKINITCPIO_HOOK_MASK}"
+    
+    # Les options placées après la racine sont transmises à pacman
+    span pacstrap run_with_package_progress "${CURRENT_STAGE:-base}" pacstrap $(pacstrap_options) "${TARGET_ROOT}" $(pacman_cache_args) \
+        "${packages[@]}"
+}
+
+# Image racine de l'ISO: --image CHEMIN, sinon celle du média de démarrage
+find_root_image() {
+    if [[ -n $ROOT_IMAGE ]]; then
+        echo "$ROOT_IMAGE"
+        return 0
+    fi
+    local image
+    for image in $ROOT_IMAGE_GLOB; do
+        [[ -f $image ]] && echo "$image" && return 0
+    done
+    return 1
+}
+
+# Copie de l'image racine de l'ISO sur la partition formatée: décompression en
+# flux par unsquashfs (écritures séquentielles, fichiers creux préservés),
+# puis retrait des éléments propres au système live
+install_root_image() {
+    local image
+    image="$(find_root_image)" || fatal "Image racine introuvable (${ROOT_IMAGE_GLOB})"
+    info "Copie de l'image système ${image}..."
+    
+    # Le dépôt hors ligne n'a pas sa place sur le système installé
+    local excludes
+    excludes="$(mktemp)"
+    echo "${OFFLINE_REPO_DIR#/}" > "$excludes"
+    
+    # -percentage: une valeur par ligne, convertie en octets de l'image lus
+    local size line
+    size=$(stat -c %s "$image")
+    span_begin unsquashfs
+    unsquashfs -f -d "${TARGET_ROOT}" -ef "$excludes" -processors "$(nproc)" \
+        -da 256 -fr 256 -percentage "$image" | while IFS= read -r line; do
+        [[ $line =~ ^[0-9]+$ ]] || continue
+        progress_event progress "${CURRENT_STAGE:-base}" \
+            "bytes_done=$((size * line / 100))" "bytes_total=${size}"
+    done
+    span_end
+    rm -f "$excludes"
+    
+    # Nettoyage du système live; l'initramfs et les presets sont recréés par
+    # regenerate_boot_files (hook mkinitcpio masqué d'ici là)
+    local file
+    for file in "${LIVE_ONLY_FILES[@]}"; do
+        rm -f "${TARGET_ROOT}${file}"
+    done
+    sed -i -E 's/[[:space:]]archiso[a-z_]*//g' "${TARGET_ROOT}/etc/mkinitcpio.conf"
+    : > "${TARGET_ROOT}/etc/machine-id"
+    : > "${TARGET_ROOT}/etc/fstab"
+    mkdir -p "${TARGET_ROOT}$(dirname "$MKINITCPIO_HOOK_MASK")"
+    ln -sf /dev/null "${TARGET_ROOT}${MKINITCPIO_HOOK_MASK}"
+    
+    local package
+    for package in "${LIVE_ONLY_PACKAGES[@]}"; do
+        if in_target pacman -Q "$package" &> /dev/null; then
+            in_target pacman -Rdd --noconfirm "$package"
+        fi
+    done
+    
+    # mkarchiso vide /boot de l'image: les microcodes sont repris sur le média
+    local ucode
+    for ucode in $ISO_BOOT_GLOB/*-ucode.img; do
+        [[ -f $ucode ]] && cp "$ucode" "${TARGET_ROOT}/boot/"
+    done
+    
+    # Paquets du plan absents de l'image (autre bureau, SSH...): une transaction --needed
+    local plan packages config
+    mapfile -t plan < <(target_packages)
+    config="$(pacman_config_path)"
+    span pacman-sync pacman --config "$config" --root "${TARGET_ROOT}" --dbpath "${TARGET_ROOT}/var/lib/pacman" -Sy --noconfirm > /dev/null
+    mapfile -t packages < <(available_packages "$config" "${plan[@]}")
+    span pacstrap run_with_package_progress "${CURRENT_STAGE:-base}" pacstrap $(pacstrap_options) "${TARGET_ROOT}" $(pacman_cache_args) \
+        --needed "${packages[@]}"
+    
+    success "Image système copiée"
+}
+
+# Désactive fsync, fdatasync, sync... pour les commandes suivantes (--no-fsync).
+# La bibliothèque est aussi copiée dans la cible, au même chemin, pour les
+# hooks de pacman exécutés dans le chroot
+bulk_io_begin() {
+    [[ $NO_FSYNC == true ]] || return 0
+    if [[ ! -f $EATMYDATA_LIB ]]; then
+        warning "libeatmydata absente: installation avec fsync"
+        NO_FSYNC=false
+        return 0
+    fi
+    install -D -m 755 "$EATMYDATA_LIB" "${TARGET_ROOT}${EATMYDATA_LIB}"
+    export LD_PRELOAD="$EATMYDATA_LIB"
+    info "Écritures sans fsync jusqu'à la synchronisation de la cible"
+}
+
+# Rétablit fsync puis synchronise chaque système de fichiers de la cible en
+# une fois; syncfs signale les erreurs d'écriture différée, qui arrêtent
+# l'installation avant le chargeur de démarrage (pas de point de reprise)
+bulk_io_end() {
+    [[ $NO_FSYNC == true ]] || return 0
+    unset LD_PRELOAD
+    rm -f "${TARGET_ROOT}${EATMYDATA_LIB}"
+    
+    local mount_point
+    for mount_point in "${TARGET_ROOT}" "${TARGET_ROOT}/boot" "${TARGET_ROOT}/boot/efi"; do
+        mountpoint -q "$mount_point" || continue
+        span sync sync -f "$mount_point" \
+            || fatal "Synchronisation de ${mount_point} échouée: écritures de la cible perdues"
+    done
+    success "Cible synchronisée"
+}
+
+# Système cible: copie de l'image de l'ISO (--image) ou plan de paquets
+install_target_system() {
+    # Restes d'une tentative interrompue (coupure, arrêt forcé): verrou de
+    # pacman (la base de la cible n'est utilisée que par cette étape) et
+    # bibliothèque de --no-fsync
+    rm -f "${TARGET_ROOT}/var/lib/pacman/db.lck" "${TARGET_ROOT}${EATMYDATA_LIB}"
+    
+    bulk_io_begin
+    if [[ $IMAGE_MODE == true ]]; then
+        install_root_image
+    else
+        install_base_packages
+    fi
+    bulk_io_end
+}
+
 # Installation du système de base
 install_base_system() {
     info "Installation du système de base..."
     
-    # Mise à jour des miroirs
-    reflector --country France,Germany,Netherlands --age 12 --protocol https --sort rate --save /etc/pacman.d/mirrorlist
-    
-    # Installation des paquets de base
-    pacstrap /mnt base base-devel linux linux-firmware \
-        networkmanager grub efibootmgr \
-        git vim nano sudo zsh \
-        intel-ucode amd-ucode
+    rank_mirrors
+    install_target_system
     
     success "Système de base installé"
 }
 
-# Configuration du système
-configure_system() {
-    info "Configuration du système..."
-    
-    # Génération du fstab
-    genfstab -U /mnt >> /mnt/etc/fstab
-    
-    # Configuration dans le chroot
-    arch-chroot /mnt /bin/bash << EOF
+# Génération du fstab
+generate_fstab() {
+    genfstab -U "${TARGET_ROOT}" > "${TARGET_ROOT}/etc/fstab"
+    # Sous-volumes désignés par leur nom seulement: subvolid change si / est
+    # restauré depuis un instantané
+    if [[ ${#LAYOUT_SUBVOLUMES[@]} -gt 0 ]]; then
+        sed -i -E 's/,subvolid=[0-9]+//' "${TARGET_ROOT}/etc/fstab"
+    fi
+}
+
 # Fuseau horaire
+configure_timezone() {
+    in_target /bin/bash << EOF
 ln -sf /usr/share/zoneinfo/${TIMEZONE} /etc/localtime
 hwclock --systohc
+EOF
+}
 
 # Localisation
-echo "${LOCALE} UTF-8" >> /etc/locale.gen
+configure_locale() {
+    span locale-gen in_target /bin/bash << EOF
+grep -qx "${LOCALE} UTF-8" /etc/locale.gen || echo "${LOCALE} UTF-8" >> /etc/locale.gen
 locale-gen
 echo "LANG=${LOCALE}" > /etc/locale.conf
 echo "KEYMAP=${KEYMAP}" > /etc/vconsole.conf
+EOF
+}
 
 # Nom d'hôte
-echo "${HOSTNAME}" > /etc/hostname
-cat > /etc/hosts << EOH
+configure_hostname() {
+    echo "${HOSTNAME}" > "${TARGET_ROOT}/etc/hostname"
+    cat > "${TARGET_ROOT}/etc/hosts" << EOF
 127.0.0.1   localhost
 ::1         localhost
 127.0.1.1   ${HOSTNAME}.localdomain ${HOSTNAME}
-EOH
+EOF
+}
 
 # Utilisateur
-useradd -m -G wheel,audio,video,optical,storage -s /bin/zsh ${USERNAME}
-echo "${USERNAME} ALL=(ALL) ALL" >> /etc/sudoers
+create_user() {
+    in_target /bin/bash << EOF
+id -u ${USERNAME} &> /dev/null || useradd -m -G wheel,audio,video,optical,storage -s /bin/zsh ${USERNAME}
+grep -qx "${USERNAME} ALL=(ALL) ALL" /etc/sudoers || echo "${USERNAME} ALL=(ALL) ALL" >> /etc/sudoers
+EOF
+}
 
-# Services
-systemctl enable NetworkManager
-systemctl enable fstrim.timer
+# Services du plan dont l'unité a bien été installée
+enable_services() {
+    local plan services=() service
+    mapfile -t plan < <(package_plan --services)
+    
+    for service in "${plan[@]}"; do
+        if [[ -e "${TARGET_ROOT}/usr/lib/systemd/system/${service}" ]] || [[ -e "${TARGET_ROOT}/usr/lib/systemd/system/${service}.service" ]]; then
+            services+=("$service")
+        else
+            warning "Service absent de la cible, non activé: ${service}"
+        fi
+    done
+    [[ ${#services[@]} -gt 0 ]] && in_target systemctl enable "${services[@]}"
+    
+    # PipeWire: services utilisateur activés pour toutes les sessions
+    if [[ -e "${TARGET_ROOT}/usr/lib/systemd/user/pipewire-pulse.socket" ]]; then
+        in_target systemctl --global enable pipewire.socket pipewire-pulse.socket
+    fi
+    
+    configure_snapshots
+}
+
+# Instantanés de la racine: configuration snapper écrite directement (le
+# sous-volume @snapshots est déjà monté sur /.snapshots, "snapper
+# create-config" en créerait un second), rétention de install.conf
+configure_snapshots() {
+    [[ $SNAPSHOTS == true ]] || return 0
+    mkdir -p "${TARGET_ROOT}/etc/snapper/configs"
+    python3 "${SCRIPT_DIR}/fs_layouts.py" snapper-config > "${TARGET_ROOT}/etc/snapper/configs/root"
+    chmod 640 "${TARGET_ROOT}/etc/snapper/configs/root"
+    if [[ -f "${TARGET_ROOT}/etc/conf.d/snapper" ]]; then
+        sed -i 's/^SNAPPER_CONFIGS=.*/SNAPPER_CONFIGS="root"/' "${TARGET_ROOT}/etc/conf.d/snapper"
+    else
+        install -D -m 644 /dev/stdin "${TARGET_ROOT}/etc/conf.d/snapper" <<< 'SNAPPER_CONFIGS="root"'
+    fi
+    chmod 750 "${TARGET_ROOT}/.snapshots"
+    in_target systemctl enable snapper-timeline.timer snapper-cleanup.timer
+    success "Instantanés automatiques de la racine activés (snapper)"
+}
 
 # Bootloader
+install_bootloader() {
+    # --removable: chemin de secours EFI/BOOT, sans modifier la NVRAM de cette machine
+    local grub_efi_options=""
+    [[ $BOOT_REMOVABLE == true ]] && grub_efi_options="--removable"
+    
+    span grub-install in_target /bin/bash << EOF
 if [[ -d /sys/firmware/efi ]]; then
-    grub-install --target=x86_64-efi --efi-directory=/boot/efi --bootloader-id=ArchFusion
+    grub-install --target=x86_64-efi --efi-directory=/boot/efi --bootloader-id=ArchFusion ${grub_efi_options}
 else
     grub-install --target=i386-pc /dev/${TARGET_DISK}
 fi
 
-# Configuration GRUB
+# Configuration GRUB (grub.cfg est généré par regenerate_boot_files)
 sed -i 's/GRUB_DISTRIBUTOR="Arch"/GRUB_DISTRIBUTOR="ArchFusion"/' /etc/default/grub
-grub-mkconfig -o /boot/grub/grub.cfg
 EOF
-
-    success "Système configuré"
 }
 
-# Installation de l'environnement de bureau
-install_desktop_environment() {
-    info "Installation de l'environnement de bureau KDE Plasma..."
+# Passe finale unique: initramfs des noyaux installés puis grub.cfg, une fois
+# la locale, le clavier et le chargeur de démarrage configurés
+regenerate_boot_files() {
+    info "Génération de l'initramfs et de la configuration GRUB..."
     
-    arch-chroot /mnt /bin/bash << 'EOF'
-# Installation KDE Plasma
-pacman -S --noconfirm plasma-meta kde-applications-meta \
-    sddm firefox kitty dolphin kate \
-    pipewire pipewire-alsa pipewire-pulse pipewire-jack \
-    ttf-dejavu ttf-liberation noto-fonts \
-    packagekit-qt5
-
-# Activation de SDDM
-systemctl enable sddm
-
-# Configuration PipeWire
-systemctl --user enable pipewire pipewire-pulse
+    rm -f "${TARGET_ROOT}${MKINITCPIO_HOOK_MASK}"
+    
+    # Initramfs réduit à la racine et au contrôleur de cette machine (presets
+    # repris par le hook); l'image de secours garde la configuration complète
+    if ! span initramfs_slim python3 "${SCRIPT_DIR}/../initramfs_slim.py" configure --root "${TARGET_ROOT}"; then
+        warning "Initramfs réduit non configuré: configuration complète conservée"
+    fi
+    
+    # Le script du hook mkinitcpio crée les presets et les images des noyaux
+    # qu'il reçoit sur l'entrée standard, comme lors d'une transaction pacman
+    span mkinitcpio in_target /bin/bash << 'EOF'
+cd /
+ls usr/lib/modules/*/vmlinuz | /usr/share/libalpm/scripts/mkinitcpio install
 EOF
+    span grub-mkconfig in_target grub-mkconfig -o /boot/grub/grub.cfg
+    
+    success "Initramfs et GRUB générés"
+}
+
+# Configuration du système
+configure_system() {
+    info "Configuration du système..."
+    
+    generate_fstab
+    configure_timezone
+    configure_locale
+    configure_hostname
+    create_user
+    enable_services
+    install_bootloader
 
-    success "Environnement de bureau installé"
+    success "Système configuré"
 }
 
 # Application des configurations ArchFusion
@@ -386,14 +1057,14 @@ apply_archfusion_configs() {
     
     # Copier les configurations personnalisées
     if [[ -d "${PROJECT_ROOT}/configs" ]]; then
-        cp -r "${PROJECT_ROOT}/configs"/* /mnt/etc/
+        cp -r "${PROJECT_ROOT}/configs"/* "${TARGET_ROOT}/etc/"
         success "Configurations ArchFusion appliquées"
     fi
     
     # Copier les thèmes et wallpapers
     if [[ -d "${PROJECT_ROOT}/assets" ]]; then
-        mkdir -p /mnt/usr/share/archfusion
-        cp -r "${PROJECT_ROOT}/assets"/* /mnt/usr/share/archfusion/
+        mkdir -p "${TARGET_ROOT}/usr/share/archfusion"
+        cp -r "${PROJECT_ROOT}/assets"/* "${TARGET_ROOT}/usr/share/archfusion/"
         success "Assets ArchFusion installés"
     fi
 }
@@ -402,18 +1073,30 @@ apply_archfusion_configs() {
 finalize_installation() {
     info "Finalisation de l'installation..."
     
-    # Définir les mots de passe
+    # Définir les mots de passe (empreintes du plan, sinon saisie interactive)
     echo -e "${CYAN}Configuration des mots de passe:${NC}"
     
-    echo "Mot de passe root:"
-    arch-chroot /mnt passwd
-    
-    echo "Mot de passe pour ${USERNAME}:"
-    arch-chroot /mnt passwd "$USERNAME"
+    local account
+    for account in root "$USERNAME"; do
+        if [[ -n $PASSWORD_FILE ]] && grep -q "^${account}:" "$PASSWORD_FILE"; then
+            grep "^${account}:" "$PASSWORD_FILE" | in_target chpasswd -e
+            success "Mot de passe de ${account} défini depuis le plan"
+        else
+            echo "Mot de passe pour ${account}:"
+            arch-chroot "${TARGET_ROOT}" passwd "$account"
+        fi
+    done
     
-    # Nettoyage
-    umount -R /mnt
-    [[ $ENABLE_ENCRYPTION == true ]] && cryptsetup close cryptroot
+    # Historique des installations (live en mémoire) conservé sur le système installé
+    if [[ -n $TRACE_FILE && -f $TRACE_FILE ]]; then
+        python3 "${SCRIPT_DIR}/install_trace.py" copy-history "$TRACE_FILE" \
+            --output "${TARGET_ROOT}/var/lib/archfusion/install-history.json" || \
+            warning "Copie de l'historique des installations impossible"
+    fi
+
+    # Nettoyage: une installation terminée n'a plus de points de reprise
+    python3 "${SCRIPT_DIR}/checkpoints.py" clear --disk "$TARGET_DISK" --target-root "$TARGET_ROOT"
+    release_target
     
     success "Installation terminée!"
     
@@ -426,8 +1109,13 @@ finalize_installation() {
     echo -e "  Hostname: ${HOSTNAME}"
     echo ""
     
-    read -p "$(echo -e "${CYAN}Redémarrer maintenant? (y/N): ${NC}")" reboot_now
-    [[ $reboot_now =~ ^[Yy]$ ]] && reboot
+    # Installation sans terminal (plan rejoué): pas de question
+    if [[ -t 0 ]]; then
+        read -p "$(echo -e "${CYAN}Redémarrer maintenant? (y/N): ${NC}")" reboot_now
+        if [[ $reboot_now =~ ^[Yy]$ ]]; then
+            reboot
+        fi
+    fi
 }
 
 # ==========================================
@@ -438,29 +1126,143 @@ main() {
     # Vérifier les privilèges root
     [[ $EUID -ne 0 ]] && fatal "Ce script doit être exécuté en tant que root"
     
-    # Initialiser le log
-    echo "=== ArchFusion OS Installation - $(date) ===" > "$LOG_FILE"
+    # Initialiser le log: le précédent est archivé (LOG_MAX_SIZE, LOG_ROTATE_COUNT) au lieu d'être écrasé
+    python3 "${SCRIPT_DIR}/log_store.py" rotate-file "$LOG_FILE" || warning "Rotation de $LOG_FILE impossible"
+    echo "=== ArchFusion OS Installation - $(date) ===" >> "$LOG_FILE"
+    
+    # Canal de progression pour l'interface graphique
+    progress_open
+    
+    # Trace de l'installation complète, résumée dans l'historique à la sortie
+    TRACE_FILE="${TRACE_FILE:-${LOG_FILE%.log}-trace.json}"
+    TRACE_SUMMARY=true
+    trace_open
+    trap on_exit EXIT
     
     # Affichage du banner
     show_banner
     
     # Vérification des prérequis
-    check_prerequisites
+    run_stage prerequisites check_prerequisites
     
     # Configuration
-    if [[ $INSTALL_MODE == "interactive" ]] || [[ $# -eq 0 ]]; then
+    if [[ $INSTALL_MODE == "interactive" ]] || [[ -z $TARGET_DISK ]]; then
         interactive_setup
     fi
     
     # Étapes d'installation
-    partition_disk
-    format_partitions
+    run_stage partition partition_disk
+    run_stage format format_partitions
+    run_stage mount mount_partitions
+    run_stage base install_base_system
+    run_stage configure configure_system
+    run_stage configs apply_archfusion_configs
+    run_stage boot_images regenerate_boot_files
+    run_stage finalize finalize_installation
+}
+
+# ==========================================
+# EXÉCUTION PAR ÉTAPES
+# ==========================================
+
+# Étapes exécutables individuellement avec --step (voir INSTALL_STEPS dans engine.py)
+declare -A STEP_FUNCTIONS=(
+    [prerequisites]=check_prerequisites
+    [rank_mirrors]=rank_mirrors
+    [partition]=partition_disk
+    [format_efi]=format_efi
+    [format_boot]=format_boot
+    [format_swap]=format_swap
+    [format_root]=format_root
+    [mount]=mount_partitions
+    [base]=install_target_system
+    [fstab]=generate_fstab
+    [timezone]=configure_timezone
+    [locale]=configure_locale
+    [hostname]=configure_hostname
+    [user]=create_user
+    [services]=enable_services
+    [bootloader]=install_bootloader
+    [configs]=apply_archfusion_configs
+    [boot_images]=regenerate_boot_files
+    [finalize]=finalize_installation
+)
+
+run_single_step() {
+    local step="$1"
+    
+    [[ $EUID -ne 0 ]] && fatal "Ce script doit être exécuté en tant que root"
+    [[ -z ${STEP_FUNCTIONS[$step]:-} ]] && fatal "Étape inconnue: ${step}"
+    [[ -z $TARGET_DISK ]] && fatal "L'exécution par étapes nécessite --disk"
+    
+    progress_open
+    trap on_exit EXIT
+    
+    resolve_partitions
+    
+    # Étape en arrière-plan: un signal d'annulation est traité dès sa
+    # réception (et non à la fin de la commande en cours) puis propagé
+    ( trap on_exit EXIT; trap 'exit 130' INT TERM; run_stage "$step" "${STEP_FUNCTIONS[$step]}" ) 0<&0 &
+    STEP_PID=$!
+    trap cancel_step TERM INT
+    local status=0
+    wait "$STEP_PID" || status=$?
+    trap - TERM INT
+    [[ $status -ne 0 ]] && exit "$status"
+    
+    # Étape réussie: point de reprise durable (cible montée, sinon /run).
+    # finalize vient d'effacer les points de reprise et de démonter la cible
+    if [[ -n $CHECKPOINT_FILE && $step != finalize ]]; then
+        python3 "${SCRIPT_DIR}/checkpoints.py" record --disk "$TARGET_DISK" \
+            --target-root "$TARGET_ROOT" "$CHECKPOINT_FILE" \
+            || warning "Point de reprise non enregistré: ${step}"
+    fi
+}
+
+# Envoie un signal à un processus et à ses descendants (suspendus pendant le
+# parcours pour qu'aucun nouveau processus n'échappe au signal)
+signal_tree() {
+    local signal="$1" pid="$2" child
+    kill -STOP "$pid" 2> /dev/null || return 0
+    for child in $(pgrep -P "$pid"); do
+        signal_tree "$signal" "$child"
+    done
+    kill "-${signal}" "$pid" 2> /dev/null || true
+    kill -CONT "$pid" 2> /dev/null || true
+}
+
+# Annulation (engine.py stop): interruption des processus de l'étape, sans
+# point de reprise; les étapes sont refaisables, l'installation reprendra à
+# celle-ci. SIGINT laisse pacman terminer le paquet en cours et libérer sa base
+cancel_step() {
+    trap - TERM INT
+    warning "Annulation de l'étape ${RUN_STEP}"
+    signal_tree INT "$STEP_PID"
+    # Le sous-shell de l'étape n'agit sur SIGINT que si sa commande en meurt
+    kill -TERM "$STEP_PID" 2> /dev/null || true
+    wait "$STEP_PID" 2> /dev/null || true
+    exit 130
+}
+
+# Monte la cible d'une installation interrompue (après un redémarrage) pour en
+# lire les points de reprise; une racine chiffrée fermée n'est pas ouverte
+probe_target() {
+    mountpoint -q "${TARGET_ROOT}" && return 0
+    [[ -b $ROOT_MOUNT ]] || return 0
+    [[ $(blkid -s LABEL -o value "$ROOT_MOUNT" 2> /dev/null) == "Root" ]] || return 0
+    # Autre disposition: rien à reprendre (l'étape format_root change d'empreinte)
+    [[ $(blkid -s TYPE -o value "$ROOT_MOUNT" 2> /dev/null) == "$LAYOUT_ROOT_FS" ]] || return 0
     mount_partitions
-    install_base_system
-    configure_system
-    install_desktop_environment
-    apply_archfusion_configs
-    finalize_installation
+}
+
+# Points de reprise valides de la cible, une ligne JSON par étape (engine.py)
+list_target_checkpoints() {
+    [[ $EUID -ne 0 ]] && fatal "Ce script doit être exécuté en tant que root"
+    [[ -z $TARGET_DISK ]] && fatal "La liste des points de reprise nécessite --disk"
+    
+    resolve_partitions
+    probe_target >&2 || warning "Cible précédente non montée: installation complète" >&2
+    python3 "${SCRIPT_DIR}/checkpoints.py" list --disk "$TARGET_DISK" --target-root "$TARGET_ROOT"
 }
 
 # ==========================================
@@ -482,8 +1284,33 @@ OPTIONS:
     -u, --username USER     Nom d'utilisateur
     -H, --hostname HOST     Nom d'hôte
     -t, --timezone TZ       Fuseau horaire
+    --locale LOCALE         Langue du système (ex: fr_FR.UTF-8)
+    --keymap KEYMAP         Disposition du clavier (ex: fr)
     -e, --encrypt           Activer le chiffrement
     --swap-size SIZE        Taille du swap (ex: 4G)
+    --target-root DIR       Point de montage du système cible (défaut: /mnt)
+    --log-file PATH         Journal de l'installation (défaut: /tmp/archfusion-install.log)
+    --gpu DRIVERS           Pilotes GPU: auto (défaut), all, none ou nvidia,amd,intel
+    --removable-boot        GRUB EFI sans entrée NVRAM (disque préparé pour une autre machine)
+    --image [PATH]          Copier l'image racine de l'ISO (airootfs.sfs) au lieu de pacstrap
+    --desktop DE            Bureau: kde (défaut), gnome, xfce, minimal
+    --ssh                   Installer et activer le serveur SSH
+    --no-firewall           Ne pas installer le pare-feu
+    --no-bluetooth          Ne pas installer le support Bluetooth
+    --progress-file PATH    Publier la progression (JSON lignes) dans PATH
+    --trace-file PATH       Trace des étapes (chrome://tracing, Perfetto; défaut: journal-trace.json)
+    --package-cache DIR     Utiliser les paquets préchargés dans DIR
+    --offline               Installer depuis le dépôt de l'ISO (réseau en complément)
+    --no-fsync              Paquets installés sans fsync, une synchronisation finale (disque neuf)
+    --fs-layout NAME        Disposition de la racine (layouts/*.conf): ext4, ext4-fast, btrfs
+                            (défaut: ROOT_FS de install.conf)
+    --snapshots             Instantanés automatiques de la racine (snapper, disposition btrfs)
+    --no-snapshots          Sans instantanés (défaut: SNAPSHOTS_ENABLED de install.conf)
+    --step STEP             Exécuter une seule étape (mode non interactif)
+    --password-file FILE    Mots de passe chiffrés (lignes compte:empreinte)
+    --package-plan DIR      Plan déjà résolu (fichiers packages et services, écrits par engine.py)
+    --checkpoint FILE       Point de reprise à enregistrer après la réussite de --step
+    --list-checkpoints      Afficher les points de reprise de la cible (JSON lignes)
 
 EXEMPLES:
     $0                      # Installation interactive
@@ -493,6 +1320,20 @@ EXEMPLES:
 EOF
 }
 
+# Disposition et instantanés par défaut: ROOT_FS et SNAPSHOTS_ENABLED de
+# install.conf, comme l'assistant, pour les options --fs-layout/--snapshots
+# absentes (engine.py passe les deux: aucun lancement de fs_layouts.py)
+load_layout_defaults() {
+    local args=(defaults) layout=ext4 snapshots=false defaults
+    if [[ -z $FS_LAYOUT || -z $SNAPSHOTS ]]; then
+        [[ -f $CONFIG_FILE ]] && args+=(--config "$CONFIG_FILE")
+        defaults=$(python3 "${SCRIPT_DIR}/fs_layouts.py" "${args[@]}") \
+            && read -r layout snapshots <<< "$defaults"
+    fi
+    FS_LAYOUT="${FS_LAYOUT:-$layout}"
+    SNAPSHOTS="${SNAPSHOTS:-$snapshots}"
+}
+
 # Parsing des arguments
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -524,6 +1365,14 @@ while [[ $# -gt 0 ]]; do
             TIMEZONE="$2"
             shift 2
             ;;
+        --locale)
+            LOCALE="$2"
+            shift 2
+            ;;
+        --keymap)
+            KEYMAP="$2"
+            shift 2
+            ;;
         -e|--encrypt)
             ENABLE_ENCRYPTION=true
             shift
@@ -532,6 +1381,101 @@ while [[ $# -gt 0 ]]; do
             SWAP_SIZE="$2"
             shift 2
             ;;
+        --desktop)
+            DESKTOP_ENVIRONMENT="$2"
+            shift 2
+            ;;
+        --target-root)
+            TARGET_ROOT="$2"
+            shift 2
+            ;;
+        --log-file)
+            LOG_FILE="$2"
+            shift 2
+            ;;
+        --gpu)
+            GPU_DRIVERS="$2"
+            shift 2
+            ;;
+        --removable-boot)
+            BOOT_REMOVABLE=true
+            shift
+            ;;
+        --image)
+            IMAGE_MODE=true
+            # Chemin facultatif (sinon l'image du média de démarrage)
+            if [[ -n ${2:-} && $2 != -* ]]; then
+                ROOT_IMAGE="$2"
+                shift
+            fi
+            shift
+            ;;
+        --ssh)
+            ENABLE_SSH=true
+            shift
+            ;;
+        --no-firewall)
+            ENABLE_FIREWALL=false
+            shift
+            ;;
+        --no-bluetooth)
+            ENABLE_BLUETOOTH=false
+            shift
+            ;;
+        --progress-file)
+            PROGRESS_FILE="$2"
+            shift 2
+            ;;
+        --trace-file)
+            TRACE_FILE="$2"
+            shift 2
+            ;;
+        --package-cache)
+            PACKAGE_CACHE="$2"
+            shift 2
+            ;;
+        --offline)
+            OFFLINE_MODE=true
+            shift
+            ;;
+        --no-fsync)
+            NO_FSYNC=true
+            shift
+            ;;
+        --fs-layout)
+            FS_LAYOUT="$2"
+            shift 2
+            ;;
+        --snapshots)
+            SNAPSHOTS=true
+            shift
+            ;;
+        --no-snapshots)
+            SNAPSHOTS=false
+            shift
+            ;;
+        --password-file)
+            PASSWORD_FILE="$2"
+            shift 2
+            ;;
+        --checkpoint)
+            CHECKPOINT_FILE="$2"
+            shift 2
+            ;;
+        --package-plan)
+            PACKAGE_PLAN_DIR="$2"
+            shift 2
+            ;;
+        --list-checkpoints)
+            LIST_CHECKPOINTS=true
+            INSTALL_MODE="auto"
+            shift
+            ;;
+        --step)
+            RUN_STEP="$2"
+            INSTALL_MODE="auto"
+            shift 2
+            ;;
         *)
             error "Option inconnue: $1"
             show_help
@@ -540,5 +1484,20 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
+# Un cache absent (dossier /tmp nettoyé...) n'empêche pas l'installation
+if [[ -n $PACKAGE_CACHE ]] && [[ ! -d $PACKAGE_CACHE ]]; then
+    warning "Cache de paquets introuvable, téléchargement complet: ${PACKAGE_CACHE}"
+    PACKAGE_CACHE=""
+fi
+
+load_layout_defaults
+load_fs_layout
+
 # Lancement du script principal
-main "$@"
\ No newline at end of file
+if [[ -n $RUN_STEP ]]; then
+    run_single_step "$RUN_STEP"
+elif [[ $LIST_CHECKPOINTS == true ]]; then
+    list_target_checkpoints
+else
+    main "$@"
+fi
\ No newline at end of file
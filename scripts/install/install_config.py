@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Lecture de configs/install.conf
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Lit les variables simples et les tableaux bash du fichier de
+             configuration d'installation sans l'exécuter
+"""
+
+import os
+import re
+import shlex
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+ConfigValue = Union[str, List[str]]
+
+# Emplacements possibles: dépôt source, puis système live (build-iso.sh copie configs/ dans /etc)
+INSTALL_CONFIG_PATHS = (
+    str(Path(__file__).resolve().parents[2] / "configs" / "install.conf"),
+    "/etc/install.conf",
+)
+
+ASSIGNMENT = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)=(.*)$")
+
+
+def find_install_config() -> Optional[str]:
+    for path in INSTALL_CONFIG_PATHS:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _split(text: str) -> List[str]:
+    try:
+        return shlex.split(text, comments=True)
+    except ValueError:
+        return []
+
+
+def _strip_comment(line: str) -> str:
+    return re.sub(r"(^|\s)#.*$", "", line).rstrip()
+
+
+def parse_install_config(text: str) -> Dict[str, ConfigValue]:
+    """Décode les affectations NOM=valeur et NOM=( ... ) d'un fichier bash"""
+    config: Dict[str, ConfigValue] = {}
+    lines = iter(text.splitlines())
+
+    for line in lines:
+        match = ASSIGNMENT.match(line.strip())
+        if not match:
+            continue
+        name, value = match.groups()
+
+        if value.startswith("("):
+            # Tableau, éventuellement sur plusieurs lignes
+            body = _strip_comment(value[1:])
+            while not body.endswith(")"):
+                try:
+                    body += "\n" + _strip_comment(next(lines))
+                except StopIteration:
+                    break
+            config[name] = _split(body[:-1] if body.endswith(")") else body)
+        else:
+            words = _split(value)
+            config[name] = words[0] if words else ""
+
+    return config
+
+
+def load_install_config(path: Optional[str] = None) -> Dict[str, ConfigValue]:
+    """Charge install.conf; dictionnaire vide si le fichier est absent"""
+    path = path or find_install_config()
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return parse_install_config(f.read())
+    except OSError:
+        return {}
+
+
+def config_bool(config: Dict[str, ConfigValue], name: str, default: bool = False) -> bool:
+    value = config.get(name)
+    if not isinstance(value, str) or not value:
+        return default
+    return value.lower() in ("true", "yes", "1", "on")
+
+
+def config_list(config: Dict[str, ConfigValue], name: str,
+                default: Optional[List[str]] = None) -> List[str]:
+    """Tableau bash ou liste séparée par des virgules"""
+    value = config.get(name)
+    if isinstance(value, list):
+        return value
+    if value:
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(default or [])
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Plan d'installation
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Export, import et validation des plans d'installation (JSON
+             versionné) produits par l'assistant et rejoués sans interface
+
+Un plan contient la configuration de l'assistant (self.config de
+gui-installer.py), sans les données propres à une exécution (cache de
+paquets). Les mots de passe ne sont acceptés que sous forme d'empreintes
+crypt(3), par exemple: openssl passwd -6
+
+Les plans des versions précédentes restent lisibles: les champs apparus
+depuis (FIELD_VERSIONS) y prennent leur valeur par défaut, celle du
+comportement de l'installateur qui les a produits.
+
+Usage:
+    python3 install_plan.py plan.json          # valider un plan
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fs_layouts import DEFAULT_LAYOUT, layout_names
+from package_plan import DESKTOPS, desktop_id
+
+PLAN_FORMAT = "archfusion-install-plan"
+PLAN_VERSION = 2
+
+# Noms acceptés par useradd et hostnamectl
+USERNAME_PATTERN = re.compile(r"^[a-z_][a-z0-9_-]{0,31}$")
+HOSTNAME_PATTERN = re.compile(r"^(?!-)[A-Za-z0-9-]{1,63}(?<!-)$")
+DISK_PATTERN = re.compile(r"^[a-z][a-z0-9]*$")
+TIMEZONE_PATTERN = re.compile(r"^[A-Za-z0-9_+-]+(/[A-Za-z0-9_+-]+)*$")
+LOCALE_PATTERN = re.compile(r"^[a-z]{2,3}_[A-Z]{2}\.UTF-8$")
+KEYMAP_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+SWAP_PATTERN = re.compile(r"^[1-9][0-9]*G$")
+PASSWORD_HASH_PATTERN = re.compile(r"^\$[0-9a-z]+\$[^\s:]+$")
+
+
+class PlanError(ValueError):
+    """Plan illisible ou invalide"""
+
+
+def _pattern(regex: re.Pattern) -> Callable[[Any], Any]:
+    def check(value):
+        if not isinstance(value, str) or not regex.match(value):
+            raise PlanError(f"valeur invalide: {value!r}")
+        return value
+    return check
+
+
+def _boolean(value):
+    if not isinstance(value, bool):
+        raise PlanError(f"booléen attendu: {value!r}")
+    return value
+
+
+def _fs_layout(value):
+    if value not in layout_names():
+        raise PlanError(f"disposition de la racine inconnue: {value!r}")
+    return value
+
+
+def _desktop(value):
+    # Identifiant (kde) ou libellé de l'assistant (KDE Plasma): le plan garde le libellé
+    try:
+        return DESKTOPS[desktop_id(value)]
+    except (TypeError, ValueError):
+        raise PlanError(f"environnement de bureau inconnu: {value!r}") from None
+
+
+# Champs du plan: nom -> (validation, valeur par défaut; None = obligatoire)
+PLAN_FIELDS: Dict[str, Tuple[Callable[[Any], Any], Any]] = {
+    "disk": (_pattern(DISK_PATTERN), None),
+    "username": (_pattern(USERNAME_PATTERN), None),
+    "hostname": (_pattern(HOSTNAME_PATTERN), "archfusion"),
+    "timezone": (_pattern(TIMEZONE_PATTERN), "Europe/Paris"),
+    "locale": (_pattern(LOCALE_PATTERN), "fr_FR.UTF-8"),
+    "keymap": (_pattern(KEYMAP_PATTERN), "fr"),
+    "encrypt": (_boolean, False),
+    "offline": (_boolean, False),
+    "image": (_boolean, False),
+    "no_fsync": (_boolean, False),
+    "fs_layout": (_fs_layout, DEFAULT_LAYOUT),
+    "snapshots": (_boolean, False),
+    "swap_size": (_pattern(SWAP_PATTERN), "4G"),
+    "desktop_environment": (_desktop, "KDE Plasma"),
+    "ssh": (_boolean, False),
+    "firewall": (_boolean, True),
+    "bluetooth": (_boolean, True),
+    # Optionnels: sans empreintes, install.sh demande les mots de passe
+    "root_password_hash": (_pattern(PASSWORD_HASH_PATTERN), ""),
+    "user_password_hash": (_pattern(PASSWORD_HASH_PATTERN), ""),
+}
+
+
+# Version du plan qui a introduit un champ (les autres existent depuis la version 1)
+FIELD_VERSIONS: Dict[str, int] = {
+    "no_fsync": 2,
+    "fs_layout": 2,
+    "snapshots": 2,
+}
+
+
+def validate_config(config: Dict[str, Any], version: int = PLAN_VERSION) -> Dict[str, Any]:
+    """Configuration complète et normalisée; lève PlanError au premier problème"""
+    known = {name for name in PLAN_FIELDS if FIELD_VERSIONS.get(name, 1) <= version}
+    unknown = sorted(set(config) - known)
+    if unknown:
+        suffix = f" (plan en version {version})" if version < PLAN_VERSION else ""
+        raise PlanError(f"champs inconnus: {', '.join(unknown)}{suffix}")
+
+    validated: Dict[str, Any] = {}
+    for name, (check, default) in PLAN_FIELDS.items():
+        value = config.get(name)
+        if value is None or value == "":
+            if default is None:
+                raise PlanError(f"champ obligatoire manquant: {name}")
+            validated[name] = default
+            continue
+        try:
+            validated[name] = check(value)
+        except PlanError as e:
+            raise PlanError(f"{name}: {e}") from None
+    return validated
+
+
+def plan_document(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Document JSON d'un plan à partir de la configuration de l'assistant"""
+    # Seuls les champs du plan sont exportés (pas le cache de paquets...)
+    fields = {name: value for name, value in config.items() if name in PLAN_FIELDS}
+    validated = validate_config(fields)
+    return {
+        "format": PLAN_FORMAT,
+        "version": PLAN_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {name: value for name, value in validated.items() if value != ""},
+    }
+
+
+def parse_plan(document: Any) -> Dict[str, Any]:
+    """Configuration validée d'un document de plan"""
+    if not isinstance(document, dict) or document.get("format") != PLAN_FORMAT:
+        raise PlanError("ce fichier n'est pas un plan d'installation ArchFusion")
+
+    version = document.get("version")
+    if not isinstance(version, int) or version < 1:
+        raise PlanError(f"version de plan invalide: {version!r}")
+    if version > PLAN_VERSION:
+        raise PlanError(f"plan en version {version}, cet installateur lit la version {PLAN_VERSION}")
+
+    config = document.get("config")
+    if not isinstance(config, dict):
+        raise PlanError("section 'config' absente")
+    return validate_config(config, version)
+
+
+def save_plan(config: Dict[str, Any], path: str):
+    """Écrit le plan de façon atomique (lisible par root seul: empreintes de mots de passe)"""
+    document = plan_document(config)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".plan-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_plan(path: str) -> Dict[str, Any]:
+    """Lit et valide un plan; lève PlanError si le fichier est inutilisable"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    except OSError as e:
+        raise PlanError(f"lecture impossible: {e.strerror}") from None
+    except json.JSONDecodeError as e:
+        raise PlanError(f"JSON invalide (ligne {e.lineno}): {e.msg}") from None
+    return parse_plan(document)
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 1:
+        print(f"Usage: {os.path.basename(sys.argv[0])} PLAN.json", file=sys.stderr)
+        return 2
+    try:
+        config = load_plan(args[0])
+    except PlanError as e:
+        print(f"❌ {args[0]}: {e}", file=sys.stderr)
+        return 1
+    for name, value in config.items():
+        if name.endswith("_password_hash"):
+            value = "(empreinte)" if value else "(demandé en fin d'installation)"
+        print(f"{name:<22} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
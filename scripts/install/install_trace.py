@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Trace et historique des installations
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Lit la trace des étapes écrite par install.sh (format Trace
+             Event, chargeable dans chrome://tracing ou Perfetto), garde un
+             résumé de chaque installation et estime le temps restant
+
+install.sh ajoute à la trace une ligne par étape (catégorie "stage") et par
+sous-étape (catégorie "task": pacstrap, reflector, mkinitcpio, grub-mkconfig...),
+le tableau JSON restant ouvert pour que plusieurs étapes parallèles puissent y
+écrire. finalize_trace() le referme en fin d'installation.
+
+Le résumé de chaque installation (durées par étape et par sous-étape, octets
+reçus pendant chaque étape) est ajouté à l'historique local; l'estimation du
+temps restant en reprend les durées médianes, et ajuste les étapes de
+téléchargement au débit mesuré pendant l'installation.
+
+L'historique local est dans le système live (en mémoire) et repart vide à
+chaque démarrage: les étapes sans mesure locale reprennent les durées de
+install-history.seed.json, installations de référence livrées avec l'ISO.
+finalize copie l'historique, installation en cours comprise, dans
+/var/lib/archfusion du système installé; "seed" en construit la référence.
+
+Usage:
+    python3 install_trace.py summarize /tmp/archfusion-install-trace.json
+    python3 install_trace.py history
+    python3 install_trace.py copy-history --output /mnt/var/lib/archfusion/install-history.json
+    python3 install_trace.py seed install-history.json... # installations de référence
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+INSTALL_TRACE_FILE = "/tmp/archfusion-install-trace.json"
+INSTALL_HISTORY_FILE = "/var/lib/archfusion/install-history.json"
+HISTORY_MAX_RUNS = 20
+# Installations de référence livrées avec l'ISO (scripts/install/)
+INSTALL_HISTORY_SEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "install-history.seed.json")
+
+# Durée supposée d'une unité de poids d'étape sans historique (secondes)
+DEFAULT_SECONDS_PER_WEIGHT = 10.0
+
+# Débit reçu au-delà duquel une étape est considérée en téléchargement (octets/s)
+DOWNLOAD_ACTIVE_RATE = 64 * 1024
+# Lissage exponentiel du débit (poids de la dernière mesure)
+THROUGHPUT_SMOOTHING = 0.3
+
+
+# ==========================================
+# TRACE
+# ==========================================
+
+def read_trace_events(path: str) -> List[Dict]:
+    """Événements d'une trace, tableau ouvert (en cours) ou objet refermé"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("{"):
+        return json.loads(text).get("traceEvents", [])
+    events = []
+    for line in text.lstrip("[").rstrip("]").splitlines():
+        line = line.strip().rstrip(",")
+        if not line:
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events
+
+
+def finalize_trace(path: str) -> List[Dict]:
+    """Referme la trace en objet JSON, avec le nom de chaque piste (étape)"""
+    events = [event for event in read_trace_events(path) if event.get("ph") != "M"]
+    # Piste d'une étape lancée seule (moteur) ou de toutes les étapes (install.sh complet)
+    stages: Dict[int, List[str]] = {}
+    for event in sorted(events, key=lambda e: e.get("ts", 0)):
+        if event.get("cat") == "stage":
+            stages.setdefault(event.get("tid", 0), []).append(event["name"])
+    names = {tid: names[0] if len(names) == 1 else "install.sh" for tid, names in stages.items()}
+    metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "Installation ArchFusion OS"}}]
+    metadata += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                 for tid, name in names.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    return events
+
+
+def span_durations(events: List[Dict], category: str) -> Dict[str, float]:
+    """Durée cumulée (secondes) par nom de span d'une catégorie"""
+    durations: Dict[str, float] = {}
+    for event in events:
+        if event.get("ph") == "X" and event.get("cat") == category:
+            durations[event["name"]] = durations.get(event["name"], 0.0) + event.get("dur", 0) / 1e6
+    return durations
+
+
+# ==========================================
+# HISTORIQUE
+# ==========================================
+
+@dataclass
+class StepRecord:
+    """Mesures d'une étape pendant l'installation en cours"""
+
+    started: float
+    finished: Optional[float] = None
+    rx_bytes: int = 0
+    download_time: float = 0.0
+
+    def elapsed(self, now: float) -> float:
+        return (self.finished or now) - self.started
+
+
+def build_summary(events: List[Dict], success: bool,
+                  records: Optional[Dict[str, StepRecord]] = None) -> Dict:
+    """Résumé d'une installation: étapes (trace ou mesures du moteur) et sous-étapes"""
+    steps = {name: {"duration": duration} for name, duration in span_durations(events, "stage").items()}
+    for name, record in (records or {}).items():
+        if record.finished is not None:
+            steps[name] = {"duration": record.finished - record.started,
+                           "rx_bytes": record.rx_bytes, "download_time": record.download_time}
+    if records:
+        stamps = [(record.started, record.finished or record.started) for record in records.values()]
+    else:
+        stamps = [(event["ts"] / 1e6, (event["ts"] + event.get("dur", 0)) / 1e6)
+                  for event in events if event.get("ph") == "X"]
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "success": success,
+        "total": max(end for _, end in stamps) - min(start for start, _ in stamps) if stamps else 0.0,
+        "steps": steps,
+        "tasks": span_durations(events, "task"),
+    }
+
+
+def load_history(path: str = INSTALL_HISTORY_FILE) -> List[Dict]:
+    try:
+        with open(path) as f:
+            runs = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return runs if isinstance(runs, list) else []
+
+
+def append_history(summary: Dict, path: str = INSTALL_HISTORY_FILE):
+    runs = (load_history(path) + [summary])[-HISTORY_MAX_RUNS:]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2)
+
+
+@dataclass
+class StepEstimate:
+    """Durée attendue d'une étape (médiane des installations réussies)"""
+
+    duration: float
+    rx_bytes: int = 0
+    download_time: float = 0.0
+
+
+def step_estimates(runs: List[Dict]) -> Dict[str, StepEstimate]:
+    samples: Dict[str, List[Dict]] = {}
+    for run in runs:
+        if run.get("success"):
+            for name, step in run.get("steps", {}).items():
+                samples.setdefault(name, []).append(step)
+    return {
+        name: StepEstimate(
+            duration=statistics.median(step["duration"] for step in steps),
+            rx_bytes=int(statistics.median(step.get("rx_bytes", 0) for step in steps)),
+            download_time=statistics.median(step.get("download_time", 0.0) for step in steps),
+        )
+        for name, steps in samples.items()
+    }
+
+
+def load_estimates(history_file: Optional[str] = INSTALL_HISTORY_FILE,
+                   seed_file: str = INSTALL_HISTORY_SEED) -> Dict[str, StepEstimate]:
+    """Durées de l'historique local, à défaut celles des installations de référence"""
+    estimates = step_estimates(load_history(seed_file))
+    if history_file:
+        estimates.update(step_estimates(load_history(history_file)))
+    return estimates
+
+
+def copy_history(trace_path: str, output: str, history_file: str = INSTALL_HISTORY_FILE) -> Dict:
+    """Écrit l'historique local et l'installation en cours (trace encore ouverte) dans output"""
+    summary = build_summary(read_trace_events(trace_path), True)
+    runs = (load_history(history_file) + [summary])[-HISTORY_MAX_RUNS:]
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(runs, f, indent=2)
+    return summary
+
+
+def build_seed(paths: List[str], output: str = INSTALL_HISTORY_SEED) -> int:
+    """Installations réussies des historiques donnés (les plus récentes), référence de l'ISO"""
+    runs = [run for path in paths for run in load_history(path) if run.get("success")]
+    runs = sorted(runs, key=lambda run: run.get("date", ""))[-HISTORY_MAX_RUNS:]
+    with open(output, "w") as f:
+        json.dump(runs, f, indent=2)
+    return len(runs)
+
+
+# ==========================================
+# TEMPS RESTANT
+# ==========================================
+
+def received_bytes(net_dir: str = "/sys/class/net") -> int:
+    """Octets reçus par toutes les interfaces réseau (hors boucle locale)"""
+    total = 0
+    for path in glob.glob(os.path.join(net_dir, "*", "statistics", "rx_bytes")):
+        if os.path.basename(os.path.dirname(os.path.dirname(path))) == "lo":
+            continue
+        try:
+            with open(path) as f:
+                total += int(f.read())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class ThroughputMeter:
+    """Débit de réception lissé, mesuré à chaque appel de sample()"""
+
+    def __init__(self, read_bytes: Callable[[], int] = received_bytes):
+        self.read_bytes = read_bytes
+        self.rate = 0.0
+        self._last = (time.monotonic(), read_bytes())
+
+    def sample(self, now: Optional[float] = None) -> Tuple[int, float]:
+        """Octets reçus et secondes écoulées depuis la mesure précédente"""
+        now = time.monotonic() if now is None else now
+        received = self.read_bytes()
+        last_time, last_received = self._last
+        delta = max(0, received - last_received)
+        if now > last_time:
+            rate = delta / (now - last_time)
+            self.rate += THROUGHPUT_SMOOTHING * (rate - self.rate) if self.rate else rate
+        self._last = (now, received)
+        return delta, max(0.0, now - last_time)
+
+
+class EtaEstimator:
+    """Temps restant: chemin critique des durées restantes de chaque étape
+
+    Une étape en cours qui a téléchargé lors des installations précédentes
+    se décompose en octets restants au débit actuel, plus sa part hors
+    téléchargement non encore écoulée.
+    """
+
+    def __init__(self, steps, estimates: Dict[str, StepEstimate],
+                 critical_path: Callable, meter: Optional[ThroughputMeter] = None):
+        self.steps = steps
+        self.critical_path = critical_path
+        self.meter = meter or ThroughputMeter()
+        self.records: Dict[str, StepRecord] = {}
+        self._lock = threading.Lock()
+        self.estimates = {
+            step.name: estimates.get(step.name, StepEstimate(step.weight * DEFAULT_SECONDS_PER_WEIGHT))
+            for step in steps
+        }
+
+    def step_started(self, name: str, now: Optional[float] = None):
+        with self._lock:
+            self.records[name] = StepRecord(time.monotonic() if now is None else now)
+
+    def step_resumed(self, name: str):
+        """Étape reprise d'une installation précédente: rien ne reste à faire"""
+        with self._lock:
+            self.estimates[name] = StepEstimate(0.0)
+
+    def step_finished(self, name: str, now: Optional[float] = None):
+        with self._lock:
+            if name in self.records:
+                self.records[name].finished = time.monotonic() if now is None else now
+
+    def tick(self, now: Optional[float] = None) -> float:
+        """Mesure le débit et l'attribue aux étapes en cours; retourne le temps restant"""
+        now = time.monotonic() if now is None else now
+        delta, interval = self.meter.sample(now)
+        with self._lock:
+            for record in self.records.values():
+                if record.finished is None:
+                    record.rx_bytes += delta
+                    if interval and delta / interval >= DOWNLOAD_ACTIVE_RATE:
+                        record.download_time += interval
+        return self.remaining(now)
+
+    def _step_remaining(self, name: str, now: float) -> float:
+        estimate = self.estimates[name]
+        record = self.records.get(name)
+        if record is None:
+            return estimate.duration
+        if record.finished is not None:
+            return 0.0
+        elapsed = record.elapsed(now)
+        if estimate.rx_bytes and self.meter.rate > 0:
+            download = max(0, estimate.rx_bytes - record.rx_bytes) / self.meter.rate
+            other = max(0.0, (estimate.duration - estimate.download_time)
+                        - (elapsed - record.download_time))
+            return download + other
+        return max(estimate.duration - elapsed, 1.0)
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            durations = {step.name: self._step_remaining(step.name, now) for step in self.steps}
+        return self.critical_path(self.steps, durations)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds} s"
+
+
+def print_history(runs: List[Dict]):
+    if not runs:
+        print("Aucune installation enregistrée")
+        return
+    for run in runs:
+        state = "réussie" if run.get("success") else "échouée"
+        print(f"\n{run['date']}  {state}  {format_duration(run.get('total', 0))}")
+        for name, step in sorted(run.get("steps", {}).items(), key=lambda item: -item[1]["duration"]):
+            print(f"  {name:<16}{format_duration(step['duration']):>14}")
+        for name, duration in sorted(run.get("tasks", {}).items(), key=lambda item: -item[1]):
+            print(f"    {name:<20}{format_duration(duration):>12}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Trace et historique des installations")
+    parser.add_argument("--history-file", default=INSTALL_HISTORY_FILE,
+                        help=f"historique (défaut: {INSTALL_HISTORY_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summarize = commands.add_parser("summarize", help="refermer une trace et l'ajouter à l'historique")
+    summarize.add_argument("trace", nargs="?", default=INSTALL_TRACE_FILE)
+    summarize.add_argument("--failed", action="store_true", help="installation échouée")
+    commands.add_parser("history", help="afficher les installations enregistrées")
+    copy = commands.add_parser("copy-history", help="copier l'historique et l'installation en cours")
+    copy.add_argument("trace", nargs="?", default=INSTALL_TRACE_FILE)
+    copy.add_argument("--output", required=True, help="historique du système installé")
+    seed = commands.add_parser("seed", help="installations de référence livrées avec l'ISO")
+    seed.add_argument("histories", nargs="+", help="historiques d'installations de référence")
+    seed.add_argument("--output", default=INSTALL_HISTORY_SEED, help=f"défaut: {INSTALL_HISTORY_SEED}")
+    args = parser.parse_args(argv)
+
+    if args.command == "history":
+        print_history(load_history(args.history_file))
+        return 0
+    if args.command == "seed":
+        try:
+            count = build_seed(args.histories, args.output)
+        except OSError as e:
+            print(f"❌ {args.output}: {e}", file=sys.stderr)
+            return 1
+        print(f"{count} installation(s) de référence dans {args.output}")
+        return 0 if count else 1
+    try:
+        if args.command == "copy-history":
+            copy_history(args.trace, args.output, args.history_file)
+            return 0
+        events = finalize_trace(args.trace)
+        append_history(build_summary(events, not args.failed), args.history_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {args.trace}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Journal persistant des installations
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Écrit le journal de l'installation sur un thread dédié, en
+             segments compressés, avec un petit index par étape et par
+             gravité pour y naviguer sans le charger en mémoire
+
+Chaque installation a son dossier dans LOG_DIR (dérivé de LOG_FILE de
+configs/install.conf): segments de LOG_MAX_SIZE octets, compressés en gzip
+une fois pleins (le segment en cours reste en clair), et index.jsonl, qui ne
+contient que:
+- la première ligne de chaque étape;
+- chaque ligne d'avertissement ou d'erreur;
+- un point de reprise toutes les CHECKPOINT_LINES lignes;
+- la taille de chaque segment refermé.
+
+Seules les LOG_ROTATE_COUNT installations précédentes sont gardées.
+LogReader lit une plage de lignes en décompressant au plus un segment.
+
+Usage:
+    python3 log_store.py runs
+    python3 log_store.py show --level ERROR --context 3
+    python3 log_store.py show --stage base --lines 50
+    python3 log_store.py rotate-file /tmp/archfusion-install.log   # depuis install.sh
+"""
+
+import argparse
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from install_config import load_install_config
+
+# Outils de scripts/, dossier parent de l'installateur (dépôt et ISO)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_cache import parse_size
+
+DEFAULT_LOG_FILE = "/var/log/archfusion-install.log"
+DEFAULT_SEGMENT_SIZE = 10 * 1024 ** 2
+DEFAULT_ROTATE_COUNT = 5
+
+INDEX_FILE = "index.jsonl"
+CHECKPOINT_LINES = 1000
+
+# Lignes en attente d'écriture au-delà desquelles write() attend le thread
+QUEUE_MAX_LINES = 100000
+
+# Gravités indexées, par ordre croissant
+LEVELS = ("WARNING", "ERROR")
+
+# Gravité d'une ligne: log() de install.sh, puis messages de pacman et des outils
+LEVEL_PATTERNS = (
+    (re.compile(r"\[(ERROR|WARNING)\]"), None),
+    (re.compile(r"^(?:error|erreur|fatal)\b|==> (?:ERROR|ERREUR)", re.IGNORECASE), "ERROR"),
+    (re.compile(r"^(?:warning|avertissement)\b|==> (?:WARNING|ATTENTION)", re.IGNORECASE), "WARNING"),
+)
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+# Filtre rapide avant les expressions régulières (la plupart des lignes n'ont aucune gravité)
+LEVEL_KEYWORDS = ("error", "erreur", "fatal", "warning", "avertissement", "attention")
+
+
+@dataclass
+class LogSettings:
+    """Réglages LOG_* de configs/install.conf"""
+
+    directory: str
+    segment_size: int = DEFAULT_SEGMENT_SIZE
+    rotate_count: int = DEFAULT_ROTATE_COUNT
+
+
+def load_log_settings(config: Optional[Dict] = None) -> LogSettings:
+    config = load_install_config() if config is None else config
+    log_file = config.get("LOG_FILE") or DEFAULT_LOG_FILE
+    settings = LogSettings(os.path.splitext(log_file)[0])
+    try:
+        settings.segment_size = parse_size(config.get("LOG_MAX_SIZE") or "10M")
+        settings.rotate_count = int(config.get("LOG_ROTATE_COUNT") or DEFAULT_ROTATE_COUNT)
+    except ValueError:
+        pass
+    return settings
+
+
+def line_level(line: str) -> Optional[str]:
+    lowered = line.lower()
+    if not any(keyword in lowered for keyword in LEVEL_KEYWORDS):
+        return None
+    text = ANSI_ESCAPE.sub("", line)
+    # Préfixe d'étape "[base] " ajouté par le moteur
+    text = re.sub(r"^\[[\w-]+\] ", "", text)
+    for pattern, level in LEVEL_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return level or match.group(1)
+    return None
+
+
+@dataclass
+class IndexEntry:
+    """Position d'une ligne dans les segments"""
+
+    kind: str           # stage, level, checkpoint, segment
+    line: int           # numéro de ligne global (0 = première)
+    segment: int
+    offset: int = 0     # octets dans le segment décompressé
+    stage: str = ""
+    level: str = ""
+    lines: int = 0      # segment: nombre de lignes
+    size: int = 0       # segment: taille décompressée
+
+
+def segment_path(run_dir: str, segment: int, compressed: bool) -> str:
+    return os.path.join(run_dir, f"{segment:06d}.log" + (".gz" if compressed else ""))
+
+
+def list_runs(directory: str) -> List[str]:
+    """Dossiers des installations, du plus ancien au plus récent"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(name for name in names if os.path.isfile(os.path.join(directory, name, INDEX_FILE)))
+
+
+class LogWriter:
+    """Puits de journal: un thread écrit segments et index, write() n'attend que si la file est pleine"""
+
+    def __init__(self, settings: LogSettings, run_id: Optional[str] = None):
+        self.settings = settings
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.run_dir = os.path.join(settings.directory, self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._remove_old_runs()
+
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue(QUEUE_MAX_LINES)
+        self._segment = 0
+        self._offset = 0
+        self._line = 0
+        self._segment_first_line = 0
+        self._stages = set()
+        self._file = open(segment_path(self.run_dir, 0, False), "wb")
+        self._index = open(os.path.join(self.run_dir, INDEX_FILE), "a", encoding="utf-8")
+        self._add_index(IndexEntry("checkpoint", 0, 0))
+        self._thread = threading.Thread(target=self._run, name="log-store", daemon=True)
+        self._thread.start()
+
+    def _remove_old_runs(self):
+        runs = [run for run in list_runs(self.settings.directory) if run != self.run_id]
+        for run in runs[:max(0, len(runs) - self.settings.rotate_count)]:
+            shutil.rmtree(os.path.join(self.settings.directory, run), ignore_errors=True)
+
+    def write(self, stage: str, line: str):
+        self._queue.put((stage, line))
+
+    def close(self):
+        """Écrit les lignes en attente et compresse le dernier segment"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _add_index(self, entry: IndexEntry):
+        data = {key: value for key, value in asdict(entry).items() if value or key in ("line", "segment")}
+        self._index.write(json.dumps(data) + "\n")
+
+    def _rotate(self):
+        """Referme le segment en cours: compression (fichier temporaire puis renommage)"""
+        self._file.close()
+        self._add_index(IndexEntry("segment", self._segment_first_line, self._segment,
+                                   lines=self._line - self._segment_first_line, size=self._offset))
+        self._index.flush()
+        source = segment_path(self.run_dir, self._segment, False)
+        target = segment_path(self.run_dir, self._segment, True)
+        with open(source, "rb") as raw, gzip.open(target + ".tmp", "wb", compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        os.replace(target + ".tmp", target)
+        os.unlink(source)
+
+    def _open_segment(self):
+        self._segment += 1
+        self._offset = 0
+        self._segment_first_line = self._line
+        self._file = open(segment_path(self.run_dir, self._segment, False), "wb")
+        self._add_index(IndexEntry("checkpoint", self._line, self._segment))
+
+    def _append(self, stage: str, line: str):
+        if self._offset >= self.settings.segment_size:
+            self._rotate()
+            self._open_segment()
+        elif self._line and self._line % CHECKPOINT_LINES == 0:
+            self._add_index(IndexEntry("checkpoint", self._line, self._segment, self._offset))
+
+        if stage not in self._stages:
+            self._stages.add(stage)
+            self._add_index(IndexEntry("stage", self._line, self._segment, self._offset, stage=stage))
+        level = line_level(line)
+        if level:
+            self._add_index(IndexEntry("level", self._line, self._segment, self._offset,
+                                       stage=stage, level=level))
+
+        data = (f"[{stage}] {line}" if stage else line).encode("utf-8", errors="replace") + b"\n"
+        self._file.write(data)
+        self._offset += len(data)
+        self._line += 1
+
+    def _run(self):
+        done = False
+        while not done:
+            items = [self._queue.get()]
+            # Lot: tout ce qui est déjà en attente, écrit puis vidé en une fois
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in items:
+                if item is None:
+                    done = True
+                    break
+                self._append(*item)
+            self._file.flush()
+            self._index.flush()
+        self._rotate()
+        self._index.close()
+
+
+class LogReader:
+    """Lecture d'une installation par plages de lignes, à partir de l'index"""
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.entries: List[IndexEntry] = []
+        self._index_position = 0
+        self.refresh()
+
+    def refresh(self):
+        """Lit les entrées ajoutées à l'index depuis le dernier appel"""
+        try:
+            with open(os.path.join(self.run_dir, INDEX_FILE), encoding="utf-8") as f:
+                f.seek(self._index_position)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    self._index_position += len(line.encode("utf-8"))
+                    self.entries.append(IndexEntry(**json.loads(line)))
+        except OSError:
+            pass
+
+    def find(self, level: Optional[str] = None, stage: Optional[str] = None) -> List[IndexEntry]:
+        """Lignes d'une gravité (au moins) et/ou d'une étape, ou débuts d'étapes"""
+        if level:
+            wanted = set(LEVELS[LEVELS.index(level):])
+            return [e for e in self.entries if e.kind == "level" and e.level in wanted
+                    and (not stage or e.stage == stage)]
+        return [e for e in self.entries if e.kind == "stage" and (not stage or e.stage == stage)]
+
+    def stages(self) -> List[str]:
+        return [entry.stage for entry in self.entries if entry.kind == "stage"]
+
+    def _checkpoint(self, line: int) -> Optional[IndexEntry]:
+        best = None
+        for entry in self.entries:
+            if entry.kind in ("checkpoint", "stage", "level") and entry.line <= line:
+                if best is None or entry.line > best.line:
+                    best = entry
+        return best
+
+    def _open_segment(self, segment: int):
+        try:
+            return open(segment_path(self.run_dir, segment, False), "rb")
+        except FileNotFoundError:
+            return gzip.open(segment_path(self.run_dir, segment, True), "rb")
+
+    def read_lines(self, start: int, count: int) -> List[str]:
+        """Lignes [start, start + count), en ne décompressant que ce qui précède dans le segment"""
+        self.refresh()
+        start = max(0, start)
+        checkpoint = self._checkpoint(start)
+        if checkpoint is None:
+            return []
+        lines: List[str] = []
+        segment, offset, line = checkpoint.segment, checkpoint.offset, checkpoint.line
+        while len(lines) < count:
+            try:
+                f = self._open_segment(segment)
+            except FileNotFoundError:
+                break
+            with f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    if line >= start:
+                        lines.append(raw.decode("utf-8", errors="replace").rstrip("\n"))
+                        if len(lines) >= count:
+                            break
+                    line += 1
+            segment, offset = segment + 1, 0
+        return lines
+
+    def line_count(self) -> int:
+        """Nombre de lignes connu (segments refermés, plus la fin du segment en cours)"""
+        self.refresh()
+        closed = [e for e in self.entries if e.kind == "segment"]
+        total = max((e.line + e.lines for e in closed), default=0)
+        last = max(self.entries, key=lambda e: e.line, default=None)
+        if last is not None and last.segment > max((e.segment for e in closed), default=-1):
+            total = max(total, last.line + len(self.read_lines(last.line, 1 << 30)))
+        return total
+
+
+def rotate_file(path: str, settings: LogSettings) -> bool:
+    """Rotation d'un fichier journal (install.sh): PATH.1.gz ... PATH.N.gz au-delà de la taille"""
+    try:
+        if os.path.getsize(path) < settings.segment_size:
+            return False
+    except OSError:
+        return False
+    for number in range(settings.rotate_count - 1, 0, -1):
+        if os.path.exists(f"{path}.{number}.gz"):
+            os.replace(f"{path}.{number}.gz", f"{path}.{number + 1}.gz")
+    if settings.rotate_count > 0:
+        with open(path, "rb") as raw, gzip.open(f"{path}.1.gz", "wb") as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+    open(path, "w").close()
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    settings = load_log_settings()
+    parser = argparse.ArgumentParser(description="Journal persistant des installations")
+    parser.add_argument("--dir", default=settings.directory,
+                        help=f"dossier du journal (défaut: {settings.directory})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="installations conservées")
+    show = commands.add_parser("show", help="lignes d'une installation")
+    show.add_argument("--run", help="installation (défaut: la plus récente)")
+    show.add_argument("--level", choices=LEVELS, help="lignes de cette gravité ou plus")
+    show.add_argument("--stage", help="début de l'étape (ou ses erreurs avec --level)")
+    show.add_argument("--context", type=int, default=0, help="lignes autour de chaque résultat")
+    show.add_argument("--lines", type=int, default=20, help="lignes affichées après un début d'étape")
+    rotate = commands.add_parser("rotate-file", help="rotation d'un fichier selon LOG_MAX_SIZE")
+    rotate.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "rotate-file":
+        rotate_file(args.path, settings)
+        return 0
+    runs = list_runs(args.dir)
+    if args.command == "runs":
+        for run in runs:
+            reader = LogReader(os.path.join(args.dir, run))
+            errors = len(reader.find(level="ERROR"))
+            print(f"{run}  {reader.line_count():>9} lignes  {errors:>4} erreur(s)  {' '.join(reader.stages())}")
+        return 0
+
+    run = args.run or (runs[-1] if runs else None)
+    if not run or run not in runs:
+        print(f"❌ Installation introuvable dans {args.dir}", file=sys.stderr)
+        return 1
+    reader = LogReader(os.path.join(args.dir, run))
+    entries = reader.find(level=args.level, stage=args.stage)
+    for entry in entries:
+        if args.level:
+            lines = reader.read_lines(entry.line - args.context, 2 * args.context + 1)
+            first = max(0, entry.line - args.context)
+        else:
+            lines = reader.read_lines(entry.line, args.lines)
+            first = entry.line
+        for number, line in enumerate(lines, first + 1):
+            print(f"{number:>8}  {line}")
+        print("--")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
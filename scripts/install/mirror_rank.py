@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Classement des miroirs
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Sonde les miroirs Arch Linux en parallèle (asyncio), les classe
+             selon la latence et le débit mesurés et met le résultat en cache
+
+Remplace reflector dans install.sh et build-iso.sh. Les pays candidats sont
+MIRROR_COUNTRY et MIRROR_UPDATE_COUNTRIES de configs/install.conf; avec
+MIRROR_UPDATE_ENABLED=false, un classement en cache n'expire jamais.
+
+Usage:
+    python3 mirror_rank.py --save /etc/pacman.d/mirrorlist
+    python3 mirror_rank.py --refresh --number 5
+    python3 mirror_rank.py --candidates http://127.0.0.1:8001/ http://127.0.0.1:8002/
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import sys
+import time
+import urllib.request
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from install_config import config_bool, config_list, load_install_config
+
+MIRROR_STATUS_URL = "https://archlinux.org/mirrors/status/json/"
+DEFAULT_COUNTRIES = ["France", "Germany", "Netherlands"]
+MIRRORLIST_PATH = "/etc/pacman.d/mirrorlist"
+
+# Classement en cache et durée de validité (secondes)
+MIRROR_CACHE = "/var/cache/archfusion/mirrors.json"
+MIRROR_CACHE_TTL = 6 * 3600
+CACHE_VERSION = 1
+
+# Fichier téléchargé pour la mesure (présent sur tous les miroirs)
+PROBE_PATH = "core/os/x86_64/core.db"
+PROBE_MAX_BYTES = 512 * 1024
+
+# Délai maximal de connexion et de réponse par miroir, durée maximale de la
+# mesure de débit et nombre de sondes simultanées
+PROBE_TIMEOUT = 5.0
+PROBE_SAMPLE_TIME = 2.0
+PROBE_CONCURRENCY = 16
+
+# Fraîcheur maximale d'un miroir (heures, comme reflector --age 12)
+MAX_SYNC_AGE_HOURS = 12
+
+# Taille de référence pour le score: temps estimé pour télécharger un paquet moyen
+REFERENCE_PACKAGE_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class MirrorResult:
+    """Mesure d'un miroir"""
+
+    url: str
+    latency: Optional[float] = None        # secondes jusqu'à la réponse HTTP
+    throughput: Optional[float] = None     # octets par seconde
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.latency is not None and bool(self.throughput)
+
+    @property
+    def score(self) -> float:
+        """Temps estimé pour un paquet de taille moyenne (plus bas = meilleur)"""
+        if not self.ok:
+            return float("inf")
+        return self.latency + REFERENCE_PACKAGE_BYTES / self.throughput
+
+
+def mirror_countries(config: Dict) -> List[str]:
+    """Pays candidats: MIRROR_COUNTRY puis MIRROR_UPDATE_COUNTRIES"""
+    countries = config_list(config, "MIRROR_COUNTRY", DEFAULT_COUNTRIES)
+    countries += config_list(config, "MIRROR_UPDATE_COUNTRIES")
+    return list(dict.fromkeys(countries))
+
+
+def parse_status(data: Dict, countries: List[str], protocols=("https",),
+                 max_age_hours: float = MAX_SYNC_AGE_HOURS,
+                 now: Optional[datetime] = None) -> List[str]:
+    """Sélectionne les miroirs actifs, à jour et complets de la liste officielle"""
+    now = now or datetime.now(timezone.utc)
+    wanted = {country.lower() for country in countries}
+    urls = []
+    for mirror in data.get("urls", []):
+        if not mirror.get("active", True) or mirror.get("protocol") not in protocols:
+            continue
+        if wanted and (mirror.get("country") or "").lower() not in wanted:
+            continue
+        if (mirror.get("completion_pct") or 0) < 1.0 or not mirror.get("last_sync"):
+            continue
+        last_sync = datetime.fromisoformat(mirror["last_sync"].replace("Z", "+00:00"))
+        if (now - last_sync).total_seconds() > max_age_hours * 3600:
+            continue
+        urls.append(mirror["url"])
+    return urls
+
+
+def fetch_status(url: str = MIRROR_STATUS_URL, timeout: float = PROBE_TIMEOUT) -> Dict:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def mirrorlist_servers(path: str = MIRRORLIST_PATH) -> List[str]:
+    """Miroirs d'une mirrorlist existante (lignes commentées comprises)"""
+    urls = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.strip().lstrip("#").partition("=")
+                if sep and key.strip() == "Server":
+                    urls.append(value.strip().split("$repo")[0])
+    except OSError:
+        pass
+    return list(dict.fromkeys(urls))
+
+
+async def probe_mirror(url: str, timeout: float = PROBE_TIMEOUT,
+                       sample_time: float = PROBE_SAMPLE_TIME,
+                       max_bytes: int = PROBE_MAX_BYTES) -> MirrorResult:
+    """Mesure la latence (première réponse) et le débit d'un miroir
+
+    La sonde dure au plus timeout + sample_time: un miroir lent mais
+    fonctionnel est classé d'après les octets reçus pendant la mesure.
+    """
+    try:
+        return await _probe(url, timeout, sample_time, max_bytes)
+    except asyncio.TimeoutError:
+        return MirrorResult(url, error="délai dépassé")
+    except (OSError, ValueError, ssl.SSLError) as e:
+        return MirrorResult(url, error=str(e) or e.__class__.__name__)
+
+
+async def _probe(url: str, timeout: float, sample_time: float, max_bytes: int) -> MirrorResult:
+    parts = urlsplit(url.rstrip("/") + "/" + PROBE_PATH)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if secure else None
+    ), timeout)
+    try:
+        writer.write(
+            f"GET {parts.path} HTTP/1.1\r\n"
+            f"Host: {parts.hostname}\r\n"
+            "User-Agent: archfusion-mirror-rank\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status = await asyncio.wait_for(reader.readline(), timeout - (loop.time() - start))
+        latency = loop.time() - start
+        fields = status.decode(errors="replace").split()
+        if len(fields) < 2 or fields[1] != "200":
+            return MirrorResult(url, error=f"HTTP {fields[1] if len(fields) > 1 else '?'}")
+
+        # En-têtes puis corps, dans la fenêtre de mesure
+        sample_start = loop.time()
+        deadline = sample_start + sample_time
+        while (await asyncio.wait_for(reader.readline(), deadline - loop.time())) \
+                not in (b"\r\n", b"\n", b""):
+            pass
+
+        received = 0
+        while received < max_bytes and loop.time() < deadline:
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            received += len(chunk)
+
+        if not received:
+            return MirrorResult(url, error="réponse vide")
+        elapsed = max(loop.time() - sample_start, 1e-6)
+        return MirrorResult(url, latency=latency, throughput=received / elapsed)
+    finally:
+        writer.close()
+
+
+async def probe_all(urls: List[str], timeout: float = PROBE_TIMEOUT,
+                    sample_time: float = PROBE_SAMPLE_TIME,
+                    concurrency: int = PROBE_CONCURRENCY) -> List[MirrorResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url: str) -> MirrorResult:
+        async with semaphore:
+            return await probe_mirror(url, timeout, sample_time)
+
+    return list(await asyncio.gather(*(bounded(url) for url in urls)))
+
+
+def rank(results: List[MirrorResult]) -> List[MirrorResult]:
+    return sorted((result for result in results if result.ok), key=lambda r: r.score)
+
+
+def load_cache(path: str, countries: List[str], ttl: Optional[float]) -> Optional[List[MirrorResult]]:
+    """Classement en cache s'il est valide pour ces pays (ttl None: sans expiration)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CACHE_VERSION or data.get("countries") != countries:
+        return None
+    if ttl is not None and time.time() - data.get("created", 0) > ttl:
+        return None
+    return [MirrorResult(**mirror) for mirror in data.get("mirrors", [])] or None
+
+
+def save_cache(path: str, countries: List[str], ranked: List[MirrorResult]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": CACHE_VERSION,
+            "created": time.time(),
+            "countries": countries,
+            "mirrors": [asdict(result) for result in ranked],
+        }, f, indent=2)
+    os.replace(tmp, path)
+
+
+def format_mirrorlist(ranked: List[MirrorResult]) -> str:
+    lines = [
+        "# ArchFusion OS - Miroirs classés par mirror_rank.py",
+        f"# Généré le {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+    ]
+    for result in ranked:
+        lines.append(f"# latence {result.latency * 1000:.0f} ms, "
+                     f"débit {result.throughput / 1024:.0f} Kio/s")
+        lines.append(f"Server = {result.url.rstrip('/')}/$repo/os/$arch")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classement des miroirs Arch Linux")
+    parser.add_argument("--config", help="install.conf (défaut: configs/install.conf ou /etc)")
+    parser.add_argument("--save", metavar="FICHIER", help="écrire la mirrorlist dans FICHIER")
+    parser.add_argument("--number", type=int, default=10, help="miroirs conservés (défaut: 10)")
+    parser.add_argument("--candidates", nargs="+", metavar="URL",
+                        help="miroirs à sonder (au lieu de la liste officielle)")
+    parser.add_argument("--status-url", default=MIRROR_STATUS_URL,
+                        help="liste officielle des miroirs (JSON)")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT,
+                        help=f"délai par miroir en secondes (défaut: {PROBE_TIMEOUT})")
+    parser.add_argument("--sample-time", type=float, default=PROBE_SAMPLE_TIME,
+                        help=f"durée de la mesure de débit (défaut: {PROBE_SAMPLE_TIME})")
+    parser.add_argument("--concurrency", type=int, default=PROBE_CONCURRENCY,
+                        help=f"sondes simultanées (défaut: {PROBE_CONCURRENCY})")
+    parser.add_argument("--cache", default=MIRROR_CACHE, help=f"cache (défaut: {MIRROR_CACHE})")
+    parser.add_argument("--ttl", type=float, default=MIRROR_CACHE_TTL,
+                        help=f"validité du cache en secondes (défaut: {MIRROR_CACHE_TTL})")
+    parser.add_argument("--refresh", action="store_true", help="ignorer le cache")
+    args = parser.parse_args()
+
+    config = load_install_config(args.config)
+    countries = mirror_countries(config)
+    cache_key = args.candidates or countries
+    ttl = args.ttl if config_bool(config, "MIRROR_UPDATE_ENABLED", True) else None
+
+    ranked = None if args.refresh else load_cache(args.cache, cache_key, ttl)
+    if ranked is not None:
+        print(f"Classement en cache réutilisé ({args.cache})", file=sys.stderr)
+    else:
+        if args.candidates:
+            urls = args.candidates
+        else:
+            try:
+                urls = parse_status(fetch_status(args.status_url, args.timeout), countries)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Liste officielle indisponible ({e}), mirrorlist locale utilisée",
+                      file=sys.stderr)
+                urls = mirrorlist_servers()
+
+        start = time.perf_counter()
+        results = asyncio.run(probe_all(urls, args.timeout, args.sample_time, args.concurrency))
+        ranked = rank(results)
+        print(f"{len(ranked)}/{len(urls)} miroirs joignables "
+              f"({time.perf_counter() - start:.1f} s)", file=sys.stderr)
+        if not ranked:
+            sys.exit(1)
+        try:
+            save_cache(args.cache, cache_key, ranked)
+        except OSError as e:
+            print(f"⚠️  Cache non enregistré: {e}", file=sys.stderr)
+
+    mirrorlist = format_mirrorlist(ranked[:args.number])
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            f.write(mirrorlist)
+    else:
+        print(mirrorlist, end="")
+
+
+if __name__ == "__main__":
+    main()
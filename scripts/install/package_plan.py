@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Plan de paquets
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Résout la liste unique des paquets et services à installer à
+             partir des tableaux de configs/install.conf et des choix de
+             l'assistant (bureau, Bluetooth, pare-feu, SSH, GPU détectés)
+
+Le plan est installé en une seule transaction pacstrap par install.sh.
+
+Usage:
+    python3 package_plan.py --desktop gnome --packages
+    python3 package_plan.py --desktop kde --no-bluetooth --services
+    python3 package_plan.py --gpu all --packages      # tous les pilotes (dépôt de l'ISO)
+"""
+
+import argparse
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from install_config import ConfigValue, config_bool, config_list, load_install_config
+
+# Environnements de bureau: identifiant -> libellé de AdvancedOptionsPage.de_combo
+DESKTOPS: Dict[str, str] = {
+    "kde": "KDE Plasma",
+    "gnome": "GNOME",
+    "xfce": "XFCE",
+    "minimal": "Minimal",
+}
+
+# Tableaux de install.conf propres à chaque bureau
+DESKTOP_ARRAYS: Dict[str, List[str]] = {
+    "kde": ["KDE_PACKAGES", "ESSENTIAL_APPS", "THEME_PACKAGES"],
+    "gnome": ["GNOME_PACKAGES"],
+    "xfce": ["XFCE_PACKAGES"],
+    "minimal": [],
+}
+
+DISPLAY_MANAGERS: Dict[str, str] = {"kde": "sddm", "gnome": "gdm", "xfce": "lightdm"}
+
+# Paquet fournissant chaque service (les autres viennent du système de base)
+SERVICE_PACKAGES: Dict[str, str] = {
+    "NetworkManager": "networkmanager",
+    "sddm": "sddm",
+    "gdm": "gdm",
+    "lightdm": "lightdm",
+    "bluetooth": "bluez",
+    "cups": "cups",
+    "firewalld": "firewalld",
+    "sshd": "openssh",
+    "docker": "docker",
+    "libvirtd": "libvirt",
+}
+
+# GPU: identifiant PCI du fabricant -> (nom, interrupteur, tableau de install.conf)
+GPU_VENDORS: Dict[str, Tuple[str, str, str]] = {
+    "0x10de": ("nvidia", "NVIDIA_SUPPORT", "NVIDIA_PACKAGES"),
+    "0x1002": ("amd", "AMD_SUPPORT", "AMD_PACKAGES"),
+    "0x8086": ("intel", "INTEL_SUPPORT", "INTEL_PACKAGES"),
+}
+
+# Tableaux optionnels activés par un interrupteur de install.conf
+OPTIONAL_ARRAYS = [
+    ("PRINTING_ENABLED", "PRINTING_PACKAGES"),
+    ("VIRTUALIZATION_ENABLED", "VIRTUALIZATION_PACKAGES"),
+    ("GAMING_ENABLED", "GAMING_PACKAGES"),
+    ("DEV_PACKAGES_ENABLED", "DEV_PACKAGES"),
+]
+
+
+@dataclass
+class PackagePlan:
+    """Paquets (sans doublons, dans l'ordre de découverte) et services à activer"""
+
+    packages: List[str] = field(default_factory=list)
+    services: List[str] = field(default_factory=list)
+    sources: Dict[str, str] = field(default_factory=dict)
+
+    def add(self, packages: List[str], source: str):
+        for package in packages:
+            if package not in self.sources:
+                self.sources[package] = source
+                self.packages.append(package)
+
+
+def desktop_id(desktop: str) -> str:
+    """Accepte un identifiant (kde) ou un libellé de l'interface (KDE Plasma)"""
+    if desktop in DESKTOPS:
+        return desktop
+    for key, label in DESKTOPS.items():
+        if label == desktop:
+            return key
+    raise ValueError(f"Environnement de bureau inconnu: {desktop}")
+
+
+def detect_gpu_vendors(sysfs_root: str = "/sys") -> Set[str]:
+    """Fabricants des contrôleurs d'affichage PCI présents (classe 0x03xxxx)"""
+    vendors: Set[str] = set()
+    devices = os.path.join(sysfs_root, "bus", "pci", "devices")
+    try:
+        entries = os.listdir(devices)
+    except OSError:
+        return vendors
+    for entry in entries:
+        try:
+            with open(os.path.join(devices, entry, "class")) as f:
+                if not f.read().strip().startswith("0x03"):
+                    continue
+            with open(os.path.join(devices, entry, "vendor")) as f:
+                vendor = GPU_VENDORS.get(f.read().strip())
+        except OSError:
+            continue
+        if vendor:
+            vendors.add(vendor[0])
+    return vendors
+
+
+def resolve_plan(config: Dict[str, ConfigValue], desktop: str = "kde",
+                 bluetooth: bool = True, firewall: bool = True, ssh: bool = False,
+                 gpu_vendors: Optional[Set[str]] = None) -> PackagePlan:
+    """Combine les tableaux de install.conf selon les choix de l'assistant
+
+    gpu_vendors: fabricants à équiper (None: détection sur la machine courante).
+    """
+    desktop = desktop_id(desktop)
+    if gpu_vendors is None:
+        gpu_vendors = detect_gpu_vendors()
+
+    plan = PackagePlan()
+    for array in ("BASE_PACKAGES", "SYSTEM_PACKAGES"):
+        plan.add(config_list(config, array), array)
+
+    if desktop != "minimal":
+        for array in DESKTOP_ARRAYS[desktop]:
+            plan.add(config_list(config, array), array)
+        for array in ("MULTIMEDIA_PACKAGES", "FONT_PACKAGES"):
+            plan.add(config_list(config, array), array)
+
+    for name, switch, array in GPU_VENDORS.values():
+        if name in gpu_vendors and config_bool(config, switch, True):
+            plan.add(config_list(config, array), array)
+
+    if bluetooth and config_bool(config, "BLUETOOTH_ENABLED", True):
+        plan.add(config_list(config, "BLUETOOTH_PACKAGES"), "BLUETOOTH_PACKAGES")
+    if firewall and config_bool(config, "FIREWALL_ENABLED", True):
+        plan.add(["firewalld"], "FIREWALL_ENABLED")
+    if ssh:
+        plan.add(["openssh"], "ssh")
+
+    for switch, array in OPTIONAL_ARRAYS:
+        if config_bool(config, switch):
+            plan.add(config_list(config, array), array)
+
+    # Services: ceux de install.conf dont le paquet est prévu, gestionnaire
+    # de connexion adapté au bureau choisi
+    services = [service for service in config_list(config, "ENABLED_SERVICES")
+                if service not in DISPLAY_MANAGERS.values()]
+    if desktop in DISPLAY_MANAGERS:
+        services.append(DISPLAY_MANAGERS[desktop])
+    if ssh:
+        services.append("sshd")
+    plan.services = [
+        service for service in dict.fromkeys(services)
+        if SERVICE_PACKAGES.get(service, "base") == "base"
+        or SERVICE_PACKAGES[service] in plan.sources
+    ]
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan de paquets d'installation")
+    parser.add_argument("--config", help="install.conf (défaut: configs/install.conf ou /etc)")
+    parser.add_argument("--desktop", default="kde", help=f"{', '.join(DESKTOPS)} (défaut: kde)")
+    parser.add_argument("--no-bluetooth", action="store_true", help="sans Bluetooth")
+    parser.add_argument("--no-firewall", action="store_true", help="sans pare-feu")
+    parser.add_argument("--ssh", action="store_true", help="avec serveur SSH")
+    parser.add_argument("--gpu", default="auto",
+                        help="auto (détection), all, none ou liste: nvidia,amd,intel")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--packages", action="store_true", help="un paquet par ligne")
+    output.add_argument("--services", action="store_true", help="un service par ligne")
+    args = parser.parse_args()
+
+    if args.gpu == "auto":
+        gpu_vendors = None
+    elif args.gpu == "all":
+        gpu_vendors = {name for name, _, _ in GPU_VENDORS.values()}
+    elif args.gpu == "none":
+        gpu_vendors = set()
+    else:
+        gpu_vendors = {name.strip() for name in args.gpu.split(",") if name.strip()}
+
+    try:
+        plan = resolve_plan(
+            load_install_config(args.config), args.desktop,
+            bluetooth=not args.no_bluetooth, firewall=not args.no_firewall,
+            ssh=args.ssh, gpu_vendors=gpu_vendors,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.packages:
+        print("\n".join(plan.packages))
+    elif args.services:
+        print("\n".join(plan.services))
+    else:
+        for package in plan.packages:
+            print(f"{package:<32} {plan.sources[package]}")
+        print(f"\n{len(plan.packages)} paquets, services: {' '.join(plan.services)}")
+
+
+if __name__ == "__main__":
+    main()
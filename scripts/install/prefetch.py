@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Préchargement des paquets
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Télécharge en arrière-plan (pacman -Sw) les paquets de
+             l'installation pendant que l'utilisateur remplit l'assistant
+
+Les paquets sont placés dans un cache temporaire transmis à install.sh
+(--package-cache), utilisé ensuite par pacstrap et par le pacman du chroot.
+La base de synchronisation est séparée de celle du système live: pacman
+télécharge donc toute la fermeture des dépendances, comme pour un disque vide.
+
+Les paquets sont ceux du plan d'installation (voir package_plan.py).
+
+Avant chaque groupe, pacman -Sp en donne la taille de téléchargement (paquets
+absents du cache): le groupe n'est préchargé que s'il tient dans l'espace
+libre du cache, et, le cache étant en mémoire (tmpfs), dans la mémoire
+disponible (MemAvailable), en gardant PREFETCH_MIN_FREE de marge.
+
+Usage:
+    python3 prefetch.py                               # plan KDE Plasma
+    python3 prefetch.py --desktop xfce --cache-dir /tmp/cache
+    python3 prefetch.py --config test/pacman.conf hello   # dépôt file:// local
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from install_config import load_install_config
+from package_plan import desktop_id, resolve_plan
+
+# Cache temporaire (tmpfs sur le système live, l'overlay racine est trop petit)
+PREFETCH_DIR = "/tmp/archfusion-pkgcache"
+PREFETCH_LOG = "/tmp/archfusion-prefetch.log"
+
+# Dépôt hors ligne intégré à l'ISO (voir build_offline_repo dans build-iso.sh)
+OFFLINE_REPO_DIR = "/opt/archfusion/repo"
+OFFLINE_REPO_NAME = "archfusion-offline"
+
+# Image racine du média de démarrage (install.sh --image)
+ROOT_IMAGE_GLOB = "/run/archiso/bootmnt/*/x86_64/airootfs.sfs"
+
+# Espace libre et mémoire disponible conservés après le préchargement (octets)
+PREFETCH_MIN_FREE = 1024 ** 3
+
+# Attente du réseau: intervalle entre deux sondes et délai de connexion (secondes)
+NETWORK_POLL_INTERVAL = 2.0
+NETWORK_PROBE_TIMEOUT = 2.0
+
+
+def plan_packages(desktop: str = "kde", bluetooth: bool = True,
+                  firewall: bool = True, ssh: bool = False,
+                  gpu_vendors: Optional[Set[str]] = None) -> List[str]:
+    """Paquets installés par install.sh pour ces choix (identifiant ou libellé du bureau)"""
+    plan = resolve_plan(load_install_config(), desktop, bluetooth=bluetooth,
+                        firewall=firewall, ssh=ssh, gpu_vendors=gpu_vendors)
+    return plan.packages
+
+
+def base_packages() -> List[str]:
+    """Paquets communs à tous les choix, préchargés avant que le bureau soit connu"""
+    return plan_packages("minimal", bluetooth=False, firewall=False)
+
+
+def available_memory() -> Optional[int]:
+    """Mémoire disponible (MemAvailable) en octets, None si inconnue"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def filesystem_type(path: str) -> str:
+    """Type du système de fichiers contenant path (point de montage le plus long)"""
+    path = os.path.realpath(path)
+    best, fstype = "", ""
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                prefix = mount_point.rstrip("/") + "/"
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) > len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        pass
+    return fstype
+
+
+def offline_repo_available(repo_dir: str = OFFLINE_REPO_DIR) -> bool:
+    """Vrai si le dépôt hors ligne de l'ISO est présent et indexé"""
+    return os.path.isfile(os.path.join(repo_dir, f"{OFFLINE_REPO_NAME}.db"))
+
+
+def root_image_path() -> Optional[str]:
+    """Image racine de l'ISO copiée par l'installation par image, si présente"""
+    images = sorted(glob.glob(ROOT_IMAGE_GLOB))
+    return images[0] if images else None
+
+
+def mirror_servers(config_path: str) -> List[str]:
+    """Liste les URL "Server =" d'une configuration pacman (Include compris)"""
+    servers: List[str] = []
+    seen: Set[str] = set()
+
+    def parse(path: str):
+        if path in seen:
+            return
+        seen.add(path)
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            key, sep, value = line.split("#", 1)[0].partition("=")
+            if not sep:
+                continue
+            key, value = key.strip(), value.strip()
+            if key == "Server":
+                servers.append(value)
+            elif key == "Include":
+                for included in sorted(glob.glob(value)):
+                    parse(included)
+
+    parse(config_path)
+    return servers
+
+
+def server_reachable(url: str, timeout: float = NETWORK_PROBE_TIMEOUT) -> bool:
+    """Vrai si le serveur d'un miroir accepte une connexion TCP"""
+    parts = urlsplit(url)
+    if parts.scheme == "file":
+        return True
+    if not parts.hostname:
+        return False
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        with socket.create_connection((parts.hostname, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class PackagePrefetcher:
+    """Télécharge des groupes de paquets dans un cache, dans un thread dédié
+
+    Chaque groupe ("base", "desktop"...) est demandé avec request(). Une
+    nouvelle demande pour un groupe pas encore commencé remplace la
+    précédente: changer plusieurs fois d'environnement de bureau ne
+    télécharge que le dernier choix.
+    """
+
+    def __init__(self, cache_dir: str = PREFETCH_DIR,
+                 pacman_config: str = "/etc/pacman.conf",
+                 pacman: str = "pacman",
+                 log_path: Optional[str] = PREFETCH_LOG,
+                 min_free_bytes: int = PREFETCH_MIN_FREE):
+        self.cache_dir = cache_dir
+        self.db_dir = os.path.join(cache_dir, ".db")
+        self.pacman_config = pacman_config
+        self.pacman = pacman
+        self.log_path = log_path
+        self.min_free_bytes = min_free_bytes
+
+        self.fetched: Set[str] = set()
+        self._pending: Dict[str, List[str]] = {}
+        self._synced = False
+        self._busy = False
+        self._stopping = False
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+
+    def available(self) -> bool:
+        """Le préchargement nécessite pacman et les droits root"""
+        return shutil.which(self.pacman) is not None and os.geteuid() == 0
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> bool:
+        """Démarre le thread de téléchargement; False si indisponible"""
+        if self._thread is not None:
+            return True
+        if not self.available():
+            return False
+        os.makedirs(self.db_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def request(self, group: str, packages: Iterable[str]):
+        """Ajoute (ou remplace) un groupe de paquets à télécharger"""
+        with self._cond:
+            self._pending.pop(group, None)
+            self._pending[group] = list(packages)
+            self._cond.notify_all()
+
+    def stop(self):
+        """Abandonne les téléchargements (les fichiers .part seront repris par pacman)"""
+        with self._cond:
+            self._stopping = True
+            self._pending.clear()
+            if self._process and self._process.poll() is None:
+                self._process.terminate()
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend que toutes les demandes soient traitées; False si délai dépassé"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (self._pending or self._busy) and not self._stopping:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _log(self, message: str):
+        if not self.log_path:
+            return
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
+
+    def _wait_for_network(self) -> bool:
+        """Attend qu'un miroir soit joignable; False si arrêt demandé"""
+        servers = mirror_servers(self.pacman_config)
+        while servers:
+            if any(server_reachable(server) for server in servers):
+                return True
+            with self._cond:
+                if self._stopping:
+                    return False
+                self._cond.wait(NETWORK_POLL_INTERVAL)
+        return True
+
+    def _run(self):
+        self._log(f"Préchargement dans {self.cache_dir}, attente du réseau...")
+        if not self._wait_for_network():
+            return
+
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                group = next(iter(self._pending))
+                packages = self._pending.pop(group)
+                self._busy = True
+
+            try:
+                self._download(group, packages)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def room(self) -> int:
+        """Octets téléchargeables en gardant min_free_bytes d'espace (et de mémoire si tmpfs)"""
+        room = shutil.disk_usage(self.cache_dir).free - self.min_free_bytes
+        if filesystem_type(self.cache_dir) == "tmpfs":
+            memory = available_memory()
+            if memory is not None:
+                room = min(room, memory - self.min_free_bytes)
+        return max(0, room)
+
+    def _pacman(self, arguments: List[str], capture: bool = False) -> Tuple[Optional[int], str]:
+        """Lance pacman sur la base et le cache du préchargement; code None si arrêt demandé"""
+        command = [
+            self.pacman, *arguments, "--noconfirm",
+            "--config", self.pacman_config,
+            "--dbpath", self.db_dir,
+            "--cachedir", self.cache_dir,
+            "--logfile", os.devnull,
+        ]
+        # Sans journal (ligne de commande), pacman écrit sur la sortie standard
+        log = open(self.log_path, "a", encoding="utf-8") if self.log_path else None
+        try:
+            with self._cond:
+                if self._stopping:
+                    return None, ""
+                self._process = subprocess.Popen(command, stdout=subprocess.PIPE if capture else log,
+                                                 stderr=log if capture else subprocess.STDOUT,
+                                                 stdin=subprocess.DEVNULL, text=True)
+            output, _ = self._process.communicate()
+            return self._process.returncode, output or ""
+        finally:
+            if log:
+                log.close()
+
+    def download_size(self, packages: List[str]) -> Optional[int]:
+        """Octets à télécharger pour ces paquets et leurs dépendances (hors cache)"""
+        returncode, output = self._pacman(["-Sp", "--print-format", "%s %f", *packages], capture=True)
+        if returncode != 0:
+            return None
+        size = 0
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0].isdigit() \
+                    and not os.path.exists(os.path.join(self.cache_dir, fields[1])):
+                size += int(fields[0])
+        return size
+
+    def _download(self, group: str, packages: List[str]):
+        packages = [package for package in packages if package not in self.fetched]
+        if not packages:
+            return
+
+        # Base de synchronisation partagée par tous les groupes, requise par -Sp
+        if not self._synced:
+            returncode, _ = self._pacman(["-Sy"])
+            if returncode is None:
+                return
+            if returncode != 0:
+                self._log(f"Échec de la synchronisation des bases (code {returncode})")
+                return
+            self._synced = True
+
+        size = self.download_size(packages)
+        if size is None:
+            self._log(f"Taille du groupe '{group}' inconnue (pacman -Sp en échec)")
+            return
+        room = self.room()
+        if size > room:
+            self._log(f"Espace insuffisant pour précharger '{group}' "
+                      f"({size} octets à télécharger, {room} disponibles)")
+            return
+
+        self._log(f"Groupe '{group}' ({size} octets): {' '.join(packages)}")
+        returncode, _ = self._pacman(["-Sw", *packages])
+        if returncode is None:
+            return
+        if returncode == 0:
+            self.fetched.update(packages)
+            self._log(f"Groupe '{group}' préchargé")
+        else:
+            self._log(f"Échec du préchargement de '{group}' (code {returncode})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Préchargement des paquets d'installation")
+    parser.add_argument("packages", nargs="*", help="paquets supplémentaires")
+    parser.add_argument("--desktop", default="kde",
+                        help="environnement de bureau: kde, gnome, xfce, minimal (défaut: kde)")
+    parser.add_argument("--no-base", action="store_true", help="ne pas précharger le système de base")
+    parser.add_argument("--cache-dir", default=PREFETCH_DIR, help=f"cache (défaut: {PREFETCH_DIR})")
+    parser.add_argument("--config", default="/etc/pacman.conf", help="configuration pacman")
+    args = parser.parse_args()
+
+    try:
+        desktop = desktop_id(args.desktop)
+    except ValueError as e:
+        parser.error(str(e))
+
+    prefetcher = PackagePrefetcher(args.cache_dir, args.config, log_path=None)
+    if not prefetcher.start():
+        raise SystemExit("❌ pacman et les droits root sont nécessaires")
+
+    if not args.no_base:
+        prefetcher.request("base", base_packages())
+    prefetcher.request("desktop", plan_packages(desktop))
+    if args.packages:
+        prefetcher.request("extra", args.packages)
+
+    start = time.perf_counter()
+    prefetcher.wait()
+    prefetcher.stop()
+    prefetcher.join()
+    print(f"{len(prefetcher.fetched)} paquets préchargés dans {args.cache_dir} "
+          f"({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Protocole de progression de l'installation
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Événements JSON émis par install.sh sur un canal dédié
+             (--progress-file) et calcul d'une progression continue
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+PROTOCOL_VERSION = 1
+
+# Étapes de l'installation: (identifiant, libellé, poids relatif)
+# Les identifiants correspondent aux appels run_stage de install.sh.
+STAGES: List[Tuple[str, str, int]] = [
+    ("prerequisites", "Vérification des prérequis", 1),
+    ("partition", "Partitionnement du disque", 2),
+    ("format", "Formatage des partitions", 3),
+    ("mount", "Montage des partitions", 1),
+    ("base", "Installation des paquets", 70),
+    ("configure", "Configuration du système", 10),
+    ("configs", "Application des configurations ArchFusion", 2),
+    ("boot_images", "Génération de l'initramfs et de GRUB", 5),
+    ("finalize", "Finalisation", 6),
+]
+
+STAGE_LABELS: Dict[str, str] = {stage: label for stage, label, _ in STAGES}
+
+
+@dataclass
+class ProgressEvent:
+    """Événement de progression publié par install.sh"""
+
+    event: str                      # begin, progress, end, failed
+    stage: str
+    ts: float
+    bytes_done: Optional[int] = None
+    bytes_total: Optional[int] = None
+    packages_done: Optional[int] = None
+    packages_total: Optional[int] = None
+
+    def fraction(self) -> Optional[float]:
+        """Avancement interne de l'étape (0.0 - 1.0) si connu"""
+        if self.packages_total:
+            return min(1.0, (self.packages_done or 0) / self.packages_total)
+        if self.bytes_total:
+            return min(1.0, (self.bytes_done or 0) / self.bytes_total)
+        return None
+
+
+def parse_event(line: str) -> Optional[ProgressEvent]:
+    """Décode une ligne JSON du canal de progression"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+
+    if not isinstance(data, dict) or data.get("v") != PROTOCOL_VERSION:
+        return None
+
+    try:
+        return ProgressEvent(
+            event=str(data["event"]),
+            stage=str(data["stage"]),
+            ts=float(data["ts"]),
+            bytes_done=data.get("bytes_done"),
+            bytes_total=data.get("bytes_total"),
+            packages_done=data.get("packages_done"),
+            packages_total=data.get("packages_total"),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class LineSplitter:
+    """Découpe un flux d'octets lus par morceaux en lignes complètes"""
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        data = self._pending + chunk
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        return [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
+
+    def flush(self) -> List[str]:
+        """Retourne la dernière ligne incomplète (fin de flux)"""
+        if not self._pending:
+            return []
+        line, self._pending = self._pending, b""
+        return [line.decode("utf-8", errors="replace").rstrip("\r")]
+
+
+class ProgressTracker:
+    """Convertit les événements en pourcentage global pondéré par étape
+
+    Chaque étape contribue selon son poids et son avancement propre, ce qui
+    reste correct lorsque plusieurs étapes s'exécutent en parallèle.
+    """
+
+    def __init__(self, stages: List[Tuple[str, str, int]] = STAGES):
+        self.stages = stages
+        self.labels: Dict[str, str] = {stage: label for stage, label, _ in stages}
+        total = sum(weight for _, _, weight in stages) or 1
+        self._weights: Dict[str, float] = {
+            stage: weight * 100.0 / total for stage, _, weight in stages
+        }
+        self._fractions: Dict[str, float] = {}
+
+        self.percent = 0.0
+        self.stage: Optional[str] = None
+        self.failed = False
+
+    @property
+    def label(self) -> str:
+        if self.stage is None:
+            return "Préparation de l'installation..."
+        return self.labels.get(self.stage, self.stage)
+
+    def update(self, event: ProgressEvent) -> float:
+        """Applique un événement et retourne le pourcentage global"""
+        if event.stage not in self._weights:
+            return self.percent
+
+        self.stage = event.stage
+        if event.event == "end":
+            self._fractions[event.stage] = 1.0
+        elif event.event == "failed":
+            self.failed = True
+        else:
+            fraction = event.fraction()
+            if fraction is not None:
+                self._fractions[event.stage] = fraction
+            else:
+                self._fractions.setdefault(event.stage, 0.0)
+
+        value = sum(self._weights[stage] * fraction
+                    for stage, fraction in self._fractions.items())
+
+        # La progression ne recule jamais
+        self.percent = max(self.percent, min(100.0, value))
+        return self.percent
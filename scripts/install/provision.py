@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Provisionnement multi-disques
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Installe un même plan d'installation sur plusieurs disques en
+             parallèle depuis une seule instance (banc d'imagerie)
+
+Chaque disque a son propre moteur (engine.py), sa racine de montage, son
+journal et son code de sortie. Les paquets sont téléchargés une seule fois
+dans un cache partagé (prefetch.py) pendant le partitionnement; l'étape
+"base" de chaque disque attend la fin de ce préchargement. Le classement des
+miroirs est fait une seule fois pour tous les disques.
+
+Les cibles peuvent être des disques (sdb, /dev/sdc) ou des fichiers image,
+attachés à un périphérique loop pour la durée de l'installation.
+
+Usage:
+    sudo python3 provision.py --plan plan.json sdb sdc sdd
+    sudo python3 provision.py --plan plan.json --image-size 40G /srv/a.img /srv/b.img
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from engine import DONE, FAILED, INSTALL_STEPS, PENDING, RUNNING, InstallEngine, Step, remove_steps
+from install_plan import PlanError, load_plan
+from package_plan import GPU_VENDORS
+from prefetch import PackagePrefetcher, offline_repo_available, plan_packages, root_image_path
+
+# Journaux, racines de montage et cache partagé
+PROVISION_DIR = "/tmp/archfusion-provision"
+PROVISION_MOUNT_DIR = "/mnt/archfusion-provision"
+
+# Disques installés simultanément, et étapes simultanées par disque
+DEFAULT_MAX_DISKS = 2
+STEP_WORKERS_PER_DISK = 2
+
+# Étapes exécutées une seule fois avant les installations
+SHARED_STEPS = ("rank_mirrors",)
+
+MIRROR_RANK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mirror_rank.py")
+
+
+@dataclass
+class DiskTarget:
+    """Cible d'installation et son état"""
+
+    source: str
+    disk: str = ""
+    image: bool = False
+    status: str = PENDING
+    percent: int = 0
+    label: str = ""
+    message: str = ""
+    duration: float = 0.0
+    log_path: str = ""
+    failed_steps: List[str] = field(default_factory=list)
+
+
+def _run(command: List[str]) -> str:
+    return subprocess.run(command, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def disk_in_use(disk: str) -> bool:
+    """Vrai si une partition du disque est montée ou sert de swap sur cette machine"""
+    prefix = f"/dev/{disk}"
+    for path in ("/proc/mounts", "/proc/swaps"):
+        try:
+            with open(path) as f:
+                if any(line.split()[0].startswith(prefix) for line in f if line.strip()):
+                    return True
+        except OSError:
+            continue
+    return False
+
+
+def release_disk(disk: str, root: str):
+    """Démonte la cible et désactive son swap (après un échec ou une interruption)"""
+    if os.path.ismount(root):
+        subprocess.run(["umount", "-R", root], check=False)
+    try:
+        with open("/proc/swaps") as f:
+            swaps = [line.split()[0] for line in f.readlines()[1:] if line.strip()]
+    except OSError:
+        swaps = []
+    for device in swaps:
+        if device.startswith(f"/dev/{disk}"):
+            subprocess.run(["swapoff", device], check=False)
+
+
+class Provisioner:
+    """Installe un plan sur plusieurs cibles avec un nombre borné d'installations simultanées"""
+
+    def __init__(self, config: Dict, targets: List[str],
+                 max_disks: int = DEFAULT_MAX_DISKS,
+                 step_workers: int = STEP_WORKERS_PER_DISK,
+                 work_dir: str = PROVISION_DIR,
+                 mount_dir: str = PROVISION_MOUNT_DIR,
+                 image_size: Optional[str] = None,
+                 prefetcher: Optional[PackagePrefetcher] = None):
+        self.config = config
+        self.targets = [DiskTarget(source) for source in targets]
+        self.max_disks = max(1, max_disks)
+        self.step_workers = step_workers
+        self.work_dir = work_dir
+        self.mount_dir = mount_dir
+        self.image_size = image_size
+        self.prefetcher = prefetcher or PackagePrefetcher(
+            cache_dir=os.path.join(work_dir, "pkgcache"),
+            log_path=os.path.join(work_dir, "prefetch.log"),
+        )
+
+        self.engines: Dict[str, InstallEngine] = {}
+        self.cache_ready = threading.Event()
+        self.steps = remove_steps(INSTALL_STEPS, SHARED_STEPS)
+        self._slots = threading.Semaphore(self.max_disks)
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    # ------------------------------------------------------------------
+    # Préparation
+
+    def attach_targets(self):
+        """Résout les noms de disques et attache les fichiers image à un loop"""
+        for target in self.targets:
+            source = target.source
+            if source.startswith("/dev/"):
+                target.disk = os.path.basename(source)
+            elif os.path.sep in source or os.path.isfile(source):
+                if not os.path.exists(source):
+                    if not self.image_size:
+                        raise ValueError(f"{source}: image absente (utilisez --image-size)")
+                    _run(["truncate", "-s", self.image_size, source])
+                device = _run(["losetup", "--find", "--show", "--partscan", source])
+                target.disk = os.path.basename(device)
+                target.image = True
+            else:
+                target.disk = source
+
+            if not os.path.exists(f"/sys/block/{target.disk}"):
+                raise ValueError(f"{source}: disque introuvable")
+            if disk_in_use(target.disk):
+                raise ValueError(f"{source}: une partition de /dev/{target.disk} est utilisée")
+
+        disks = [target.disk for target in self.targets]
+        duplicates = sorted({disk for disk in disks if disks.count(disk) > 1})
+        if duplicates:
+            raise ValueError(f"disques en double: {', '.join(duplicates)}")
+
+    def detach_targets(self):
+        for target in self.targets:
+            if target.image and target.disk:
+                subprocess.run(["losetup", "-d", f"/dev/{target.disk}"], check=False)
+
+    def rank_mirrors(self):
+        """Classement des miroirs une seule fois (install.sh le ferait pour chaque disque)"""
+        if self.config["offline"]:
+            return
+        result = subprocess.run([sys.executable, MIRROR_RANK_SCRIPT, "--save", "/etc/pacman.d/mirrorlist"],
+                                check=False)
+        if result.returncode != 0:
+            print("⚠️  Classement des miroirs impossible, liste actuelle conservée")
+
+    def start_prefetch(self):
+        """Télécharge le plan complet une seule fois dans le cache partagé"""
+        if self.config["offline"] or not self.prefetcher.start():
+            self.cache_ready.set()
+            return
+
+        self.config["package_cache"] = self.prefetcher.cache_dir
+        self.prefetcher.request("plan", plan_packages(
+            self.config["desktop_environment"], bluetooth=self.config["bluetooth"],
+            firewall=self.config["firewall"], ssh=self.config["ssh"],
+            gpu_vendors={name for name, _, _ in GPU_VENDORS.values()},
+        ))
+
+        def wait():
+            self.prefetcher.wait()
+            self.cache_ready.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Installation
+
+    def _before_step(self, step: Step) -> bool:
+        # Sans cache complet, chaque disque téléchargerait ses propres paquets
+        if step.name == "base":
+            self.cache_ready.wait()
+        return not self._stopping
+
+    def _report(self, target: DiskTarget):
+        print(f"[{target.disk:>8}] {target.percent:3d}% {target.label}", flush=True)
+
+    def _install(self, target: DiskTarget):
+        with self._slots:
+            if self._stopping:
+                target.message = "annulé"
+                target.status = FAILED
+                return
+
+            root = os.path.join(self.mount_dir, target.disk)
+            target.log_path = os.path.join(self.work_dir, f"{target.disk}.log")
+            target.status = RUNNING
+
+            def progress(percent: int, label: str):
+                target.percent, target.label = percent, label
+                self._report(target)
+
+            def step_status(step: Step, status: str):
+                if status == FAILED:
+                    target.failed_steps.append(step.name)
+
+            engine = InstallEngine(
+                {**self.config, "disk": target.disk},
+                on_progress=progress,
+                on_step=step_status,
+                steps=self.steps,
+                max_workers=self.step_workers,
+                command_prefix=(),
+                console_log=target.log_path,
+                extra_arguments=(
+                    "--target-root", root,
+                    "--log-file", os.path.join(self.work_dir, f"{target.disk}-install.log"),
+                    "--gpu", "all",
+                    "--removable-boot",
+                ),
+                before_step=self._before_step,
+                trace_file=os.path.join(self.work_dir, f"{target.disk}-trace.json"),
+                history_file=None,
+            )
+            with self._lock:
+                self.engines[target.disk] = engine
+
+            start = time.monotonic()
+            ok = engine.run()
+            target.duration = time.monotonic() - start
+
+            if ok:
+                target.status = DONE
+                target.message = "installé"
+            else:
+                target.status = FAILED
+                target.message = f"échec: {', '.join(target.failed_steps) or 'interrompu'}"
+                release_disk(target.disk, root)
+            print(f"[{target.disk:>8}] {'✅' if ok else '❌'} {target.message} "
+                  f"({target.duration:.0f} s, journal: {target.log_path})", flush=True)
+
+    def run(self) -> bool:
+        """Installe toutes les cibles; True si toutes ont réussi"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        threads: List[threading.Thread] = []
+        try:
+            self.attach_targets()
+            self.rank_mirrors()
+            self.start_prefetch()
+
+            threads = [threading.Thread(target=self._install, args=(target,), daemon=True)
+                       for target in self.targets]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                # join() avec délai: Ctrl+C reste traité pendant l'attente
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            # Les cibles ne sont détachées qu'une fois toutes les étapes arrêtées
+            self.stop()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            self.prefetcher.stop()
+            self.detach_targets()
+            self.write_status()
+
+        return all(target.status == DONE for target in self.targets)
+
+    def stop(self):
+        """Arrête toutes les installations en cours et débloque les étapes en attente"""
+        self._stopping = True
+        self.cache_ready.set()
+        with self._lock:
+            engines = list(self.engines.values())
+        for engine in engines:
+            engine.stop()
+
+    def write_status(self):
+        """Résultat par disque (status.json) pour les outils du banc"""
+        path = os.path.join(self.work_dir, "status.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([asdict(target) for target in self.targets], f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Installation d'un plan sur plusieurs disques")
+    parser.add_argument("targets", nargs="+", help="disques (sdb, /dev/sdc) ou fichiers image")
+    parser.add_argument("--plan", required=True, help="plan d'installation (voir install_plan.py)")
+    parser.add_argument("--max-disks", type=int, default=DEFAULT_MAX_DISKS,
+                        help=f"installations simultanées (défaut: {DEFAULT_MAX_DISKS})")
+    parser.add_argument("--step-workers", type=int, default=STEP_WORKERS_PER_DISK,
+                        help=f"étapes simultanées par disque (défaut: {STEP_WORKERS_PER_DISK})")
+    parser.add_argument("--image-size", help="taille des fichiers image à créer (ex: 40G)")
+    parser.add_argument("--work-dir", default=PROVISION_DIR, help=f"journaux et cache (défaut: {PROVISION_DIR})")
+    parser.add_argument("--yes", action="store_true", help="ne pas demander de confirmation")
+    args = parser.parse_args()
+
+    try:
+        config = load_plan(args.plan)
+    except PlanError as e:
+        parser.error(f"{args.plan}: {e}")
+
+    # Aucune saisie possible pendant des installations parallèles
+    if config["encrypt"]:
+        parser.error("le chiffrement demande une phrase de passe interactive: non pris en charge")
+    if not (config["root_password_hash"] and config["user_password_hash"]):
+        parser.error("le plan doit contenir root_password_hash et user_password_hash")
+    if config["offline"] and not offline_repo_available():
+        print("⚠️  Dépôt de l'ISO absent: installation depuis les miroirs")
+        config["offline"] = False
+    if config["image"] and not root_image_path():
+        print("⚠️  Image système de l'ISO absente: installation des paquets")
+        config["image"] = False
+    if os.geteuid() != 0:
+        parser.error("le provisionnement doit être exécuté en tant que root")
+
+    if not args.yes:
+        print("⚠️  Toutes les données de ces cibles seront EFFACÉES:")
+        for target in args.targets:
+            print(f"    {target}")
+        if input("Continuer? (y/N): ").strip().lower() not in ("y", "o", "yes", "oui"):
+            sys.exit(1)
+
+    provisioner = Provisioner(config, args.targets, max_disks=args.max_disks,
+                              step_workers=args.step_workers, work_dir=args.work_dir,
+                              image_size=args.image_size)
+    try:
+        ok = provisioner.run()
+    except KeyboardInterrupt:
+        ok = False
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print()
+    for target in provisioner.targets:
+        print(f"{target.source:<24} /dev/{target.disk:<10} {target.message}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Mises à jour différentielles des ISO
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Compare une ISO publiée et la suivante par découpage selon le
+             contenu, pour ne transférer que les blocs qui ont changé: fichier
+             delta compact, ou index de blocs (façon zsync) avec lequel le
+             client ne télécharge que les plages manquantes de la nouvelle ISO
+
+Les coupures des blocs dépendent du contenu (repère de deux octets, bornes de
+taille minimale et maximale), pas de leur position: une insertion ou un
+décalage dans le squashfs ne change que les blocs voisins. Le repère est cherché
+par bytes.find, à la vitesse de la mémoire; l'ISO étant surtout composée de
+données compressées, il tombe en moyenne tous les 64K.
+
+L'ISO reconstruite est vérifiée avec l'empreinte SHA-256 de la nouvelle ISO
+avant d'être mise en place.
+
+Usage:
+    python3 iso_delta.py create ANCIENNE.iso NOUVELLE.iso        # NOUVELLE.iso.delta
+    python3 iso_delta.py apply ANCIENNE.iso NOUVELLE.iso.delta -o NOUVELLE.iso
+    python3 iso_delta.py index NOUVELLE.iso                      # NOUVELLE.iso.cdc.json
+    python3 iso_delta.py fetch https://.../NOUVELLE.iso --seed ANCIENNE.iso -o NOUVELLE.iso
+    python3 iso_delta.py bench ANCIENNE.iso NOUVELLE.iso         # taille et durées
+"""
+
+import argparse
+import hashlib
+import json
+import lzma
+import os
+import struct
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from build_cache import format_size
+from iso_manifest import HASH_WORKERS, chunk_digest
+
+DELTA_FORMAT = "archfusion-iso-delta"
+INDEX_FORMAT = "archfusion-chunk-index"
+FORMAT_VERSION = 1
+DELTA_MAGIC = b"AFDELTA1"
+DELTA_SUFFIX = ".delta"
+INDEX_SUFFIX = ".cdc.json"
+
+# Découpage selon le contenu
+CHUNK_ANCHOR = b"\xa5\x5a"
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+READ_SIZE = 16 * 1024 ** 2
+# Copie et téléchargement: taille des lectures et des requêtes de plages
+COPY_SIZE = 1024 ** 2
+MAX_RANGE = 8 * 1024 ** 2
+XZ_PRESET = 6
+
+
+class DeltaError(ValueError):
+    """Delta ou index illisible, ou ISO reconstruite différente de l'attendue"""
+
+
+@dataclass
+class Chunk:
+    offset: int
+    length: int
+    digest: str
+
+
+@dataclass
+class ImageIndex:
+    """Blocs d'une image découpée selon le contenu"""
+
+    name: str
+    size: int
+    sha256: str
+    chunks: List[Chunk] = field(default_factory=list)
+
+    def document(self) -> Dict:
+        return {
+            "format": INDEX_FORMAT,
+            "version": FORMAT_VERSION,
+            "name": self.name,
+            "size": self.size,
+            "sha256": self.sha256,
+            "chunking": chunking_parameters(),
+            "chunks": [[chunk.length, chunk.digest] for chunk in self.chunks],
+        }
+
+    @classmethod
+    def from_document(cls, document) -> "ImageIndex":
+        _check_document(document, INDEX_FORMAT)
+        index = cls(document["name"], int(document["size"]), document["sha256"])
+        offset = 0
+        for length, digest in document["chunks"]:
+            index.chunks.append(Chunk(offset, int(length), digest))
+            offset += int(length)
+        if offset != index.size:
+            raise DeltaError("index incohérent: la somme des blocs ne fait pas la taille de l'image")
+        return index
+
+    def digests(self) -> Dict[str, Chunk]:
+        """Premier bloc de chaque contenu"""
+        found: Dict[str, Chunk] = {}
+        for chunk in self.chunks:
+            found.setdefault(chunk.digest, chunk)
+        return found
+
+
+def chunking_parameters() -> Dict:
+    return {"anchor": CHUNK_ANCHOR.hex(), "min": MIN_CHUNK, "max": MAX_CHUNK}
+
+
+def _check_document(document, expected_format: str):
+    if not isinstance(document, dict) or document.get("format") != expected_format:
+        raise DeltaError(f"format attendu: {expected_format}")
+    if document.get("version") != FORMAT_VERSION:
+        raise DeltaError(f"version non prise en charge: {document.get('version')!r}")
+    if document.get("chunking", chunking_parameters()) != chunking_parameters():
+        raise DeltaError("paramètres de découpage différents de ceux de cet outil")
+
+
+# ----------------------------------------------------------------------
+# Découpage
+
+def _content_windows(f: BinaryIO) -> Iterator[Tuple[int, memoryview, bytes]]:
+    """Blocs (position, contenu) coupés selon le contenu, et données lues au passage"""
+    buffer = b""
+    base = 0
+    position = 0
+    eof = False
+    while True:
+        # Toujours au moins un bloc maximal d'avance, sauf en fin de fichier
+        if not eof and len(buffer) - position < MAX_CHUNK:
+            more = f.read(READ_SIZE)
+            eof = not more
+            buffer = buffer[position:] + more
+            base += position
+            position = 0
+            yield -1, memoryview(b""), more
+            continue
+        if position >= len(buffer):
+            return
+        limit = min(position + MAX_CHUNK, len(buffer))
+        anchor = buffer.find(CHUNK_ANCHOR, position + MIN_CHUNK, limit)
+        end = anchor + len(CHUNK_ANCHOR) if anchor >= 0 else limit
+        yield base + position, memoryview(buffer)[position:end], b""
+        position = end
+
+
+def index_image(path: str, workers: int = HASH_WORKERS) -> ImageIndex:
+    """Index d'une image en une lecture: blocs et SHA-256 de l'image entière"""
+    whole = hashlib.sha256()
+    chunks: List[Chunk] = []
+    pending: List[Tuple[int, int, object]] = []
+    with open(path, "rb", buffering=0) as f, ThreadPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=1) as sequential:
+        updates = []
+        for offset, view, data in _content_windows(f):
+            if offset < 0:
+                # Empreinte globale dans l'ordre, en parallèle des blocs
+                if data:
+                    updates.append(sequential.submit(whole.update, data))
+                continue
+            pending.append((offset, len(view), pool.submit(chunk_digest, "sha256", view)))
+            if len(pending) >= 4096:
+                chunks += [Chunk(o, n, future.result()) for o, n, future in pending]
+                pending = []
+        chunks += [Chunk(o, n, future.result()) for o, n, future in pending]
+        for update in updates:
+            update.result()
+    size = chunks[-1].offset + chunks[-1].length if chunks else 0
+    return ImageIndex(os.path.basename(path), size, whole.hexdigest(), chunks)
+
+
+def save_index(index: ImageIndex, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index.document(), f, separators=(",", ":"))
+        f.write("\n")
+
+
+def load_index(location: str) -> ImageIndex:
+    """Index local ou téléchargé (http, https)"""
+    try:
+        if location.startswith(("http://", "https://")):
+            with urllib.request.urlopen(location) as response:
+                document = json.load(response)
+        else:
+            with open(location, encoding="utf-8") as f:
+                document = json.load(f)
+    except OSError as e:
+        raise DeltaError(f"{location}: lecture impossible: {e}") from None
+    except ValueError as e:
+        raise DeltaError(f"{location}: JSON invalide: {e}") from None
+    return ImageIndex.from_document(document)
+
+
+# ----------------------------------------------------------------------
+# Écriture vérifiée de l'image reconstruite
+
+class VerifiedOutput:
+    """Fichier temporaire écrit dans l'ordre, mis en place si son SHA-256 est l'attendu"""
+
+    def __init__(self, path: str, expected_sha256: str):
+        self.path = path
+        self.expected = expected_sha256
+        self.digest = hashlib.sha256()
+        self.written = 0
+        fd, self.tmp_path = tempfile.mkstemp(prefix=".iso-delta-", dir=os.path.dirname(os.path.abspath(path)))
+        self.file = os.fdopen(fd, "w+b")
+
+    def write(self, data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.written += len(data)
+
+    def read_back(self, offset: int, length: int) -> bytes:
+        """Données déjà écrites (blocs répétés dans la nouvelle image)"""
+        self.file.flush()
+        return os.pread(self.file.fileno(), length, offset)
+
+    def commit(self):
+        self.file.close()
+        if self.digest.hexdigest() != self.expected:
+            os.unlink(self.tmp_path)
+            raise DeltaError("SHA-256 de l'ISO reconstruite différent de celui de la nouvelle ISO")
+        os.chmod(self.tmp_path, 0o644)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def _copy_range(fd: int, offset: int, length: int, output: VerifiedOutput):
+    while length > 0:
+        data = os.pread(fd, min(COPY_SIZE, length), offset)
+        if not data:
+            raise DeltaError("image de référence tronquée")
+        output.write(data)
+        offset += len(data)
+        length -= len(data)
+
+
+# ----------------------------------------------------------------------
+# Fichier delta: MAGIC, longueur de l'en-tête (8 octets), en-tête JSON,
+# puis les données des blocs nouveaux compressées (xz), dans l'ordre
+
+@dataclass
+class DeltaStats:
+    new_size: int = 0
+    delta_size: int = 0
+    reused: int = 0
+    literal: int = 0
+    elapsed: float = 0.0
+
+
+def _append_operation(operations: List[list], kind: str, offset: int, length: int):
+    """Opérations contiguës fusionnées: ["old"|"new", position, longueur] ou ["data", longueur]"""
+    if operations:
+        last = operations[-1]
+        if kind == "data" and last[0] == "data":
+            last[1] += length
+            return
+        if kind != "data" and last[0] == kind and last[1] + last[2] == offset:
+            last[2] += length
+            return
+    operations.append([kind, length] if kind == "data" else [kind, offset, length])
+
+
+def create_delta(old_path: str, new_path: str, output: str,
+                 old_index: Optional[ImageIndex] = None, new_index: Optional[ImageIndex] = None) -> DeltaStats:
+    start = time.monotonic()
+    old_index = old_index or index_image(old_path)
+    new_index = new_index or index_image(new_path)
+    old_chunks = old_index.digests()
+    seen: Dict[str, Chunk] = {}
+    stats = DeltaStats(new_size=new_index.size)
+
+    operations: List[list] = []
+    literal: List[Chunk] = []
+    for chunk in new_index.chunks:
+        if chunk.digest in old_chunks:
+            _append_operation(operations, "old", old_chunks[chunk.digest].offset, chunk.length)
+            stats.reused += chunk.length
+        elif chunk.digest in seen:
+            _append_operation(operations, "new", seen[chunk.digest].offset, chunk.length)
+            stats.reused += chunk.length
+        else:
+            _append_operation(operations, "data", 0, chunk.length)
+            literal.append(chunk)
+            stats.literal += chunk.length
+        seen.setdefault(chunk.digest, chunk)
+
+    header = json.dumps({
+        "format": DELTA_FORMAT,
+        "version": FORMAT_VERSION,
+        "chunking": chunking_parameters(),
+        "old": {"name": old_index.name, "size": old_index.size, "sha256": old_index.sha256},
+        "new": {"name": new_index.name, "size": new_index.size, "sha256": new_index.sha256},
+        "operations": operations,
+    }, separators=(",", ":")).encode()
+
+    tmp_path = output + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f, open(new_path, "rb", buffering=0) as new:
+            f.write(DELTA_MAGIC + struct.pack(">Q", len(header)) + header)
+            compressor = lzma.LZMACompressor(preset=XZ_PRESET)
+            for chunk in literal:
+                f.write(compressor.compress(os.pread(new.fileno(), chunk.length, chunk.offset)))
+            f.write(compressor.flush())
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    stats.delta_size = os.path.getsize(output)
+    stats.elapsed = time.monotonic() - start
+    return stats
+
+
+def read_delta_header(f: BinaryIO) -> Dict:
+    if f.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+        raise DeltaError("ce fichier n'est pas un delta d'ISO ArchFusion")
+    (length,) = struct.unpack(">Q", f.read(8))
+    try:
+        header = json.loads(f.read(length))
+    except ValueError as e:
+        raise DeltaError(f"en-tête illisible: {e}") from None
+    _check_document(header, DELTA_FORMAT)
+    return header
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        for data in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def apply_delta(old_path: str, delta_path: str, output_path: str, check_old: bool = True) -> float:
+    """Reconstruit la nouvelle ISO; durée en secondes"""
+    start = time.monotonic()
+    with open(delta_path, "rb") as delta:
+        header = read_delta_header(delta)
+        old = header["old"]
+        if os.path.getsize(old_path) != old["size"] or (check_old and file_sha256(old_path) != old["sha256"]):
+            raise DeltaError(f"{old_path} n'est pas l'ISO de départ du delta ({old['name']})")
+
+        payload = lzma.LZMAFile(delta)
+        output = VerifiedOutput(output_path, header["new"]["sha256"])
+        try:
+            with open(old_path, "rb", buffering=0) as source:
+                for operation in header["operations"]:
+                    if operation[0] == "old":
+                        _copy_range(source.fileno(), operation[1], operation[2], output)
+                    elif operation[0] == "new":
+                        for position in range(operation[1], operation[1] + operation[2], COPY_SIZE):
+                            length = min(COPY_SIZE, operation[1] + operation[2] - position)
+                            output.write(output.read_back(position, length))
+                    else:
+                        remaining = operation[1]
+                        while remaining > 0:
+                            data = payload.read(min(COPY_SIZE, remaining))
+                            if not data:
+                                raise DeltaError("données du delta tronquées")
+                            output.write(data)
+                            remaining -= len(data)
+            output.commit()
+        except BaseException:
+            output.abort()
+            raise
+    return time.monotonic() - start
+
+
+# ----------------------------------------------------------------------
+# Index de blocs et téléchargement des plages manquantes (façon zsync)
+
+@dataclass
+class FetchStats:
+    size: int = 0
+    reused: int = 0
+    downloaded: int = 0
+    requests: int = 0
+    elapsed: float = 0.0
+
+
+def read_range(location: str, offset: int, length: int) -> bytes:
+    """Plage d'octets d'une ISO distante (requête Range) ou locale"""
+    if location.startswith(("http://", "https://")):
+        request = urllib.request.Request(location, headers={"Range": f"bytes={offset}-{offset + length - 1}"})
+        with urllib.request.urlopen(request) as response:
+            if response.status != 206:
+                raise DeltaError(f"{location}: le serveur ne prend pas en charge les plages (HTTP {response.status})")
+            return response.read()
+    with open(location, "rb") as f:
+        return os.pread(f.fileno(), length, offset)
+
+
+def fetch_image(location: str, index: ImageIndex, seeds: List[str], output_path: str) -> FetchStats:
+    """Reconstruit l'ISO: blocs présents dans les images locales, le reste téléchargé"""
+    start = time.monotonic()
+    stats = FetchStats(size=index.size)
+    available: Dict[str, Tuple[int, int]] = {}
+    handles = []
+    output = VerifiedOutput(output_path, index.sha256)
+    try:
+        for seed in seeds:
+            f = open(seed, "rb", buffering=0)
+            handles.append(f)
+            for digest, chunk in index_image(seed).digests().items():
+                available.setdefault(digest, (f.fileno(), chunk.offset))
+
+        missing: List[Chunk] = []
+
+        def download():
+            # Blocs manquants contigus: une requête, contenu vérifié bloc par bloc
+            data = read_range(location, missing[0].offset, sum(c.length for c in missing))
+            stats.requests += 1
+            position = 0
+            for chunk in missing:
+                part = memoryview(data)[position:position + chunk.length]
+                if len(part) != chunk.length or chunk_digest("sha256", part) != chunk.digest:
+                    raise DeltaError(f"{location}: bloc à {chunk.offset} différent de l'index")
+                output.write(part)
+                position += chunk.length
+            stats.downloaded += len(data)
+            missing.clear()
+
+        for chunk in index.chunks:
+            if chunk.digest in available:
+                if missing:
+                    download()
+                fd, offset = available[chunk.digest]
+                _copy_range(fd, offset, chunk.length, output)
+                stats.reused += chunk.length
+            else:
+                if missing and sum(c.length for c in missing) + chunk.length > MAX_RANGE:
+                    download()
+                missing.append(chunk)
+        if missing:
+            download()
+        output.commit()
+    except BaseException:
+        output.abort()
+        raise
+    finally:
+        for f in handles:
+            f.close()
+    stats.elapsed = time.monotonic() - start
+    return stats
+
+
+# ----------------------------------------------------------------------
+# Mesures
+
+def bench(old_path: str, new_path: str, work_dir: str) -> int:
+    print("Découpage des deux ISO...", flush=True)
+    start = time.monotonic()
+    old_index = index_image(old_path)
+    new_index = index_image(new_path)
+    index_time = (time.monotonic() - start) / 2
+
+    delta_path = os.path.join(work_dir, "bench.delta")
+    rebuilt = os.path.join(work_dir, "bench-rebuilt.iso")
+    index_path = os.path.join(work_dir, "bench.cdc.json")
+    stats = create_delta(old_path, new_path, delta_path, old_index, new_index)
+    apply_time = apply_delta(old_path, delta_path, rebuilt)
+    os.unlink(rebuilt)
+    save_index(new_index, index_path)
+    fetch = fetch_image(new_path, new_index, [old_path], rebuilt)
+    os.unlink(rebuilt)
+
+    size = new_index.size
+
+    def row(label: str, value: str, detail: str = ""):
+        print(f"{label:<34}{value:>10}  {detail}")
+
+    def share(part: int) -> str:
+        return f"{part * 100 / max(size, 1):.1f} %"
+
+    print()
+    row("Nouvelle ISO", format_size(size), f"({len(new_index.chunks)} blocs)")
+    row("Blocs repris de l'ancienne ISO", format_size(stats.reused), f"({share(stats.reused)})")
+    row("Delta", format_size(stats.delta_size), f"({share(stats.delta_size)})")
+    row("Index de blocs", format_size(os.path.getsize(index_path)))
+    row("Téléchargé avec l'index", format_size(fetch.downloaded),
+        f"({share(fetch.downloaded)}, {fetch.requests} requêtes)")
+    print()
+    row("Découpage d'une ISO", f"{index_time:.1f}s")
+    row("Création du delta", f"{stats.elapsed:.1f}s")
+    row("Reconstruction (delta)", f"{apply_time:.1f}s")
+    row("Reconstruction (index, local)", f"{fetch.elapsed:.1f}s")
+    os.unlink(delta_path)
+    os.unlink(index_path)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mises à jour différentielles des ISO")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="delta entre deux ISO")
+    create.add_argument("old")
+    create.add_argument("new")
+    create.add_argument("-o", "--output", help="fichier delta (défaut: NOUVELLE.iso.delta)")
+
+    apply = commands.add_parser("apply", help="reconstruit la nouvelle ISO avec un delta")
+    apply.add_argument("old")
+    apply.add_argument("delta")
+    apply.add_argument("-o", "--output", required=True, help="ISO reconstruite")
+    apply.add_argument("--no-check-old", action="store_true",
+                       help="sans vérification préalable de l'ancienne ISO (l'ISO produite reste vérifiée)")
+
+    index = commands.add_parser("index", help="index de blocs d'une ISO (à publier avec elle)")
+    index.add_argument("image")
+    index.add_argument("-o", "--output", help=f"index (défaut: IMAGE{INDEX_SUFFIX})")
+
+    fetch = commands.add_parser("fetch", help="télécharge seulement les blocs absents des ISO locales")
+    fetch.add_argument("source", help="URL (ou chemin) de la nouvelle ISO")
+    fetch.add_argument("--index", help=f"index de la nouvelle ISO (défaut: SOURCE{INDEX_SUFFIX})")
+    fetch.add_argument("--seed", action="append", default=[], required=True,
+                       help="ISO locale dont les blocs sont réutilisés (répétable)")
+    fetch.add_argument("-o", "--output", required=True, help="ISO reconstruite")
+
+    bench_parser = commands.add_parser("bench", help="taille du delta et durées sur deux ISO")
+    bench_parser.add_argument("old")
+    bench_parser.add_argument("new")
+    bench_parser.add_argument("--work-dir", default=tempfile.gettempdir(),
+                              help="emplacement des fichiers produits (défaut: /tmp)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "create":
+            output = args.output or args.new + DELTA_SUFFIX
+            stats = create_delta(args.old, args.new, output)
+            print(f"{output}: {format_size(stats.delta_size)} pour une ISO de {format_size(stats.new_size)} "
+                  f"({stats.delta_size * 100 / max(stats.new_size, 1):.1f} %), {stats.elapsed:.1f} s")
+        elif args.command == "apply":
+            elapsed = apply_delta(args.old, args.delta, args.output, not args.no_check_old)
+            print(f"✅ {args.output} reconstruite et vérifiée en {elapsed:.1f} s")
+        elif args.command == "index":
+            output = args.output or args.image + INDEX_SUFFIX
+            image_index = index_image(args.image)
+            save_index(image_index, output)
+            print(f"{output}: {len(image_index.chunks)} blocs")
+        elif args.command == "fetch":
+            image_index = load_index(args.index or args.source + INDEX_SUFFIX)
+            stats = fetch_image(args.source, image_index, args.seed, args.output)
+            print(f"✅ {args.output} reconstruite et vérifiée en {stats.elapsed:.1f} s: "
+                  f"{format_size(stats.downloaded)} téléchargés sur {format_size(stats.size)} "
+                  f"({stats.requests} requêtes)")
+        else:
+            return bench(args.old, args.new, args.work_dir)
+    except (OSError, DeltaError, lzma.LZMAError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
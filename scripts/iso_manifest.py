@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ArchFusion OS - Empreintes et manifeste de blocs des ISO
+Auteur: Jimmy Ramsamynaick
+Version: 1.0.0
+Description: Calcule en une seule lecture de l'image toutes les empreintes
+             demandées (sha256, md5...) et le manifeste des empreintes par
+             bloc, puis vérifie une copie (téléchargement, clé USB) bloc par
+             bloc
+
+L'image est lue une fois par grands tampons; chaque empreinte globale est
+calculée par son propre thread et les blocs par un groupe de threads
+(hashlib libère le GIL). Les fichiers <iso>.<algorithme> gardent le format de
+sha256sum/md5sum (vérifiables avec sha256sum -c); le manifeste <iso>.chunks.json
+liste l'empreinte de chaque bloc de taille fixe, pour vérifier un périphérique
+ou une mise à jour sans relire toute l'image de référence.
+
+Usage:
+    python3 iso_manifest.py create iso/archfusion-1.0.0-x86_64.iso
+    python3 iso_manifest.py create ISO --algorithms sha256 sha512 md5 --chunk-size 8M
+    python3 iso_manifest.py verify ISO                        # manifeste ISO.chunks.json
+    sudo python3 iso_manifest.py verify /dev/sdX --manifest ISO.chunks.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from build_cache import format_size, parse_size
+
+MANIFEST_FORMAT = "archfusion-chunk-manifest"
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".chunks.json"
+
+DEFAULT_ALGORITHMS = ("sha256", "md5")
+DEFAULT_CHUNK_SIZE = 4 * 1024 ** 2
+CHUNK_ALGORITHM = "sha256"
+# Tampons de lecture: plusieurs blocs, et quelques tampons d'avance par thread
+READ_CHUNKS = 8
+QUEUE_DEPTH = 4
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+Progress = Callable[[int, int], None]
+
+
+class ManifestError(ValueError):
+    """Manifeste illisible ou incompatible avec l'image"""
+
+
+@dataclass
+class ChunkManifest:
+    """Empreintes globales et par bloc d'une image"""
+
+    name: str
+    size: int
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    chunk_algorithm: str = CHUNK_ALGORITHM
+    digests: Dict[str, str] = field(default_factory=dict)
+    chunks: List[str] = field(default_factory=list)
+
+    def chunk_range(self, index: int) -> Tuple[int, int]:
+        """Position et longueur du bloc (le dernier peut être plus court)"""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    def document(self) -> Dict:
+        return {
+            "format": MANIFEST_FORMAT,
+            "version": MANIFEST_VERSION,
+            "name": self.name,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "chunk_algorithm": self.chunk_algorithm,
+            "digests": self.digests,
+            "chunks": self.chunks,
+        }
+
+    @classmethod
+    def from_document(cls, document) -> "ChunkManifest":
+        if not isinstance(document, dict) or document.get("format") != MANIFEST_FORMAT:
+            raise ManifestError("ce fichier n'est pas un manifeste de blocs ArchFusion")
+        if document.get("version") != MANIFEST_VERSION:
+            raise ManifestError(f"version de manifeste non prise en charge: {document.get('version')!r}")
+        try:
+            manifest = cls(
+                name=document["name"],
+                size=int(document["size"]),
+                chunk_size=int(document["chunk_size"]),
+                chunk_algorithm=document["chunk_algorithm"],
+                digests=dict(document["digests"]),
+                chunks=list(document["chunks"]),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ManifestError(f"champ invalide ou manquant: {e}") from None
+        if manifest.chunk_size <= 0 or len(manifest.chunks) != -(-manifest.size // manifest.chunk_size):
+            raise ManifestError("nombre de blocs incohérent avec la taille de l'image")
+        if manifest.chunk_algorithm not in hashlib.algorithms_available:
+            raise ManifestError(f"algorithme inconnu: {manifest.chunk_algorithm}")
+        return manifest
+
+
+def manifest_path(image: str) -> str:
+    return image + MANIFEST_SUFFIX
+
+
+def load_manifest(path: str) -> ChunkManifest:
+    try:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    except OSError as e:
+        raise ManifestError(f"lecture impossible: {e.strerror}") from None
+    except json.JSONDecodeError as e:
+        raise ManifestError(f"JSON invalide (ligne {e.lineno}): {e.msg}") from None
+    return ChunkManifest.from_document(document)
+
+
+def save_manifest(manifest: ChunkManifest, path: str):
+    """Écriture atomique du manifeste"""
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest.document(), f, indent=1)
+            f.write("\n")
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def image_size(f: BinaryIO) -> int:
+    """Taille d'un fichier ou d'un périphérique bloc"""
+    return os.lseek(f.fileno(), 0, os.SEEK_END)
+
+
+def read_blocks(f: BinaryIO, length: int, buffer_size: int) -> Iterator[bytes]:
+    """Lecture séquentielle de length octets par tampons pleins (sauf le dernier)"""
+    f.seek(0)
+    remaining = length
+    while remaining > 0:
+        wanted = min(buffer_size, remaining)
+        data = f.read(wanted)
+        while data and len(data) < wanted:
+            more = f.read(wanted - len(data))
+            if not more:
+                break
+            data += more
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+class _DigestThread(threading.Thread):
+    """Empreinte globale calculée au fil des tampons reçus"""
+
+    def __init__(self, algorithm: str):
+        super().__init__(daemon=True)
+        self.digest = hashlib.new(algorithm)
+        self.blocks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=QUEUE_DEPTH)
+
+    def run(self):
+        while True:
+            data = self.blocks.get()
+            if data is None:
+                return
+            self.digest.update(data)
+
+
+def chunk_digest(algorithm: str, data: memoryview) -> str:
+    return hashlib.new(algorithm, data).hexdigest()
+
+
+def hash_image(f: BinaryIO, length: int, chunk_size: int, chunk_algorithm: str,
+               algorithms: Sequence[str] = (), progress: Optional[Progress] = None,
+               workers: int = HASH_WORKERS) -> Tuple[Dict[str, str], List[str]]:
+    """Empreintes globales et par bloc des length premiers octets, en une lecture"""
+    threads = [_DigestThread(algorithm) for algorithm in algorithms]
+    for thread in threads:
+        thread.start()
+
+    chunks: List[str] = []
+    pending: "deque[List[Future]]" = deque()
+    done = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for data in read_blocks(f, length, chunk_size * READ_CHUNKS):
+                for thread in threads:
+                    thread.blocks.put(data)
+                view = memoryview(data)
+                pending.append([pool.submit(chunk_digest, chunk_algorithm, view[start:start + chunk_size])
+                                for start in range(0, len(data), chunk_size)])
+                # Mémoire bornée: quelques tampons en cours au plus
+                while len(pending) > QUEUE_DEPTH:
+                    chunks += [future.result() for future in pending.popleft()]
+                done += len(data)
+                if progress:
+                    progress(done, length)
+            while pending:
+                chunks += [future.result() for future in pending.popleft()]
+    finally:
+        for thread in threads:
+            thread.blocks.put(None)
+        for thread in threads:
+            thread.join()
+
+    if done != length:
+        raise ManifestError(f"image tronquée: {done} octets lus sur {length}")
+    return {algorithm: thread.digest.hexdigest() for algorithm, thread in zip(algorithms, threads)}, chunks
+
+
+def create_manifest(image: str, algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_algorithm: str = CHUNK_ALGORITHM,
+                    progress: Optional[Progress] = None) -> ChunkManifest:
+    """Empreintes globales et manifeste de blocs d'une image, en une lecture"""
+    with open(image, "rb", buffering=0) as f:
+        size = image_size(f)
+        digests, chunks = hash_image(f, size, chunk_size, chunk_algorithm, algorithms, progress)
+    return ChunkManifest(os.path.basename(image), size, chunk_size, chunk_algorithm, digests, chunks)
+
+
+def write_checksums(manifest: ChunkManifest, directory: str) -> List[str]:
+    """Fichiers <image>.<algorithme> au format de sha256sum, et le manifeste"""
+    written = []
+    for algorithm, digest in manifest.digests.items():
+        path = os.path.join(directory, f"{manifest.name}.{algorithm}")
+        with open(path, "w") as f:
+            f.write(f"{digest}  {manifest.name}\n")
+        written.append(path)
+    path = manifest_path(os.path.join(directory, manifest.name))
+    save_manifest(manifest, path)
+    written.append(path)
+    return written
+
+
+def verify_image(target: str, manifest: ChunkManifest,
+                 progress: Optional[Progress] = None) -> List[int]:
+    """Indices des blocs de target (fichier ou périphérique) différents du manifeste"""
+    with open(target, "rb", buffering=0) as f:
+        if image_size(f) < manifest.size:
+            raise ManifestError(f"{target}: plus petit que l'image ({format_size(manifest.size)})")
+        try:
+            _, chunks = hash_image(f, manifest.size, manifest.chunk_size,
+                                   manifest.chunk_algorithm, progress=progress)
+        except ManifestError:
+            raise ManifestError(f"{target}: lecture incomplète") from None
+    return [index for index, (found, expected) in enumerate(zip(chunks, manifest.chunks))
+            if found != expected]
+
+
+def bad_ranges(manifest: ChunkManifest, indices: List[int]) -> List[Tuple[int, int]]:
+    """Blocs différents regroupés en plages d'octets (début, fin exclue)"""
+    ranges: List[Tuple[int, int]] = []
+    for index in indices:
+        offset, length = manifest.chunk_range(index)
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1] = (ranges[-1][0], offset + length)
+        else:
+            ranges.append((offset, offset + length))
+    return ranges
+
+
+def progress_printer(label: str) -> Progress:
+    """Avancement, débit et temps restant sur une seule ligne du terminal"""
+    start = time.monotonic()
+    last = [0.0]
+
+    def report(done: int, total: int):
+        now = time.monotonic()
+        if now - last[0] < 0.5 and done < total:
+            return
+        last[0] = now
+        rate = done / max(now - start, 1e-6)
+        remaining = int((total - done) / rate) if rate else 0
+        print(f"\r{label}: {done * 100 // max(total, 1):3d}%  {format_size(done)}/{format_size(total)}"
+              f"  {format_size(rate)}/s  reste {remaining // 60}:{remaining % 60:02d} ",
+              end="" if done < total else "\n", file=sys.stderr, flush=True)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Empreintes et manifeste de blocs des ISO")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="empreintes et manifeste d'une image (une lecture)")
+    create.add_argument("image")
+    create.add_argument("--algorithms", nargs="+", default=list(DEFAULT_ALGORITHMS),
+                        choices=sorted(hashlib.algorithms_guaranteed), metavar="ALGO",
+                        help=f"empreintes globales (défaut: {' '.join(DEFAULT_ALGORITHMS)})")
+    create.add_argument("--chunk-size", default=format_size(DEFAULT_CHUNK_SIZE),
+                        help="taille des blocs du manifeste (défaut: 4M)")
+    create.add_argument("--output-dir", help="emplacement des fichiers écrits (défaut: celui de l'image)")
+    create.add_argument("--quiet", action="store_true", help="sans affichage de l'avancement")
+
+    verify = commands.add_parser("verify", help="vérifie une copie bloc par bloc")
+    verify.add_argument("target", help="image, fichier téléchargé ou périphérique")
+    verify.add_argument("--manifest", help="manifeste (défaut: TARGET.chunks.json)")
+    verify.add_argument("--quiet", action="store_true", help="sans affichage de l'avancement")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        try:
+            chunk_size = parse_size(args.chunk_size)
+        except ValueError as e:
+            parser.error(str(e))
+        if chunk_size <= 0:
+            parser.error("taille de bloc invalide")
+        progress = None if args.quiet or not sys.stderr.isatty() else progress_printer(os.path.basename(args.image))
+        try:
+            manifest = create_manifest(args.image, args.algorithms, chunk_size, progress=progress)
+            written = write_checksums(manifest, args.output_dir or os.path.dirname(os.path.abspath(args.image)))
+        except (OSError, ManifestError) as e:
+            print(f"❌ {args.image}: {e}", file=sys.stderr)
+            return 1
+        for algorithm, digest in manifest.digests.items():
+            print(f"{algorithm.upper()}: {digest}")
+        print(f"{len(manifest.chunks)} blocs de {format_size(manifest.chunk_size)}: {written[-1]}")
+        return 0
+
+    try:
+        manifest = load_manifest(args.manifest or manifest_path(args.target))
+        progress = None if args.quiet or not sys.stderr.isatty() else progress_printer(os.path.basename(args.target))
+        bad = verify_image(args.target, manifest, progress)
+    except (OSError, ManifestError) as e:
+        print(f"❌ {args.target}: {e}", file=sys.stderr)
+        return 1
+    if not bad:
+        print(f"✅ {args.target}: {len(manifest.chunks)} blocs conformes à {manifest.name}")
+        return 0
+    print(f"❌ {args.target}: {len(bad)} bloc(s) sur {len(manifest.chunks)} différent(s) de {manifest.name}")
+    for start, end in bad_ranges(manifest, bad):
+        print(f"   octets {start}-{end - 1} ({format_size(end - start)})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -60,6 +60,7 @@ EOF
     echo -e "  ${WHITE}5)${NC} Vérifier le Disque Dur"
     echo -e "  ${WHITE}6)${NC} Informations Système"
     echo -e "  ${WHITE}7)${NC} Test de Connectivité Réseau"
+    echo -e "  ${WHITE}18)${NC} Créer une Clé USB Bootable (écriture vérifiée)"
     echo ""
     
     echo -e "${CYAN}💻 ENVIRONNEMENT LIVE${NC}"
@@ -167,6 +168,26 @@ check_disk() {
     read -p "Appuyez sur Entrée pour continuer..."
 }
 
+# Fonction pour écrire une ISO sur une clé USB (relue et vérifiée)
+write_usb() {
+    echo -e "${GREEN}💾 Création d'une clé USB bootable...${NC}"
+    echo ""
+    
+    echo -e "${CYAN}Périphériques amovibles:${NC}"
+    lsblk -d -o NAME,SIZE,MODEL,TRAN,RM | awk 'NR == 1 || $NF == 1'
+    echo ""
+    
+    read -p "Chemin de l'ISO: " iso_path
+    read -p "Périphérique cible (ex: sdb): " usb_disk
+    if [[ -f "$iso_path" && -b "/dev/${usb_disk}" ]]; then
+        sudo python3 /usr/share/archfusion/scripts/image_writer.py "$iso_path" "/dev/${usb_disk}"
+    else
+        echo -e "${RED}❌ ISO ou périphérique introuvable${NC}"
+    fi
+    
+    read -p "Appuyez sur Entrée pour continuer..."
+}
+
 # Fonction pour les informations système
 system_info() {
     echo -e "${GREEN}💻 Informations Système${NC}"
@@ -543,7 +564,7 @@ main_loop() {
     while true; do
         show_welcome_menu
         
-        read -p "$(echo -e "${WHITE}Choisissez une option (0-17): ${NC}")" choice
+        read -p "$(echo -e "${WHITE}Choisissez une option (0-18): ${NC}")" choice
         
         case $choice in
             1) install_gui ;;
@@ -563,12 +584,13 @@ main_loop() {
             15) configure_keyboard ;;
             16) configure_network ;;
             17) configure_display ;;
+            18) write_usb ;;
             0) 
                 echo -e "${GREEN}Au revoir! 👋${NC}"
                 exit 0
                 ;;
             *)
-                echo -e "${RED}Option invalide. Veuillez choisir entre 0 et 17.${NC}"
+                echo -e "${RED}Option invalide. Veuillez choisir entre 0 et 18.${NC}"
                 sleep 2
                 ;;
         esac
@@ -0,0 +1,26 @@
+"""
+ArchFusion OS - Configuration des tests
+Les outils de scripts/ et scripts/install/ s'importent entre eux par leur nom
+de module (lancés depuis leur dossier): les deux dossiers sont ajoutés au
+chemin d'import. write() et read() préparent et relisent les fichiers des
+arborescences factices (sysfs, images).
+"""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("scripts", os.path.join("scripts", "install")):
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, directory))
+
+
+def write(path, content):
+    """Écrit un fichier (texte ou octets), dossiers parents compris"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+
+
+def read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,63 @@
+"""Empreintes des étapes et reprise aux points enregistrés (checkpoints.py)"""
+
+from checkpoints import LIVE_STEPS, completed_steps, step_digests
+from engine import INSTALL_STEPS, topological_order
+
+BY_NAME = {step.name: step for step in INSTALL_STEPS}
+STEPS = [BY_NAME[name] for name in topological_order(INSTALL_STEPS)]
+
+CONFIG = {
+    "disk": "sda", "swap_size": "4G", "username": "jimmy", "hostname": "archfusion",
+    "timezone": "Europe/Paris", "locale": "fr_FR.UTF-8", "keymap": "fr",
+    "desktop_environment": "kde", "fs_layout": "ext4", "snapshots": False,
+}
+
+
+def records_for(digests, names):
+    return {name: {"step": name, "digest": digests[name]} for name in names}
+
+
+def changed_steps(**changes):
+    before = step_digests(STEPS, CONFIG)
+    after = step_digests(STEPS, {**CONFIG, **changes})
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_hostname_change_redoes_only_dependent_steps():
+    # boot_images ne dépend pas de hostname (étapes parallèles): seule finalize suit
+    assert changed_steps(hostname="autre") == {"hostname", "finalize"}
+
+    previous = step_digests(STEPS, CONFIG)
+    digests = step_digests(STEPS, {**CONFIG, "hostname": "autre"})
+    done = completed_steps(STEPS, digests, records_for(previous, BY_NAME))
+    assert set(BY_NAME) - done == {"hostname", "finalize"}
+
+
+def test_disk_or_swap_change_redoes_everything():
+    previous = step_digests(STEPS, CONFIG)
+    for change in ({"disk": "sdb"}, {"swap_size": "8G"}):
+        # Prérequis et miroirs ne lisent pas le disque, mais sont refaits avec base
+        assert changed_steps(**change) == set(BY_NAME) - {"prerequisites", "rank_mirrors"}
+        digests = step_digests(STEPS, {**CONFIG, **change})
+        assert completed_steps(STEPS, digests, records_for(previous, BY_NAME)) == set()
+
+
+def test_live_steps_skipped_only_when_dependents_are_done():
+    digests = step_digests(STEPS, CONFIG)
+    durable = [name for name in BY_NAME if name not in LIVE_STEPS]
+
+    # base à refaire: ses montages et ses miroirs aussi
+    done = completed_steps(STEPS, digests, records_for(digests, [n for n in durable if n != "base"]))
+    assert "base" not in done
+    assert not {"mount", "rank_mirrors"} & done
+    # Formatages gardés: seul le montage est refait pour base
+    assert {"partition", "format_root"} <= done
+
+    # Tout ce qui dépend des étapes live est fait: elles sont sautées
+    done = completed_steps(STEPS, digests, records_for(digests, [n for n in durable if n != "fstab"]))
+    assert {"mount", "rank_mirrors", "prerequisites", "base"} <= done
+    assert "fstab" not in done
+
+    # Point de reprise d'une étape live ignoré: refaite si base l'est
+    done = completed_steps(STEPS, digests, records_for(digests, ["mount", "rank_mirrors"]))
+    assert done == set()
@@ -0,0 +1,55 @@
+"""Énumération des disques (disks.py) sur une arborescence sysfs factice"""
+
+import os
+
+from conftest import write
+from disks import DiskCache, block_disk_event, parse_uevent
+
+
+def fake_disk(sysfs, name, sectors, rotational="0", model="Disque test", partitions=()):
+    device = os.path.join(sysfs, "devices", "pci0000:00", "0000:00:17.0", "ata1", "block", name)
+    write(os.path.join(device, "size"), f"{sectors}\n")
+    write(os.path.join(device, "queue", "rotational"), f"{rotational}\n")
+    write(os.path.join(device, "removable"), "0\n")
+    write(os.path.join(device, "device", "model"), f"{model}\n")
+    for number, part_sectors in partitions:
+        write(os.path.join(device, f"{name}{number}", "partition"), f"{number}\n")
+        write(os.path.join(device, f"{name}{number}", "size"), f"{part_sectors}\n")
+    os.makedirs(os.path.join(sysfs, "block"), exist_ok=True)
+    os.symlink(device, os.path.join(sysfs, "block", name))
+
+
+def test_scan_and_refresh(tmp_path):
+    sysfs = str(tmp_path)
+    fake_disk(sysfs, "sda", 2 * 1024 ** 3, rotational="1", partitions=((2, 2048), (1, 1024)))
+    fake_disk(sysfs, "loop0", 2048)
+    cache = DiskCache(sysfs)
+
+    disks = cache.scan()
+    assert [disk.name for disk in disks] == ["sda"]
+    sda = disks[0]
+    assert sda.size_bytes == 1024 ** 4
+    assert sda.rotational and sda.model == "Disque test"
+    assert [(part.name, part.number) for part in sda.partitions] == [("sda1", 1), ("sda2", 2)]
+    assert sda.transport == "sata"
+
+    # Branchement puis retrait: seul le disque concerné est relu
+    fake_disk(sysfs, "nvme0n1", 1024 ** 2)
+    assert cache.refresh("nvme0n1").name == "nvme0n1"
+    assert [disk.name for disk in cache.disks()] == ["nvme0n1", "sda"]
+    os.unlink(os.path.join(sysfs, "block", "nvme0n1"))
+    assert cache.refresh("nvme0n1") is None
+    assert [disk.name for disk in cache.disks()] == ["sda"]
+
+
+def test_uevent_filter():
+    add = parse_uevent(b"add@/devices/pci0000:00/block/sdb\0ACTION=add\0SUBSYSTEM=block\0"
+                       b"DEVTYPE=disk\0DEVNAME=sdb\0")
+    assert block_disk_event(add) == "sdb"
+    # Une partition modifiée fait relire son disque
+    partition = parse_uevent(b"add@/devices/x/sdb/sdb1\0ACTION=add\0SUBSYSTEM=block\0"
+                             b"DEVPATH=/devices/x/block/sdb/sdb1\0DEVTYPE=partition\0DEVNAME=sdb1\0")
+    assert block_disk_event(partition) == "sdb"
+    loop = parse_uevent(b"add@/devices/virtual/block/loop3\0ACTION=add\0SUBSYSTEM=block\0"
+                        b"DEVTYPE=disk\0DEVNAME=loop3\0")
+    assert block_disk_event(loop) is None
@@ -0,0 +1,63 @@
+"""Détection matérielle (archfusion-hardware-detect) sur un sysfs factice"""
+
+import importlib.machinery
+import importlib.util
+import os
+
+from conftest import PROJECT_ROOT, write
+
+DETECT_SCRIPT = os.path.join(PROJECT_ROOT, "archiso", "airootfs", "usr", "local", "bin",
+                             "archfusion-hardware-detect")
+
+
+def load_detector():
+    # Script sans extension .py: chargé explicitement
+    loader = importlib.machinery.SourceFileLoader("hardware_detect", DETECT_SCRIPT)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def fake_system(root):
+    sysfs = os.path.join(root, "sys")
+    # Carte réseau Intel e1000e, contrôleur NVMe, périphérique USB sans modalias
+    write(os.path.join(sysfs, "bus", "pci", "devices", "0000:00:1f.6", "modalias"),
+          "pci:v00008086d000015BCsv00001028sd000007E6bc02sc00i00\n")
+    write(os.path.join(sysfs, "bus", "pci", "devices", "0000:01:00.0", "modalias"),
+          "pci:v0000144Dd0000A808sv0000144Dsd0000A801bc01sc08i02\n")
+    os.makedirs(os.path.join(sysfs, "bus", "usb", "devices", "1-1"))
+    os.makedirs(os.path.join(sysfs, "module", "nvme"))
+    modules_dir = os.path.join(root, "lib", "modules", "6.6.1-test")
+    write(os.path.join(modules_dir, "modules.alias"),
+          "alias pci:v00008086d000015BCsv*sd*bc*sc*i* e1000e\n"
+          "alias pci:v*d*sv*sd*bc01sc08i02* nvme\n"
+          "alias pci:v000010DEd*sv*sd*bc03sc*i* nouveau\n"
+          "alias usb:v*p*d*dc*dsc*dp*ic09isc*ip*in* usbcore\n")
+    write(os.path.join(modules_dir, "modules.builtin"), "kernel/drivers/usb/core/usbcore.ko\n")
+    return sysfs, modules_dir
+
+
+def test_scan_and_resolve(tmp_path):
+    detect = load_detector()
+    sysfs, modules_dir = fake_system(str(tmp_path))
+
+    devices = detect.scan_modaliases(sysfs)
+    assert set(devices) == {"pci/0000:00:1f.6", "pci/0000:01:00.0"}
+
+    index = detect.ModaliasIndex.load(modules_dir)
+    assert index.patterns == 4 and "usbcore" in index.builtin
+    assert index.resolve(devices["pci/0000:00:1f.6"]) == {"e1000e"}
+    assert index.resolve(devices["pci/0000:01:00.0"]) == {"nvme"}
+    assert detect.loaded_modules(sysfs) == {"nvme"}
+
+
+def test_dry_run_loads_nothing(tmp_path, capsys):
+    detect = load_detector()
+    fake_system(str(tmp_path))
+
+    assert detect.main(["--dry-run", "--root", str(tmp_path), "--kernel", "6.6.1-test"]) == 0
+    rows = {line.split()[0]: line for line in capsys.readouterr().out.splitlines()}
+    assert "à charger" in rows["e1000e"]
+    assert "déjà présent" in rows["nvme"]
+    assert "nouveau" not in rows
@@ -0,0 +1,48 @@
+"""Écriture vérifiée (image_writer.py) vers un fichier ordinaire"""
+
+import os
+
+import pytest
+
+from conftest import read, write
+from image_writer import ImageWriter, WriterError
+from iso_manifest import DEFAULT_CHUNK_SIZE, create_manifest
+
+
+def make_image(path, chunks: int, tail: int = 12345):
+    """Image de blocs aléatoires et nuls, de taille non alignée"""
+    write(path, b"".join(os.urandom(DEFAULT_CHUNK_SIZE) if index % 2 == 0 else bytes(DEFAULT_CHUNK_SIZE)
+                         for index in range(chunks)) + os.urandom(tail))
+    return os.path.getsize(path)
+
+
+def test_write_skip_zeros_and_verify(tmp_path):
+    image, target = str(tmp_path / "image.iso"), str(tmp_path / "cible.img")
+    size = make_image(image, chunks=5)
+
+    writer = ImageWriter(image, target)
+    manifest = writer.write()
+    assert writer.stats.size == size == os.path.getsize(target)
+    # Fichier neuf: les deux blocs nuls ne sont pas écrits
+    assert writer.stats.skipped == 2 * DEFAULT_CHUNK_SIZE
+    assert writer.stats.written + writer.stats.skipped == size
+    assert read(image) == read(target)
+    assert writer.verify(manifest) == []
+
+    # Un octet modifié sur la cible: seul son bloc est signalé
+    with open(target, "r+b") as f:
+        f.seek(3 * DEFAULT_CHUNK_SIZE + 10)
+        f.write(b"\x01")
+    assert writer.verify(manifest) == [3]
+
+
+def test_damaged_image_detected_with_manifest(tmp_path):
+    image, target = str(tmp_path / "image.iso"), str(tmp_path / "cible.img")
+    make_image(image, chunks=3)
+    manifest = create_manifest(image)
+    with open(image, "r+b") as f:
+        f.seek(DEFAULT_CHUNK_SIZE + 1)
+        f.write(b"\xff")
+
+    with pytest.raises(WriterError, match="bloc 1"):
+        ImageWriter(image, target, manifest=manifest).write()
@@ -0,0 +1,30 @@
+"""Plans d'installation (install_plan.py): version courante et versions précédentes"""
+
+import pytest
+
+from install_plan import PLAN_FORMAT, PLAN_VERSION, PlanError, parse_plan, plan_document
+
+
+def document(version, **config):
+    return {"format": PLAN_FORMAT, "version": version,
+            "config": {"disk": "sda", "username": "jimmy", **config}}
+
+
+def test_round_trip():
+    config = parse_plan(plan_document({"disk": "nvme0n1", "username": "jimmy",
+                                       "fs_layout": "btrfs", "snapshots": True, "no_fsync": True}))
+    assert (config["fs_layout"], config["snapshots"], config["no_fsync"]) == ("btrfs", True, True)
+
+
+def test_version_1_plan_gets_defaults():
+    config = parse_plan(document(1))
+    assert (config["fs_layout"], config["snapshots"], config["no_fsync"]) == ("ext4", False, False)
+
+    # Champs apparus en version 2: inconnus d'un plan de version 1
+    with pytest.raises(PlanError, match="fs_layout"):
+        parse_plan(document(1, fs_layout="btrfs"))
+
+
+def test_newer_version_rejected():
+    with pytest.raises(PlanError, match="version"):
+        parse_plan(document(PLAN_VERSION + 1))
@@ -0,0 +1,45 @@
+"""Historique des installations (install_trace.py): copie vers la cible et référence de l'ISO"""
+
+import json
+
+from install_trace import copy_history, load_estimates, load_history
+
+# Trace encore ouverte (tableau JSON non refermé), telle qu'au début de finalize
+TRACE = """[
+{"name": "partition", "cat": "stage", "ph": "X", "ts": 1000000, "dur": 5000000, "pid": 1, "tid": 1},
+{"name": "base", "cat": "stage", "ph": "X", "ts": 6000000, "dur": 70000000, "pid": 1, "tid": 2},
+{"name": "pacstrap", "cat": "task", "ph": "X", "ts": 7000000, "dur": 60000000, "pid": 1, "tid": 2},
+"""
+
+
+def run(steps, success=True):
+    return {"date": "2026-01-01T00:00:00", "success": success, "total": 0.0,
+            "steps": {name: {"duration": duration} for name, duration in steps.items()}, "tasks": {}}
+
+
+def test_copy_history_includes_current_run(tmp_path):
+    trace, live = tmp_path / "trace.json", tmp_path / "live.json"
+    trace.write_text(TRACE)
+    live.write_text(json.dumps([run({"base": 100.0})]))
+    output = tmp_path / "mnt" / "var" / "lib" / "archfusion" / "install-history.json"
+
+    copy_history(str(trace), str(output), str(live))
+    runs = load_history(str(output))
+    assert len(runs) == 2 and runs[-1]["success"]
+    assert runs[-1]["steps"] == {"partition": {"duration": 5.0}, "base": {"duration": 70.0}}
+    assert runs[-1]["tasks"] == {"pacstrap": 60.0}
+
+
+def test_estimates_fall_back_to_seed(tmp_path):
+    seed, live = tmp_path / "seed.json", tmp_path / "live.json"
+    seed.write_text(json.dumps([run({"base": 300.0, "bootloader": 40.0}),
+                                run({"base": 900.0}, success=False)]))
+
+    # Live vide (premier démarrage): durées de référence, installations échouées ignorées
+    estimates = load_estimates(str(live), str(seed))
+    assert estimates["base"].duration == 300.0 and estimates["bootloader"].duration == 40.0
+
+    # Mesure locale prioritaire, référence pour les autres étapes
+    live.write_text(json.dumps([run({"base": 120.0})]))
+    estimates = load_estimates(str(live), str(seed))
+    assert estimates["base"].duration == 120.0 and estimates["bootloader"].duration == 40.0
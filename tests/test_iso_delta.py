@@ -0,0 +1,51 @@
+"""Delta et index de blocs des ISO (iso_delta.py): aller-retour sur des images factices"""
+
+import os
+import random
+
+import pytest
+
+from conftest import read, write
+from iso_delta import DeltaError, apply_delta, create_delta, fetch_image, index_image
+
+MIB = 1024 ** 2
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Ancienne image aléatoire; la nouvelle y insère 200K et modifie 1K plus loin"""
+    rng = random.Random(1)
+    old = rng.randbytes(8 * MIB)
+    new = bytearray(old[:3 * MIB] + rng.randbytes(200 * 1024) + old[3 * MIB:])
+    new[6 * MIB:6 * MIB + 1024] = rng.randbytes(1024)
+    paths = str(tmp_path / "old.iso"), str(tmp_path / "new.iso")
+    for path, data in zip(paths, (old, new)):
+        write(path, bytes(data))
+    return paths
+
+
+def test_delta_round_trip(images, tmp_path):
+    old, new = images
+    delta, rebuilt = str(tmp_path / "new.iso.delta"), str(tmp_path / "rebuilt.iso")
+
+    stats = create_delta(old, new, delta)
+    # Le décalage après l'insertion ne change que les blocs voisins
+    assert stats.literal < MIB and stats.reused + stats.literal == os.path.getsize(new)
+    assert os.path.getsize(delta) < 2 * MIB
+
+    apply_delta(old, delta, rebuilt)
+    assert read(rebuilt) == read(new)
+
+    # Delta appliqué à une autre image de départ: refusé, rien n'est écrit
+    with pytest.raises(DeltaError):
+        apply_delta(new, delta, str(tmp_path / "faux.iso"))
+    assert not os.path.exists(tmp_path / "faux.iso")
+
+
+def test_fetch_missing_ranges_only(images, tmp_path):
+    old, new = images
+    rebuilt = str(tmp_path / "fetched.iso")
+
+    stats = fetch_image(new, index_image(new), [old], rebuilt)
+    assert read(rebuilt) == read(new)
+    assert stats.downloaded < MIB and stats.reused > 7 * MIB
@@ -0,0 +1,41 @@
+"""Journal segmenté et indexé des installations (log_store.py)"""
+
+import os
+
+from log_store import LogReader, LogSettings, LogWriter, segment_path
+
+
+def write_run(tmp_path, lines, segment_size=256):
+    writer = LogWriter(LogSettings(str(tmp_path), segment_size=segment_size), run_id="run")
+    for stage, line in lines:
+        writer.write(stage, line)
+    writer.close()
+    return writer.run_dir
+
+
+def test_reads_across_compressed_segments(tmp_path):
+    lines = [("base", f"paquet {i:03d} installé") for i in range(60)]
+    lines[25] = ("base", "error: échec du téléchargement de paquet 025")
+    lines[40] = ("base", "warning: paquet 040 remplacé")
+    lines += [("fstab", f"ligne fstab {i}") for i in range(10)]
+    # Format de log() de install.sh
+    lines[65] = ("fstab", "2026-10-18 12:00:00 [ERROR] genfstab a échoué")
+    run_dir = write_run(tmp_path, lines)
+
+    # Segments pleins compressés, aucun segment en clair après close()
+    assert os.path.exists(segment_path(run_dir, 1, True))
+    assert not os.path.exists(segment_path(run_dir, 0, False))
+
+    reader = LogReader(run_dir)
+    assert reader.line_count() == 70
+    assert [e.line for e in reader.find(level="ERROR")] == [25, 65]
+    assert [e.line for e in reader.find(level="WARNING")] == [25, 40, 65]
+    assert [e.line for e in reader.find(level="ERROR", stage="fstab")] == [65]
+    assert reader.stages() == ["base", "fstab"]
+
+    # Plage à cheval sur plusieurs segments, lue depuis le point le plus proche
+    expected = [f"[{stage}] {line}" for stage, line in lines]
+    assert len({e.segment for e in reader.entries if e.kind == "segment"}) > 2
+    assert reader.read_lines(5, 50) == expected[5:55]
+    assert reader.read_lines(60, 100) == expected[60:]
+    assert reader.read_lines(70, 5) == []
@@ -0,0 +1,68 @@
+"""Classement des miroirs (mirror_rank.py) face à des serveurs HTTP locaux"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mirror_rank import PROBE_PATH, load_cache, probe_all, rank, save_cache
+
+BODY = bytes(256 * 1024)
+
+
+@contextmanager
+def mirror(delay: float, status: int = 200):
+    """Miroir local qui répond à la sonde après delay secondes"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            if self.path != "/" + PROBE_PATH:
+                status_code = 404
+            else:
+                status_code = status
+            self.send_response(status_code)
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            try:
+                self.wfile.write(BODY)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_probe_rank_and_timeouts(tmp_path):
+    with mirror(0.0) as fast, mirror(0.8) as slow, mirror(3.0) as stalled, mirror(0.0, 404) as broken:
+        start = time.monotonic()
+        results = asyncio.run(probe_all([stalled, slow, broken, fast], timeout=1.0, sample_time=0.5))
+        elapsed = time.monotonic() - start
+
+    by_url = {result.url: result for result in results}
+    assert by_url[fast].ok and by_url[slow].ok
+    assert by_url[slow].latency >= 0.8 > by_url[fast].latency
+    assert by_url[stalled].error == "délai dépassé"
+    assert by_url[broken].error == "HTTP 404"
+    # Sondes simultanées: bornées par le délai d'une seule (1 s), pas par leur
+    # somme (1.8 s l'une après l'autre)
+    assert elapsed < 1.5
+
+    ranked = rank(results)
+    assert [result.url for result in ranked] == [fast, slow]
+
+    cache = str(tmp_path / "mirrors.json")
+    save_cache(cache, ["France"], ranked)
+    assert [result.url for result in load_cache(cache, ["France"], ttl=60)] == [fast, slow]
+    assert load_cache(cache, ["Germany"], ttl=60) is None
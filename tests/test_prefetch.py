@@ -0,0 +1,68 @@
+"""Préchargement des paquets (prefetch.py): groupe plafonné par l'espace disponible"""
+
+import os
+
+import pytest
+
+from prefetch import PackagePrefetcher, filesystem_type
+
+# pacman factice: -Sp donne deux paquets (taille et fichier), -Sw les "télécharge"
+PACMAN = """#!/bin/bash
+echo "$*" >> "{calls}"
+cache=""
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        --cachedir) cache="$2"; shift 2 ;;
+        -Sp) sizes=true; shift ;;
+        -Sw) fetch=true; shift ;;
+        *) shift ;;
+    esac
+done
+if [[ -n $sizes ]]; then
+    echo "300 a-1-x86_64.pkg.tar.zst"
+    echo "700 b-1-x86_64.pkg.tar.zst"
+elif [[ -n $fetch ]]; then
+    touch "$cache/a-1-x86_64.pkg.tar.zst" "$cache/b-1-x86_64.pkg.tar.zst"
+fi
+"""
+
+pytestmark = pytest.mark.skipif(os.geteuid() != 0, reason="le préchargement nécessite root")
+
+
+def prefetcher(tmp_path, room):
+    calls = tmp_path / "calls"
+    pacman = tmp_path / "pacman"
+    pacman.write_text(PACMAN.format(calls=calls))
+    pacman.chmod(0o755)
+    config = tmp_path / "pacman.conf"
+    config.write_text("[options]\n")
+    prefetch = PackagePrefetcher(str(tmp_path / "cache"), str(config), str(pacman), log_path=None)
+    prefetch.room = lambda: room
+    return prefetch, calls
+
+
+def run(prefetch, packages):
+    assert prefetch.start()
+    prefetch.request("base", packages)
+    assert prefetch.wait(10)
+
+
+def test_group_too_large_is_skipped(tmp_path):
+    prefetch, calls = prefetcher(tmp_path, room=999)
+    run(prefetch, ["a", "b"])
+    prefetch.stop()
+    assert not prefetch.fetched
+    assert [line.split()[0] for line in calls.read_text().splitlines()] == ["-Sy", "-Sp"]
+
+
+def test_group_that_fits_is_downloaded(tmp_path):
+    prefetch, calls = prefetcher(tmp_path, room=1000)
+    run(prefetch, ["a", "b"])
+    assert prefetch.fetched == {"a", "b"}
+    # Paquets désormais en cache: plus rien à télécharger
+    assert prefetch.download_size(["a", "b"]) == 0
+    prefetch.stop()
+
+
+def test_filesystem_type():
+    assert filesystem_type("/proc/self") == "proc"
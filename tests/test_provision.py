@@ -0,0 +1,52 @@
+"""Préparation des cibles de provision.py: images creuses attachées à des loops"""
+
+import os
+import shutil
+
+import pytest
+
+from provision import Provisioner
+
+pytestmark = pytest.mark.skipif(
+    os.geteuid() != 0 or not shutil.which("losetup") or not os.path.exists("/dev/loop-control"),
+    reason="losetup et les droits root sont nécessaires",
+)
+
+
+def provisioner(tmp_path, targets, image_size=None):
+    return Provisioner({"offline": True}, targets, work_dir=str(tmp_path / "work"),
+                       mount_dir=str(tmp_path / "mnt"), image_size=image_size)
+
+
+def test_attach_and_detach_images(tmp_path):
+    images = [str(tmp_path / f"disk{i}.img") for i in range(2)]
+    prov = provisioner(tmp_path, images, image_size="64M")
+    try:
+        prov.attach_targets()
+        disks = [target.disk for target in prov.targets]
+        assert len(set(disks)) == 2 and all(target.image for target in prov.targets)
+        for image, disk in zip(images, disks):
+            # Image créée creuse à la taille demandée, vue comme un disque bloc
+            assert os.path.getsize(image) == 64 * 1024 ** 2
+            with open(f"/sys/block/{disk}/size") as f:
+                assert int(f.read()) * 512 == 64 * 1024 ** 2
+    finally:
+        prov.detach_targets()
+    # Loop libéré: plus de fichier associé
+    assert not any(os.path.exists(f"/sys/block/{disk}/loop/backing_file") for disk in disks)
+
+
+def test_rejects_missing_image_and_duplicates(tmp_path):
+    with pytest.raises(ValueError, match="--image-size"):
+        provisioner(tmp_path, [str(tmp_path / "absent.img")]).attach_targets()
+
+    image = str(tmp_path / "disk.img")
+    prov = provisioner(tmp_path, [image], image_size="32M")
+    try:
+        prov.attach_targets()
+        disk = prov.targets[0].disk
+        # Même disque désigné par son nom et par son chemin
+        with pytest.raises(ValueError, match="double"):
+            provisioner(tmp_path, [disk, f"/dev/{disk}"]).attach_targets()
+    finally:
+        prov.detach_targets()